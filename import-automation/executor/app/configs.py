@@ -145,6 +145,28 @@ class ExecutorConfig:
     import_version_override: str = ''
     # Maximum time venv creation can take in seconds.
     venv_create_timeout: float = 3600
+    # Directory for the cache of venvs keyed by the requirements.
+    # The venv for each import is created in a temporary directory if empty.
+    venv_cache_dir: str = ''
+    # Maximum disk space for the venv cache in bytes. Least recently used venvs
+    # are removed beyond this size. Set to 0 for no limit.
+    venv_cache_max_bytes: int = 20 * 1024 * 1024 * 1024
+    # Directory with wheels to install requirements from without network
+    # access. Modules are installed from PyPI if empty.
+    pip_wheelhouse_dir: str = ''
+    # Maximum number of imports executed concurrently.
+    max_parallel_imports: int = 4
+    # CPUs available to imports executed concurrently. The resource_limits of
+    # the imports running at a time are kept within this.
+    # Set to 0 to use the CPUs of the machine.
+    import_cpu_limit: float = 0
+    # Memory in GB available to imports executed concurrently.
+    # Set to 0 to use the memory of the machine.
+    import_memory_gb_limit: float = 0
+    # Number of files uploaded or downloaded concurrently for an import.
+    max_transfer_workers: int = 8
+    # Number of retries for each file upload or download after an error.
+    transfer_max_retries: int = 3
     # Maximum time downloading a file can take in seconds.
     file_download_timeout: float = 600
     # Maximum time downloading the repo can take in seconds.
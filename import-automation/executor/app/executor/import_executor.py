@@ -16,6 +16,7 @@
 based on manifests.
 """
 
+import contextlib
 import dataclasses
 import glob
 import json
@@ -31,6 +32,7 @@ import traceback
 from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from google.cloud import spanner
 import datetime
+import functools
 
 REPO_DIR = os.path.dirname(
     os.path.dirname(
@@ -50,11 +52,15 @@ from tools.import_validation.runner import ValidationRunner
 from app import configs
 from app import utils
 from app.executor import cloud_run_simple_import
+from app.executor import import_scheduler
 from app.executor import import_target
+from app.executor import subprocess_runner
+from app.executor import venv_cache
 from app.service import email_notifier
 from app.service import file_uploader
 from app.service import github_api
 from app.service import import_service
+from app.service import transfer_manager
 from google.cloud import storage
 
 # Email address for status messages.
@@ -84,6 +90,9 @@ class ExecutionResult:
     imports_executed: List[str]
     # Description of the result
     message: str
+    # Results of each import when multiple imports are executed
+    import_results: List['ExecutionResult'] = dataclasses.field(
+        default_factory=list)
 
 
 class ExecutionError(Exception):
@@ -221,8 +230,6 @@ class ImportExecutor:
                 logging.info('%s: downloaded repo %s', absolute_import_name,
                              repo_dir)
 
-            executed_imports = []
-
             # An example import_dir is 'scripts/us_fed/treasury'
             import_dir, import_name = import_target.split_absolute_import_name(
                 absolute_import_name)
@@ -233,26 +240,14 @@ class ImportExecutor:
             logging.info('%s: loaded manifest %s', absolute_import_name,
                          manifest_path)
 
+            imports_to_execute = []
             for spec in manifest['import_specifications']:
-                import_name_in_spec = spec['import_name']
-                if import_name in ('all', import_name_in_spec):
-                    try:
-                        self._import_one(
-                            repo_dir=repo_dir,
-                            relative_import_dir=import_dir,
-                            absolute_import_dir=absolute_import_dir,
-                            import_spec=spec,
-                        )
-                    except Exception:
-                        raise ExecutionError(
-                            ExecutionResult('failed', executed_imports,
-                                            traceback.format_exc()))
-                    executed_imports.append(
-                        import_target.get_absolute_import_name(
-                            import_dir, import_name_in_spec))
+                if import_name in ('all', spec['import_name']):
+                    imports_to_execute.append((import_dir, spec))
+            result = self._execute_imports(repo_dir, imports_to_execute)
 
         logging.info('%s: END', absolute_import_name)
-        return ExecutionResult('succeeded', executed_imports, 'No issues')
+        return result
 
     def _execute_imports_on_commit_helper(
         self,
@@ -293,26 +288,71 @@ class ImportExecutor:
                 repo_dir=repo_dir,
             )
 
-            executed_imports = []
-            for relative_dir, spec in imports_to_execute:
-                try:
-                    self._import_one(
+            return self._execute_imports(repo_dir, imports_to_execute)
+
+    def _execute_imports(
+            self, repo_dir: str,
+            imports_to_execute: List[Tuple[str, dict]]) -> ExecutionResult:
+        """Executes imports concurrently within the configured resources.
+
+    Imports in the same directory share the files in it and are executed one
+    at a time. A failed import doesn't stop the others.
+
+    Args:
+        repo_dir: Absolute path to the repository, as a string.
+        imports_to_execute: List of tuples of the path to the directory
+          containing the manifest relative to repo_dir and the import spec.
+
+    Returns:
+        ExecutionResult object with the result of each import in
+        import_results.
+
+    Raises:
+        ExecutionError: The execution of any import failed. The result has
+          the succeeded imports in imports_executed.
+    """
+        tasks = []
+        for relative_dir, spec in imports_to_execute:
+            cpu, memory_gb = import_scheduler.get_import_resources(spec)
+            tasks.append(
+                import_scheduler.ImportTask(
+                    name=import_target.get_absolute_import_name(
+                        relative_dir, spec['import_name']),
+                    run=functools.partial(
+                        self._import_one,
                         repo_dir=repo_dir,
                         relative_import_dir=relative_dir,
                         absolute_import_dir=os.path.join(
                             repo_dir, relative_dir),
                         import_spec=spec,
-                    )
-
-                except Exception:
-                    raise ExecutionError(
-                        ExecutionResult('failed', executed_imports,
-                                        traceback.format_exc()))
-                absolute_name = import_target.get_absolute_import_name(
-                    relative_dir, spec['import_name'])
-                executed_imports.append(absolute_name)
-
-            return ExecutionResult('succeeded', executed_imports, 'No issues')
+                    ),
+                    cpu=cpu,
+                    memory_gb=memory_gb,
+                    group=relative_dir,
+                ))
+        scheduler = import_scheduler.ImportScheduler(
+            max_parallel=self.config.max_parallel_imports,
+            cpu=self.config.import_cpu_limit or os.cpu_count(),
+            memory_gb=self.config.import_memory_gb_limit or _get_memory_gb())
+        task_results = scheduler.run(tasks)
+
+        import_results = [
+            ExecutionResult(task.status, [task.name], task.message or
+                            'No issues') for task in task_results
+        ]
+        executed_imports = [
+            task.name for task in task_results if task.status == 'succeeded'
+        ]
+        failures = [
+            f'{task.name}: {task.message}' for task in task_results
+            if task.status != 'succeeded'
+        ]
+        if failures:
+            raise ExecutionError(
+                ExecutionResult('failed', executed_imports, '\n'.join(failures),
+                                import_results))
+        return ExecutionResult('succeeded', executed_imports, 'No issues',
+                               import_results)
 
     @log_function_call
     def _import_one(
@@ -646,6 +686,9 @@ class ImportExecutor:
                 script_interpreter = _get_script_interpreter(
                     script_path, interpreter_path)
                 script_env = os.environ.copy()
+                # Imports running concurrently have their own venv.
+                script_env['PATH'] = os.path.dirname(
+                    interpreter_path) + ':' + script_env.get('PATH', '')
                 if self.config.user_script_env:
                     script_env.update(self.config.user_script_env)
                 timer = Timer()
@@ -746,9 +789,8 @@ class ImportExecutor:
         self.counters.add_counter(f'import-{import_name}', 1)
         urls = import_spec.get('data_download_url')
         if urls:
-            for url in urls:
-                utils.download_file(url, absolute_import_dir,
-                                    self.config.file_download_timeout)
+            self._get_transfer_manager().download_files(
+                urls, absolute_import_dir, self.config.file_download_timeout)
 
         output_dir = f'{relative_import_dir}/{import_name}'
         version = self.config.import_version_override if self.config.import_version_override else _clean_time(
@@ -765,24 +807,20 @@ class ImportExecutor:
                                         import_summary)
             return
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            requirements_path = os.path.join(absolute_import_dir,
-                                             self.config.requirements_filename)
-            central_requirements_path = os.path.join(
-                repo_dir, 'import-automation', 'executor',
-                self.config.requirements_filename)
-            timer = Timer()
-            interpreter_path, process = _create_venv(
-                (central_requirements_path, requirements_path),
-                tmpdir,
-                timeout=self.config.venv_create_timeout,
-            )
-
+        requirements_path = os.path.join(absolute_import_dir,
+                                         self.config.requirements_filename)
+        central_requirements_path = os.path.join(
+            repo_dir, 'import-automation', 'executor',
+            self.config.requirements_filename)
+        timer = Timer()
+        with _use_venv((central_requirements_path, requirements_path),
+                       self.config) as (interpreter_path, process, cache_hit):
             _log_process(process=process,
                          import_name=import_name,
                          metrics={
                              "stage": "SETUP",
                              "latency_secs": timer.time(),
+                             "venv_cache_hit": cache_hit,
                          })
             process.check_returncode()
 
@@ -887,6 +925,8 @@ class ImportExecutor:
         uploaded = import_service.ImportInputs()
         import_inputs = import_spec.get('import_inputs', [])
         errors = []
+        # List of (src, dest) files to upload.
+        upload_files = []
         for import_input in import_inputs:
             for input_type in self.config.import_input_types:
                 path = import_input.get(input_type)
@@ -902,10 +942,7 @@ class ImportExecutor:
                         for file in import_files:
                             if file:
                                 dest = f'{output_dir}/{version}/{os.path.basename(file)}'
-                                self._upload_file_helper(
-                                    src=file,
-                                    dest=dest,
-                                )
+                                upload_files.append((file, dest))
                         uploaded_dest = f'{output_dir}/{version}/{os.path.basename(path)}'
                         setattr(uploaded, input_type, uploaded_dest)
                     elif not glob.has_magic(path):
@@ -923,10 +960,8 @@ class ImportExecutor:
         source_files = file_util.file_get_matching(source_files)
         for file in source_files:
             dest = f'{output_dir}/{version}/source_files/{os.path.basename(file)}'
-            self._upload_file_helper(
-                src=file,
-                dest=dest,
-            )
+            upload_files.append((file, dest))
+        self._get_transfer_manager().upload_files(upload_files)
 
         if errors:
             logging.fatal(f'Missing user_script outputs: {errors}')
@@ -934,14 +969,12 @@ class ImportExecutor:
                 f'Import job failed due to missing output files {errors}')
         return uploaded
 
-    def _upload_file_helper(self, src: str, dest: str) -> None:
-        """Uploads a file from src to dest.
-
-    Args:
-        src: Path to the file to upload, as a string.
-        dest: Path to where the file is to be uploaded to, as a string.
-    """
-        self.uploader.upload_file(src, dest)
+    def _get_transfer_manager(self) -> transfer_manager.TransferManager:
+        """Returns a TransferManager for concurrent uploads and downloads."""
+        return transfer_manager.TransferManager(
+            self.uploader,
+            max_workers=self.config.max_transfer_workers,
+            max_retries=self.config.transfer_max_retries)
 
     @log_function_call
     def _import_metadata_mcf_helper(self, import_spec: dict) -> str:
@@ -1028,40 +1061,22 @@ def _run_with_timeout_async(args: List[str],
     try:
         logging.info(f'Launching async command for {name}: {args} '
                      f'with timeout {timeout} in {cwd}, env: {env}')
-        start_time = time.time()
-        stdout = []
-        stderr = []
-        process = subprocess.Popen(
-            args,
-            cwd=cwd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env=env,
-        )
-
-        # Log output continuously until the command completes.
-        for line in process.stderr:
-            stderr.append(line)
-            logging.info(f'Process stderr:{name}: {line}')
-        for line in process.stdout:
-            stdout.append(line)
-            logging.info(f'Process stdout:{name}: {line}')
-
-        # Wait in case script has closed stderr/stdout early.
-        process.wait()
-        end_time = time.time()
-
-        return_code = process.returncode
+        # Read stdout and stderr concurrently, keeping only the first and
+        # last lines of each.
+        process = subprocess_runner.run_process(args,
+                                                timeout=timeout,
+                                                cwd=cwd,
+                                                env=env,
+                                                name=name)
+        rusage = process.rusage
         end_msg = (f'Completed script:{name}: "{args}", '
-                   f'Return code: {return_code}, '
-                   f'time: {end_time - start_time:.3f} secs.\n')
+                   f'Return code: {process.returncode}, '
+                   f'time: {rusage["latency_secs"]:.3f} secs, '
+                   f'cpu: {rusage["cpu_user_secs"]:.3f} user, '
+                   f'{rusage["cpu_system_secs"]:.3f} system secs, '
+                   f'max rss: {rusage["max_rss_kb"]} KB.\n')
         logging.info(end_msg)
-        return subprocess.CompletedProcess(
-            args=args,
-            returncode=return_code,
-            stdout=b''.join(stdout),
-            stderr=b''.join(stderr),
-        )
+        return process
     except Exception as e:
         message = traceback.format_exc()
         logging.exception(
@@ -1070,8 +1085,8 @@ def _run_with_timeout_async(args: List[str],
         return subprocess.CompletedProcess(
             args=args,
             returncode=1,
-            stdout=b''.join(stdout),
-            stderr=b''.join(stderr),
+            stdout=b'',
+            stderr=message.encode(),
         )
 
 
@@ -1117,8 +1132,11 @@ def _run_with_timeout(args: List[str],
 
 
 @log_function_call
-def _create_venv(requirements_path: Iterable[str], venv_dir: str,
-                 timeout: float) -> Tuple[str, subprocess.CompletedProcess]:
+def _create_venv(
+        requirements_path: Iterable[str],
+        venv_dir: str,
+        timeout: float,
+        wheelhouse_dir: str = '') -> Tuple[str, subprocess.CompletedProcess]:
     """Creates a Python virtual environment.
 
   The virtual environment is created with --system-site-packages set,
@@ -1126,6 +1144,9 @@ def _create_venv(requirements_path: Iterable[str], venv_dir: str,
   the opportunity to use the requirements.txt file for this project as
   a central requirement file for all user scripts.
 
+  The PATH of the executor is not changed as imports may run concurrently
+  with different environments.
+
   Args:
       requirements_path: List of paths to pip requirement files listing the
         dependencies to install, each as a string.
@@ -1133,6 +1154,9 @@ def _create_venv(requirements_path: Iterable[str], venv_dir: str,
         string.
       timeout: Maximum time the creation script can run for in seconds as a
         float.
+      wheelhouse_dir: Directory with wheels to install the requirements from
+        without accessing the package index. Modules are installed from the
+        package index if empty.
 
   Returns:
       A tuple consisting of the path to the created interpreter as a string
@@ -1144,19 +1168,70 @@ def _create_venv(requirements_path: Iterable[str], venv_dir: str,
     with tempfile.NamedTemporaryFile(mode='w', suffix='.sh') as script:
         script.write(f'python3 -m venv --system-site-packages {venv_dir}\n')
         script.write(f'. {venv_dir}/bin/activate\n')
+        pip_args = '--no-cache-dir --quiet'
+        if wheelhouse_dir:
+            pip_args += f' --no-index --find-links {wheelhouse_dir}'
         for path in requirements_path:
             if os.path.exists(path):
                 script.write(
-                    f'python3 -m pip install --no-cache-dir --quiet --requirement {path}\n'
-                )
+                    f'python3 -m pip install {pip_args} --requirement {path}\n')
         script.flush()
 
         process = _run_with_timeout(['bash', script.name], timeout)
-        os.environ['PATH'] = os.path.join(venv_dir,
-                                          'bin') + ':' + os.environ.get('PATH')
         return os.path.join(venv_dir, 'bin/python3'), process
 
 
+@contextlib.contextmanager
+def _use_venv(requirements_path: Iterable[str], config: configs.ExecutorConfig):
+    """Yields a Python virtual environment with the requirements installed.
+
+  The environment is reused from config.venv_cache_dir if set, else it is
+  created in a temporary directory that is removed after use.
+
+  Args:
+      requirements_path: List of paths to pip requirement files.
+      config: ExecutorConfig with the venv settings.
+
+  Yields:
+      A tuple of the path to the interpreter as a string, the
+      subprocess.CompletedProcess used to create the environment and a bool
+      that is True if the environment was reused from the cache.
+      The PATH of the executor is not changed. Processes that need the
+      environment get its bin directory in their own env.
+  """
+
+    def create_venv(requirements_path: Iterable[str], venv_dir: str):
+        return _create_venv(requirements_path,
+                            venv_dir,
+                            timeout=config.venv_create_timeout,
+                            wheelhouse_dir=config.pip_wheelhouse_dir)
+
+    if not config.venv_cache_dir:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            interpreter_path, process = create_venv(requirements_path, tmpdir)
+            yield interpreter_path, process, False
+        return
+
+    # Wheels available for install change the modules in the environment.
+    key_extra = ''
+    if config.pip_wheelhouse_dir and os.path.isdir(config.pip_wheelhouse_dir):
+        key_extra = ','.join(sorted(os.listdir(config.pip_wheelhouse_dir)))
+    cache = venv_cache.VenvCache(config.venv_cache_dir,
+                                 config.venv_cache_max_bytes)
+    with cache.use_venv(requirements_path, create_venv,
+                        key_extra) as (interpreter_path, process, cache_hit):
+        yield interpreter_path, process, cache_hit
+
+
+def _get_memory_gb() -> float:
+    """Returns the physical memory of the machine in GB."""
+    try:
+        return (os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') /
+                (1024 * 1024 * 1024))
+    except (ValueError, OSError):
+        return 0
+
+
 def _get_script_interpreter(script: str, py_interpreter: str) -> str:
     """Returns the interpreter for the script.
 
@@ -1291,6 +1366,8 @@ def _log_process(process: subprocess.CompletedProcess,
     if import_name:
         metrics["import_name"] = import_name
     metrics["status"] = process.returncode
+    # Add the CPU time and memory used by the process.
+    metrics.update(getattr(process, 'rusage', {}))
 
     log_metric(
         AUTO_IMPORT_JOB_STAGE, "INFO" if process.returncode == 0 else "ERROR",
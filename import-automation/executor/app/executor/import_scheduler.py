@@ -0,0 +1,170 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Runs multiple imports concurrently within CPU and memory limits.
+
+Each import is a task with the CPU and memory it needs, taken from the
+resource_limits in the manifest. Tasks are started in order as long as the
+resources are available and the number of running tasks is below the limit.
+Tasks in the same group, such as imports in the same directory that share
+files, run one at a time.
+
+A failed task doesn't stop the other tasks. The result of each task is
+returned in the order of the tasks.
+
+Usage:
+  scheduler = ImportScheduler(max_parallel=4, cpu=8, memory_gb=32)
+  results = scheduler.run([
+      ImportTask(name='dir:import1', run=run_import1, cpu=2, memory_gb=8),
+      ImportTask(name='dir:import2', run=run_import2, cpu=4, memory_gb=16),
+  ])
+"""
+
+import concurrent.futures
+import dataclasses
+import logging
+import threading
+import time
+import traceback
+from typing import Callable, List, Tuple
+
+# Resources for imports without resource_limits in the manifest.
+_DEFAULT_CPU = 1
+_DEFAULT_MEMORY_GB = 2
+
+
+@dataclasses.dataclass
+class ImportTask:
+    """An import to be run by the scheduler."""
+    # Absolute import name.
+    name: str
+    # Function that runs the import. Raises an exception on failure.
+    run: Callable[[], None]
+    # CPUs needed by the import.
+    cpu: float = _DEFAULT_CPU
+    # Memory needed by the import in GB.
+    memory_gb: float = _DEFAULT_MEMORY_GB
+    # Tasks with the same group are not run concurrently.
+    group: str = ''
+
+
+@dataclasses.dataclass
+class ImportTaskResult:
+    """Result of an import run by the scheduler."""
+    name: str
+    # 'succeeded' or 'failed'
+    status: str
+    # Stack trace for a failure.
+    message: str = ''
+    latency_secs: float = 0
+
+
+def get_import_resources(import_spec: dict) -> Tuple[float, float]:
+    """Returns the tuple (cpu, memory in GB) for an import spec."""
+    resources = import_spec.get('resource_limits', {})
+    return (float(resources.get('cpu', _DEFAULT_CPU)),
+            float(resources.get('memory', _DEFAULT_MEMORY_GB)))
+
+
+class ImportScheduler:
+    """Runs import tasks concurrently within resource limits.
+
+  Attributes:
+      max_parallel: Maximum number of tasks running at a time.
+      cpu: Total CPUs available for the tasks. 0 for no limit.
+      memory_gb: Total memory available for the tasks in GB. 0 for no limit.
+  """
+
+    def __init__(self, max_parallel: int = 1, cpu: float = 0, memory_gb=0):
+        self.max_parallel = max(1, max_parallel)
+        self.cpu = cpu
+        self.memory_gb = memory_gb
+        self._lock = threading.Condition()
+        self._used_cpu = 0
+        self._used_memory_gb = 0
+        self._active_groups = set()
+        self._num_running = 0
+
+    def run(self, tasks: List[ImportTask]) -> List[ImportTaskResult]:
+        """Runs all the tasks and returns their results in the same order."""
+        results = [None] * len(tasks)
+        pending = list(range(len(tasks)))
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_parallel) as pool:
+            with self._lock:
+                while pending:
+                    index = self._get_next_task(tasks, pending)
+                    if index is None:
+                        # Wait for a running task to complete.
+                        self._lock.wait()
+                        continue
+                    pending.remove(index)
+                    self._acquire(tasks[index])
+                    pool.submit(self._run_task, tasks[index], index, results)
+        return results
+
+    def _get_next_task(self, tasks: List[ImportTask], pending: List[int]):
+        """Returns the index of the first pending task that can be started."""
+        if self._num_running >= self.max_parallel:
+            return None
+        for index in pending:
+            task = tasks[index]
+            if task.group and task.group in self._active_groups:
+                continue
+            if self._num_running == 0:
+                # A task larger than the limits is run by itself.
+                return index
+            if self.cpu and self._used_cpu + task.cpu > self.cpu:
+                continue
+            if (self.memory_gb and
+                    self._used_memory_gb + task.memory_gb > self.memory_gb):
+                continue
+            return index
+        return None
+
+    def _acquire(self, task: ImportTask):
+        self._num_running += 1
+        self._used_cpu += task.cpu
+        self._used_memory_gb += task.memory_gb
+        if task.group:
+            self._active_groups.add(task.group)
+
+    def _release(self, task: ImportTask):
+        with self._lock:
+            self._num_running -= 1
+            self._used_cpu -= task.cpu
+            self._used_memory_gb -= task.memory_gb
+            self._active_groups.discard(task.group)
+            self._lock.notify_all()
+
+    def _run_task(self, task: ImportTask, index: int,
+                  results: List[ImportTaskResult]):
+        logging.info(f'Starting import {task.name} with {task.cpu} cpu,'
+                     f' {task.memory_gb} GB memory')
+        start_time = time.time()
+        try:
+            task.run()
+            results[index] = ImportTaskResult(task.name, 'succeeded')
+        except Exception:
+            logging.exception(f'Import {task.name} failed')
+            results[index] = ImportTaskResult(task.name, 'failed',
+                                              traceback.format_exc())
+        finally:
+            if results[index] is None:
+                results[index] = ImportTaskResult(task.name, 'failed',
+                                                  'Import interrupted')
+            results[index].latency_secs = time.time() - start_time
+            logging.info(f'Completed import {task.name} with status'
+                         f' {results[index].status} in'
+                         f' {results[index].latency_secs:.1f} secs')
+            self._release(task)
@@ -0,0 +1,240 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Runs a subprocess and streams its stdout/stderr with bounded memory.
+
+Both pipes are read concurrently so that a process writing a lot to one
+stream can't block on a full pipe while the other stream is being read.
+Lines are logged as they arrive, upto a rate limit, and only the first and
+last lines of each stream are kept for the CompletedProcess.
+
+The CPU time and max RSS of the process are returned in the rusage attribute
+of the CompletedProcess.
+"""
+
+import collections
+import logging
+import os
+import selectors
+import subprocess
+import time
+from typing import List
+
+# Number of lines to keep from the start and end of each stream.
+_HEAD_LINES = 100
+_TAIL_LINES = 1000
+
+# Maximum number of lines logged per second for each stream.
+_MAX_LOG_LINES_PER_SEC = 100
+
+# Maximum length of a line. Longer lines are split.
+_MAX_LINE_BYTES = 64 * 1024
+
+# Size of reads from the pipes.
+_READ_SIZE = 64 * 1024
+
+
+class OutputBuffer:
+    """Keeps the first and last lines of an output stream."""
+
+    def __init__(self,
+                 head_lines: int = _HEAD_LINES,
+                 tail_lines: int = _TAIL_LINES):
+        self._head_lines = head_lines
+        self._head = []
+        self._tail = collections.deque(maxlen=tail_lines)
+        self.num_lines = 0
+        self.num_bytes = 0
+
+    def add_line(self, line: bytes):
+        self.num_lines += 1
+        self.num_bytes += len(line)
+        if len(self._head) < self._head_lines:
+            self._head.append(line)
+        else:
+            self._tail.append(line)
+
+    def get_output(self) -> bytes:
+        """Returns the lines kept with a marker for lines dropped."""
+        num_dropped = self.num_lines - len(self._head) - len(self._tail)
+        lines = list(self._head)
+        if num_dropped > 0:
+            lines.append(f'... {num_dropped} lines omitted ...\n'.encode())
+        lines.extend(self._tail)
+        return b''.join(lines)
+
+
+class RateLimitedLogger:
+    """Logs lines upto a maximum number of lines per second.
+
+  Lines beyond the limit are counted and reported in the next log.
+  """
+
+    def __init__(self,
+                 prefix: str,
+                 max_lines_per_sec: int = _MAX_LOG_LINES_PER_SEC):
+        self._prefix = prefix
+        self._max_lines_per_sec = max_lines_per_sec
+        self._window_start = 0
+        self._window_lines = 0
+        self.num_suppressed = 0
+
+    def log(self, line: bytes):
+        now = time.monotonic()
+        if now - self._window_start >= 1:
+            self._window_start = now
+            self._window_lines = 0
+        if (self._max_lines_per_sec and
+                self._window_lines >= self._max_lines_per_sec):
+            self.num_suppressed += 1
+            return
+        self._window_lines += 1
+        if self.num_suppressed:
+            logging.info(f'{self._prefix}: ... suppressed'
+                         f' {self.num_suppressed} lines ...')
+            self.num_suppressed = 0
+        logging.info(
+            f'{self._prefix}: {line.decode("utf-8", errors="replace").rstrip()}'
+        )
+
+    def flush(self):
+        if self.num_suppressed:
+            logging.info(f'{self._prefix}: ... suppressed'
+                         f' {self.num_suppressed} lines ...')
+            self.num_suppressed = 0
+
+
+class _StreamReader:
+    """Splits the data read from a pipe into lines."""
+
+    def __init__(self, buffer: OutputBuffer, logger: RateLimitedLogger):
+        self._buffer = buffer
+        self._logger = logger
+        self._partial = b''
+
+    def add_data(self, data: bytes):
+        data = self._partial + data
+        lines = data.split(b'\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self._add_line(line + b'\n')
+        while len(self._partial) >= _MAX_LINE_BYTES:
+            self._add_line(self._partial[:_MAX_LINE_BYTES])
+            self._partial = self._partial[_MAX_LINE_BYTES:]
+
+    def close(self):
+        if self._partial:
+            self._add_line(self._partial)
+            self._partial = b''
+        self._logger.flush()
+
+    def _add_line(self, line: bytes):
+        self._buffer.add_line(line)
+        self._logger.log(line)
+
+
+def run_process(
+    args: List[str],
+    timeout: float = None,
+    cwd: str = None,
+    env: dict = None,
+    name: str = None,
+    head_lines: int = _HEAD_LINES,
+    tail_lines: int = _TAIL_LINES,
+    max_log_lines_per_sec: int = _MAX_LOG_LINES_PER_SEC
+) -> subprocess.CompletedProcess:
+    """Runs a command and logs its stdout/stderr as lines are emitted.
+
+  Args:
+      args: Command to run as a list. Each element is a string.
+      timeout: Maximum time the command can run for in seconds as a float.
+        The process is killed after the timeout.
+      cwd: Current working directory of the process as a string.
+      env: Dict of environment variables for the command.
+      name: Name of the command for logs.
+      head_lines: Number of lines to keep from the start of each stream.
+      tail_lines: Number of lines to keep from the end of each stream.
+      max_log_lines_per_sec: Maximum lines logged per second for each stream.
+
+  Returns:
+      subprocess.CompletedProcess with the first and last lines of
+      stdout/stderr and an additional attribute rusage with a dict of:
+        'cpu_user_secs', 'cpu_system_secs', 'max_rss_kb', 'latency_secs',
+        'stdout_lines', 'stderr_lines' and 'timed_out'.
+  """
+    start_time = time.monotonic()
+    process = subprocess.Popen(args,
+                               cwd=cwd,
+                               env=env,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    buffers = {}
+    readers = {}
+    selector = selectors.DefaultSelector()
+    for stream_name, stream in [('stdout', process.stdout),
+                                ('stderr', process.stderr)]:
+        buffers[stream_name] = OutputBuffer(head_lines, tail_lines)
+        readers[stream.fileno()] = _StreamReader(
+            buffers[stream_name],
+            RateLimitedLogger(f'Process {stream_name}:{name}',
+                              max_log_lines_per_sec))
+        selector.register(stream, selectors.EVENT_READ)
+
+    timed_out = False
+    try:
+        while selector.get_map():
+            wait_secs = None
+            if timeout:
+                wait_secs = timeout - (time.monotonic() - start_time)
+                if wait_secs <= 0:
+                    logging.error(
+                        f'Killing process {name} after timeout of {timeout} secs'
+                    )
+                    timed_out = True
+                    process.kill()
+                    break
+            for key, _ in selector.select(wait_secs):
+                data = os.read(key.fd, _READ_SIZE)
+                if data:
+                    readers[key.fd].add_data(data)
+                else:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+    finally:
+        for key in list(selector.get_map().values()):
+            selector.unregister(key.fileobj)
+            key.fileobj.close()
+        selector.close()
+        for reader in readers.values():
+            reader.close()
+
+    # Wait for the process and get its resource usage.
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    completed_process = subprocess.CompletedProcess(
+        args=args,
+        returncode=process.returncode,
+        stdout=buffers['stdout'].get_output(),
+        stderr=buffers['stderr'].get_output(),
+    )
+    # ru_maxrss is in KB on Linux.
+    completed_process.rusage = {
+        'cpu_user_secs': rusage.ru_utime,
+        'cpu_system_secs': rusage.ru_stime,
+        'max_rss_kb': rusage.ru_maxrss,
+        'latency_secs': time.monotonic() - start_time,
+        'stdout_lines': buffers['stdout'].num_lines,
+        'stderr_lines': buffers['stderr'].num_lines,
+        'timed_out': timed_out,
+    }
+    return completed_process
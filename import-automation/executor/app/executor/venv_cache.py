@@ -0,0 +1,222 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Cache of Python virtual environments for user scripts.
+
+Each virtual environment is stored in a directory named by a hash of the
+contents of the requirement files and the Python interpreter version, so
+imports with the same requirements reuse the environment instead of
+installing the modules again.
+
+A lock file per environment makes the cache safe to use across processes:
+an exclusive lock is held while an environment is created and a shared lock
+while it is used. Environments that are not in use are evicted, least
+recently used first, when the cache exceeds its size limit.
+
+Usage:
+  cache = VenvCache('/tmp/venv_cache', max_size_bytes=20 << 30)
+  with cache.use_venv(['requirements.txt'], create_venv) as (
+      interpreter_path, process, cache_hit):
+    # Run scripts with interpreter_path
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+from typing import Callable, Iterable, Tuple
+
+# File created in an environment after it is setup completely.
+_COMPLETE_MARKER = '.venv_complete'
+# Suffix for the lock file of an environment.
+_LOCK_SUFFIX = '.lock'
+
+
+def get_venv_key(requirements_path: Iterable[str], extra: str = '') -> str:
+    """Returns the key for a virtual environment.
+
+  Args:
+      requirements_path: List of paths to pip requirement files. Files that
+        don't exist are ignored.
+      extra: Additional string that changes the environment, such as the
+        pip options.
+
+  Returns:
+      Hash of the Python version and the contents of the requirement files.
+  """
+    key = hashlib.sha256()
+    key.update(sys.version.encode())
+    python_path = shutil.which('python3') or ''
+    key.update(os.path.realpath(python_path).encode())
+    key.update(extra.encode())
+    for path in requirements_path:
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                key.update(hashlib.sha256(file.read()).digest())
+        else:
+            key.update(b'-')
+    return key.hexdigest()[:24]
+
+
+def _get_dir_size(path: str) -> int:
+    """Returns the bytes used by files under a directory."""
+    size = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.lstat(os.path.join(root, file)).st_size
+            except OSError:
+                pass
+    return size
+
+
+class VenvCache:
+    """Cache of virtual environments keyed by the requirements."""
+
+    def __init__(self, cache_dir: str, max_size_bytes: int = 0):
+        self._cache_dir = cache_dir
+        self._max_size_bytes = max_size_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_venv_dir(self, key: str) -> str:
+        return os.path.join(self._cache_dir, key)
+
+    @contextlib.contextmanager
+    def use_venv(
+            self,
+            requirements_path: Iterable[str],
+            create_venv: Callable[[Iterable[str], str],
+                                  Tuple[str, subprocess.CompletedProcess]],
+            key_extra: str = ''
+    ) -> Tuple[str, subprocess.CompletedProcess, bool]:
+        """Yields a virtual environment with the requirements installed.
+
+    The environment is created if it is not in the cache.
+
+    Args:
+        requirements_path: List of paths to pip requirement files.
+        create_venv: function called with the requirements_path and a
+          directory to create the environment in, that returns a tuple of the
+          interpreter path and the subprocess.CompletedProcess for the setup.
+        key_extra: Additional string for the key of the environment.
+
+    Yields:
+        tuple of the path to the Python interpreter, a
+        subprocess.CompletedProcess for the setup and a bool that is True if
+        the environment was in the cache. For an environment from the cache,
+        the process has an empty output and a return code of 0.
+    """
+        key = get_venv_key(requirements_path, key_extra)
+        venv_dir = self.get_venv_dir(key)
+        interpreter_path = os.path.join(venv_dir, 'bin', 'python3')
+        with open(venv_dir + _LOCK_SUFFIX, 'a+') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            process = None
+            if not self._is_complete(venv_dir):
+                # Upgrade to an exclusive lock to create the environment.
+                # Check again in case another process created it.
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                if not self._is_complete(venv_dir):
+                    process = self._create(key, requirements_path, create_venv)
+                fcntl.flock(lock_file, fcntl.LOCK_SH)
+            cache_hit = process is None
+            if cache_hit:
+                logging.info(f'Using cached venv {venv_dir}')
+                process = subprocess.CompletedProcess(
+                    args=['venv-cache', venv_dir],
+                    returncode=0,
+                    stdout='',
+                    stderr='')
+            if process.returncode == 0:
+                # Update the last use time for eviction.
+                os.utime(os.path.join(venv_dir, _COMPLETE_MARKER))
+            try:
+                yield interpreter_path, process, cache_hit
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self.evict(keep_keys={key})
+
+    def evict(self, keep_keys: Iterable[str] = ()) -> int:
+        """Removes least recently used environments over the size limit.
+
+    Environments in use by any process are not removed.
+
+    Returns:
+        Number of environments removed.
+    """
+        if not self._max_size_bytes:
+            return 0
+        venvs = []
+        total_size = 0
+        for key in os.listdir(self._cache_dir):
+            venv_dir = self.get_venv_dir(key)
+            if key.endswith(_LOCK_SUFFIX) or not os.path.isdir(venv_dir):
+                continue
+            size = _get_dir_size(venv_dir)
+            total_size += size
+            last_used = 0
+            marker = os.path.join(venv_dir, _COMPLETE_MARKER)
+            if os.path.exists(marker):
+                last_used = os.path.getmtime(marker)
+            venvs.append((last_used, key, size))
+
+        num_removed = 0
+        for _, key, size in sorted(venvs):
+            if total_size <= self._max_size_bytes:
+                break
+            if key in keep_keys:
+                continue
+            venv_dir = self.get_venv_dir(key)
+            with open(venv_dir + _LOCK_SUFFIX, 'a+') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Environment is in use.
+                    continue
+                logging.info(f'Evicting venv {venv_dir} with {size} bytes')
+                shutil.rmtree(venv_dir, ignore_errors=True)
+                total_size -= size
+                num_removed += 1
+        return num_removed
+
+    def _is_complete(self, venv_dir: str) -> bool:
+        return os.path.exists(os.path.join(venv_dir, _COMPLETE_MARKER))
+
+    def _create(
+        self, key: str, requirements_path: Iterable[str],
+        create_venv: Callable[[Iterable[str], str],
+                              Tuple[str, subprocess.CompletedProcess]]
+    ) -> subprocess.CompletedProcess:
+        """Creates the environment while holding the exclusive lock.
+
+    The environment is marked complete only if the setup succeeded, so a
+    failed or interrupted setup is recreated on the next use.
+    """
+        venv_dir = self.get_venv_dir(key)
+        if os.path.exists(venv_dir):
+            logging.info(f'Removing incomplete venv {venv_dir}')
+            shutil.rmtree(venv_dir, ignore_errors=True)
+        logging.info(f'Creating venv {venv_dir} for {requirements_path}')
+        start_time = time.time()
+        _, process = create_venv(requirements_path, venv_dir)
+        if process.returncode == 0:
+            with open(os.path.join(venv_dir, _COMPLETE_MARKER), 'w') as marker:
+                marker.write(f'{requirements_path}\n')
+            logging.info(f'Created venv {venv_dir} in'
+                         f' {time.time() - start_time:.3f} secs')
+        return process
@@ -15,12 +15,20 @@
 File uploaders for uploading generated data files.
 """
 
+import base64
+import hashlib
 import os
 import logging
 import shutil
 
 from google.cloud import storage
 
+# Files larger than this are uploaded to GCS in chunks with a resumable upload
+# that is retried from the last chunk on errors.
+_RESUMABLE_UPLOAD_MIN_BYTES = 32 * 1024 * 1024
+# Size of the chunks for uploads. GCS requires a multiple of 256KB.
+_UPLOAD_CHUNK_BYTES = 16 * 1024 * 1024
+
 
 class FileUploader:
     """Base class for all file uploaders."""
@@ -33,6 +41,14 @@ class FileUploader:
         """Uploads the string to a file at dest."""
         raise NotImplementedError
 
+    def get_checksum(self, dest: str) -> str:
+        """Returns the checksum of the file at dest from get_file_checksum().
+
+        Returns an empty string if the file doesn't exist or the checksum
+        is not available.
+        """
+        return ''
+
 
 class GCSFileUploader(FileUploader):
     """Class for uploading files to a Google Storage Bucket.
@@ -84,7 +100,11 @@ class GCSFileUploader(FileUploader):
         dest = self._fix_path(dest)
         logging.info('GCSFileUploader.upload_file: Uploading %s to %s', src,
                      dest)
-        blob = self.bucket.blob(dest)
+        if (os.path.exists(src) and
+                os.path.getsize(src) > _RESUMABLE_UPLOAD_MIN_BYTES):
+            blob = self.bucket.blob(dest, chunk_size=_UPLOAD_CHUNK_BYTES)
+        else:
+            blob = self.bucket.blob(dest)
         blob.upload_from_filename(src)
         logging.info('GCSFileUploader.upload_file: Uploaded %s to %s', src,
                      dest)
@@ -107,6 +127,17 @@ class GCSFileUploader(FileUploader):
         blob.upload_from_string(string)
         logging.info('GCSFileUploader.upload_string: Uploaded to %s', dest)
 
+    def get_checksum(self, dest: str) -> str:
+        """Returns the MD5 checksum of a file in the bucket.
+
+        Composite objects don't have an MD5 and return an empty string.
+        """
+        _strings_not_empty(dest)
+        blob = self.bucket.get_blob(self._fix_path(dest))
+        if blob is None or not blob.md5_hash:
+            return ''
+        return blob.md5_hash
+
     def _fix_path(self, path):
         """Returns {self.path_prefix}/{path}."""
         return os.path.join(self.path_prefix, path)
@@ -139,7 +170,16 @@ class LocalFileUploader(FileUploader):
         logging.info('LocalFileUploader.upload_file: Uploading %s to %s', src,
                      dest)
         os.makedirs(os.path.dirname(dest), exist_ok=True)
-        shutil.copyfile(src, dest)
+        # Copy to a temporary file so that a partial copy is never seen at
+        # dest.
+        tmp_dest = f'{dest}.{os.getpid()}.tmp'
+        try:
+            with open(src, 'rb') as src_file, open(tmp_dest, 'wb') as out:
+                shutil.copyfileobj(src_file, out, _UPLOAD_CHUNK_BYTES)
+            os.replace(tmp_dest, dest)
+        finally:
+            if os.path.exists(tmp_dest):
+                os.remove(tmp_dest)
         logging.info('LocalFileUploader.upload_file: Uploaded %s to %s', src,
                      dest)
 
@@ -161,6 +201,23 @@ class LocalFileUploader(FileUploader):
         logging.info('LocalFileUploader.upload_string: Uploaded %s to %s',
                      string, dest)
 
+    def get_checksum(self, dest: str) -> str:
+        """Returns the MD5 checksum of the file at <output_dir>/<dest>."""
+        _strings_not_empty(dest)
+        dest = os.path.join(self.output_dir, dest)
+        if not os.path.exists(dest):
+            return ''
+        return get_file_checksum(dest)
+
+
+def get_file_checksum(path: str) -> str:
+    """Returns the base64 encoded MD5 of a file, as used by GCS."""
+    md5 = hashlib.md5()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(_UPLOAD_CHUNK_BYTES), b''):
+            md5.update(chunk)
+    return base64.b64encode(md5.digest()).decode()
+
 
 def _strings_not_empty(*args: str):
     """Ensures that the strings are not None, empty, or all spaces.
@@ -0,0 +1,148 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Concurrent uploads and downloads of files for imports.
+
+Files are transferred by a pool of workers. Uploads go through a
+FileUploader and are skipped if the destination already has a file with the
+same checksum. Each file is retried on errors, and all files are attempted
+before the errors are raised.
+"""
+
+import concurrent.futures
+import logging
+import time
+from typing import List, Tuple
+
+from app import utils
+from app.service import file_uploader
+
+# Number of files transferred concurrently.
+_MAX_WORKERS = 8
+# Number of retries for a file after an error.
+_MAX_RETRIES = 3
+# Seconds to wait before the first retry. Doubled for each retry.
+_RETRY_SECS = 1
+
+
+class TransferManager:
+    """Uploads and downloads files concurrently.
+
+    Attributes:
+        uploader: FileUploader used to upload files.
+        max_workers: Number of files transferred concurrently.
+        max_retries: Number of retries for a file after an error.
+        retry_secs: Seconds to wait before the first retry.
+    """
+
+    def __init__(self,
+                 uploader: file_uploader.FileUploader,
+                 max_workers: int = _MAX_WORKERS,
+                 max_retries: int = _MAX_RETRIES,
+                 retry_secs: float = _RETRY_SECS):
+        self.uploader = uploader
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.retry_secs = retry_secs
+
+    def upload_files(self, files: List[Tuple[str, str]]) -> List[str]:
+        """Uploads files that are not already at the destination.
+
+        Args:
+            files: List of tuples of (src, dest) for each file to upload.
+
+        Returns:
+            List with the status of each file, 'uploaded' or 'skipped' if
+            the destination had the same file.
+
+        Raises:
+            RuntimeError: Any of the files failed to upload after retries.
+        """
+        return self._run_all(self._upload_file, files, 'upload')
+
+    def download_files(self, urls: List[str], dest_dir: str,
+                       timeout: float) -> List[str]:
+        """Downloads files from web URLs into a directory.
+
+        Args:
+            urls: List of URLs to download.
+            dest_dir: Directory to download the files into.
+            timeout: Maximum time in seconds for each file.
+
+        Returns:
+            List of paths to the downloaded files in the order of urls.
+
+        Raises:
+            RuntimeError: Any of the files failed to download.
+        """
+        # Retries are done by download_file to resume partial downloads.
+        return self._run_all(
+            lambda url: utils.download_file(url,
+                                            dest_dir,
+                                            timeout,
+                                            max_retries=self.max_retries,
+                                            retry_secs=self.retry_secs), urls,
+            'download')
+
+    def _run_all(self, func, items: list, name: str) -> list:
+        """Returns the result of func on each item run by the workers."""
+        if not items:
+            return []
+        start_time = time.time()
+        results = [None] * len(items)
+        errors = []
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers) as pool:
+            futures = {
+                pool.submit(func, item): index
+                for index, item in enumerate(items)
+            }
+            for future in concurrent.futures.as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as exc:
+                    logging.exception(f'Failed to {name} {items[index]}')
+                    errors.append(f'{items[index]}: {exc}')
+        logging.info(f'Completed {name} of {len(items)} files with'
+                     f' {len(errors)} errors in'
+                     f' {time.time() - start_time:.3f} secs')
+        if errors:
+            raise RuntimeError(
+                f'Failed to {name} {len(errors)} files: {errors}')
+        return results
+
+    def _upload_file(self, file: Tuple[str, str]) -> str:
+        src, dest = file
+        checksum = self.uploader.get_checksum(dest)
+        if checksum and checksum == file_uploader.get_file_checksum(src):
+            logging.info(f'Skipping upload of {src} to {dest} with the same'
+                         ' checksum')
+            return 'skipped'
+        attempt = 0
+        while True:
+            try:
+                self.uploader.upload_file(src, dest)
+                return 'uploaded'
+            except (FileNotFoundError, ValueError):
+                # Errors for the arguments are not retried.
+                raise
+            except Exception as exc:
+                if attempt >= self.max_retries:
+                    raise
+                wait_secs = self.retry_secs * (2**attempt)
+                attempt += 1
+                logging.warning(f'Retrying upload of {src} to {dest} in'
+                                f' {wait_secs} secs after error: {exc}')
+                time.sleep(wait_secs)
@@ -15,6 +15,7 @@
 Utility functions.
 """
 
+import logging
 import time
 import os
 import re
@@ -27,6 +28,9 @@ import requests
 
 _PACIFIC_TIME = 'America/Los_Angeles'
 
+# Size of the chunks written to a file being downloaded.
+_DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
 
 def utctime():
     """Returns the current time string in ISO 8601 with timezone UTC+0, e.g.
@@ -101,15 +105,25 @@ def _get_filename(response):
     return name_list[0]
 
 
-def download_file(url: str, dest_dir: str, timeout: float = None) -> str:
+def download_file(url: str,
+                  dest_dir: str,
+                  timeout: float = None,
+                  max_retries: int = 0,
+                  retry_secs: float = 1) -> str:
     """Downloads a file from a web URL to a directory.
 
+    The file is downloaded in chunks. If the connection fails, the download is
+    retried from the last byte received, if the server supports range requests.
+
     Args:
         url: File url as a string.
         dest_dir: Directory to download the file into, as a string.
         timeout: Maximum time in seconds downloading the file can take,
             as a float. The actual timeout will be a rough approximation to
             this, likely several seconds larger.
+        max_retries: Number of times to retry after a connection error.
+        retry_secs: Seconds to wait before the first retry. The wait is
+            doubled for each retry.
 
     Returns:
         Path to the downloaded file of the form
@@ -118,19 +132,48 @@ def download_file(url: str, dest_dir: str, timeout: float = None) -> str:
     Raises:
         requests.Timeout: Downloading timed out.
     """
-    # 9.05 is the connect timeout and 27 is the read timeout. See
-    # https://requests.readthedocs.io/en/master/user/advanced/#timeouts.
-    with requests.get(url, stream=True, timeout=(9.05, 27)) as response:
-        response.raise_for_status()
-        filename = _get_filename(response)
-        path = os.path.join(dest_dir, filename)
-        with open(path, 'wb') as out:
-            start = time.time()
-            for data in response.iter_content(chunk_size=4096):
-                out.write(data)
-                if timeout is not None and time.time() - start > timeout:
-                    raise requests.Timeout(f'Downloading {url} timed out')
-        return path
+    start = time.time()
+    path = None
+    offset = 0
+    attempt = 0
+    while True:
+        headers = {}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+        try:
+            # 9.05 is the connect timeout and 27 is the read timeout. See
+            # https://requests.readthedocs.io/en/master/user/advanced/#timeouts.
+            with requests.get(url,
+                              stream=True,
+                              timeout=(9.05, 27),
+                              headers=headers) as response:
+                response.raise_for_status()
+                if path is None:
+                    path = os.path.join(dest_dir, _get_filename(response))
+                if response.status_code != 206:
+                    # Range not supported, download the whole file again.
+                    offset = 0
+                with open(path, 'r+b' if offset else 'wb') as out:
+                    out.seek(offset)
+                    for data in response.iter_content(
+                            chunk_size=_DOWNLOAD_CHUNK_BYTES):
+                        out.write(data)
+                        offset += len(data)
+                        if timeout is not None and time.time(
+                        ) - start > timeout:
+                            raise requests.Timeout(
+                                f'Downloading {url} timed out')
+                    out.truncate()
+            return path
+        except (requests.ConnectionError,
+                requests.exceptions.ChunkedEncodingError) as exc:
+            if attempt >= max_retries:
+                raise
+            wait_secs = retry_secs * (2**attempt)
+            attempt += 1
+            logging.warning(f'Retrying download of {url} from byte {offset}'
+                            f' in {wait_secs} secs after error: {exc}')
+            time.sleep(wait_secs)
 
 
 def parse_tag_list(message: str, tag: str, allowed_chars: str) -> List[str]:
@@ -15,11 +15,13 @@
 Tests for import_executor.py.
 """
 
+import os
 import unittest
 from unittest import mock
 import subprocess
 import tempfile
 
+from app import configs
 from app.executor import import_executor
 
 
@@ -48,9 +50,11 @@ class ImportExecutorTest(unittest.TestCase):
             requirements.write('beautifulsoup4\nrequests\n')
             requirements.flush()
             with tempfile.TemporaryDirectory() as venv_dir:
+                path = os.environ.get('PATH')
                 interpreter_path, proc = import_executor._create_venv(
                     (requirements.name,), venv_dir, 20)
                 self.assertEqual(0, proc.returncode)
+                self.assertEqual(path, os.environ.get('PATH'))
                 with tempfile.NamedTemporaryFile(mode='w+') as script:
                     script.write('import bs4\nimport requests\nprint(123)\n')
                     script.flush()
@@ -61,6 +65,31 @@ class ImportExecutorTest(unittest.TestCase):
                     self.assertEqual(0, proc.returncode)
                     self.assertEqual('123\n', proc.stdout)
 
+    @mock.patch('app.executor.import_executor._create_venv')
+    def test_use_venv_cache(self, create_venv):
+
+        def _create_fake_venv(requirements_path, venv_dir, **kwargs):
+            os.makedirs(os.path.join(venv_dir, 'bin'))
+            interpreter_path = os.path.join(venv_dir, 'bin', 'python3')
+            with open(interpreter_path, 'w') as file:
+                file.write('')
+            return interpreter_path, subprocess.CompletedProcess(args=[],
+                                                                 returncode=0)
+
+        create_venv.side_effect = _create_fake_venv
+        path = os.environ.get('PATH')
+        requirements = ('requirements.txt',)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config = configs.ExecutorConfig(venv_cache_dir=cache_dir)
+            with import_executor._use_venv(requirements, config) as venv:
+                self.assertFalse(venv[2])
+            with import_executor._use_venv(requirements, config) as cached_venv:
+                self.assertTrue(cached_venv[2])
+                self.assertEqual(venv[0], cached_venv[0])
+        self.assertEqual(1, create_venv.call_count)
+        # The venv is not added to the PATH of the executor.
+        self.assertEqual(path, os.environ.get('PATH'))
+
     @mock.patch('app.utils.utctime', lambda: '2020-07-28T20:22:18.311294+00:00')
     def test_run_and_handle_exception(self):
 
@@ -0,0 +1,102 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests for import_scheduler.py.
+"""
+
+import threading
+import time
+import unittest
+
+from app.executor import import_scheduler
+
+
+class ImportSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self._lock = threading.Lock()
+        self.running = set()
+        # Sets of tasks that were running together.
+        self.overlaps = []
+
+    def _task(self, name, fail=False, **kwargs):
+
+        def run():
+            with self._lock:
+                self.running.add(name)
+                self.overlaps.append(set(self.running))
+            time.sleep(0.05)
+            with self._lock:
+                self.running.discard(name)
+            if fail:
+                raise ValueError(f'{name} failed')
+
+        return import_scheduler.ImportTask(name=name, run=run, **kwargs)
+
+    def test_get_import_resources(self):
+        self.assertEqual((1, 2), import_scheduler.get_import_resources({}))
+        self.assertEqual(
+            (8, 64),
+            import_scheduler.get_import_resources(
+                {'resource_limits': {
+                    'cpu': 8,
+                    'memory': 64,
+                    'disk': 100
+                }}))
+
+    def test_run_with_failures(self):
+        scheduler = import_scheduler.ImportScheduler(max_parallel=3)
+        results = scheduler.run([
+            self._task('a'),
+            self._task('b', fail=True),
+            self._task('c'),
+        ])
+        self.assertEqual(['a', 'b', 'c'], [result.name for result in results])
+        self.assertEqual(['succeeded', 'failed', 'succeeded'],
+                         [result.status for result in results])
+        self.assertIn('b failed', results[1].message)
+        self.assertEqual(3, max(len(tasks) for tasks in self.overlaps))
+
+    def test_resource_limits(self):
+        scheduler = import_scheduler.ImportScheduler(max_parallel=4,
+                                                     cpu=8,
+                                                     memory_gb=16)
+        results = scheduler.run([
+            self._task('big', cpu=6, memory_gb=4),
+            self._task('large_memory', cpu=1, memory_gb=14),
+            self._task('small', cpu=2, memory_gb=4),
+            # Larger than the limits, run by itself.
+            self._task('huge', cpu=16, memory_gb=64),
+        ])
+        self.assertTrue(all(result.status == 'succeeded' for result in results))
+        for tasks in self.overlaps:
+            self.assertFalse({'big', 'large_memory'}.issubset(tasks))
+            if 'huge' in tasks:
+                self.assertEqual({'huge'}, tasks)
+        self.assertIn({'big', 'small'}, self.overlaps)
+
+    def test_groups(self):
+        scheduler = import_scheduler.ImportScheduler(max_parallel=4)
+        scheduler.run([
+            self._task('dir1:a', group='dir1'),
+            self._task('dir1:b', group='dir1'),
+            self._task('dir2:c', group='dir2'),
+        ])
+        for tasks in self.overlaps:
+            self.assertFalse({'dir1:a', 'dir1:b'}.issubset(tasks))
+        self.assertIn({'dir1:a', 'dir2:c'}, self.overlaps)
+
+
+if __name__ == '__main__':
+    unittest.main()
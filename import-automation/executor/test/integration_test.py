@@ -89,12 +89,23 @@ class StandaloneUpdateTest(unittest.TestCase):
             })
         self.assertEqual(200, response.status_code)
         expected_result = {
-            'status': 'succeeded',
+            'status':
+                'succeeded',
             'imports_executed': [
                 'scripts/us_fed/treasury_constant_maturity_rates'
                 ':us_treasury_constant_maturity_rates'
             ],
-            'message': 'No issues'
+            'message':
+                'No issues',
+            'import_results': [{
+                'status': 'succeeded',
+                'imports_executed': [
+                    'scripts/us_fed/treasury_constant_maturity_rates'
+                    ':us_treasury_constant_maturity_rates'
+                ],
+                'message': 'No issues',
+                'import_results': []
+            }]
         }
         self.assertEqual(expected_result, response.json)
 
@@ -110,12 +121,23 @@ class StandaloneUpdateTest(unittest.TestCase):
             })
         self.assertEqual(200, response.status_code)
         expected_result = {
-            'status': 'succeeded',
+            'status':
+                'succeeded',
             'imports_executed': [
                 'scripts/covid_tracking_project/historic_state_data'
                 ':historic_state_data'
             ],
-            'message': 'No issues'
+            'message':
+                'No issues',
+            'import_results': [{
+                'status': 'succeeded',
+                'imports_executed': [
+                    'scripts/covid_tracking_project/historic_state_data'
+                    ':historic_state_data'
+                ],
+                'message': 'No issues',
+                'import_results': []
+            }]
         }
         self.assertEqual(expected_result, response.json)
 
@@ -140,12 +162,23 @@ class CommitTest(unittest.TestCase):
             })
         self.assertEqual(200, response.status_code)
         expected_result = {
-            'status': 'succeeded',
+            'status':
+                'succeeded',
             'imports_executed': [
                 'scripts/us_fed/treasury_constant_maturity_rates'
                 ':us_treasury_constant_maturity_rates'
             ],
-            'message': 'No issues'
+            'message':
+                'No issues',
+            'import_results': [{
+                'status': 'succeeded',
+                'imports_executed': [
+                    'scripts/us_fed/treasury_constant_maturity_rates'
+                    ':us_treasury_constant_maturity_rates'
+                ],
+                'message': 'No issues',
+                'import_results': []
+            }]
         }
         self.assertEqual(expected_result, response.json)
 
@@ -158,9 +191,17 @@ class CommitTest(unittest.TestCase):
             })
         self.assertEqual(200, response.status_code)
         expected_result = {
-            'status': 'succeeded',
+            'status':
+                'succeeded',
             'imports_executed': ['scripts/us_bls/jolts:JOLTS'],
-            'message': 'No issues'
+            'message':
+                'No issues',
+            'import_results': [{
+                'status': 'succeeded',
+                'imports_executed': ['scripts/us_bls/jolts:JOLTS'],
+                'message': 'No issues',
+                'import_results': []
+            }]
         }
         self.assertEqual(expected_result, response.json)
 
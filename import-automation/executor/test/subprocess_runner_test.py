@@ -0,0 +1,66 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests for subprocess_runner.py.
+"""
+
+import sys
+import unittest
+
+from app.executor import subprocess_runner
+
+
+class SubprocessRunnerTest(unittest.TestCase):
+
+    def test_run_process(self):
+        # Writes more than a pipe buffer to stderr before any stdout.
+        script = ('import sys\n'
+                  'for i in range(20000): print("err", i, file=sys.stderr)\n'
+                  'for i in range(10): print("out", i)\n'
+                  'sys.exit(3)\n')
+        process = subprocess_runner.run_process([sys.executable, '-c', script],
+                                                timeout=60,
+                                                name='test',
+                                                head_lines=2,
+                                                tail_lines=3,
+                                                max_log_lines_per_sec=10)
+        self.assertEqual(3, process.returncode)
+        self.assertEqual(
+            b'out 0\nout 1\n... 5 lines omitted ...\nout 7\nout 8\nout 9\n',
+            process.stdout)
+        self.assertEqual(
+            b'err 0\nerr 1\n... 19995 lines omitted ...\n'
+            b'err 19997\nerr 19998\nerr 19999\n', process.stderr)
+        self.assertEqual(10, process.rusage['stdout_lines'])
+        self.assertEqual(20000, process.rusage['stderr_lines'])
+        self.assertGreater(process.rusage['max_rss_kb'], 0)
+        self.assertFalse(process.rusage['timed_out'])
+
+    def test_run_process_timeout(self):
+        process = subprocess_runner.run_process(['sleep', '10'], timeout=0.2)
+        self.assertNotEqual(0, process.returncode)
+        self.assertTrue(process.rusage['timed_out'])
+        self.assertLess(process.rusage['latency_secs'], 5)
+
+    def test_output_buffer(self):
+        buffer = subprocess_runner.OutputBuffer(head_lines=1, tail_lines=1)
+        for line in [b'a\n', b'b\n', b'c\n']:
+            buffer.add_line(line)
+        self.assertEqual(b'a\n... 1 lines omitted ...\nc\n',
+                         buffer.get_output())
+        self.assertEqual(6, buffer.num_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
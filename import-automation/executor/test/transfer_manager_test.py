@@ -0,0 +1,143 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests for transfer_manager.py.
+"""
+
+import http.server
+import os
+import tempfile
+import threading
+import unittest
+
+from app.service import file_uploader
+from app.service import transfer_manager
+
+_DATA = bytes(range(256)) * 1000
+
+
+class _RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Serves _DATA and drops the connection on the first request."""
+
+    num_requests = 0
+
+    def do_GET(self):
+        _RangeHandler.num_requests += 1
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header:
+            start = int(range_header.split('=')[1].rstrip('-'))
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(_DATA) - start))
+        self.end_headers()
+        if _RangeHandler.num_requests == 1:
+            # Send part of the data and close the connection.
+            self.wfile.write(_DATA[start:start + 1000])
+            self.wfile.flush()
+            self.connection.close()
+            return
+        self.wfile.write(_DATA[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+class _FlakyUploader(file_uploader.LocalFileUploader):
+    """Fails the first upload of each file."""
+
+    def __init__(self, output_dir):
+        super().__init__(output_dir)
+        self.uploads = []
+        self._lock = threading.Lock()
+
+    def upload_file(self, src, dest):
+        with self._lock:
+            self.uploads.append(dest)
+            first_attempt = self.uploads.count(dest) == 1
+        if first_attempt:
+            raise ConnectionError(f'Upload failed for {dest}')
+        super().upload_file(src, dest)
+
+
+class TransferManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_dir = self._tmp_dir.name
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _write_files(self, num_files):
+        files = []
+        for index in range(num_files):
+            path = os.path.join(self.tmp_dir, f'shard{index}.csv')
+            with open(path, 'w') as file:
+                file.write(f'id,value\n{index},{index * 10}\n')
+            files.append((path, f'output/shard{index}.csv'))
+        return files
+
+    def test_upload_files(self):
+        files = self._write_files(20)
+        output_dir = os.path.join(self.tmp_dir, 'output')
+        uploader = _FlakyUploader(output_dir)
+        manager = transfer_manager.TransferManager(uploader,
+                                                   max_workers=4,
+                                                   retry_secs=0)
+        self.assertEqual(['uploaded'] * 20, manager.upload_files(files))
+        self.assertEqual(40, len(uploader.uploads))
+        for src, dest in files:
+            with open(src) as src_file, open(os.path.join(output_dir,
+                                                          dest)) as dest_file:
+                self.assertEqual(src_file.read(), dest_file.read())
+
+        # Files with the same checksum are skipped.
+        with open(files[0][0], 'w') as file:
+            file.write('id,value\n0,1\n')
+        statuses = manager.upload_files(files)
+        self.assertEqual(['uploaded'] + ['skipped'] * 19, statuses)
+
+    def test_upload_files_errors(self):
+        files = self._write_files(3)
+        files.append((os.path.join(self.tmp_dir, 'missing.csv'), 'missing'))
+        uploader = file_uploader.LocalFileUploader(
+            os.path.join(self.tmp_dir, 'output'))
+        manager = transfer_manager.TransferManager(uploader, retry_secs=0)
+        with self.assertRaisesRegex(RuntimeError, 'missing.csv'):
+            manager.upload_files(files)
+        # Other files are uploaded.
+        self.assertTrue(uploader.get_checksum('output/shard2.csv'))
+
+    def test_download_files_resume(self):
+        server = http.server.ThreadingHTTPServer(('localhost', 0),
+                                                 _RangeHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            manager = transfer_manager.TransferManager(None, retry_secs=0)
+            url = f'http://localhost:{server.server_port}/data.bin'
+            paths = manager.download_files([url], self.tmp_dir, timeout=60)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual([os.path.join(self.tmp_dir, 'data.bin')], paths)
+        self.assertEqual(2, _RangeHandler.num_requests)
+        with open(paths[0], 'rb') as file:
+            self.assertEqual(_DATA, file.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests for venv_cache.py.
+"""
+
+import os
+import subprocess
+import tempfile
+import unittest
+
+from app.executor import venv_cache
+
+
+class VenvCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_dir = self._tmp_dir.name
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        self.created = []
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _write_requirements(self, name: str, content: str) -> str:
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def _create_venv(self, requirements_path, venv_dir, returncode=0):
+        # Fake venv with a file of 1000 bytes.
+        self.created.append(venv_dir)
+        os.makedirs(os.path.join(venv_dir, 'bin'))
+        with open(os.path.join(venv_dir, 'bin', 'python3'), 'w') as file:
+            file.write('#' * 1000)
+        return os.path.join(venv_dir, 'bin', 'python3'), \
+            subprocess.CompletedProcess(args=[], returncode=returncode)
+
+    def test_get_venv_key(self):
+        req1 = self._write_requirements('req1.txt', 'absl-py\n')
+        req2 = self._write_requirements('req2.txt', 'absl-py\n')
+        req3 = self._write_requirements('req3.txt', 'pandas\n')
+        missing = os.path.join(self.tmp_dir, 'missing.txt')
+        self.assertEqual(venv_cache.get_venv_key([req1, missing]),
+                         venv_cache.get_venv_key([req2, missing]))
+        self.assertNotEqual(venv_cache.get_venv_key([req1]),
+                            venv_cache.get_venv_key([req3]))
+        self.assertNotEqual(venv_cache.get_venv_key([req1]),
+                            venv_cache.get_venv_key([req1], 'wheels'))
+
+    def test_use_venv(self):
+        req = self._write_requirements('req.txt', 'absl-py\n')
+        cache = venv_cache.VenvCache(self.cache_dir)
+        with cache.use_venv([req], self._create_venv) as (interpreter, process,
+                                                          cache_hit):
+            self.assertFalse(cache_hit)
+            self.assertTrue(os.path.exists(interpreter))
+            self.assertEqual(0, process.returncode)
+        with cache.use_venv([req],
+                            self._create_venv) as (interpreter2, _, cache_hit):
+            self.assertTrue(cache_hit)
+            self.assertEqual(interpreter, interpreter2)
+        self.assertEqual(1, len(self.created))
+
+    def test_failed_venv_recreated(self):
+        req = self._write_requirements('req.txt', 'absl-py\n')
+        cache = venv_cache.VenvCache(self.cache_dir)
+
+        def create_failed_venv(requirements_path, venv_dir):
+            return self._create_venv(requirements_path, venv_dir, returncode=1)
+
+        with cache.use_venv([req], create_failed_venv) as (_, process, _):
+            self.assertEqual(1, process.returncode)
+        with cache.use_venv([req],
+                            self._create_venv) as (_, process, cache_hit):
+            self.assertFalse(cache_hit)
+            self.assertEqual(0, process.returncode)
+        self.assertEqual(2, len(self.created))
+
+    def test_evict(self):
+        cache = venv_cache.VenvCache(self.cache_dir, max_size_bytes=2500)
+        keys = []
+        for index in range(4):
+            req = self._write_requirements(f'req{index}.txt', f'module{index}')
+            keys.append(venv_cache.get_venv_key([req]))
+            with cache.use_venv([req], self._create_venv):
+                pass
+            # Mark the last use time in order.
+            os.utime(os.path.join(cache.get_venv_dir(keys[-1]),
+                                  '.venv_complete'),
+                     times=(index, index))
+        # Each venv is about 1000 bytes, so the 2 oldest are evicted.
+        self.assertEqual(
+            [False, False, True, True],
+            [os.path.exists(cache.get_venv_dir(key)) for key in keys])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,6 +16,7 @@
 
 import csv
 import datetime
+import functools
 import json
 import os
 import pickle
@@ -195,7 +196,11 @@ class GeoEvent:
         return self._places
 
     def merge_event(self, place_event):
-        '''Merge places and PVs from place_event into this event.'''
+        '''Merge places and PVs from place_event into this event.
+
+        The places of the smaller event are added into the larger one
+        so that each place is copied a few times over a series of merges.
+        '''
         # Check event to be merged doesn't have a parent.
         if self == place_event:
             # Event is already merged.
@@ -204,21 +209,34 @@ class GeoEvent:
             logging.fatal(
                 f'Cannot merge non-root event {place_event._event_id} into {self._event_id}'
             )
+        places = place_event.get_places()
+        if len(places) > len(self._places):
+            # Keep the places of the larger event and add the smaller into it.
+            places, self._places = self._places, places
+            self.end_date = max(self.end_date, place_event.get_event_end_date())
         # Merge data from all places into current event.
-        for place_id, date_pvs in place_event.get_places().items():
+        for place_id, date_pvs in places.items():
             for date, pvs in date_pvs.items():
                 self.add_place_pvs(place_id, date, pvs)
-        # Set current event as parent for merged event
+        # Set current event as parent for merged event.
+        # Places are looked up through the parent.
+        place_event._places = {}
         place_event._merged_into_event = self
         logging.level_debug() and logging.debug(
             f'Merged events {place_event.event_id()} into {self.event_id()}: {self._places}'
         )
 
     def get_root_event(self):
+        root = self
+        while root._merged_into_event:
+            root = root._merged_into_event
+        # Point all events along the path to the root for later lookups.
         event = self
-        while event._merged_into_event:
-            event = event._merged_into_event
-        return event
+        while event._merged_into_event and event._merged_into_event != root:
+            parent = event._merged_into_event
+            event._merged_into_event = root
+            event = parent
+        return root
 
     def get_event_dates(self) -> list:
         '''Returns a list of dates across all places for the event.'''
@@ -331,7 +349,15 @@ class GeoEventsProcessor:
         # different ids.
         self._event_by_id = dict()
         # Dictionary of active events keyed by place_id
+        # The event for a place may have been merged into another event.
+        # Use get_active_event_by_place_id() to get the merged event.
         self._active_event_by_place = dict()
+        # Dictionary of places added to an event keyed by event_id that are
+        # added to the place index when the event is merged next.
+        self._unindexed_places_by_event = dict()
+        # Dictionary of neighbouring places within the overlap distance
+        # keyed by place_id.
+        self._place_neighbors = dict()
         # Max date seen across all events.
         self._max_date = ''
         self._counters = counters
@@ -398,25 +424,50 @@ class GeoEventsProcessor:
         It considers a buffer of neighboring places
         for overlap upto a buffer distance specified.'''
         event_ids = set()
-        place_event = self._active_event_by_place.get(place_id, None)
+        place_event = self.get_active_event_by_place_id(place_id)
         if place_event:
             event_ids.add(place_event.event_id())
 
         # Collect any event_ids for neighboring places within allowed distance.
-        neighbour_places = set({utils.strip_namespace(place_id)})
+        neighbour_places = self.get_place_neighbors(place_id)
+        max_event_places = self._config.get('max_event_places', sys.maxsize)
+        for n in neighbour_places:
+            place_event = self.get_active_event_by_place_id(n)
+            if place_event:
+                if len(place_event.get_places()) < max_event_places:
+                    event_ids.add(place_event.event_id())
+                else:
+                    self._counters.add_counter('events_skipped_with_max_places',
+                                               1)
+        self._counters.max_counter('max_neighbours_considered',
+                                   len(neighbour_places) + 1)
+
+        logging.level_debug() and logging.debug(
+            f'Got event_ids: {event_ids} for {len(neighbour_places)} neighbors of {place_id}'
+        )
+        return list(event_ids)
+
+    def get_place_neighbors(self, place_id: str) -> set:
+        '''Returns the set of places near the place that can overlap.
+
+        Neighbours are places within 'max_overlap_place_hop' hops and
+        'max_overlap_distance_km' of the place, if set.
+        The neighbours are computed once per place.
+        '''
+        place_id = utils.strip_namespace(place_id)
+        neighbour_places = self._place_neighbors.get(place_id)
+        if neighbour_places is not None:
+            return neighbour_places
         max_distance_km = self._config.get('max_overlap_distance_km', 0)
         max_place_hop = self._config.get('max_overlap_place_hop', 1)
-        place_hop = 0
-        place_distance_km = 0
-        max_event_places = self._config.get('max_event_places', sys.maxsize)
-        while place_distance_km <= max_distance_km and place_hop <= max_place_hop:
+        neighbour_places = set({place_id})
+        # Places added in the last hop.
+        last_places = neighbour_places
+        for _ in range(max_place_hop):
             # Get the next set of neighbors of explored places.
-            place_hop += 1
-            if place_hop > max_place_hop:
-                break
             new_neighbours = set()
-            for place_id in neighbour_places:
-                for n in _get_place_neighbors_ids(place_id):
+            for last_place in last_places:
+                for n in _get_place_neighbors_ids(last_place):
                     n = utils.strip_namespace(n)
                     if n not in neighbour_places:
                         new_neighbours.add(n)
@@ -425,27 +476,17 @@ class GeoEventsProcessor:
             if max_distance_km:
                 place_distance_km = utils.place_distance(
                     place_id, _first(new_neighbours))
-                if place_distance == 0 or place_distance_km > max_distance:
+                if place_distance_km == 0 or place_distance_km > max_distance_km:
                     # Neighbours are too far. Ignore them
                     break
-            for n in new_neighbours:
-                place_event = self.get_active_event_by_place_id(n)
-                if place_event:
-                    if len(place_event.get_places()) < max_event_places:
-                        event_id = place_event.event_id()
-                        if event_id not in event_ids:
-                            event_ids.add(event_id)
-                    else:
-                        self._counters.add_counter(
-                            'events_skipped_with_max_places', 1)
             neighbour_places.update(new_neighbours)
-        self._counters.max_counter('max_neighbours_considered',
-                                   len(neighbour_places))
-
-        logging.level_debug() and logging.debug(
-            f'Got event_ids: {event_ids} for {len(neighbour_places)} neighbors of {place_id}'
-        )
-        return list(event_ids)
+            last_places = new_neighbours
+        neighbour_places.discard(place_id)
+        if len(self._place_neighbors) >= self._config.get(
+                'max_place_neighbors_cache', 1000000):
+            self._place_neighbors.clear()
+        self._place_neighbors[place_id] = neighbour_places
+        return neighbour_places
 
     def is_event_active(self, event_id: str, min_date: str) -> bool:
         '''Returns true if all the dates in the event are less than min_date.'''
@@ -536,6 +577,7 @@ class GeoEventsProcessor:
         places = event.get_places().keys()
         logging.level_debug() and logging.debug(
             f'Removing event {event_id} active places: {places}')
+        self._unindexed_places_by_event.pop(event_id, None)
         for place_id in places:
             place_event = self._active_event_by_place.get(place_id, None)
             if place_event and place_event.event_id() == event_id:
@@ -578,9 +620,14 @@ class GeoEventsProcessor:
             if event and event != root_event:
                 # Merge the data from event into root and
                 # remove references to the event.
+                # Places of the event in the place index
+                # are resolved to the root event.
                 root_event.merge_event(event)
                 self.delete_event(event_id)
-        self.add_event_to_place_index(root_event)
+        # Add any new places of the merged events into the place index.
+        for event_id in sorted_ids:
+            for place_id in self._unindexed_places_by_event.pop(event_id, []):
+                self._active_event_by_place[place_id] = root_event
         self._counters.add_counter('events_merged', len(sorted_ids))
         return root_event
 
@@ -610,10 +657,12 @@ class GeoEventsProcessor:
         # the earliest date.
         root_event = self.merge_events(event_ids)
         if not root_event:
-            logging.debug(f'Unable to find event for {root_event_id}')
+            logging.debug(f'Unable to find event for {event_ids}')
             return None
         root_event_id = root_event.event_id()
         root_event.add_place_pvs(place_id, date, pvs)
+        self._unindexed_places_by_event.setdefault(root_event_id,
+                                                   []).append(place_id)
         self._counters.add_counter('event_places_added', 1, root_event_id)
         logging.level_debug() and logging.debug(
             f'Added {place_id}, {date}, {pvs} into event: {root_event_id}')
@@ -863,7 +912,9 @@ class GeoEventsProcessor:
         event = self.get_event_by_id(event_id)
         if not event:
             return
-        self.remove_event_from_place_index(event_id)
+        if event.event_id() == event_id:
+            # Places of a merged event are left in the index for the root.
+            self.remove_event_from_place_index(event_id)
         if event_id in self._event_by_id:
             self._event_by_id.pop(event_id)
         self._deleted_events[event_id] = event
@@ -1635,7 +1686,7 @@ class GeoEventsProcessor:
             days=self._config.get('max_event_interval_days', 30))
         min_date = _get_full_date(date)
         try:
-            min_date = (parser.parse(min_date) - interval_days).isoformat()
+            min_date = (_parse_date(min_date) - interval_days).isoformat()
         except parser._parser.ParserError:
             logging.error(f'Unable to parse date: "{min_date}"')
             self._counters.add_counter('error_input_rows_invalid_date', 1)
@@ -1838,8 +1889,14 @@ def _get_full_date(date_str: str) -> str:
 
 
 def _get_dates_duration(start_date: str, end_date: str) -> int:
-    return (parser.parse(_get_full_date(end_date)) -
-            parser.parse(_get_full_date(start_date))).days + 1
+    return (_parse_date(_get_full_date(end_date)) -
+            _parse_date(_get_full_date(start_date))).days + 1
+
+
+@functools.lru_cache(maxsize=10000)
+def _parse_date(date_str: str) -> datetime.datetime:
+    '''Returns the datetime for the date string, memoized per date.'''
+    return parser.parse(date_str)
 
 
 def _get_place_neighbors_ids(place_id: str) -> list:
@@ -201,3 +201,54 @@ class ProcessEventsTest(unittest.TestCase):
         self.assertEqual(1, new_event_pvs['AffectedPlaceCount'])
         self.assertEqual('floodEvent/2023-01_0x89c2f90000000000',
                          new_event_pvs['dcid'])
+
+    def test_merge_events(self):
+        '''Verify events that come close are merged into the earliest event.'''
+        events_processor = GeoEventsProcessor(self._config)
+        # Get a row of neighbouring cells.
+        cell = utils.s2_cell_from_latlng(20, 80, 10)
+        cells = [cell]
+        for _ in range(3):
+            cell = cell.get_edge_neighbors()[1]
+            cells.append(cell)
+        place_ids = [
+            utils.strip_namespace(utils.s2_cell_to_dcid(cell)) for cell in cells
+        ]
+        event_data = {
+            'area': 1,
+            'date': '2022-10',
+        }
+        # Places 3 hops apart are separate events.
+        for index in [0, 3]:
+            event_data['s2CellId'] = place_ids[index]
+            self.assertTrue(events_processor.process_event_data(event_data))
+        event_ids = sorted(events_processor.get_active_event_ids('2022-10'))
+        self.assertEqual(2, len(event_ids))
+
+        # Place between the two events merges them.
+        event_data['s2CellId'] = place_ids[1]
+        self.assertTrue(events_processor.process_event_data(event_data))
+        self.assertEqual([event_ids[0]],
+                         events_processor.get_active_event_ids('2022-10'))
+        event = events_processor.get_event_by_id(event_ids[0])
+        self.assertEqual(sorted([place_ids[0], place_ids[1], place_ids[3]]),
+                         sorted(event.get_places().keys()))
+        for index in [0, 3]:
+            self.assertEqual(
+                event,
+                events_processor.get_active_event_by_place_id(place_ids[index]))
+        self.assertNotIn(event_ids[1], events_processor.get_events())
+
+        # Save and load active events.
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            events_file = os.path.join(tmp_dir, 'active_events.pkl')
+            events_processor.write_active_events(events_file)
+            loaded_processor = GeoEventsProcessor(self._config)
+            loaded_processor.read_active_events(events_file)
+        self.assertEqual([event_ids[0]], list(loaded_processor.get_events()))
+        loaded_event = loaded_processor.get_event_by_id(event_ids[0])
+        self.assertEqual(event.get_places(), loaded_event.get_places())
+        for place_id in event.get_places():
+            self.assertEqual(
+                loaded_event,
+                loaded_processor.get_active_event_by_place_id(place_id))
@@ -44,6 +44,8 @@ Additional processing options:
   --ignore_geotiff, --ignore_csv
       Drop points that match these files.
   --aggregate: Default aggregation for data value columns like 'band:0',
+  --raster_window_size=<N>: Process the raster in windows of about NxN
+    pixels with vectorized group-by aggregation in bounded memory.
   --config=<json file with config>
     For config options supported, please refer to _DEFAULT_CONFIG below.
 """
@@ -122,6 +124,13 @@ flags.DEFINE_float(
     0,
     'Area of the cell if the raster input is not provided.',
 )
+flags.DEFINE_integer(
+    'raster_window_size',
+    0,
+    'Process rasters in windows of about NxN pixels with vectorized'
+    ' locations and group-by aggregation.'
+    ' If 0, the whole raster is loaded and processed per point.',
+)
 
 _FLAGS = flags.FLAGS
 _FLAGS(sys.argv)  # Allow invocation without app.run()
@@ -157,6 +166,10 @@ def get_default_config():
         # generate data for all s2 cells from --s2_level upto this level.
         # Default cell area if constant for the whole data set.
         'default_cell_area': _FLAGS.default_cell_area,
+        # Process rasters in windows of about this size x size pixels.
+        # Point locations in a window are computed and aggregated by key with
+        # vectorized operations and the memory used is bounded by the window.
+        'raster_window_size': _FLAGS.raster_window_size,
         # Default point/cell width/height for ~1sqkm at equator, lower near poles.
         'default_cell_width': 0.009,
         'default_cell_height': 0.009,
@@ -706,6 +719,18 @@ def process_raster(
     # Load the geoTiff file
     counter.set_prefix('1:load_raster:')
     src = load_raster_geotiff(raster_input)
+    if data_points is None:
+        data_points = dict()
+    if config.get('raster_window_size', 0):
+        # Process the raster in windows with vectorized operations.
+        ignore_src, allow_src = (None, None)
+        if config.get('ignore_geotiff', None):
+            ignore_src = load_raster_geotiff(config.get('ignore_geotiff'))
+        if config.get('allow_geotiff', None):
+            allow_src = load_raster_geotiff(config.get('allow_geotiff'))
+        process_raster_windows(src, ignore_src, allow_src, data_points, config,
+                               counter)
+        return data_points
     # Convert raster into a numpy array.
     # Note: This creates a large array with the shape of the original raster
     # extent with non-valid data points set to 0.
@@ -721,8 +746,6 @@ def process_raster(
     if allow_geotiff:
         allow_src = load_raster_geotiff(allow_geotiff)
         allow_arr = allow_src.read()
-    if data_points is None:
-        data_points = dict()
 
     # Extract all valid data points from the raster into a numpy array.
     # Note: This assumes a sparse raster with few valid data points.
@@ -875,6 +898,693 @@ def process_raster_points(
     return True
 
 
+def get_raster_windows(src: rasterio.io.DatasetReader,
+                       window_size: int) -> list:
+    """Returns a list of windows of about window_size x window_size pixels.
+
+  Windows are strips of rows across the full width of the raster so that
+  points are processed in the same row-major order as process_raster_points().
+  """
+    (height, width) = src.shape
+    num_rows = max(1, (window_size * window_size) // max(width, 1))
+    return [
+        rasterio.windows.Window(0, row_off, width,
+                                min(num_rows, height - row_off))
+        for row_off in range(0, height, num_rows)
+    ]
+
+
+def get_raster_mask_values(mask_src: rasterio.io.DatasetReader, lat: np.ndarray,
+                           lng: np.ndarray) -> np.ndarray:
+    """Returns the values in band 0 of the mask raster for the points.
+
+  Only the window of the mask raster covering the points is read.
+
+  Args:
+    mask_src: raster dataset with the mask.
+    lat: array of latitudes of the points.
+    lng: array of longitudes of the points.
+
+  Returns:
+    array of mask values for the points with 0 for points outside the mask.
+  """
+    values = np.zeros(len(lat), dtype=mask_src.dtypes[0])
+    if not len(lat):
+        return values
+    (rows, cols) = rasterio.transform.rowcol(mask_src.transform, lng, lat)
+    rows = np.asarray(rows)
+    cols = np.asarray(cols)
+    (height, width) = mask_src.shape
+    inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    if not inside.any():
+        return values
+    row_off = rows[inside].min()
+    col_off = cols[inside].min()
+    window = rasterio.windows.Window(col_off, row_off,
+                                     cols[inside].max() - col_off + 1,
+                                     rows[inside].max() - row_off + 1)
+    mask_arr = mask_src.read(1, window=window)
+    values[inside] = mask_arr[rows[inside] - row_off, cols[inside] - col_off]
+    return values
+
+
+def get_cell_area_by_lat(lat: np.ndarray, lng: np.ndarray, height: float,
+                         width: float) -> np.ndarray:
+    """Returns the area in sqkm of cells of height x width degrees at lat/lng.
+
+  The area of a cell only depends on the latitude, so it is computed once per
+  latitude, except for cells at the 180 degree longitude that are clipped.
+  """
+    area = np.zeros(len(lat))
+    clipped = lng + width > 180
+    unique_lat, lat_index = np.unique(lat, return_inverse=True)
+    lat_area = np.array([
+        utils.latlng_cell_area(point_lat, 0, height, width)
+        for point_lat in unique_lat
+    ])
+    area[:] = lat_area[lat_index]
+    for index in np.nonzero(clipped)[0]:
+        area[index] = utils.latlng_cell_area(lat[index], lng[index], height,
+                                             width)
+    return area
+
+
+def get_raster_window_points(
+    src: rasterio.io.DatasetReader,
+    window: rasterio.windows.Window,
+    ignore_src: rasterio.io.DatasetReader = None,
+    allow_src: rasterio.io.DatasetReader = None,
+    config: ConfigMap = None,
+    counter: Counters = None,
+) -> dict:
+    """Returns the points with data in a window of the raster.
+
+  Args:
+    src: raster dataset to process.
+    window: rasterio window to read.
+    ignore_src: raster with points to be ignored set to non-zero.
+    allow_src: raster with points to be allowed set to non-zero.
+    config: ConfigMap dictionary of config parameters.
+    counter: Counters for the points.
+
+  Returns:
+    dictionary of column name to a numpy array with the value for each point
+    in row-major order with columns: latitude, longitude, area, s2CellId or
+    dcid and 'band:<N>' for each band with the raster values.
+  """
+    arr = src.read(window=window)
+    # Points with data in any band.
+    (rows, cols) = np.nonzero(np.any(arr != 0, axis=0))
+    band_values = arr[:, rows, cols]
+    arr = None
+    counter.add_counter('window_data_points', len(rows))
+    (lng, lat) = rasterio.transform.xy(src.transform, rows + window.row_off,
+                                       cols + window.col_off)
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    valid = (lat <= 90) & (lat >= -90) & (lng <= 180) & (lng >= -180)
+    if not valid.all():
+        counter.add_counter('invalid-lat-lng', int(np.count_nonzero(~valid)))
+    if ignore_src is not None:
+        ignore = get_raster_mask_values(ignore_src, lat, lng) != 0
+        counter.add_counter('ignored_points',
+                            int(np.count_nonzero(ignore & valid)))
+        valid &= ~ignore
+    if allow_src is not None:
+        allow = get_raster_mask_values(allow_src, lat, lng) != 0
+        counter.add_counter('dropped_points',
+                            int(np.count_nonzero(~allow & valid)))
+        valid &= allow
+    lat = lat[valid]
+    lng = lng[valid]
+    band_values = band_values[:, valid]
+
+    points = {
+        'latitude': lat,
+        'longitude': lng,
+        'area': get_cell_area_by_lat(lat, lng, src.res[1], src.res[0]),
+    }
+    s2_level = config.get('s2_level', None)
+    if s2_level:
+        points['s2CellId'] = utils.s2_cells_latlng_dcid(lat, lng, s2_level)
+    grid_degree = config.get('grid_degree', None)
+    if grid_degree:
+        points['dcid'] = utils.grid_ids_from_lat_lng(
+            grid_degree, lat, lng, config.get('grid_prefix', 'grid_1'))
+    for band in range(src.count):
+        points[f'band:{band}'] = band_values[band]
+    return points
+
+
+def get_raster_window_data_points(points: dict,
+                                  config: ConfigMap,
+                                  point_indexes: list = None) -> list:
+    """Returns a list of data points for the points in a raster window.
+
+  The data points have the same properties as the ones from
+  get_raster_data_point() so they can be added with add_data_point().
+
+  Args:
+    points: dictionary of column to an array of values per point as returned
+      by get_raster_window_points().
+    config: ConfigMap with the s2_level, grid_degree and output_date.
+    point_indexes: list of indexes of the points to return.
+      All points are returned if not set.
+
+  Returns:
+    list of data point dictionaries in the order of the points.
+  """
+    s2_level = config.get('s2_level', None)
+    grid_degree = config.get('grid_degree', None)
+    date = config.get('output_date')
+    if point_indexes is None:
+        point_indexes = range(len(points['latitude']))
+    location_columns = [
+        col for col in ['latitude', 'longitude', 'area', 's2CellId', 'dcid']
+        if col in points
+    ]
+    location_values = [points[col].tolist() for col in location_columns]
+    band_columns = [col for col in points if col.startswith('band:')]
+    band_values = []
+    for col in band_columns:
+        # Keep the raster values as numpy scalars as in get_raster_data_point().
+        values = points[col]
+        has_value = (values != 0) & ~np.isnan(values)
+        band_values.append((col, values, has_value.tolist()))
+    data_points = []
+    for index in point_indexes:
+        data = {}
+        for col, values in zip(location_columns, location_values):
+            data[col] = values[index]
+            if col == 's2CellId':
+                data['s2Level'] = s2_level
+            elif col == 'dcid':
+                data['grid_degree'] = grid_degree
+        for col, values, has_value in band_values:
+            if has_value[index]:
+                data[col] = values[index]
+        if date:
+            data['date'] = date
+        data_points.append(data)
+    return data_points
+
+
+# Kinds of values in a merged column as produced by add_data_point():
+# int 0 for values converted from missing or non-numeric values,
+# a python float or a numpy value from the raster.
+_VALUE_INT_ZERO = 0
+_VALUE_FLOAT = 1
+_VALUE_RASTER = 2
+
+# Aggregations supported by add_data_point().
+_AGGREGATIONS = {'sum', 'min', 'max', 'mean', 'last'}
+
+
+class _WindowColumn:
+    """Values of a column for groups of points from a raster window.
+
+  Values of points in a group are merged with the same rules as
+  add_data_point(). Values equal to the current value are skipped, the first
+  value of a mean is replaced by the next different value, and values are
+  converted with _get_numeric_value() only if either value is a python int or
+  float, which turns numpy values other than float64 into 0.
+
+  Each merge is applied to all groups with arrays, with the state of the
+  value for a group as one of the _VALUE_* kinds.
+  """
+
+    def __init__(self, values: np.ndarray, has_value: np.ndarray,
+                 num_groups: int, aggregate: str):
+        self.values = values
+        self.has_value = has_value
+        self.aggregate = aggregate
+        # Numpy values other than float64 are not converted to python numbers.
+        self.is_raster = values.dtype != np.float64
+        self.has = np.zeros(num_groups, dtype=bool)
+        self.kind = np.zeros(num_groups, dtype=np.int8)
+        self.float_values = np.zeros(num_groups, dtype=np.float64)
+        self.raster_values = np.zeros(num_groups, dtype=values.dtype)
+        self.mean_counts = np.zeros(num_groups, dtype=np.int64)
+        self.has_mean_counts = np.zeros(num_groups, dtype=bool)
+
+    def get_merged(self, groups: np.ndarray, point_index: np.ndarray,
+                   exists: np.ndarray) -> dict:
+        """Returns the state for the groups merged with one point per group.
+
+    Args:
+      groups: array of group indexes.
+      point_index: array with the index of the point for each group.
+      exists: array of bool set for groups with earlier points merged.
+
+    Returns:
+      dictionary of state attribute to an array of values for the groups.
+    """
+        new_value = self.values[point_index]
+        has_new = self.has_value[point_index]
+        has = self.has[groups]
+        kind = self.kind[groups]
+        float_values = self.float_values[groups]
+        raster_values = self.raster_values[groups]
+        mean_counts = self.mean_counts[groups]
+        has_mean_counts = self.has_mean_counts[groups]
+        # A missing value is merged as an int 0.
+        cur_kind = np.where(has, kind, _VALUE_INT_ZERO)
+        cur_float = np.where(has, float_values, 0.0)
+        is_raster = cur_kind == _VALUE_RASTER
+        if self.is_raster:
+            is_equal = np.where(is_raster, raster_values == new_value,
+                                cur_float == new_value.astype(np.float64))
+        else:
+            is_equal = cur_float == new_value
+        new_kind = _VALUE_RASTER if self.is_raster else _VALUE_FLOAT
+        merged_kind = kind.copy()
+        merged_float = float_values.copy()
+        merged_raster = raster_values.copy()
+        merged_has = has.copy()
+        merged_mean_counts = mean_counts.copy()
+        merged_has_mean_counts = has_mean_counts.copy()
+
+        def _set(mask, value_kind, values):
+            merged_kind[mask] = value_kind
+            if value_kind == _VALUE_RASTER:
+                merged_raster[mask] = values[mask]
+            else:
+                merged_float[mask] = values[mask]
+
+        # New groups start with the values of the point.
+        first = ~exists
+        merged_has[first] = has_new[first]
+        merged_has_mean_counts[first] = False
+        _set(first & has_new, new_kind, new_value)
+
+        merge = exists & has_new & ~is_equal
+        aggregate = self.aggregate
+        if aggregate not in _AGGREGATIONS:
+            merge[:] = False
+        # Values converted to python numbers, where the new value becomes 0
+        # for numpy values other than float64.
+        convert = merge & ~is_raster
+        if aggregate == 'last':
+            _set(merge, new_kind, new_value)
+        elif aggregate in ['sum', 'min', 'max']:
+            if self.is_raster:
+                raster_merge = merge & is_raster
+                if aggregate == 'sum':
+                    merged = raster_values + new_value
+                elif aggregate == 'min':
+                    merged = np.minimum(raster_values, new_value)
+                else:
+                    merged = np.maximum(raster_values, new_value)
+                _set(raster_merge, _VALUE_RASTER, merged)
+                # The current value is merged with 0.
+                if aggregate == 'min':
+                    is_zero = convert & (cur_float > 0)
+                elif aggregate == 'max':
+                    is_zero = convert & (cur_float < 0)
+                else:
+                    is_zero = np.zeros(len(groups), dtype=bool)
+                merged_kind[convert] = cur_kind[convert]
+                merged_float[convert] = cur_float[convert]
+                merged_kind[is_zero] = _VALUE_INT_ZERO
+                merged_float[is_zero] = 0.0
+            elif aggregate == 'sum':
+                _set(convert, _VALUE_FLOAT, cur_float + new_value)
+            else:
+                if aggregate == 'min':
+                    use_new = convert & (new_value < cur_float)
+                else:
+                    use_new = convert & (new_value > cur_float)
+                merged_kind[convert] = cur_kind[convert]
+                merged_float[convert] = cur_float[convert]
+                _set(use_new, _VALUE_FLOAT, new_value)
+        elif aggregate == 'mean':
+            cur_num = np.where(has_mean_counts, mean_counts, 0)
+            if self.is_raster:
+                raster_merge = merge & is_raster
+                if np.issubdtype(self.values.dtype, np.integer):
+                    # Integer values are divided into a float64.
+                    merged = ((raster_values.astype(np.float64) * cur_num) +
+                              new_value.astype(np.float64)) / (cur_num + 1)
+                    _set(raster_merge, _VALUE_FLOAT, merged)
+                else:
+                    dtype = self.values.dtype
+                    merged = ((raster_values * cur_num.astype(dtype)) +
+                              new_value) / (cur_num + 1).astype(dtype)
+                    _set(raster_merge, _VALUE_RASTER, merged)
+                _set(convert, _VALUE_FLOAT,
+                     ((cur_float * cur_num) + 0.0) / (cur_num + 1))
+            else:
+                _set(convert, _VALUE_FLOAT,
+                     ((cur_float * cur_num) + new_value) / (cur_num + 1))
+            merged_mean_counts[merge] = cur_num[merge] + 1
+            merged_has_mean_counts[merge] = True
+        merged_has[merge] = True
+        return {
+            'has': merged_has,
+            'kind': merged_kind,
+            'float_values': merged_float,
+            'raster_values': merged_raster,
+            'mean_counts': merged_mean_counts,
+            'has_mean_counts': merged_has_mean_counts,
+        }
+
+    def update(self, groups: np.ndarray, merged: dict):
+        """Sets the state for the groups from get_merged()."""
+        for attr, values in merged.items():
+            getattr(self, attr)[groups] = values
+
+    def is_dropped(self, merged: dict, check: str, threshold) -> np.ndarray:
+        """Returns an array of bool set for groups dropped by the filter check.
+
+    Args:
+      merged: state of the groups as returned by get_merged().
+      check: one of 'min', 'max' or 'eq' as in is_valid_data_point().
+      threshold: value for the check.
+
+    Returns:
+      array of bool set for groups with values that don't match the check.
+    """
+        values = merged['float_values']
+        is_raster = merged['kind'] == _VALUE_RASTER
+        raster_values = merged['raster_values']
+        if check == 'eq':
+            # math.isclose() compares python floats.
+            if self.is_raster:
+                values = np.where(is_raster, raster_values.astype(np.float64),
+                                  values)
+            return ~merged['has'] | ~_is_close(values, float(threshold))
+        compare = np.less if check == 'min' else np.greater
+        is_dropped = compare(values, threshold)
+        if self.is_raster:
+            # Raster values are compared in their type as with numpy scalars.
+            is_dropped = np.where(is_raster, compare(raster_values, threshold),
+                                  is_dropped)
+        return ~merged['has'] | is_dropped
+
+    def get_value(self, group: int):
+        """Returns the value for the group as set by add_data_point()."""
+        kind = self.kind[group]
+        if kind == _VALUE_RASTER:
+            return self.raster_values[group]
+        if kind == _VALUE_FLOAT:
+            return float(self.float_values[group])
+        return 0
+
+
+def _is_close(values: np.ndarray, target: float) -> np.ndarray:
+    """Returns an array of bool set for values close to target as math.isclose().
+    """
+    rel_tol = 1e-09
+    diff = np.abs(target - values)
+    is_close = (diff <= abs(rel_tol * target)) | (diff <= np.abs(
+        rel_tol * values))
+    is_close &= ~np.isinf(values) & ~np.isinf(target)
+    return is_close | (values == target)
+
+
+def aggregate_raster_window_points(points: dict,
+                                   data_points: dict,
+                                   config: ConfigMap,
+                                   filter_params: dict = None,
+                                   counter: Counters = None) -> int:
+    """Adds the points from a raster window into data_points.
+
+  Points are grouped by the s2 cell, grid or lat/lng and the values for each
+  group are merged with array operations with the same results as adding the
+  points in order with add_data_point(). Points for keys already in
+  data_points and configs that can't be merged with arrays, such as a regex
+  filter, are added with add_data_point().
+
+  Args:
+    points: dictionary of column to an array of values per point as returned
+      by get_raster_window_points().
+    data_points: dictionary of data point key:value dicts into which the
+      points are added.
+    config: ConfigMap with the settings for aggregate, rename_columns, s2_level,
+      grid_degree and output_date.
+    filter_params: dictionary with data filter settings per column.
+    counter: Counters for the points.
+
+  Returns:
+    number of points added.
+  """
+    num_points = len(points['latitude'])
+    if not num_points:
+        return 0
+    if filter_params is None:
+        filter_params = {}
+    rename_columns = config.get('rename_columns', {}) or {}
+    value_columns = {}
+    for col, values in points.items():
+        if col == 'area' or col.startswith('band:'):
+            value_columns[rename_columns.get(col, col)] = col
+    other_columns = {
+        'latitude', 'longitude', 's2CellId', 's2Level', 'dcid', 'grid_degree',
+        'date'
+    }
+    # Renames into other value columns depend on the order of renames.
+    can_merge = len(value_columns) == len(
+        [col for col in points if col == 'area' or col.startswith('band:')])
+    for prop, col in value_columns.items():
+        if prop != col and prop in points:
+            can_merge = False
+    if other_columns.intersection(rename_columns) or other_columns.intersection(
+            value_columns):
+        can_merge = False
+    for col, params in filter_params.items():
+        if 'regex' in params or (col in other_columns and
+                                 col not in ['latitude', 'longitude']):
+            can_merge = False
+    if not can_merge:
+        num_added = 0
+        for data in get_raster_window_data_points(points, config):
+            if add_data_point(data_points, data, config, filter_params,
+                              counter):
+                num_added += 1
+        return num_added
+
+    # Group points by key.
+    if 's2CellId' in points:
+        unique_keys, group_index = np.unique(points['s2CellId'],
+                                             return_inverse=True)
+    elif 'dcid' in points:
+        unique_keys, group_index = np.unique(points['dcid'],
+                                             return_inverse=True)
+    else:
+        unique_keys, group_index = np.unique(np.stack(
+            [points['latitude'], points['longitude']], axis=1),
+                                             axis=0,
+                                             return_inverse=True)
+    group_index = group_index.reshape(-1)
+    num_groups = len(unique_keys)
+    order = np.argsort(group_index, kind='stable')
+    group_sizes = np.bincount(group_index, minlength=num_groups)
+    group_starts = np.cumsum(group_sizes) - group_sizes
+    first_points = order[group_starts]
+    # Get the data key for each group from its first point.
+    first_data = get_raster_window_data_points(points, config,
+                                               first_points.tolist())
+    group_keys = [_get_data_key(data) for data in first_data]
+
+    # Points for keys added earlier are merged with add_data_point().
+    is_new_group = np.array([key not in data_points for key in group_keys],
+                            dtype=bool)
+    num_added = 0
+    if not is_new_group.all():
+        existing_points = np.sort(
+            np.nonzero(~is_new_group[group_index])[0]).tolist()
+        for data in get_raster_window_data_points(points, config,
+                                                  existing_points):
+            if add_data_point(data_points, data, config, filter_params,
+                              counter):
+                num_added += 1
+    group_sizes[~is_new_group] = 0
+
+    def_aggr = config.get('aggregate', 'sum')
+    columns = {}
+    for prop, col in value_columns.items():
+        values = points[col]
+        if col == 'area':
+            has_value = np.ones(num_points, dtype=bool)
+        else:
+            has_value = values != 0
+            if np.issubdtype(values.dtype, np.floating):
+                has_value &= ~np.isnan(values)
+        aggr = filter_params.get(prop, {}).get('aggregate', def_aggr)
+        columns[prop] = _WindowColumn(values, has_value, num_groups, aggr)
+    exists = np.zeros(num_groups, dtype=bool)
+    # Index of the first point added for each group to add keys in order.
+    first_index = np.full(num_groups, num_points, dtype=np.int64)
+    counts = np.ones(num_groups, dtype=np.int64)
+    latlng = {
+        loc: np.zeros(num_groups, dtype=np.float64)
+        for loc in ['latitude', 'longitude']
+    }
+
+    if 's2CellId' in points:
+        s2_level = config.get('s2_level', None)
+    else:
+        s2_level = config.get('s2Level', config.get('grid_degree', ''))
+    # Merge the k-th point of all groups with at least k points together.
+    groups_by_size = np.argsort(-group_sizes, kind='stable')
+    sorted_sizes = group_sizes[groups_by_size]
+    max_size = sorted_sizes[0] if num_groups else 0
+    for point_num in range(max_size):
+        num_active = np.searchsorted(-sorted_sizes, -point_num, side='left')
+        groups = groups_by_size[:num_active]
+        point_index = order[group_starts[groups] + point_num]
+        group_exists = exists[groups]
+        merged_columns = {
+            prop: column.get_merged(groups, point_index, group_exists)
+            for prop, column in columns.items()
+        }
+        merged_counts = np.where(group_exists, counts[groups] + 1, 1)
+        merged_latlng = {}
+        for loc, values in latlng.items():
+            cur_count = counts[groups].astype(np.float64)
+            merged_latlng[loc] = np.where(group_exists,
+                                          ((values[groups] * cur_count) +
+                                           (points[loc][point_index] * 1.0)) /
+                                          (cur_count + 1),
+                                          points[loc][point_index])
+        counter.add_counter('processed_points', num_active)
+        num_merged = int(np.count_nonzero(group_exists))
+        if num_merged:
+            counter.add_counter(
+                f'processed_points_aggregated_s2level_{s2_level}', num_merged)
+
+        # Drop points that don't match the filter as is_valid_data_point().
+        is_valid = np.ones(num_active, dtype=bool)
+        for col, params in filter_params.items():
+            for check in ['min', 'max', 'eq']:
+                if check not in params:
+                    continue
+                if col in columns:
+                    is_dropped = columns[col].is_dropped(
+                        merged_columns[col], check, params[check])
+                elif col in merged_latlng:
+                    values = merged_latlng[col]
+                    if check == 'min':
+                        is_dropped = values < params[check]
+                    elif check == 'max':
+                        is_dropped = values > params[check]
+                    else:
+                        is_dropped = ~_is_close(values, float(params[check]))
+                else:
+                    is_dropped = np.ones(num_active, dtype=bool)
+                is_dropped &= is_valid
+                num_dropped = int(np.count_nonzero(is_dropped))
+                if num_dropped:
+                    counter.add_counter(f'data-dropped-{check}-{col}',
+                                        num_dropped)
+                is_valid &= ~is_dropped
+        num_dropped = num_active - int(np.count_nonzero(is_valid))
+        if num_dropped:
+            counter.add_counter('processed_points_dropped', num_dropped)
+        num_valid = num_active - num_dropped
+        if num_valid:
+            counter.add_counter(f'output_points_s2level_{s2_level}', num_valid)
+        valid_groups = groups[is_valid]
+        for prop, column in columns.items():
+            column.update(
+                valid_groups, {
+                    attr: values[is_valid]
+                    for attr, values in merged_columns[prop].items()
+                })
+        for loc, values in merged_latlng.items():
+            latlng[loc][valid_groups] = values[is_valid]
+        counts[valid_groups] = merged_counts[is_valid]
+        first_index[valid_groups] = np.minimum(first_index[valid_groups],
+                                               point_index[is_valid])
+        exists[valid_groups] = True
+        num_added += num_valid
+
+    # Add the merged points.
+    added_groups = np.nonzero(exists)[0]
+    added_groups = added_groups[np.argsort(first_index[added_groups])]
+    for group in added_groups.tolist():
+        data = first_data[group]
+        for loc, values in latlng.items():
+            data[loc] = float(values[group])
+        for col in value_columns.values():
+            data.pop(col, None)
+        for prop, column in columns.items():
+            if column.has[group]:
+                data[prop] = column.get_value(group)
+                if column.has_mean_counts[group]:
+                    data[f'#{prop}:count'] = int(column.mean_counts[group])
+        if counts[group] > 1:
+            data['#count'] = int(counts[group])
+        data_points[group_keys[group]] = data
+    return num_added
+
+
+def process_raster_windows(
+    src: rasterio.io.DatasetReader,
+    ignore_src: rasterio.io.DatasetReader,
+    allow_src: rasterio.io.DatasetReader,
+    data_points: dict,
+    config: ConfigMap,
+    counter: Counters = None,
+) -> dict:
+    """Process a raster in windows with vectorized operations.
+
+  Each window of the raster is read, and the lat/lng, area, s2 cell or grid
+  ids and the allow/ignore masks for the points with data are computed with
+  array operations. The points are then grouped by key and merged into
+  data_points with array operations by aggregate_raster_window_points().
+  Windows are processed in the same order as process_raster_points() so the
+  output is the same. The memory used is proportional to the window size and
+  the number of output points.
+
+  Args:
+    src: Source raster data set to process.
+    ignore_src: Raster dataset with data points to be ignored.
+    allow_src: Raster dataset with data points to be allowed.
+    data_points: dictionary of data point key:value dicts into which processed
+      points are added.
+    config: ConfigMap dictionary of configuration parameter:values.
+      Uses 'raster_window_size' for the size of the windows.
+    counter: dictionary of named counter:values
+
+  Returns:
+    data_points dictionary with the points from the raster.
+  """
+    if counter is None:
+        counter = Counters()
+    window_size = config.get('raster_window_size', 1024)
+    windows = get_raster_windows(src, window_size)
+    logging.info(f'Processing {len(windows)} windows of size {window_size}'
+                 f' from {src.files}')
+    counter.set_prefix('2:process_raster_windows:')
+    counter.set_counter('geotiff_width', src.shape[1])
+    counter.set_counter('geotiff_height', src.shape[0])
+    counter.set_counter('total_points', src.shape[0] * src.shape[1])
+    data_filter = config.get('input_data_filter', {})
+    limit_points = config.get('limit_points', sys.maxsize)
+    num_points = 0
+    for window in windows:
+        points = get_raster_window_points(src, window, ignore_src, allow_src,
+                                          config, counter)
+        if num_points + len(points['latitude']) > limit_points:
+            points = {
+                col: values[:limit_points - num_points]
+                for col, values in points.items()
+            }
+        num_points += len(points['latitude'])
+        counter.add_counter(
+            'output_data_points',
+            aggregate_raster_window_points(points, data_points, config,
+                                           data_filter, counter))
+        counter.add_counter('processed_window_pixels',
+                            window.width * window.height)
+        counter.print_counters_periodically()
+        if num_points >= limit_points:
+            break
+    counter.print_counters()
+    return data_points
+
+
 def process_csv_points(
     input_csv: str,
     ignore_csv: str = None,
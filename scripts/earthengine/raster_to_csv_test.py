@@ -13,12 +13,14 @@
 # limitations under the License.
 """Tests for raster_to_csv.py"""
 
+import csv
 import os
 import tempfile
 import sys
 import unittest
 
 from absl import logging
+import numpy as np
 
 # Allows the following module imports to work when running as a script
 _SCRIPTS_DIR = os.path.dirname(os.path.dirname(__file__))
@@ -85,6 +87,100 @@ class RasterToCsvTest(unittest.TestCase):
                 os.path.join(_TESTDIR, 'sample_floods_output_places.tmcf'),
                 f'{place_output_prefix}.tmcf')
 
+    def test_process_geotiff_windows(self):
+        '''Verify raster processing in windows matches processing per point.'''
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_geotiff = os.path.join(_TESTDIR, 'sample_floods.tif')
+            output_csv = {}
+            for s2_level, window_size in [(20, 0), (20, 64), (13, 0), (13, 8),
+                                          (13, 64)]:
+                process_config = ConfigMap(
+                    config_dict={
+                        's2_level': s2_level,
+                        'aggregate': 'sum',
+                        'rename_columns': {
+                            'band:0': 'water'
+                        },
+                        'output_date': '2022-10',
+                        'raster_window_size': window_size,
+                    })
+                output = os.path.join(tmp_dir,
+                                      f'output_{s2_level}_{window_size}.csv')
+                r2c.process(input_geotiff=input_geotiff,
+                            input_csv=None,
+                            output_csv=output,
+                            config=process_config,
+                            counter=Counters())
+                output_csv[(s2_level, window_size)] = output
+            # Each point is in a separate s2 cell of level 20.
+            self.compare_files(output_csv[(20, 0)], output_csv[(20, 64)])
+            # Points in the same level 13 cell are aggregated the same way
+            # including cells spanning multiple windows.
+            self.compare_files(output_csv[(13, 0)], output_csv[(13, 8)])
+            self.compare_files(output_csv[(13, 0)], output_csv[(13, 64)])
+            with open(output_csv[(13, 64)]) as csv_file:
+                rows = list(csv.DictReader(csv_file))
+            self.assertEqual(937, len(rows))
+            self.assertEqual(937, sum(int(row['water']) for row in rows))
+
+    def test_aggregate_raster_window_points(self):
+        '''Verify points in a window are aggregated as add_data_point().'''
+        points = {
+            'latitude':
+                np.array([1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6]),
+            'longitude':
+                np.array([2.0, 2.1, 2.2, 2.3, 2.4, 2.5, 2.6]),
+            'area':
+                np.array([1.5, 1.5, 2.5, 3.0, 1.0, 2.0, 0.5]),
+            's2CellId':
+                np.array([
+                    'dcid:c1', 'dcid:c2', 'dcid:c1', 'dcid:c3', 'dcid:c1',
+                    'dcid:c2', 'dcid:c1'
+                ],
+                         dtype=object),
+            'band:0':
+                np.array([1.5, 0, 2.5, 1.5, np.nan, 3.0, 1.5],
+                         dtype=np.float32),
+            'band:1':
+                np.array([1, 2, 2, 0, 3, 2, 1], dtype=np.uint8),
+        }
+        filter_params = {'water': {'min': 1.0}, 'band:1': {'aggregate': 'max'}}
+        for aggregate in ['sum', 'min', 'max', 'mean', 'last']:
+            config = ConfigMap(
+                config_dict={
+                    's2_level': 10,
+                    'aggregate': aggregate,
+                    'rename_columns': {
+                        'band:0': 'water'
+                    },
+                    'output_date': '2022',
+                })
+            # Points for cell c3 are merged into an existing data point.
+            expected_points = {
+                'dcid:c32022': {
+                    'latitude': 1.0,
+                    'longitude': 1.0,
+                    'water': 1.0,
+                    'date': '2022',
+                }
+            }
+            actual_points = {
+                key: dict(data) for key, data in expected_points.items()
+            }
+            expected_counter = Counters()
+            for data in r2c.get_raster_window_data_points(points, config):
+                r2c.add_data_point(expected_points, data, config, filter_params,
+                                   expected_counter)
+            counter = Counters()
+            r2c.aggregate_raster_window_points(points, actual_points, config,
+                                               filter_params, counter)
+            self.assertEqual(list(expected_points.keys()),
+                             list(actual_points.keys()))
+            self.assertEqual(expected_points, actual_points)
+            self.assertEqual(
+                expected_counter.get_counter('processed_points_dropped'),
+                counter.get_counter('processed_points_dropped'))
+
     def test_process_csv(self):
         '''Verify re-processing of CSV file.'''
         with tempfile.TemporaryDirectory() as tmp_dir:
@@ -17,7 +17,9 @@ import csv
 import datetime
 from datetime import date
 from datetime import datetime
+import functools
 import glob
+import math
 import os
 import pickle
 import re
@@ -29,6 +31,7 @@ from absl import logging
 import datacommons as dc
 from dateutil.relativedelta import relativedelta
 from geopy import distance
+import numpy as np
 import s2sphere
 from s2sphere import Cell, CellId, LatLng
 from shapely.geometry import Polygon
@@ -47,6 +50,7 @@ from dc_api_wrapper import dc_api_wrapper
 _MAX_LATITUDE = 90.0
 _MAX_LONGITUDE = 180.0
 _DC_API_ROOT = 'http://autopush.api.datacommons.org'
+_EARTH_RADIUS_KM = 6371
 
 # Utilities for dicts.
 
@@ -174,9 +178,14 @@ def s2_cell_area(cell_id: s2sphere.CellId) -> float:
   Returns:
     Area of the cell in sq km.
   """
-    _EARTH_RADIUS = 6371  # Radius of Earth in Km.
-    s2_cell = s2_cell_from_dcid(cell_id)
-    return s2sphere.Cell(s2_cell).exact_area() * _EARTH_RADIUS * _EARTH_RADIUS
+    return _s2_cell_id_area(s2_cell_from_dcid(cell_id).id())
+
+
+@functools.lru_cache(maxsize=1000000)
+def _s2_cell_id_area(cell_id: int) -> float:
+    """Returns the area of the S2 cell id in sqkm, memoized per cell."""
+    return (s2sphere.Cell(CellId(cell_id)).exact_area() * _EARTH_RADIUS_KM *
+            _EARTH_RADIUS_KM)
 
 
 def s2_cell_get_neighbor_ids(s2_cell_id: str) -> list:
@@ -187,11 +196,19 @@ def s2_cell_get_neighbor_ids(s2_cell_id: str) -> list:
   """
     s2_cell = s2_cell_from_dcid(s2_cell_id)
     return [
-        s2_cell_to_dcid(cell)
-        for cell in s2_cell.get_all_neighbors(s2_cell.level())
+        s2_cell_to_dcid(cell_id)
+        for cell_id in _s2_cell_id_neighbors(s2_cell.id())
     ]
 
 
+@functools.lru_cache(maxsize=1000000)
+def _s2_cell_id_neighbors(cell_id: int) -> tuple:
+    """Returns a tuple of neighbouring cell ids, memoized per cell."""
+    s2_cell = CellId(cell_id)
+    return tuple(
+        cell.id() for cell in s2_cell.get_all_neighbors(s2_cell.level()))
+
+
 def s2_cell_to_polygon(s2_cell_id: str) -> Polygon:
     """Returns the polygon with 4 vertices for an s2 cell."""
     s2_cell = Cell(s2_cell_from_dcid(s2_cell_id))
@@ -208,6 +225,179 @@ def s2_cell_to_polygon(s2_cell_id: str) -> Polygon:
     return Polygon(vertices)
 
 
+# Batch utilities for S2 cells over numpy arrays of points.
+# These mirror the computation in s2sphere for
+# CellId.from_lat_lng(LatLng.from_degrees(lat, lng)) with the same floating
+# point operations. Points too close to a face or leaf cell boundary for the
+# result to be certain are computed with s2sphere so the cell ids are identical
+# to s2_cell_from_latlng().
+
+# Lookup table from 4 bits each of i, j and the orientation to the
+# position along the hilbert curve and the new orientation.
+_S2_LOOKUP_POS = np.array(s2sphere.sphere.LOOKUP_POS, dtype=np.int64)
+_S2_MAX_LEVEL = 30
+_S2_MAX_SIZE = 1 << _S2_MAX_LEVEL
+# Maximum difference in leaf cell coordinates or face components to use
+# s2sphere for a point.
+_S2_IJ_TOLERANCE = 1e-4
+_S2_FACE_TOLERANCE = 1e-12
+
+
+def _s2_uv_to_ij(u: np.ndarray) -> tuple:
+    """Returns a tuple of the leaf cell coordinates and a mask for coordinates
+  too close to a cell boundary for the uv values."""
+    # Quadratic projection from u to s as in CellId.uv_to_st()
+    s = np.where(u >= 0, 0.5 * np.sqrt(1 + 3 * np.maximum(u, 0)),
+                 1 - 0.5 * np.sqrt(1 - 3 * np.minimum(u, 0)))
+    ij_float = _S2_MAX_SIZE * s
+    ij_floor = np.floor(ij_float)
+    uncertain = ((ij_float - ij_floor < _S2_IJ_TOLERANCE) |
+                 (ij_floor + 1 - ij_float < _S2_IJ_TOLERANCE))
+    ij = np.clip(ij_floor, 0, _S2_MAX_SIZE - 1).astype(np.int64)
+    return ij, uncertain
+
+
+def _s2_cell_ids_from_face_ij(face: np.ndarray, i: np.ndarray,
+                              j: np.ndarray) -> np.ndarray:
+    """Returns leaf cell ids for the face and leaf coordinates i, j."""
+    n = face.astype(np.uint64) << np.uint64(2 * _S2_MAX_LEVEL)
+    bits = face & s2sphere.sphere.SWAP_MASK
+    for k in range(7, -1, -1):
+        bits = (bits + (((i >> (k * 4)) & 15) << 6) + (((j >>
+                                                         (k * 4)) & 15) << 2))
+        bits = _S2_LOOKUP_POS[bits]
+        n |= (bits >> 2).astype(np.uint64) << np.uint64(k * 8)
+        bits &= (s2sphere.sphere.SWAP_MASK | s2sphere.sphere.INVERT_MASK)
+    return n * np.uint64(2) + np.uint64(1)
+
+
+def s2_cells_from_latlng(lat: np.ndarray, lng: np.ndarray,
+                         level: int) -> np.ndarray:
+    """Returns an array of S2 cell ids of level for arrays of lat/lng.
+
+  Args:
+    lat: array of latitudes in degrees
+    lng: array of longitudes in degrees of the same size as lat.
+    level: desired S2 level for cell ids, <= 30.
+
+  Returns:
+    numpy array of uint64 cell ids, same as s2_cell_from_latlng().id() for each
+    point. The ids are unsigned as cells on faces 4 and 5 are above 2^63.
+  """
+    assert level >= 0 and level <= _S2_MAX_LEVEL
+    lat = np.asarray(lat, dtype=np.float64).reshape(-1)
+    lng = np.asarray(lng, dtype=np.float64).reshape(-1)
+    if lat.size == 0:
+        return np.zeros(0, dtype=np.uint64)
+    # Get the xyz point as in LatLng.from_degrees(lat, lng).to_point()
+    phi = lat * (math.pi / 180.0)
+    theta = lng * (math.pi / 180.0)
+    cosphi = np.cos(phi)
+    xyz = np.stack(
+        [np.cos(theta) * cosphi,
+         np.sin(theta) * cosphi,
+         np.sin(phi)])
+    abs_xyz = np.abs(xyz)
+    (ax, ay, az) = abs_xyz
+    # Get the face for the largest component as in xyz_to_face_uv()
+    face = np.where(ax > ay, np.where(ax > az, 0, 2), np.where(ay > az, 1, 2))
+    max_abs = np.max(abs_xyz, axis=0)
+    uncertain = np.sum(max_abs - abs_xyz < _S2_FACE_TOLERANCE, axis=0) > 1
+    face_value = np.take_along_axis(xyz, face[np.newaxis, :], axis=0)[0]
+    face = np.where(face_value < 0, face + 3, face)
+    # Get the u,v for the face as in valid_face_xyz_to_uv()
+    (x, y, z) = xyz
+    u_num = [y, -x, -x, z, z, -y]
+    v_num = [z, z, -y, y, -x, -x]
+    denom = [x, y, z, x, y, z]
+    u = np.choose(face, u_num) / np.choose(face, denom)
+    v = np.choose(face, v_num) / np.choose(face, denom)
+    i, i_uncertain = _s2_uv_to_ij(u)
+    j, j_uncertain = _s2_uv_to_ij(v)
+    cell_ids = _s2_cell_ids_from_face_ij(face, i, j)
+    # Use s2sphere for points that may be in an adjacent leaf cell.
+    uncertain |= i_uncertain | j_uncertain
+    for index in np.flatnonzero(uncertain):
+        cell_ids[index] = s2_cell_from_latlng(lat[index], lng[index],
+                                              _S2_MAX_LEVEL).id()
+    return s2_cells_parent(cell_ids, level)
+
+
+def s2_cells_parent(cell_ids: np.ndarray, level: int) -> np.ndarray:
+    """Returns an array of the parent cell ids at level for the cell ids.
+
+  Args:
+    cell_ids: array of S2 cell ids of levels >= level.
+    level: S2 level for the parent cells.
+
+  Returns:
+    numpy array of uint64 parent cell ids.
+  """
+    cell_ids = np.asarray(cell_ids, dtype=np.uint64)
+    lsb = np.uint64(CellId.lsb_for_level(level))
+    return (cell_ids & ~(lsb - np.uint64(1))) | lsb
+
+
+def s2_cells_parents(cell_ids: np.ndarray, level: int,
+                     top_level: int) -> np.ndarray:
+    """Returns an array of the parent ids from level up to top_level.
+
+  Args:
+    cell_ids: array of S2 cell ids of level.
+    level: S2 level of the cell ids.
+    top_level: S2 level of the last parent.
+
+  Returns:
+    numpy array of uint64 with a row for each cell id with the parents at
+    levels: level, level-1, ... top_level.
+  """
+    cell_ids = np.asarray(cell_ids, dtype=np.uint64)
+    parents = np.zeros((cell_ids.size, max(0, level - top_level + 1)),
+                       dtype=np.uint64)
+    for col, parent_level in enumerate(range(level, top_level - 1, -1)):
+        parents[:, col] = s2_cells_parent(cell_ids, parent_level)
+    return parents
+
+
+def s2_cells_to_dcid(cell_ids: np.ndarray) -> np.ndarray:
+    """Returns an array of dcids of the form dcid:s2CellId/0x1234."""
+    unique_ids, index = np.unique(np.asarray(cell_ids, dtype=np.uint64),
+                                  return_inverse=True)
+    dcids = np.array([s2_cell_to_dcid(int(cell_id)) for cell_id in unique_ids],
+                     dtype=object)
+    return dcids[index.reshape(-1)]
+
+
+def s2_cells_latlng_dcid(lat: np.ndarray, lng: np.ndarray,
+                         level: int) -> np.ndarray:
+    """Returns an array of dcids of s2 cells of level containing the points."""
+    return s2_cells_to_dcid(s2_cells_from_latlng(lat, lng, level))
+
+
+def s2_cells_area(cell_ids: np.ndarray) -> np.ndarray:
+    """Returns an array with the area in sqkm of each S2 cell id.
+
+  Areas are computed once for each cell and are the same as s2_cell_area().
+  """
+    unique_ids, index = np.unique(np.asarray(cell_ids, dtype=np.uint64),
+                                  return_inverse=True)
+    areas = np.array([_s2_cell_id_area(int(cell_id)) for cell_id in unique_ids],
+                     dtype=np.float64)
+    return areas[index.reshape(-1)]
+
+
+def s2_cells_get_neighbor_ids(cell_ids: np.ndarray) -> list:
+    """Returns a list with the tuple of neighbour cell ids for each cell id.
+
+  Neighbours are computed once for each cell and are in the same order as
+  s2_cell_get_neighbor_ids().
+  """
+    return [
+        _s2_cell_id_neighbors(int(cell_id))
+        for cell_id in np.asarray(cell_ids, dtype=np.uint64)
+    ]
+
+
 def latlng_cell_area(lat: float, lng: float, height: float,
                      width: float) -> float:
     """Returns the area of the rectangular region in sqkm.
@@ -269,6 +459,51 @@ def grid_id_from_lat_lng(
     return f'dcid:{prefix}{degree_str}/{lat_str}_{lng_str}{suffix}'
 
 
+def grid_ids_from_lat_lng(
+    degrees: float,
+    lat: np.ndarray,
+    lng: np.ndarray,
+    prefix: str = 'grid_',
+    suffix: str = '',
+    lat_offset: float = 0,
+    lng_offset: float = 0,
+) -> np.ndarray:
+    """Returns an array of grid dcids for arrays of lat/lng.
+
+  The dcids are the same as grid_id_from_lat_lng() for each point.
+  Each distinct grid is formatted once.
+  """
+    degree_str = str_from_number(degrees)
+    if prefix == 'ipcc_':
+        degree_str = str_from_number(int(degrees * 100))
+    lat = np.asarray(lat, dtype=np.float64).reshape(-1)
+    lng = np.asarray(lng, dtype=np.float64).reshape(-1)
+    # Get the string for each distinct lat/lng rounded to the grid degrees.
+    lat_rounded, lat_index = np.unique(np.trunc(lat / degrees) * degrees +
+                                       lat_offset,
+                                       return_inverse=True)
+    lng_rounded, lng_index = np.unique(np.trunc(lng / degrees) * degrees +
+                                       lng_offset,
+                                       return_inverse=True)
+    lat_strs = [
+        str_from_number(number=float(value), precision_digits=2)
+        for value in lat_rounded
+    ]
+    lng_strs = [
+        str_from_number(number=float(value), precision_digits=2)
+        for value in lng_rounded
+    ]
+    num_lngs = len(lng_strs)
+    grids, grid_index = np.unique(lat_index.reshape(-1) * num_lngs +
+                                  lng_index.reshape(-1),
+                                  return_inverse=True)
+    grid_ids = [
+        f'dcid:{prefix}{degree_str}/{lat_strs[grid // num_lngs]}_'
+        f'{lng_strs[grid % num_lngs]}{suffix}' for grid in grids
+    ]
+    return np.array(grid_ids, dtype=object)[grid_index.reshape(-1)]
+
+
 def grid_id_to_deg_lat_lng(
         grid_id: str, default_deg: float = 1) -> (float, float, float, str):
     """Returns a tuple of degree, latitude longitude, suffix for the grid id."""
@@ -20,6 +20,7 @@ import tempfile
 import unittest
 
 from absl import logging
+import numpy as np
 import s2sphere
 import shapely
 
@@ -168,6 +169,46 @@ class S2CellUtilsTest(unittest.TestCase):
             n_cell = utils.s2_cell_from_dcid(n)
             self.assertEqual(n_cell.level(), s2_cell.level())
 
+    def test_s2_cells_from_latlng(self):
+        lat = np.array([0, 10, 37.42, -33.86, 89.99, -90, 45, 0.5])
+        lng = np.array([0, 20, -122.08, 151.2, 179.99, 0, 180, -180])
+        for level in [0, 10, 13, 30]:
+            cell_ids = utils.s2_cells_from_latlng(lat, lng, level)
+            self.assertEqual(
+                [
+                    utils.s2_cell_from_latlng(lat[i], lng[i], level).id()
+                    for i in range(len(lat))
+                ],
+                [int(cell_id) for cell_id in cell_ids],
+            )
+        self.assertEqual(
+            [
+                utils.s2_cell_latlng_dcid(lat[i], lng[i], 10)
+                for i in range(len(lat))
+            ],
+            list(utils.s2_cells_latlng_dcid(lat, lng, 10)),
+        )
+
+    def test_s2_cells_parents(self):
+        s2_cell = utils.s2_cell_from_latlng(10, 20, 10)
+        self.assertEqual(
+            [[s2_cell.parent(level).id() for level in [10, 9, 8]]],
+            utils.s2_cells_parents([s2_cell.id()], 10, 8).tolist(),
+        )
+
+    def test_s2_cells_area_neighbors(self):
+        cell_ids = utils.s2_cells_from_latlng([0, 80, 0], [0, 90, 0], 10)
+        self.assertEqual(
+            [utils.s2_cell_area(int(cell_id)) for cell_id in cell_ids],
+            list(utils.s2_cells_area(cell_ids)),
+        )
+        neighbors = utils.s2_cells_get_neighbor_ids(cell_ids)
+        self.assertEqual(3, len(neighbors))
+        self.assertEqual(
+            utils.s2_cell_get_neighbor_ids(int(cell_ids[1])),
+            [utils.s2_cell_to_dcid(cell_id) for cell_id in neighbors[1]],
+        )
+
     def test_latlng_cell_area(self):
         self.assertEqual(12309, int(utils.latlng_cell_area(0, 0, 1, 1)))
         self.assertEqual(21, int(utils.latlng_cell_area(80, -80, 0.1, 0.1)))
@@ -190,6 +231,26 @@ class GridCellUtilsTest(unittest.TestCase):
         self.assertEqual('dcid:grid_1/20_30',
                          utils.grid_id_from_lat_lng(1, 20, 30))
 
+    def test_grid_ids_from_latlng(self):
+        lat = [20.5, 20.9, -0.5, 34.26]
+        lng = [30.1, 30.7, -85.2, -85.26]
+        self.assertEqual(
+            [
+                'dcid:grid_1/20_30', 'dcid:grid_1/20_30', 'dcid:grid_1/0_-85',
+                'dcid:grid_1/34_-85'
+            ],
+            list(utils.grid_ids_from_lat_lng(1, lat, lng)),
+        )
+        self.assertEqual(
+            [
+                utils.grid_id_from_lat_lng(0.5, lat[i], lng[i], 'ipcc_', '_USA',
+                                           0.25, 0.25) for i in range(len(lat))
+            ],
+            list(
+                utils.grid_ids_from_lat_lng(0.5, lat, lng, 'ipcc_', '_USA',
+                                            0.25, 0.25)),
+        )
+
     def test_grid_ids_distance(self):
         self.assertTrue(
             math.isclose(
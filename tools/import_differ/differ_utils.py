@@ -1,34 +1,185 @@
 import glob
+import gzip
 import fnmatch
 import os
 import pandas as pd
 import re
+import struct
 
 from absl import logging
 from google.cloud import storage
 
+# Properties that identify an observation.
+OBS_KEY_PROPS = [
+    'variableMeasured', 'observationAbout', 'observationDate',
+    'observationPeriod', 'measurementMethod', 'unit', 'scalingFactor'
+]
+# Properties compared for observations with the same key.
+OBS_VALUE_PROPS = ['value']
+# Properties in the observation tuples.
+OBS_PROPS = OBS_KEY_PROPS + OBS_VALUE_PROPS
 
-def load_mcf_file(file: str):
-    """ Reads an MCF text file and returns mcf nodes."""
-    mcf_file = open(file, 'r', encoding='utf-8')
-    mcf_contents = mcf_file.read()
-    mcf_file.close()
-    # nodes separated by a blank line
-    mcf_nodes_text = mcf_contents.split('\n\n')
-    # lines seprated as property: constraint
-    mcf_line = re.compile(r'^(\w+)\s*:\s*(.*)$')
-    mcf_nodes = []
-    for node in mcf_nodes_text:
-        current_mcf_node = {}
-        for line in node.split('\n'):
-            parsed_line = mcf_line.match(line)
+# lines seprated as property: constraint
+_MCF_LINE_RE = re.compile(r'^(\w+)\s*:\s*(.*)$')
+
+# Field numbers in the McfStatVarObsSeries.Key proto for the observation
+# properties.
+_SVOBS_KEY_FIELDS = {
+    1: 'observationAbout',
+    2: 'variableMeasured',
+    3: 'measurementMethod',
+    4: 'observationPeriod',
+    5: 'scalingFactor',
+    6: 'unit',
+}
+
+# Protobuf wire types.
+_WIRE_VARINT = 0
+_WIRE_FIXED64 = 1
+_WIRE_LENGTH = 2
+_WIRE_FIXED32 = 5
+
+
+def _open_file(file: str, mode: str = 'r'):
+    """ Returns a file object that decompresses .gz files as it is read."""
+    if file.endswith('.gz'):
+        if 'b' not in mode:
+            mode = mode + 't'
+        return gzip.open(file, mode, encoding=None if 'b' in mode else 'utf-8')
+    return open(file, mode, encoding=None if 'b' in mode else 'utf-8')
+
+
+def iterate_mcf_nodes(file: str):
+    """ Reads an MCF text file line by line and yields mcf nodes as dicts."""
+    num_nodes = 0
+    current_mcf_node = {}
+    with _open_file(file) as mcf_file:
+        for line in mcf_file:
+            line = line.rstrip('\r\n')
+            if not line.strip():
+                # nodes separated by a blank line
+                if current_mcf_node:
+                    num_nodes += 1
+                    yield current_mcf_node
+                current_mcf_node = {}
+                continue
+            parsed_line = _MCF_LINE_RE.match(line)
             if parsed_line is not None:
                 current_mcf_node[parsed_line.group(1)] = parsed_line.group(2)
-        if current_mcf_node:
-            mcf_nodes.append(current_mcf_node)
+    if current_mcf_node:
+        num_nodes += 1
+        yield current_mcf_node
+    logging.info(f'Loaded {num_nodes} nodes from file {file}')
 
-    logging.info(f'Loaded {len(mcf_nodes)} nodes from file {file}')
-    return mcf_nodes
+
+def load_mcf_file(file: str):
+    """ Reads an MCF text file and returns mcf nodes."""
+    return list(iterate_mcf_nodes(file))
+
+
+def iterate_tfrecords(file: str):
+    """ Yields the records in a TFRecord file that may be gzip'd.
+
+    Each record is a uint64 length, a uint32 CRC of the length, the data and
+    a uint32 CRC of the data. The CRCs are not verified.
+    """
+    with _open_file(file, 'rb') as tfrecord_file:
+        while True:
+            header = tfrecord_file.read(12)
+            if not header:
+                return
+            if len(header) < 12:
+                raise ValueError(f'Truncated record header in {file}')
+            length = struct.unpack('<Q', header[:8])[0]
+            data = tfrecord_file.read(length)
+            if len(data) < length or len(tfrecord_file.read(4)) < 4:
+                raise ValueError(f'Truncated record in {file}')
+            yield data
+
+
+def _read_varint(data: bytes, pos: int) -> (int, int):
+    """ Returns the varint at pos and the position after it."""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _iterate_proto_fields(data: bytes):
+    """ Yields tuples of (field number, wire type, value) for a serialized
+    proto message. Values for length delimited fields are bytes."""
+    pos = 0
+    while pos < len(data):
+        tag, pos = _read_varint(data, pos)
+        wire_type = tag & 0x7
+        if wire_type == _WIRE_VARINT:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == _WIRE_FIXED64:
+            value = data[pos:pos + 8]
+            pos += 8
+        elif wire_type == _WIRE_LENGTH:
+            length, pos = _read_varint(data, pos)
+            value = data[pos:pos + length]
+            pos += length
+        elif wire_type == _WIRE_FIXED32:
+            value = data[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f'Unsupported proto wire type {wire_type}')
+        yield tag >> 3, wire_type, value
+
+
+def _format_number(number: float) -> str:
+    if number.is_integer():
+        return str(int(number))
+    return repr(number)
+
+
+def iterate_tfrecord_observations(file: str):
+    """ Yields observations from a graph TFRecord file with
+    McfOptimizedGraph protos.
+
+    Args:
+      file: TFRecord file, such as graph.tfrecord-00000-of-00001.gz
+    Yields:
+      tuple with values for the properties in OBS_PROPS.
+    """
+    date_index = OBS_KEY_PROPS.index('observationDate')
+    for record in iterate_tfrecords(file):
+        for field, _, series in _iterate_proto_fields(record):
+            if field != 1:
+                # Skip anything other than McfStatVarObsSeries.
+                continue
+            key = {}
+            svobs_list = []
+            for series_field, _, value in _iterate_proto_fields(series):
+                if series_field == 1:
+                    for key_field, wire_type, key_value in _iterate_proto_fields(
+                            value):
+                        prop = _SVOBS_KEY_FIELDS.get(key_field)
+                        if prop and wire_type == _WIRE_LENGTH:
+                            key[prop] = key_value.decode('utf-8')
+                elif series_field == 2:
+                    svobs_list.append(value)
+            key_values = [key.get(prop, '') for prop in OBS_KEY_PROPS]
+            for svobs in svobs_list:
+                date = ''
+                obs_value = ''
+                for obs_field, _, value in _iterate_proto_fields(svobs):
+                    if obs_field == 1:
+                        date = value.decode('utf-8')
+                    elif obs_field == 2:
+                        obs_value = _format_number(
+                            struct.unpack('<d', value)[0])
+                    elif obs_field == 3:
+                        obs_value = value.decode('utf-8')
+                key_values[date_index] = date
+                yield tuple(key_values) + (obs_value,)
 
 
 def load_mcf_files(path: str) -> pd.DataFrame:
@@ -71,6 +222,18 @@ def write_csv_data(df: pd.DataFrame, dest: str, file: str, tmp_dir: str):
         upload_output_data(path, dest)
 
 
+def write_table_csv_data(con, table: str, dest: str, file: str, tmp_dir: str):
+    """ Writes a DuckDB table sorted by key to a CSV file with the given path."""
+    if dest.startswith('gs://'):
+        path = os.path.join(tmp_dir, file)
+    else:
+        path = os.path.join(dest, file)
+    con.execute(f"COPY (SELECT * FROM {table} ORDER BY key_combined)"
+                f" TO '{path}' (HEADER, DELIMITER ',')")
+    if dest.startswith('gs://'):
+        upload_output_data(path, dest)
+
+
 def upload_output_data(src: str, dest: str):
     client = storage.Client()
     bucket_name = dest.split('/')[2]
@@ -103,6 +266,22 @@ def get_gcs_data(uri: str, dest_dir: str) -> str:
     return os.path.join(dest_dir, file_pat)
 
 
+def get_data_files(path: str, tmp_dir: str) -> list:
+    """ Returns the list of local files for the given path.
+    Args:
+      path: local or gcs path (single file or wildcard format)
+      tmp_dir: temporary folder for files downloaded from GCS
+    Returns:
+      sorted list of local files
+    """
+    if path.startswith('gs://'):
+        os.makedirs(tmp_dir, exist_ok=True)
+        path = get_gcs_data(path, tmp_dir)
+    filenames = sorted(glob.glob(path))
+    logging.info(f'Found {len(filenames)} files for path {path}')
+    return filenames
+
+
 def load_data(path: str, tmp_dir: str) -> list:
     """ Loads data from the given path and returns dataframe.
     Args:
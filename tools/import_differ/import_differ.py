@@ -13,6 +13,9 @@
 # limitations under the License.
 """ Utility to generate a dataset diff for import analysis."""
 
+import duckdb
+import multiprocessing
+import numpy as np
 import os
 import pandas as pd
 import random
@@ -23,7 +26,6 @@ from enum import Enum
 from absl import app
 from absl import flags
 from absl import logging
-from googleapiclient.discovery import build
 
 _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(_SCRIPT_DIR)
@@ -68,6 +70,12 @@ flags.DEFINE_string('file_format', 'mcf',
 flags.DEFINE_string('runner_mode', 'local', 'Runner mode (local/cloud)')
 flags.DEFINE_string('job_name', 'differ', 'Name of the differ job.')
 flags.DEFINE_string('project_id', '', 'GCP project id for the dataflow job.')
+flags.DEFINE_integer(
+    'num_processes', 0, 'Number of processes to load input files in local'
+    ' mode. Defaults to the number of CPUs.')
+flags.DEFINE_string(
+    'memory_limit', '', 'Memory limit for the local differ, such as 4GB.'
+    ' Data beyond the limit is spilled to disk.')
 
 
 class ImportDiffer:
@@ -94,6 +102,9 @@ class ImportDiffer:
   - schema_diff_summary.csv: diff summary for schema analysis
   - schema_diff_log.csv: diff log for schema nodes 
 
+  In local mode, the input files are loaded one at a time into a DuckDB
+  database in the output folder and the diff is computed with SQL queries
+  that spill to disk when the data doesn't fit in memory.
   """
 
     def __init__(self,
@@ -103,7 +114,9 @@ class ImportDiffer:
                  project_id='',
                  job_name='differ',
                  file_format='mcf',
-                 runner_mode='local'):
+                 runner_mode='local',
+                 memory_limit='',
+                 num_processes=0):
         self.current_data = current_data
         self.previous_data = previous_data
         self.output_path = output_location
@@ -111,6 +124,8 @@ class ImportDiffer:
         self.job_name = job_name
         self.file_format = file_format
         self.runner_mode = runner_mode
+        self.memory_limit = memory_limit
+        self.num_processes = num_processes or os.cpu_count()
 
     def _cleanup_data(self, df: pd.DataFrame):
         for column in [Diff.ADDED, Diff.DELETED, Diff.MODIFIED]:
@@ -156,11 +171,13 @@ class ImportDiffer:
                           on=Column.key_combined.name,
                           how='outer',
                           indicator=Column.diff_type.name)
-        result[Column.diff_type.name] = result.apply(
-          lambda row: Diff.ADDED.name if row[Column.diff_type.name] == 'right_only' \
-          else Diff.DELETED.name if row[Column.diff_type.name] == 'left_only' \
-          else Diff.MODIFIED.name if row[Column.value_combined.name + '_x'] != row[Column.value_combined.name + '_y'] \
-          else Diff.UNMODIFIED.name, axis=1)
+        merge_type = result[Column.diff_type.name]
+        result[Column.diff_type.name] = np.select([
+            merge_type == 'right_only', merge_type == 'left_only',
+            result[Column.value_combined.name + '_x']
+            != result[Column.value_combined.name + '_y']
+        ], [Diff.ADDED.name, Diff.DELETED.name, Diff.MODIFIED.name],
+                                                  default=Diff.UNMODIFIED.name)
         result.drop(
             result[result[Column.diff_type.name] == Diff.UNMODIFIED.name].index,
             inplace=True)
@@ -182,30 +199,13 @@ class ImportDiffer:
         Returns:
           Dataframes containing observation and schema nodes 
         """
-        obs_list = []
+        obs_rows = []
         schema_list = []
         for node in mcf_nodes:
             if 'StatVarObservation' in node.get(Column.typeOf.name):
-                values_to_combine = []
-                keys_to_combine = []
-                groupby_keys = [
-                    'variableMeasured', 'observationAbout', 'observationDate',
-                    'observationPeriod', 'measurementMethod', 'unit',
-                    'scalingFactor'
-                ]
-                value_keys = [Column.value.name]
-                for key in groupby_keys:
-                    keys_to_combine.append(str(node.get(key, "")))
-                for key in value_keys:
-                    values_to_combine.append(str(node.get(key, "")))
-
-                key_combined = ";".join(keys_to_combine)
-                value_combined = ";".join(values_to_combine)
-
-                obs_list.append({
-                    Column.key_combined.name: key_combined,
-                    Column.value_combined.name: value_combined
-                })
+                obs_rows.append(
+                    tuple(
+                        node.get(prop, '') for prop in differ_utils.OBS_PROPS))
             else:
                 node_id_key = str(node.get('Node', ""))
                 node_id_key = str(node.get(Column.dcid.name, node_id_key))
@@ -228,9 +228,166 @@ class ImportDiffer:
 
         schema_df = pd.DataFrame(schema_list)
         schema_df.drop_duplicates(inplace=True)
-        obs_df = pd.DataFrame(obs_list)
+        obs_df = get_obs_data(obs_rows)
         return obs_df, schema_df
 
+    def load_diff_tables(self, con: duckdb.DuckDBPyConnection, path: str,
+                         tmp_dir: str, prefix: str) -> (int, int):
+        """Loads the data into tables <prefix>_obs and <prefix>_schema.
+
+        Files are read in parallel by multiple processes and added to the
+        tables one at a time so that memory used is bounded by the size of
+        the files being read.
+
+        Args:
+          con: DuckDB connection for the tables.
+          path: local or gcs path (single file or wildcard format)
+          tmp_dir: temporary folder
+          prefix: prefix for the table names.
+
+        Returns:
+          tuple with the number of observations and schema nodes loaded.
+        """
+        for table in [f'{prefix}_obs', f'{prefix}_schema']:
+            con.execute(f'CREATE OR REPLACE TABLE {table}'
+                        ' (key_combined VARCHAR, value_combined VARCHAR)')
+        filenames = differ_utils.get_data_files(path, tmp_dir)
+        file_args = [(filename, self.file_format) for filename in filenames]
+        num_processes = min(self.num_processes, len(filenames))
+        if num_processes > 1:
+            pool = multiprocessing.Pool(num_processes)
+            file_data = pool.imap_unordered(load_file_data, file_args)
+        else:
+            pool = None
+            file_data = map(load_file_data, file_args)
+        for obs_df, schema_df in file_data:
+            for table, df in [(f'{prefix}_obs', obs_df),
+                              (f'{prefix}_schema', schema_df)]:
+                if not df.empty:
+                    con.execute(f'INSERT INTO {table}'
+                                ' SELECT key_combined, value_combined FROM df')
+        if pool:
+            pool.close()
+            pool.join()
+        return (_get_table_size(con, f'{prefix}_obs'),
+                _get_table_size(con, f'{prefix}_schema'))
+
+    def generate_diff_table(self,
+                            con: duckdb.DuckDBPyConnection,
+                            previous_table: str,
+                            current_table: str,
+                            diff_table: str,
+                            distinct: bool = False) -> int:
+        """Creates a table with the diff between two tables.
+
+        The diff table has the same columns as the output of generate_diff().
+
+        Args:
+          con: DuckDB connection with the tables.
+          previous_table: table with previous (old) data.
+          current_table: table with current (new) data.
+          diff_table: name of the table to be created with the diff.
+          distinct: if True, duplicate rows in the input tables are dropped.
+
+        Returns:
+          number of rows in the diff.
+        """
+        select = 'SELECT DISTINCT' if distinct else 'SELECT'
+        con.execute(f"""
+            CREATE OR REPLACE TABLE {diff_table} AS
+            SELECT
+              COALESCE(prev.key_combined, cur.key_combined) AS key_combined,
+              prev.value_combined AS value_combined_x,
+              cur.value_combined AS value_combined_y,
+              CASE
+                WHEN prev.key_combined IS NULL THEN '{Diff.ADDED.name}'
+                WHEN cur.key_combined IS NULL THEN '{Diff.DELETED.name}'
+                ELSE '{Diff.MODIFIED.name}'
+              END AS diff_type
+            FROM ({select} * FROM {previous_table}) AS prev
+            FULL OUTER JOIN ({select} * FROM {current_table}) AS cur
+              ON prev.key_combined = cur.key_combined
+            WHERE prev.key_combined IS NULL OR cur.key_combined IS NULL
+              OR prev.value_combined IS DISTINCT FROM cur.value_combined
+            """)
+        return _get_table_size(con, diff_table)
+
+    def observation_diff_table_analysis(
+            self, con: duckdb.DuckDBPyConnection,
+            diff_table: str) -> (pd.DataFrame, pd.DataFrame):
+        """Performs observation diff analysis on a diff table.
+
+        Only the aggregates per variable are loaded into memory.
+
+        Returns:
+          summary and results from the analysis
+          same as observation_diff_analysis().
+        """
+        samples = con.execute(f"""
+            WITH diff AS (
+              SELECT
+                split_part(key_combined, ';', 1) AS variableMeasured,
+                diff_type,
+                split_part(key_combined, ';', 2) AS observationAbout,
+                split_part(key_combined, ';', 3) AS observationDate,
+                row_number() OVER (
+                  PARTITION BY split_part(key_combined, ';', 1), diff_type
+                  ORDER BY random()) AS sample_rank
+              FROM {diff_table}
+            )
+            SELECT
+              variableMeasured,
+              diff_type,
+              list(observationAbout) FILTER (sample_rank <= {_SAMPLE_COUNT})
+                AS observationAbout,
+              list(observationDate) FILTER (sample_rank <= {_SAMPLE_COUNT})
+                AS observationDate,
+              min(observationDate) AS min_date,
+              max(observationDate) AS max_date,
+              count(*) AS diff_size
+            FROM diff
+            GROUP BY variableMeasured, diff_type
+            """).df()
+        if samples.empty:
+            return self.observation_diff_analysis(pd.DataFrame())
+        samples[Column.observationAbout.name] = samples[
+            Column.observationAbout.name].apply(list)
+        samples[Column.observationDate.name] = [
+            _get_date_samples(list(dates), min_date, max_date, size)
+            for dates, min_date, max_date, size in zip(
+                samples[Column.observationDate.name], samples['min_date'],
+                samples['max_date'], samples[Column.diff_size.name])
+        ]
+        samples = samples[[
+            Column.variableMeasured.name, Column.diff_type.name,
+            Column.observationAbout.name, Column.observationDate.name,
+            Column.diff_size.name
+        ]]
+        summary = samples.pivot(
+          index=Column.variableMeasured.name, columns=Column.diff_type.name, values=Column.diff_size.name)\
+          .reset_index().rename_axis(None, axis=1)
+        self._cleanup_data(summary)
+        samples = samples.sort_values(
+            by=[Column.diff_type.name, Column.variableMeasured.name])
+        return summary, samples
+
+    def schema_diff_table_analysis(self, con: duckdb.DuckDBPyConnection,
+                                   diff_table: str) -> pd.DataFrame:
+        """Performs schema diff analysis on a diff table.
+
+        Returns:
+          summary from the analysis same as schema_diff_analysis().
+        """
+        counts = dict(
+            con.execute(f'SELECT diff_type, count(*) AS diff_size'
+                        f' FROM {diff_table} GROUP BY diff_type'
+                        ' ORDER BY diff_size DESC, diff_type').fetchall())
+        if not counts:
+            return self.schema_diff_analysis(pd.DataFrame())
+        summary = pd.DataFrame([counts])
+        self._cleanup_data(summary)
+        return summary
+
     def observation_diff_analysis(
             self, diff: pd.DataFrame) -> (pd.DataFrame, pd.DataFrame):
         """ 
@@ -313,6 +470,9 @@ class ImportDiffer:
         else:
             logging.info('Using mcf file format')
 
+        # Dataflow client is only needed for the cloud runner.
+        from googleapiclient.discovery import build
+
         template = _DATAFLOW_TEMPLATE_URL
         dataflow = build("dataflow", "v1b3")
         request = (dataflow.projects().locations().flexTemplates().launch(
@@ -347,6 +507,64 @@ class ImportDiffer:
         )
         return status
 
+    def run_local_differ(
+            self, tmp_path: str) -> (pd.DataFrame, pd.DataFrame, pd.DataFrame):
+        """Generates the diff with the data loaded into a DuckDB database.
+
+        The diff logs are written to the output path.
+
+        Returns:
+          tuple of schema diff summary, obs diff summary and obs diff samples.
+        """
+        db_file = os.path.join(tmp_path, 'differ.duckdb')
+        if os.path.exists(db_file):
+            os.remove(db_file)
+        con = duckdb.connect(db_file)
+        if self.memory_limit:
+            con.execute(f"SET memory_limit = '{self.memory_limit}'")
+        try:
+            logging.info(f'Loading current data from {self.current_data}')
+            num_obs, num_nodes = self.load_diff_tables(
+                con, self.current_data, os.path.join(tmp_path, 'current'),
+                'current')
+            logging.info(
+                f'Loaded current data with {num_obs} observations and {num_nodes} nodes.'
+            )
+            logging.info(f'Loading previous data from {self.previous_data}')
+            num_obs, num_nodes = self.load_diff_tables(
+                con, self.previous_data, os.path.join(tmp_path, 'previous'),
+                'previous')
+            logging.info(
+                f'Loaded previous data with {num_obs} observations and {num_nodes} nodes.'
+            )
+            logging.info('Generating observation diff...')
+            obs_diff_size = self.generate_diff_table(con, 'previous_obs',
+                                                     'current_obs', 'obs_diff')
+            logging.info('Generating schema diff...')
+            schema_diff_size = self.generate_diff_table(con,
+                                                        'previous_schema',
+                                                        'current_schema',
+                                                        'schema_diff',
+                                                        distinct=True)
+            logging.info(f'Generated observation diff of size {obs_diff_size}')
+            logging.info(f'Generated schema diff of size {schema_diff_size}')
+            differ_utils.write_table_csv_data(con, 'obs_diff', self.output_path,
+                                              'obs_diff_log.csv', tmp_path)
+            differ_utils.write_table_csv_data(con, 'schema_diff',
+                                              self.output_path,
+                                              'schema_diff_log.csv', tmp_path)
+
+            logging.info(f'Performing schema diff analysis')
+            schema_diff_summary = self.schema_diff_table_analysis(
+                con, 'schema_diff')
+            logging.info('Performing observation diff analysis...')
+            obs_diff_summary, obs_diff_samples = (
+                self.observation_diff_table_analysis(con, 'obs_diff'))
+        finally:
+            con.close()
+            os.remove(db_file)
+        return schema_diff_summary, obs_diff_summary, obs_diff_samples
+
     def run_differ(self):
         os.makedirs(self.output_path, exist_ok=True)
         tmp_path = os.path.join(self.output_path, self.job_name)
@@ -368,40 +586,21 @@ class ImportDiffer:
             diff_path = os.path.join(self.output_path, 'schema-diff*')
             logging.info("Loading schema diff data from: %s", diff_path)
             schema_diff = differ_utils.load_csv_data(diff_path, tmp_path)
-        else:
-            # Runs local Python differ.
-            current_dir = os.path.join(tmp_path, 'current')
-            previous_dir = os.path.join(tmp_path, 'previous')
-            logging.info(f'Loading current data from {self.current_data}')
-            mcf_nodes = differ_utils.load_data(self.current_data, current_dir)
-            current_df_obs, current_df_schema = self.split_data(mcf_nodes)
+
             logging.info(
-                f'Loaded current data with {current_df_obs.shape[0]} observations and {current_df_schema.shape[0]} nodes.'
-            )
-            logging.info(f'Loading previous data from {self.previous_data}')
-            mcf_nodes = differ_utils.load_data(self.previous_data, previous_dir)
-            previous_df_obs, previous_df_schema = self.split_data(mcf_nodes)
+                f'Generated observation diff of size {obs_diff.shape[0]}')
             logging.info(
-                f'Loaded previous data with {previous_df_obs.shape[0]} observations and {previous_df_schema.shape[0]} nodes.'
-            )
-            logging.info('Generating observation diff...')
-            obs_diff = self.generate_diff(previous_df_obs, current_df_obs)
-            logging.info('Generating schema diff...')
-            schema_diff = self.generate_diff(previous_df_schema,
-                                             current_df_schema)
-            differ_utils.write_csv_data(obs_diff, self.output_path,
-                                        'obs_diff_log.csv', tmp_path)
-            differ_utils.write_csv_data(schema_diff, self.output_path,
-                                        'schema_diff_log.csv', tmp_path)
-
-        logging.info(f'Generated observation diff of size {obs_diff.shape[0]}')
-        logging.info(f'Generated schema diff of size {schema_diff.shape[0]}')
-
-        logging.info(f'Performing schema diff analysis')
-        schema_diff_summary = self.schema_diff_analysis(schema_diff)
-        logging.info('Performing observation diff analysis...')
-        obs_diff_summary, obs_diff_samples = self.observation_diff_analysis(
-            obs_diff)
+                f'Generated schema diff of size {schema_diff.shape[0]}')
+
+            logging.info(f'Performing schema diff analysis')
+            schema_diff_summary = self.schema_diff_analysis(schema_diff)
+            logging.info('Performing observation diff analysis...')
+            obs_diff_summary, obs_diff_samples = self.observation_diff_analysis(
+                obs_diff)
+        else:
+            # Runs local differ.
+            schema_diff_summary, obs_diff_summary, obs_diff_samples = (
+                self.run_local_differ(tmp_path))
 
         logging.info(f'Writing differ output to {self.output_path}')
         differ_utils.write_csv_data(schema_diff_summary, self.output_path,
@@ -413,12 +612,85 @@ class ImportDiffer:
         logging.info(f'Differ output written to {self.output_path}')
 
 
+def get_obs_data(obs_rows: list) -> pd.DataFrame:
+    """Returns a dataframe with the key and value for observations.
+
+    Args:
+      obs_rows: list of tuples with values for differ_utils.OBS_PROPS.
+
+    Returns:
+      dataframe with key_combined and value_combined columns.
+    """
+    obs_df = pd.DataFrame()
+    if obs_rows:
+        # Combine the key and value properties across all observations.
+        props_df = pd.DataFrame.from_records(obs_rows,
+                                             columns=differ_utils.OBS_PROPS)
+        props_df = props_df.fillna('').astype(str)
+        obs_df[Column.key_combined.name] = _join_columns(
+            props_df, differ_utils.OBS_KEY_PROPS)
+        obs_df[Column.value_combined.name] = _join_columns(
+            props_df, differ_utils.OBS_VALUE_PROPS)
+    return obs_df
+
+
+def load_file_data(file_args: tuple) -> (pd.DataFrame, pd.DataFrame):
+    """Returns the observation and schema data for a file.
+
+    Args:
+      file_args: tuple of (filename, file_format) where file_format is one of
+        'mcf' or 'tfrecord'.
+
+    Returns:
+      dataframes with observations and schema nodes from the file.
+    """
+    filename, file_format = file_args
+    if file_format == 'tfrecord':
+        obs_df = get_obs_data(
+            list(differ_utils.iterate_tfrecord_observations(filename)))
+        schema_df = pd.DataFrame()
+    else:
+        obs_df, schema_df = ImportDiffer('', '', '').split_data(
+            differ_utils.iterate_mcf_nodes(filename))
+    logging.info(f'Loaded {obs_df.shape[0]} observations and'
+                 f' {schema_df.shape[0]} nodes from {filename}')
+    return obs_df, schema_df
+
+
+def _join_columns(df: pd.DataFrame, columns: list) -> pd.Series:
+    """Returns the values of the string columns joined with ';'."""
+    result = df[columns[0]]
+    for column in columns[1:]:
+        result = result + ';' + df[column]
+    return result
+
+
+def _get_table_size(con: duckdb.DuckDBPyConnection, table: str) -> int:
+    return con.execute(f'SELECT count(*) FROM {table}').fetchone()[0]
+
+
+def _get_date_samples(dates: list, min_date: str, max_date: str,
+                      size: int) -> list:
+    """Returns sample dates with the first and last dates in the diff."""
+    dates = sorted(dates)
+    if size <= _SAMPLE_COUNT:
+        return dates
+    samples = [
+        date for date in dates[:_SAMPLE_COUNT - 2]
+        if date != min_date and date != max_date
+    ]
+    if len(samples) < _SAMPLE_COUNT - 2:
+        samples = dates[:_SAMPLE_COUNT - 2]
+    return [min_date] + samples + [max_date]
+
+
 def main(_):
     '''Runs the differ.'''
     differ = ImportDiffer(_FLAGS.current_data, _FLAGS.previous_data,
                           _FLAGS.output_location, _FLAGS.project_id,
                           _FLAGS.job_name, _FLAGS.file_format,
-                          _FLAGS.runner_mode)
+                          _FLAGS.runner_mode, _FLAGS.memory_limit,
+                          _FLAGS.num_processes)
     differ.run_differ()
 
 
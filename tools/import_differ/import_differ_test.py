@@ -14,6 +14,7 @@
 
 import os
 import pandas as pd
+import tempfile
 import unittest
 
 from pandas.testing import assert_frame_equal
@@ -54,6 +55,49 @@ class TestImportDiffer(unittest.TestCase):
                          'schema_diff_summary.csv'))
         assert_frame_equal(summary, expected_summary)
 
+    def test_local_differ(self):
+        current_data = os.path.join(module_dir, 'test', 'current', '*.mcf')
+        previous_data = os.path.join(module_dir, 'test', 'previous', '*.mcf')
+        with tempfile.TemporaryDirectory() as output_location:
+            differ = import_differ.ImportDiffer(current_data, previous_data,
+                                                output_location)
+            differ.run_differ()
+            for file in [
+                    'obs_diff_summary.csv', 'schema_diff_summary.csv',
+                    'obs_diff_log.csv', 'schema_diff_log.csv'
+            ]:
+                assert_frame_equal(
+                    pd.read_csv(os.path.join(output_location, file)),
+                    pd.read_csv(
+                        os.path.join(module_dir, 'test', 'results', file)))
+
+    def test_iterate_mcf_nodes(self):
+        mcf_file = os.path.join(module_dir, 'test', 'current', 'schema.mcf')
+        nodes = list(differ_utils.iterate_mcf_nodes(mcf_file))
+        self.assertEqual(differ_utils.load_mcf_file(mcf_file), nodes)
+        self.assertEqual('"InterestRate_TreasuryBill_6Month"', nodes[0]['dcid'])
+        self.assertEqual('[6 Month]', nodes[0]['maturity'])
+
+    def test_tfrecord_diff(self):
+        tfrecord_file = os.path.join(module_dir,
+                                     'graph.tfrecord-00000-of-00001.gz')
+        obs = list(differ_utils.iterate_tfrecord_observations(tfrecord_file))
+        self.assertEqual(62784, len(obs))
+        self.assertEqual(
+            ('Expenditure_EconomicActivity_Government_Society', 'country/FRA',
+             '1970', '', '', 'PerUnitGDP', '', '7.24514'), obs[0])
+
+        obs_df, schema_df = import_differ.load_file_data(
+            (tfrecord_file, 'tfrecord'))
+        self.assertTrue(schema_df.empty)
+        previous_df = obs_df.drop(index=[0, 1])
+        current_df = obs_df.drop(index=[2])
+        current_df.loc[3, 'value_combined'] = '1'
+        differ = import_differ.ImportDiffer('', '', '')
+        diff = differ.generate_diff(previous_df, current_df)
+        self.assertEqual(['ADDED', 'ADDED', 'DELETED', 'MODIFIED'],
+                         sorted(diff['diff_type']))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -23,7 +23,7 @@ from typing import Tuple
 
 from .validation_config import ValidationConfig
 from .report_generator import ReportGenerator
-from .validator import Validator
+from .validator import Validator, get_connection
 from .util import filter_dataframe
 from .result import ValidationResult, ValidationStatus
 
@@ -42,6 +42,10 @@ class ValidationRunner:
         self.validator = Validator()
         self.validation_results = []
         self.dataframes = {'stats': pd.DataFrame(), 'differ': pd.DataFrame()}
+        # DuckDB connection shared by all SQL rules.
+        self._connection = None
+        # Dictionary of scope filters to the filtered DataFrame.
+        self._scope_dataframes = {}
 
         self._initialize_data_sources(stats_summary, differ_output)
 
@@ -141,23 +145,13 @@ class ValidationRunner:
             if validator_name == 'SQL_VALIDATOR':
                 result = validation_func(self.dataframes['stats'],
                                          self.dataframes['differ'],
-                                         rule['params'])
+                                         rule['params'],
+                                         con=self._get_connection())
             else:
                 scope = rule['scope']
                 if isinstance(scope, str):
                     scope = self.config.get_scope(scope)
-
-                data_source = scope['data_source']
-                df = self.dataframes[data_source]
-
-                if 'variables' in scope:
-                    variables_config = scope['variables']
-                    df = filter_dataframe(
-                        df,
-                        dcids=variables_config.get('dcids'),
-                        regex_patterns=variables_config.get('regex'),
-                        contains_all=variables_config.get('contains_all'))
-
+                df = self._get_scope_dataframe(scope)
                 result = validation_func(df, rule['params'])
 
             result.name = rule['rule_id']
@@ -178,6 +172,36 @@ class ValidationRunner:
 
         return overall_status, self.validation_results
 
+    def _get_connection(self):
+        """Returns the DuckDB connection with the stats and differ tables."""
+        if self._connection is None:
+            self._connection = get_connection(self.dataframes['stats'],
+                                              self.dataframes['differ'])
+        return self._connection
+
+    def _get_scope_dataframe(self, scope: dict) -> pd.DataFrame:
+        """Returns the rows of the data source selected by the scope.
+
+    Rules with the same scope share the filtered DataFrame.
+    """
+        data_source = scope['data_source']
+        variables_config = scope.get('variables')
+        if not variables_config:
+            return self.dataframes[data_source]
+
+        key = (data_source, tuple(variables_config.get('dcids') or []),
+               tuple(variables_config.get('regex') or
+                     []), tuple(variables_config.get('contains_all') or []))
+        df = self._scope_dataframes.get(key)
+        if df is None:
+            df = filter_dataframe(
+                self.dataframes[data_source],
+                dcids=variables_config.get('dcids'),
+                regex_patterns=variables_config.get('regex'),
+                contains_all=variables_config.get('contains_all'))
+            self._scope_dataframes[key] = df
+        return df
+
 
 def main(_):
     try:
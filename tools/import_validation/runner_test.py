@@ -20,6 +20,7 @@ import os
 import json
 import tempfile
 
+from tools.import_validation import runner as runner_module
 from tools.import_validation.runner import ValidationRunner
 from tools.import_validation.result import ValidationResult, ValidationStatus
 
@@ -124,6 +125,65 @@ class TestValidationRunner(unittest.TestCase):
         filtered_df_arg = call_args[0]
         self.assertEqual(filtered_df_arg.iloc[0]['StatVar'], 'filtered_sv')
 
+    @patch('tools.import_validation.runner.filter_dataframe')
+    def test_runner_shares_filters_and_connection(self, mock_filter_dataframe):
+        mock_filter_dataframe.return_value = pd.DataFrame({
+            'StatVar': ['sv1'],
+            'NumPlaces': [10],
+            'NumObservations': [5]
+        })
+        scope = {'data_source': 'stats', 'variables': {'dcids': ['sv1']}}
+        sql_rule = {
+            'validator': 'SQL_VALIDATOR',
+            'params': {
+                'query': 'SELECT NumPlaces FROM stats',
+                'condition': 'NumPlaces > 0'
+            }
+        }
+        config = {
+            'rules': [{
+                'rule_id': 'places',
+                'validator': 'NUM_PLACES_COUNT',
+                'scope': scope,
+                'params': {
+                    'minimum': 1
+                }
+            }, {
+                'rule_id': 'observations',
+                'validator': 'NUM_OBSERVATIONS_CHECK',
+                'scope': scope,
+                'params': {
+                    'minimum': 1
+                }
+            }, {
+                'rule_id': 'sql1',
+                **sql_rule
+            }, {
+                'rule_id': 'sql2',
+                **sql_rule
+            }]
+        }
+        with open(self.config_path, 'w') as f:
+            json.dump(config, f)
+        pd.DataFrame({
+            'StatVar': ['sv1', 'sv2'],
+            'NumPlaces': [10, 20],
+            'NumObservations': [5, 6]
+        }).to_csv(self.stats_path, index=False)
+
+        runner = ValidationRunner(validation_config_path=self.config_path,
+                                  stats_summary=self.stats_path,
+                                  differ_output=self.differ_path,
+                                  validation_output=self.output_path)
+        with patch('tools.import_validation.runner.get_connection',
+                   wraps=runner_module.get_connection) as mock_connection:
+            overall_status, results = runner.run_validations()
+
+        self.assertTrue(overall_status)
+        self.assertEqual(4, len(results))
+        mock_filter_dataframe.assert_called_once()
+        mock_connection.assert_called_once()
+
     @patch('tools.import_validation.runner.Validator')
     def test_runner_handles_failed_validation(self, MockValidator):
         # 1. Setup the mock to return a FAILED result
@@ -82,18 +82,17 @@ def filter_dataframe(df: pd.DataFrame,
     if not dcids and not regex_patterns and not contains_all:
         return df
 
-    # This will hold the indices of all rows that match at least one filter
-    matching_indices = set()
+    # Rows that match at least one filter
+    matches = pd.Series(False, index=df.index)
 
     if dcids:
-        matching_indices.update(df[df['StatVar'].isin(dcids)].index)
+        matches |= df['StatVar'].isin(dcids)
 
     if regex_patterns:
         for pattern in regex_patterns:
             try:
                 regex = re.compile(pattern)
-                matches = df['StatVar'].str.match(regex, na=False)
-                matching_indices.update(df[matches].index)
+                matches |= df['StatVar'].str.match(regex, na=False)
             except re.error:
                 # If it's not a valid regex, it won't match anything.
                 # We could log a warning here if needed.
@@ -105,6 +104,9 @@ def filter_dataframe(df: pd.DataFrame,
         for substring in contains_all:
             combined_condition &= df['StatVar'].str.contains(substring,
                                                              case=False)
-        matching_indices.update(df[combined_condition].index)
+        matches |= combined_condition
 
-    return df.loc[sorted(list(matching_indices))]
+    result = df[matches.astype(bool)]
+    if not result.index.is_monotonic_increasing:
+        result = result.sort_index()
+    return result
@@ -24,8 +24,11 @@ class Validator:
   This class is stateless and does not interact with the filesystem.
   """
 
-    def validate_sql(self, stats_df: pd.DataFrame, differ_df: pd.DataFrame,
-                     params: dict) -> ValidationResult:
+    def validate_sql(self,
+                     stats_df: pd.DataFrame,
+                     differ_df: pd.DataFrame,
+                     params: dict,
+                     con: duckdb.DuckDBPyConnection = None) -> ValidationResult:
         """Runs a SQL query to validate the data.
 
     Args:
@@ -33,6 +36,9 @@ class Validator:
         differ_df: A DataFrame containing the differ output.
         params: A dictionary containing the validation parameters, which must
           have 'query' and 'condition' keys.
+        con: An optional DuckDB connection with the 'stats' and 'differ'
+          tables already registered. It is shared across rules to avoid
+          registering the data for each query.
 
     Returns:
         A ValidationResult object.
@@ -46,9 +52,8 @@ class Validator:
             )
 
         try:
-            con = duckdb.connect(database=':memory:', read_only=False)
-            con.register('stats', stats_df)
-            con.register('differ', differ_df)
+            if con is None:
+                con = get_connection(stats_df, differ_df)
 
             final_query = f"""
             WITH data_to_validate AS (
@@ -103,8 +108,7 @@ class Validator:
                                         'rows_failed': 0
                                     })
 
-        stats_df['MaxDate'] = pd.to_datetime(stats_df['MaxDate'])
-        max_date_year = stats_df['MaxDate'].dt.year.max()
+        max_date_year = pd.to_datetime(stats_df['MaxDate']).dt.year.max()
         current_year = pd.to_datetime('today').year
 
         if max_date_year < current_year:
@@ -378,47 +382,12 @@ class Validator:
                                         'rows_failed': 0
                                     })
 
-        min_val = params.get('minimum')
-        max_val = params.get('maximum')
-        exact_val = params.get('value')
-
         rows_processed = len(stats_df)
-        rows_failed = 0
-        failed_rows_details = []
-
-        for _, row in stats_df.iterrows():
-            value = row['NumPlaces']
-            stat_var = row.get('StatVar', 'Unknown')
-            failed = False
-
-            if exact_val is not None and value != exact_val:
-                failed = True
-                failed_rows_details.append({
-                    'stat_var': stat_var,
-                    'actual_value': value,
-                    'expected_value': exact_val,
-                    'reason': f"Expected exactly {exact_val}"
-                })
-            elif min_val is not None and value < min_val:
-                failed = True
-                failed_rows_details.append({
-                    'stat_var': stat_var,
-                    'actual_value': value,
-                    'minimum': min_val,
-                    'reason': f"Below minimum of {min_val}"
-                })
-            elif max_val is not None and value > max_val:
-                failed = True
-                failed_rows_details.append({
-                    'stat_var': stat_var,
-                    'actual_value': value,
-                    'maximum': max_val,
-                    'reason': f"Above maximum of {max_val}"
-                })
-
-            if failed:
-                rows_failed += 1
-
+        failed_rows_details = _get_range_failures(stats_df, 'NumPlaces',
+                                                  params.get('minimum'),
+                                                  params.get('maximum'),
+                                                  params.get('value'))
+        rows_failed = len(failed_rows_details)
         rows_succeeded = rows_processed - rows_failed
 
         if rows_failed > 0:
@@ -476,20 +445,14 @@ class Validator:
 
         min_val = params['minimum']
         rows_processed = len(stats_df)
-        rows_failed = 0
-        failed_rows_details = []
-
-        for _, row in stats_df.iterrows():
-            min_value = row['MinValue']
-            stat_var = row.get('StatVar', 'Unknown')
-
-            if min_value < min_val:
-                rows_failed += 1
-                failed_rows_details.append({
-                    'stat_var': stat_var,
-                    'actual_min_value': min_value,
-                    'minimum': min_val
-                })
+        failed_df = stats_df[stats_df['MinValue'] < min_val]
+        rows_failed = len(failed_df)
+        failed_rows_details = [{
+            'stat_var': stat_var,
+            'actual_min_value': min_value,
+            'minimum': min_val
+        } for stat_var, min_value in zip(_get_stat_vars(failed_df),
+                                         failed_df['MinValue'].tolist())]
 
         rows_succeeded = rows_processed - rows_failed
 
@@ -594,47 +557,12 @@ class Validator:
                                         'rows_failed': 0
                                     })
 
-        min_val = params.get('minimum')
-        max_val = params.get('maximum')
-        exact_val = params.get('value')
-
         rows_processed = len(stats_df)
-        rows_failed = 0
-        failed_rows_details = []
-
-        for _, row in stats_df.iterrows():
-            value = row['NumObservations']
-            stat_var = row.get('StatVar', 'Unknown')
-            failed = False
-
-            if exact_val is not None and value != exact_val:
-                failed = True
-                failed_rows_details.append({
-                    'stat_var': stat_var,
-                    'actual_value': value,
-                    'expected_value': exact_val,
-                    'reason': f"Expected exactly {exact_val}"
-                })
-            elif min_val is not None and value < min_val:
-                failed = True
-                failed_rows_details.append({
-                    'stat_var': stat_var,
-                    'actual_value': value,
-                    'minimum': min_val,
-                    'reason': f"Below minimum of {min_val}"
-                })
-            elif max_val is not None and value > max_val:
-                failed = True
-                failed_rows_details.append({
-                    'stat_var': stat_var,
-                    'actual_value': value,
-                    'maximum': max_val,
-                    'reason': f"Above maximum of {max_val}"
-                })
-
-            if failed:
-                rows_failed += 1
-
+        failed_rows_details = _get_range_failures(stats_df, 'NumObservations',
+                                                  params.get('minimum'),
+                                                  params.get('maximum'),
+                                                  params.get('value'))
+        rows_failed = len(failed_rows_details)
         rows_succeeded = rows_processed - rows_failed
 
         if rows_failed > 0:
@@ -742,20 +670,14 @@ class Validator:
 
         max_val = params['maximum']
         rows_processed = len(stats_df)
-        rows_failed = 0
-        failed_rows_details = []
-
-        for _, row in stats_df.iterrows():
-            max_value = row['MaxValue']
-            stat_var = row.get('StatVar', 'Unknown')
-
-            if max_value > max_val:
-                rows_failed += 1
-                failed_rows_details.append({
-                    'stat_var': stat_var,
-                    'actual_max_value': max_value,
-                    'maximum': max_val
-                })
+        failed_df = stats_df[stats_df['MaxValue'] > max_val]
+        rows_failed = len(failed_df)
+        failed_rows_details = [{
+            'stat_var': stat_var,
+            'actual_max_value': max_value,
+            'maximum': max_val
+        } for stat_var, max_value in zip(_get_stat_vars(failed_df),
+                                         failed_df['MaxValue'].tolist())]
 
         rows_succeeded = rows_processed - rows_failed
 
@@ -779,3 +701,70 @@ class Validator:
                                     'rows_succeeded': rows_succeeded,
                                     'rows_failed': rows_failed
                                 })
+
+
+def get_connection(stats_df: pd.DataFrame,
+                   differ_df: pd.DataFrame) -> duckdb.DuckDBPyConnection:
+    """Returns a DuckDB connection with the 'stats' and 'differ' tables."""
+    con = duckdb.connect(database=':memory:', read_only=False)
+    for name, df in [('stats', stats_df), ('differ', differ_df)]:
+        # DuckDB can't register a DataFrame without columns.
+        if len(df.columns):
+            con.register(name, df)
+    return con
+
+
+def _get_stat_vars(df: pd.DataFrame) -> list:
+    """Returns the list of StatVars for the rows in the DataFrame."""
+    if 'StatVar' in df.columns:
+        return df['StatVar'].tolist()
+    return ['Unknown'] * len(df)
+
+
+def _get_range_failures(df: pd.DataFrame, column: str, min_val, max_val,
+                        exact_val) -> list:
+    """Returns the details for rows with a value outside the range.
+
+    Each row is reported for the first check that fails, in the order:
+    exact value, minimum and maximum.
+    """
+    values = df[column]
+    not_exact = pd.Series(False, index=df.index)
+    below_min = pd.Series(False, index=df.index)
+    above_max = pd.Series(False, index=df.index)
+    if exact_val is not None:
+        not_exact = values != exact_val
+    if min_val is not None:
+        below_min = (values < min_val) & ~not_exact
+    if max_val is not None:
+        above_max = (values > max_val) & ~not_exact & ~below_min
+    failed = not_exact | below_min | above_max
+    if not failed.any():
+        return []
+
+    failed_rows_details = []
+    for stat_var, value, is_not_exact, is_below_min in zip(
+            _get_stat_vars(df[failed]), values[failed].tolist(),
+            not_exact[failed], below_min[failed]):
+        if is_not_exact:
+            failed_rows_details.append({
+                'stat_var': stat_var,
+                'actual_value': value,
+                'expected_value': exact_val,
+                'reason': f"Expected exactly {exact_val}"
+            })
+        elif is_below_min:
+            failed_rows_details.append({
+                'stat_var': stat_var,
+                'actual_value': value,
+                'minimum': min_val,
+                'reason': f"Below minimum of {min_val}"
+            })
+        else:
+            failed_rows_details.append({
+                'stat_var': stat_var,
+                'actual_value': value,
+                'maximum': max_val,
+                'reason': f"Above maximum of {max_val}"
+            })
+    return failed_rows_details
@@ -288,6 +288,22 @@ class TestNumPlacesCountValidation(unittest.TestCase):
         self.assertEqual(result.details['rows_succeeded'], 1)
         self.assertEqual(result.details['rows_failed'], 0)
 
+    def test_num_places_count_reports_first_failed_check(self):
+        test_df = pd.DataFrame({
+            'StatVar': ['sv1', 'sv2', 'sv3', 'sv4'],
+            'NumPlaces': [5, 10, 20, 12]
+        })
+        params = {'minimum': 8, 'maximum': 15, 'value': 12}
+        result = self.validator.validate_num_places_count(test_df, params)
+        self.assertEqual(result.status, ValidationStatus.FAILED)
+        self.assertEqual(result.details['rows_failed'], 3)
+        self.assertEqual(result.details['rows_succeeded'], 1)
+        self.assertEqual([(row['stat_var'], row['reason'])
+                          for row in result.details['failed_rows']],
+                         [('sv1', 'Expected exactly 12'),
+                          ('sv2', 'Expected exactly 12'),
+                          ('sv3', 'Expected exactly 12')])
+
     def test_num_places_count_passes_on_empty_dataframe(self):
         test_df = pd.DataFrame({'StatVar': [], 'NumPlaces': []})
         params = {'minimum': 1}
@@ -41,6 +41,12 @@ flags.DEFINE_string('config_file', '', 'File with configuration parameters.')
 flags.DEFINE_list('data_url', '', 'URLs to download the data from.')
 flags.DEFINE_string('shard_input_by_column', '',
                     'Shard input data by unique values in column.')
+flags.DEFINE_integer(
+    'shard_input_by_rows',
+    0,
+    'Shard input data into files with the given number of rows for parallel'
+    ' processing. If negative, each input is split into parallelism shards.',
+)
 flags.DEFINE_integer(
     'shard_prefix_length',
     sys.maxsize,
@@ -212,6 +218,30 @@ def get_default_config() -> dict:
             _FLAGS.aggregate_duplicate_svobs,
         'merged_pvs_property':
             '#MergedSVObs',
+        # Store SVObs with interned values in columns instead of a dict per
+        # SVObs to reduce memory for large inputs.
+        'compact_svobs_store':
+            False,
+        # Approximate memory in MB for the compact SVObs store beyond which
+        # SVObs are moved to a database in svobs_store_tmp_dir.
+        # Set to 0 to keep all SVObs in memory.
+        'svobs_store_memory_mb':
+            4096,
+        'svobs_store_tmp_dir':
+            '',
+        # Write SVObs to disk as they are generated instead of keeping them in
+        # memory. Not supported with aggregate_duplicate_svobs, filter_data_*
+        # or resolve_places_batch configs.
+        'stream_svobs':
+            False,
+        # Number of SVObs expected in stream_svobs mode to size the filter for
+        # duplicate SVObs keys.
+        'stream_svobs_expected_count':
+            10000000,
+        # Maximum number of distinct observation dates with the resolved date
+        # cached across SVObs.
+        'observation_date_cache_size':
+            100000,
         'multi_value_properties': [
             'name', 'alternateName', 'measurementDenominator'
         ],
@@ -311,6 +341,13 @@ def get_default_config() -> dict:
         # List of default PVS maps to lookup column values if there is no map for a
         # column name.
         'default_pv_maps': ['GLOBAL'],
+        # Number of recent PV map lookups for cell values to be cached.
+        'pv_lookup_cache_size':
+            10000,
+        # Evaluate #Eval statements that only use the cell value once for
+        # each unique value in a column.
+        'eval_column_batch':
+            False,
         # Row and column indices with content to be looked up in pv_maps.
         'mapped_rows':
             0,
@@ -326,6 +363,10 @@ def get_default_config() -> dict:
             _FLAGS.maps_api_key,
         'resolve_places':
             False,
+        # Resolve places after all inputs are processed in a single batch
+        # instead of one lookup per SVObs.
+        'resolve_places_batch':
+            False,
         'places_csv':
             _FLAGS.places_csv,
         'places_resolved_csv':
@@ -364,6 +405,14 @@ def get_default_config() -> dict:
             True,  # Drop existing statvars from output
         'output_precision_digits':
             5,  # Round floating values to 5 decimal digits.
+        # Merge SVObs CSV from parallel shards by one of the following:
+        #   sort: Sort SVObs by key, merging duplicates across shards.
+        #   concat: Concatenate shard CSVs as is.
+        'merge_svobs_csv':
+            'sort',
+        # Number of SVObs sorted in memory into a run for the merge.
+        'merge_svobs_run_size':
+            100000,
         'generate_schema_mcf':
             True,
         'generate_provisional_schema':
@@ -392,6 +441,8 @@ def get_default_config() -> dict:
         'process_rows': [0],
         'parallelism':
             _FLAGS.parallelism,
+        'shard_input_by_rows':
+            _FLAGS.shard_input_by_rows,
         'output_counters':
             _FLAGS.output_counters,
 
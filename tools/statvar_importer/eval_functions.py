@@ -26,6 +26,12 @@ The module also includes helper functions for common data transformations:
 - `format_date`: Parses and formats date strings.
 - `str_to_camel_case`: Converts strings to CamelCase.
 
+Statements are compiled once and the code objects are cached, so evaluating
+the same `#Eval` expression for every row only pays the parse cost once.
+`evaluate_statement_for_column` applies a statement to a whole column of
+values, evaluating it once per unique value, and `format_date_column` and
+`str_to_camel_case_column` are column versions of the helpers.
+
 These utilities can be invoked within a configuration that uses `#Eval` directives
 for data processing. For example, to format a 'DateTime' column into ISO-8601
 format, you could use:
@@ -35,13 +41,16 @@ format, you could use:
 }
 """
 
+import ast
 from datetime import datetime
+import functools
 import re
 
 from absl import logging
 import dateutil
 from dateutil import parser
 from dateutil.relativedelta import relativedelta
+import pandas as pd
 
 # String utility functions
 
@@ -110,6 +119,56 @@ def str_to_camel_case(input_string: str,
         [w[0].upper() + w[1:] for w in clean_str.split(' ') if len(w) > 0])
 
 
+def format_date_column(values: list, format_str: str = '%Y-%m-%d') -> list:
+    """Returns a list of formatted dates for a column of date strings.
+
+    Each unique date string is parsed once with `format_date`.
+
+    Args:
+        values: list or pandas Series of date strings.
+        format_str: The desired output format for the date.
+
+    Returns:
+        list of formatted dates, one for each value.
+
+    Examples:
+        >>> format_date_column(['Jan 31, 2023', '2022/01/31', 'Jan 31, 2023'])
+        ['2023-01-31', '2022-01-31', '2023-01-31']
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object),
+                                  use_na_sentinel=False)
+    unique_dates = pd.array([format_date(v, format_str) for v in uniques],
+                            dtype=object)
+    return list(unique_dates.take(codes))
+
+
+def str_to_camel_case_column(values: list,
+                             strip_re: str = r'[^A-Za-z_0-9]') -> list:
+    """Returns a list of CamelCase strings for a column of strings.
+
+    This is a vectorized version of `str_to_camel_case` using pandas string
+    functions.
+
+    Args:
+        values: list or pandas Series of strings.
+        strip_re: A regular expression of characters to be removed.
+
+    Returns:
+        list of strings in CamelCase, one for each value.
+
+    Examples:
+        >>> str_to_camel_case_column(['Abc-def(HG)', 'my name', 123])
+        ['AbcDefHg', 'MyName', '123']
+    """
+    series = pd.Series(values, dtype=object).map(str)
+    clean_str = series.str.replace(strip_re, ' ', regex=True).str.strip()
+    # Drop spaces and capitalize the first letter of each word.
+    camel_case = clean_str.str.replace(r'(?:^| +)([^ ])',
+                                       lambda m: m.group(1).upper(),
+                                       regex=True)
+    return list(camel_case)
+
+
 # A dictionary of functions and modules that are safe to use in `eval()`.
 # This dictionary acts as a safelist, defining the execution environment for
 # the `evaluate_statement` function. By controlling the available globals,
@@ -139,6 +198,71 @@ EVAL_GLOBALS = {
 }
 
 
+@functools.lru_cache(maxsize=4096)
+def compile_statement(eval_str: str) -> (str, object):
+    """Returns the variable and compiled code for a statement.
+
+    The statement is split into 'variable = statement' once and the statement
+    is compiled into a code object that is cached for subsequent calls with the
+    same eval_str.
+
+    Args:
+        eval_str: The string containing the expression to be compiled, in the
+          format 'variable = statement' or just 'statement'.
+
+    Returns:
+        A tuple of the variable name and the compiled code object.
+        The code object is None if the statement can't be compiled.
+
+    Examples:
+        >>> compile_statement('num = 1 + x')
+        ('num', <code object <module> at ..., file "<eval>", line 1>)
+        >>> compile_statement('var = 1 +')
+        ('var', None)
+    """
+    variable = ''
+    statement = eval_str
+    if '=' in eval_str:
+        variable, statement = eval_str.split('=', 1)
+    variable = variable.strip()
+    try:
+        # eval() ignores leading spaces and tabs, compile() does not.
+        code = compile(statement.lstrip(' \t'), '<eval>', 'eval')
+    except (SyntaxError, ValueError) as e:
+        logging.debug(f'Failed to compile: {variable}={statement}, {e}')
+        code = None
+    return (variable, code)
+
+
+@functools.lru_cache(maxsize=4096)
+def get_statement_variables(eval_str: str) -> frozenset:
+    """Returns the set of names used in a statement.
+
+    The names include variables as well as functions such as 'format_date'.
+
+    Args:
+        eval_str: The string containing the expression, in the format
+          'variable = statement' or just 'statement'.
+
+    Returns:
+        A frozenset of names referenced in the statement.
+        The set is empty if the statement can't be compiled.
+
+    Examples:
+        >>> sorted(get_statement_variables('date=format_date(Data, "%Y")'))
+        ['Data', 'format_date']
+    """
+    _, code = compile_statement(eval_str)
+    if code is None:
+        return frozenset()
+    statement = eval_str
+    if '=' in eval_str:
+        statement = eval_str.split('=', 1)[1]
+    tree = ast.parse(statement.lstrip(' \t'), mode='eval')
+    return frozenset(
+        node.id for node in ast.walk(tree) if isinstance(node, ast.Name))
+
+
 def evaluate_statement(eval_str: str,
                        variables: dict = {},
                        functions: dict = EVAL_GLOBALS) -> (str, str):
@@ -147,7 +271,7 @@ def evaluate_statement(eval_str: str,
     This function is a safe wrapper around Python's `eval()` built-in. It
     is designed to execute simple expressions, often used for data
     transformations. The expression can optionally assign a value to a
-    variable.
+    variable. The compiled statement is cached by `compile_statement`.
 
     Args:
         eval_str: The string containing the expression to be evaluated, in the
@@ -180,15 +304,60 @@ def evaluate_statement(eval_str: str,
         >>> evaluate_statement('name = 1 + "2"')
         ('name', None)
     """
-    variable = ''
-    statement = eval_str
-    if '=' in eval_str:
-        variable, statement = eval_str.split('=', 1)
-    variable = variable.strip()
+    variable, code = compile_statement(eval_str)
+    if code is None:
+        return (variable, None)
     try:
-        result = eval(statement, functions, variables)
+        result = eval(code, functions, variables)
     except Exception as e:
-        logging.debug(
-            f'Failed to evaluate: {variable}={statement}, {e} in {variables}')
+        logging.debug(f'Failed to evaluate: {eval_str}, {e} in {variables}')
         result = None
     return (variable, result)
+
+
+def evaluate_statement_for_column(
+        eval_str: str,
+        values: list,
+        data_key: str = 'Data',
+        variables: dict = None,
+        functions: dict = EVAL_GLOBALS) -> (str, list):
+    """Evaluates a Python expression for each value in a column.
+
+    The statement is evaluated once for each unique value in the column with
+    the value set as the variable `data_key` and the results are mapped back
+    to all rows. This is equivalent to calling `evaluate_statement` for each
+    value, but faster for columns with repeated values such as dates.
+
+    Args:
+        eval_str: The string containing the expression to be evaluated, in the
+          format 'variable = statement' or just 'statement'.
+        values: list or pandas Series of values for the column.
+        data_key: name of the variable set to the column value.
+        variables: additional variables common to all rows.
+        functions: A dictionary of functions that are accessible within the
+          `eval()` context. Defaults to `EVAL_GLOBALS`.
+
+    Returns:
+        A tuple of the variable name and a list of results, one per value.
+        Results are None for values where the evaluation failed.
+
+    Examples:
+        >>> evaluate_statement_for_column('date=format_date(Data, "%Y-%m")',
+        ...     ['Jan 2022', 'Feb 2022', 'Jan 2022'])
+        ('date', ['2022-01', '2022-02', '2022-01'])
+    """
+    variable, code = compile_statement(eval_str)
+    if code is None:
+        return (variable, [None] * len(values))
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object),
+                                  use_na_sentinel=False)
+    eval_vars = dict(variables) if variables else {}
+    unique_results = []
+    for value in uniques:
+        eval_vars[data_key] = value
+        try:
+            unique_results.append(eval(code, functions, eval_vars))
+        except Exception as e:
+            logging.debug(f'Failed to evaluate: {eval_str}, {e} for {value}')
+            unique_results.append(None)
+    return (variable, [unique_results[code] for code in codes])
@@ -77,6 +77,48 @@ class TestEvaluateStatement(unittest.TestCase):
             ('val', None),
             eval_functions.evaluate_statement('val = "abc"[5]', {}))
 
+    def test_compile_statement_is_cached(self):
+        eval_functions.compile_statement.cache_clear()
+        variable, code = eval_functions.compile_statement('num=1+Number')
+        self.assertEqual('num', variable)
+        self.assertIs(code, eval_functions.compile_statement('num=1+Number')[1])
+        self.assertEqual(1, eval_functions.compile_statement.cache_info().hits)
+
+    def test_compile_statement_with_syntax_error(self):
+        self.assertEqual(('var', None),
+                         eval_functions.compile_statement('var=1+'))
+
+    def test_get_statement_variables(self):
+        self.assertEqual({'Data', 'format_date'},
+                         eval_functions.get_statement_variables(
+                             'date=format_date(Data, "%Y-%m")'))
+        self.assertEqual(
+            {'Data'},
+            eval_functions.get_statement_variables('name=Data.strip()'))
+        self.assertEqual(set(),
+                         eval_functions.get_statement_variables('var=1+'))
+
+
+class TestEvaluateStatementForColumn(unittest.TestCase):
+
+    def test_evaluate_statement_for_column(self):
+        self.assertEqual(
+            ('date', ['2022-01', '2022-02', '2022-01', '']),
+            eval_functions.evaluate_statement_for_column(
+                'date=format_date(Data, "%Y-%m")',
+                ['Jan 2022', 'Feb 2022', 'Jan 2022', 'Not A Date']))
+
+    def test_evaluate_statement_for_column_with_variables(self):
+        self.assertEqual(('num', [3, 4, None, 3]),
+                         eval_functions.evaluate_statement_for_column(
+                             'num=Offset+Data', [1, 2, 'x', 1],
+                             variables={'Offset': 2}))
+
+    def test_evaluate_statement_for_column_with_syntax_error(self):
+        self.assertEqual(
+            ('var', [None, None]),
+            eval_functions.evaluate_statement_for_column('var=1+', [1, 2]))
+
 
 class TestFormatDate(unittest.TestCase):
 
@@ -99,6 +141,16 @@ class TestFormatDate(unittest.TestCase):
         self.assertEqual('', eval_functions.format_date(''))
 
 
+class TestFormatDateColumn(unittest.TestCase):
+
+    def test_format_date_column(self):
+        self.assertEqual(['2023-01-31', '2022-01-31', '2023-01-31', ''],
+                         eval_functions.format_date_column([
+                             'Jan 31, 2023', '2022/01/31', 'Jan 31, 2023',
+                             'Not A Date'
+                         ]))
+
+
 class TestStrToCamelCase(unittest.TestCase):
 
     def test_str_to_camel_case_with_hyphens_and_spaces(self):
@@ -133,6 +185,14 @@ class TestStrToCamelCase(unittest.TestCase):
         self.assertEqual('AlreadyCamel',
                          eval_functions.str_to_camel_case('AlreadyCamel'))
 
+    def test_str_to_camel_case_column(self):
+        values = [
+            ' camel-case 123 ', '1.0 my DCID', 'snake(case.) string', '', 123,
+            '@#$%^&*', 'AlreadyCamel', 'Abc-def(HG)'
+        ]
+        self.assertEqual([eval_functions.str_to_camel_case(v) for v in values],
+                         eval_functions.str_to_camel_case_column(values))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -555,48 +555,13 @@ def load_mcf_nodes(
             num_nodes = len(file_nodes)
         else:
             # Load nodes from MCF file.
-            line_number = 0
-            with file_util.FileIO(file, 'r', errors='ignore') as input_f:
-                pvs = _get_new_node(normalize)
-                for line in input_f:
-                    line_number += 1
-                    # Strip leading trailing whitespaces
-                    line = re.sub(r'\s+$', '', re.sub(r'^\s+', '', line))
-                    if line and line[0] == '"' and line[-1] == '"':
-                        line = line[1:-1]
-                    if line == '""':
-                        # MCFs downloaded from sheets have "" for empty lines.
-                        line = ''
-                    if line.count('""') > 1:
-                        # MCFs from sheets have quotes escaped as '""<text>""'
-                        line = line.replace('""', '"')
-                    if line == '':
-                        if pvs:
-                            if not add_mcf_node(pvs, nodes, strip_namespaces,
-                                                append_values, normalize,
-                                                counters):
-                                logging.error(
-                                    f'Unable to add node from {file}:{line_number}: {pvs}'
-                                )
-                            else:
-                                num_nodes += 1
-                            pvs = _get_new_node(normalize)
-                    elif line[0] == '#':
-                        add_comment_to_node(line, pvs)
-                    else:
-                        prop, value = get_pv_from_line(line)
-                        if strip_namespaces:
-                            value = strip_namespace(value)
-                        add_pv_to_node(prop, value, pvs, append_values,
-                                       strip_namespace, normalize)
-                        num_props += 1
-                if pvs:
-                    if not add_mcf_node(pvs, nodes, strip_namespaces,
-                                        append_values, normalize, counters):
-
-                        logging.error(
-                            f'Unable to add node from {file}:{line_number}: {pvs}'
-                        )
+            for pvs in iterate_mcf_nodes(file, strip_namespaces, append_values,
+                                         normalize):
+                num_props += len(pvs)
+                if not add_mcf_node(pvs, nodes, strip_namespaces, append_values,
+                                    normalize, counters):
+                    logging.error(f'Unable to add node from {file}: {pvs}')
+                else:
                     num_nodes += 1
         logging.info(
             f'Loaded {num_nodes} nodes with {num_props} properties from file {file}'
@@ -605,6 +570,58 @@ def load_mcf_nodes(
     return nodes
 
 
+def iterate_mcf_nodes(
+    filename: str,
+    strip_namespaces: bool = False,
+    append_values: bool = True,
+    normalize: bool = True,
+):
+    """Yields nodes from an MCF file one at a time.
+
+  This allows large MCF files to be processed without loading all nodes into
+  memory. Nodes are returned in the order in the file and nodes with the same
+  dcid are not merged.
+
+  Args:
+    filename: MCF file to be read.
+    strip_namespace: if True, strips namespace from the value for node
+      properties.
+    append_values: if True, appends new values for repeated properties into a
+      comma separated list, else replaces existing value.
+    normalize: if True, values are normalized.
+
+  Yields:
+    dictionary of property:values for each node in the file.
+  """
+    with file_util.FileIO(filename, 'r', errors='ignore') as input_f:
+        pvs = _get_new_node(normalize)
+        for line in input_f:
+            # Strip leading trailing whitespaces
+            line = re.sub(r'\s+$', '', re.sub(r'^\s+', '', line))
+            if line and line[0] == '"' and line[-1] == '"':
+                line = line[1:-1]
+            if line == '""':
+                # MCFs downloaded from sheets have "" for empty lines.
+                line = ''
+            if line.count('""') > 1:
+                # MCFs from sheets have quotes escaped as '""<text>""'
+                line = line.replace('""', '"')
+            if line == '':
+                if pvs:
+                    yield pvs
+                    pvs = _get_new_node(normalize)
+            elif line[0] == '#':
+                add_comment_to_node(line, pvs)
+            else:
+                prop, value = get_pv_from_line(line)
+                if strip_namespaces:
+                    value = strip_namespace(value)
+                add_pv_to_node(prop, value, pvs, append_values, strip_namespace,
+                               normalize)
+        if pvs:
+            yield pvs
+
+
 def filter_mcf_nodes(
     nodes: dict,
     allow_dcids: list = None,
@@ -31,11 +31,20 @@ Example:
   # Returns a list of tuples with (key, <details>):
   # [(<key>, { 'value': <value>, 'info': {'score': 1.2, 'ngram_matches': 3} }),
   # ...]
+
+  # Save the index to a directory and load it later without rebuilding.
+  # The posting lists are memory mapped from numpy files.
+  matcher.save('/tmp/ngram_index')
+  matcher = NgramMatcher()
+  matcher.load('/tmp/ngram_index')
 """
 
+import json
+import os
 import unicodedata
 
 from absl import logging
+import numpy as np
 
 # Default configuration settings for NgramMatcher
 _DEFAULT_CONFIG = {
@@ -44,6 +53,9 @@ _DEFAULT_CONFIG = {
     'min_match_fraction': 0.8,
 }
 
+# Config parameters that the ngram index depends on.
+_INDEX_CONFIG_PARAMS = ['ngram_size', 'ignore_non_alphanum']
+
 
 class NgramMatcher:
 
@@ -54,9 +66,19 @@ class NgramMatcher:
         self._ngram_size = self._config.get('ngram_size', 4)
         # List of (key, value) tuples.
         self._key_values = list()
-        # Dictionary of ngram to set of string ids that contain the ngram.
-        # { '<ngram>': { (id1, pos1), (id2, pos2), ...}, ...}
-        self._ngram_dict = {}
+        # Dictionary of ngram to an id for the posting list of the ngram.
+        self._ngram_ids = {}
+        # Posting lists for all ngrams as numpy arrays.
+        # The postings for the ngram with id 'n' are at positions
+        # _posting_offsets[n] to _posting_offsets[n+1] in the arrays
+        # _posting_keys with the key index and _posting_pos with the
+        # position of the ngram in the key.
+        self._posting_offsets = np.zeros(1, dtype=np.int64)
+        self._posting_keys = np.zeros(0, dtype=np.int32)
+        self._posting_pos = np.zeros(0, dtype=np.int32)
+        # Postings added since the arrays were built as lists of
+        # ngram id, key index and position.
+        self._new_postings = ([], [], [])
 
     def get_tuples_count(self):
         return len(self._key_values)
@@ -84,7 +106,7 @@ class NgramMatcher:
 
     def get_ngrams_count(self) -> int:
         """Returns the number of ngrams in the index."""
-        return len(self._ngram_dict)
+        return len(self._ngram_ids)
 
     def lookup(
         self,
@@ -96,7 +118,10 @@ class NgramMatcher:
         """Lookup a key string.
 
     Returns an ordered list of (key, value) tuples matching the key.
+    Keys with the same score are ordered by length, longest first, and then
+    in the order they were added.
     """
+        self._build_index()
         normalized_key = self._normalize_string(key)
         ngrams = self._get_ngrams(normalized_key)
         logging.level_debug() and logging.log(
@@ -106,64 +131,150 @@ class NgramMatcher:
             # Use the match config passed in.
             lookup_config = dict(self._config)
             lookup_config.update(config)
-        # Get the matching key indices for all ngrams.
-        matches = dict()
+        # Get the postings for all ngrams in the key.
+        key_indices = []
+        ngram_scores = []
+        ngram_pos = []
         for ngram in ngrams:
-            ngram_matches = self._ngram_dict.get(ngram, {})
-            if ngram_matches:
-                # Use IDF score for each ngram
-                ngram_score = 1 / len(ngram_matches)
-                for key_index, ngram_pos in ngram_matches:
-                    # Collect matches and update score for each ngram
-                    if key_index not in matches:
-                        matches[key_index] = {
-                            'score': ngram_score,
-                            'ngram_matches': 1,
-                            'ngram_pos': ngram_pos,
-                        }
-                    else:
-                        key_match = matches[key_index]
-                        key_match['score'] = key_match['score'] + ngram_score
-                        key_match[
-                            'ngram_matches'] = key_match['ngram_matches'] + 1
-                        key_match['ngram_pos'] = min(key_match['ngram_pos'],
-                                                     ngram_pos)
-
-        logging.level_debug() and logging.log(2,
-                                              f'Matches for {key}: {matches}')
-        # Collect all key indices that matches with counts.
-        match_indices = list()
+            ngram_id = self._ngram_ids.get(ngram)
+            if ngram_id is None:
+                continue
+            start = self._posting_offsets[ngram_id]
+            end = self._posting_offsets[ngram_id + 1]
+            # Use IDF score for each ngram
+            ngram_scores.append(np.full(end - start, 1 / (end - start)))
+            key_indices.append(self._posting_keys[start:end])
+            ngram_pos.append(self._posting_pos[start:end])
+        if not key_indices:
+            return []
+
+        # Collect scores for each matching key index.
+        matches, match_index = np.unique(np.concatenate(key_indices),
+                                         return_inverse=True)
+        scores = np.bincount(match_index,
+                             weights=np.concatenate(ngram_scores),
+                             minlength=len(matches))
+        ngram_matches = np.bincount(match_index, minlength=len(matches))
+        min_pos = np.full(len(matches), np.iinfo(np.int32).max, dtype=np.int32)
+        np.minimum.at(min_pos, match_index, np.concatenate(ngram_pos))
+        logging.level_debug() and logging.log(
+            2, f'Matches for {key}: {matches}, scores: {scores}')
+
+        # Select key indices with enough ngram matches.
         min_matches = max(
             1,
             len(ngrams) * lookup_config.get('min_match_fraction', 0.8))
-        for key_index, result in matches.items():
-            if result['ngram_matches'] >= min_matches:
-                match_indices.append((key_index, result))
-
-        # Order key_index by decreasing number of matches.
-        key_len = len(normalized_key)
-        match_indices.sort(
-            key=lambda x: self._get_ngram_match_score(x[1], key_len),
-            reverse=True)
+        selected = np.flatnonzero(ngram_matches >= min_matches)
+        match_scores = self._get_ngram_match_scores(scores[selected],
+                                                    min_pos[selected],
+                                                    ngram_matches[selected],
+                                                    len(normalized_key))
+        if num_results and num_results < len(selected):
+            # Keep the top results and any ties with the last one.
+            min_score = np.partition(match_scores, -num_results)[-num_results]
+            top = match_scores >= min_score
+            selected = selected[top]
+            match_scores = match_scores[top]
+        # Order key_index by decreasing score and key length.
+        key_lengths = np.array(
+            [len(self._key_values[k][0]) for k in matches[selected]],
+            dtype=np.int64)
+        order = np.lexsort((matches[selected], -key_lengths, -match_scores))
+        if num_results:
+            order = order[:num_results]
         logging.level_debug() and logging.log(
-            2, f'Sorted matches for {key}: {match_indices}')
+            2, f'Sorted matches for {key}: {matches[selected[order]]}')
 
         # Collect results in sorted order
         results = list()
-        for match in match_indices:
-            result_key, result_value = self._key_values[match[0]]
+        for match in selected[order]:
+            result_key, result_value = self._key_values[matches[match]]
             if return_score:
                 results.append((result_key, {
                     'value': result_value,
-                    'info': match[1]
+                    'info': {
+                        'score': float(scores[match]),
+                        'ngram_matches': int(ngram_matches[match]),
+                        'ngram_pos': int(min_pos[match]),
+                    }
                 }))
             else:
                 results.append((result_key, result_value))
-            if num_results and len(results) >= num_results:
-                # There are enough results. Return these.
-                break
         return results
 
+    def save(self, dirname: str, source_id: str = ''):
+        """Saves the ngram index into files in the directory.
+
+    The posting lists are saved as numpy arrays that are memory mapped by
+    load(). The keys, values and ngrams are saved as JSON, so the values
+    should be JSON serializable.
+
+    Args:
+      dirname: directory to save the index files into.
+      source_id: identifier for the data the index is built from, such as a
+        hash, that is checked by load().
+    """
+        self._build_index()
+        os.makedirs(dirname, exist_ok=True)
+        np.save(os.path.join(dirname, 'posting_offsets.npy'),
+                self._posting_offsets)
+        np.save(os.path.join(dirname, 'posting_keys.npy'), self._posting_keys)
+        np.save(os.path.join(dirname, 'posting_pos.npy'), self._posting_pos)
+        with open(os.path.join(dirname, 'ngram_index.json'), 'w') as file:
+            json.dump(
+                {
+                    'config': {
+                        p: self._config.get(p) for p in _INDEX_CONFIG_PARAMS
+                    },
+                    'source_id': source_id,
+                    'key_values': self._key_values,
+                    'ngrams': list(self._ngram_ids.keys()),
+                }, file)
+        logging.info(f'Saved {len(self._key_values)} keys with'
+                     f' {len(self._ngram_ids)} ngrams into {dirname}')
+
+    def load(self, dirname: str, source_id: str = None) -> bool:
+        """Loads the ngram index saved in the directory by save().
+
+    Any keys added earlier are replaced. The config settings used to build
+    the index, such as the ngram_size, are also loaded.
+
+    Args:
+      dirname: directory with the index files.
+      source_id: if set, the index is loaded only if it was saved with the
+        same source_id.
+
+    Returns:
+      True if the index was loaded.
+    """
+        with open(os.path.join(dirname, 'ngram_index.json')) as file:
+            index = json.load(file)
+        if source_id is not None and index.get('source_id') != source_id:
+            logging.info(f'Ignoring ngram index {dirname} for source'
+                         f' {index.get("source_id")} instead of {source_id}')
+            return False
+        for param, value in index.get('config', {}).items():
+            if self._config.get(param) != value:
+                logging.warning(
+                    f'Using {param}={value} from ngram index {dirname}')
+                self._config[param] = value
+        self._ngram_size = self._config.get('ngram_size', 4)
+        self._key_values = [tuple(kv) for kv in index['key_values']]
+        self._ngram_ids = {
+            ngram: ngram_id for ngram_id, ngram in enumerate(index['ngrams'])
+        }
+        self._posting_offsets = np.load(os.path.join(dirname,
+                                                     'posting_offsets.npy'),
+                                        mmap_mode='r')
+        self._posting_keys = np.load(os.path.join(dirname, 'posting_keys.npy'),
+                                     mmap_mode='r')
+        self._posting_pos = np.load(os.path.join(dirname, 'posting_pos.npy'),
+                                    mmap_mode='r')
+        self._new_postings = ([], [], [])
+        logging.info(f'Loaded {len(self._key_values)} keys with'
+                     f' {len(self._ngram_ids)} ngrams from {dirname}')
+        return True
+
     def _get_ngrams(self, key: str) -> list:
         """Returns a list of ngrams for the key."""
         normalized_key = self._normalize_string(key)
@@ -180,29 +291,57 @@ class NgramMatcher:
         # Remove extra characters and convert to lower case.
         normalized_key = self._normalize_string(key)
         # index by all unique ngrams in the key
-        ngrams = self._get_ngrams(normalized_key)
+        ngrams = dict.fromkeys(self._get_ngrams(normalized_key))
+        ngram_ids, key_indices, ngram_pos = self._new_postings
         for ngram in ngrams:
-            if ngram not in self._ngram_dict:
-                self._ngram_dict[ngram] = set()
-            ngram_pos = normalized_key.find(ngram)
-            self._ngram_dict[ngram].add((key_index, ngram_pos))
+            ngram_id = self._ngram_ids.get(ngram)
+            if ngram_id is None:
+                ngram_id = len(self._ngram_ids)
+                self._ngram_ids[ngram] = ngram_id
+            ngram_ids.append(ngram_id)
+            key_indices.append(key_index)
+            ngram_pos.append(normalized_key.find(ngram))
             logging.level_debug() and logging.log(
                 3, f'Added ngram "{ngram}" for {key}:{key_index}')
 
+    def _build_index(self):
+        """Merges any new postings into the posting list arrays."""
+        new_ngram_ids, new_key_indices, new_ngram_pos = self._new_postings
+        if not new_ngram_ids:
+            return
+        # Get the ngram id for each existing posting.
+        num_postings = np.diff(self._posting_offsets)
+        ngram_ids = np.concatenate([
+            np.repeat(np.arange(len(num_postings)), num_postings),
+            np.array(new_ngram_ids, dtype=np.int64)
+        ])
+        # Sort postings by ngram id retaining the order of keys.
+        order = np.argsort(ngram_ids, kind='stable')
+        self._posting_keys = np.concatenate(
+            [self._posting_keys,
+             np.array(new_key_indices, dtype=np.int32)])[order]
+        self._posting_pos = np.concatenate(
+            [self._posting_pos,
+             np.array(new_ngram_pos, dtype=np.int32)])[order]
+        self._posting_offsets = np.zeros(len(self._ngram_ids) + 1,
+                                         dtype=np.int64)
+        np.cumsum(np.bincount(ngram_ids, minlength=len(self._ngram_ids)),
+                  out=self._posting_offsets[1:])
+        self._new_postings = ([], [], [])
+
     def _normalize_string(self, key: str) -> str:
         """Returns a normalized string removing special characters"""
         return normalized_string(key,
                                  self._config.get('ignore_non_alphanum', True))
 
-    def _get_ngram_match_score(self, match: dict, key_len: int) -> float:
-        """Returns a score for the ngram match components."""
+    def _get_ngram_match_scores(self, scores: np.ndarray, ngram_pos: np.ndarray,
+                                ngram_matches: np.ndarray,
+                                key_len: int) -> np.ndarray:
+        """Returns an array of scores for the ngram match components."""
         # IDF score
-        score = match['score']
         # Boost for match at the beginning of the key.
-        score += (key_len - match['ngram_pos']) * 10000
         # DF score
-        score += match['ngram_matches'] * 100
-        return score
+        return scores + (key_len - ngram_pos) * 10000 + ngram_matches * 100
 
 
 def normalized_string(key: str, ignore_non_alnum: bool = True) -> str:
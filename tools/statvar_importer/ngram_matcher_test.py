@@ -13,6 +13,8 @@
 # limitations under the License.
 """Unit tests for NgramMatcher."""
 
+import os
+import tempfile
 import unittest
 
 from absl import app
@@ -36,6 +38,62 @@ class NgramMatcherTest(unittest.TestCase):
             matcher.lookup('Tester', config={'min_match_fraction': 0.1}))
         self.assertFalse(matcher.lookup('ABCDEF'))
 
+    def test_lookup_top_results(self):
+        matcher = ngram_matcher.NgramMatcher(config={'ngram_size': 4})
+        matcher.add_keys_values({
+            'San Jose California': 'dcid:geoId/0668000',
+            'San Jose Costa Rica': 'dcid:wikidataId/Q647808',
+            'California': 'dcid:geoId/06',
+        })
+        self.assertEqual([('San Jose California', 'dcid:geoId/0668000')],
+                         matcher.lookup('San Jose California', 1))
+        results = matcher.lookup('California', 2, return_score=True)
+        # Match at the start of the key is ranked higher.
+        self.assertEqual(['California', 'San Jose California'],
+                         [key for key, _ in results])
+        self.assertEqual(
+            {
+                'value': 'dcid:geoId/0668000',
+                'info': {
+                    'score': 4.0,
+                    'ngram_matches': 8,
+                    'ngram_pos': 9
+                }
+            }, results[1][1])
+
+        # Keys added after a lookup are merged into the index.
+        matcher.add_key_value('Costa Rica', 'dcid:country/CRI')
+        self.assertEqual(('Costa Rica', 'dcid:country/CRI'),
+                         matcher.lookup('Costa Rica', 1)[0])
+
+    def test_save_load(self):
+        matcher = ngram_matcher.NgramMatcher(config={'ngram_size': 3})
+        matcher.add_key_value('Test Key 1', 1)
+        matcher.add_key_value('TESTKey Two', 'two')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = os.path.join(tmp_dir, 'index')
+            matcher.save(index_dir)
+            loaded_matcher = ngram_matcher.NgramMatcher()
+            loaded_matcher.load(index_dir)
+            self.assertEqual(matcher.get_ngrams_count(),
+                             loaded_matcher.get_ngrams_count())
+            self.assertEqual(matcher.lookup('Key Two'),
+                             loaded_matcher.lookup('Key Two'))
+            loaded_matcher.add_key_value('Key 3', 3)
+            self.assertEqual([('Key 3', 3)], loaded_matcher.lookup('Key 3', 1))
+
+    def test_load_source_id(self):
+        matcher = ngram_matcher.NgramMatcher()
+        matcher.add_key_value('Test Key 1', 1)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            matcher.save(tmp_dir, source_id='v1')
+            loaded_matcher = ngram_matcher.NgramMatcher()
+            self.assertFalse(loaded_matcher.load(tmp_dir, source_id='v2'))
+            self.assertEqual(0, loaded_matcher.get_ngrams_count())
+            self.assertTrue(loaded_matcher.load(tmp_dir, source_id='v1'))
+            self.assertEqual(matcher.get_ngrams_count(),
+                             loaded_matcher.get_ngrams_count())
+
 
 if __name__ == '__main__':
     app.run()
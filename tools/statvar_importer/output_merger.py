@@ -0,0 +1,501 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Utilities to merge sharded outputs of the StatVar processor.
+
+When input data is processed in parallel, each shard generates its own
+StatVar MCF, SVObs CSV and tMCF. These are merged into a single output
+with bounded memory:
+  - StatVar MCF files are merged with a k-way merge of nodes sorted by dcid.
+    Nodes with the same dcid across shards are merged into a single node.
+  - SVObs CSV files are either concatenated or sorted by the SVObs key
+    (place, date, statvar and other PVs except value) and merged.
+    Duplicate SVObs across shards are dropped or aggregated.
+    SVObs are sorted in runs of a fixed size spilled to disk.
+  - A common tMCF is generated for the columns across all shard CSVs.
+
+Memory used is proportional to the number of shards and the size of a run,
+not the total size of the output.
+"""
+
+import csv
+import heapq
+import itertools
+import os
+import sys
+import tempfile
+from typing import Callable
+
+from absl import logging
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(_SCRIPT_DIR)
+sys.path.append(os.path.dirname(_SCRIPT_DIR))
+sys.path.append(os.path.dirname(os.path.dirname(_SCRIPT_DIR)))
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(_SCRIPT_DIR)), 'util'))
+
+import file_util
+import property_value_utils as pv_utils
+
+from counters import Counters
+from mcf_file_util import (add_mcf_node, get_node_dcid, get_pv_from_line,
+                           iterate_mcf_nodes, load_mcf_nodes, node_dict_to_text,
+                           normalize_mcf_node, strip_namespace, write_mcf_nodes)
+
+# CSV options used by the StatVarProcessor for SVObs CSV files.
+_SVOBS_CSV_OPTIONS = {
+    'doublequote': False,
+    'escapechar': '\\',
+    'lineterminator': '\n',
+}
+
+# Internal column with the SVObs key in sorted runs.
+_SVOBS_KEY_COLUMN = '#SVObsKey'
+
+# PVs for StatVarObs ignored when looking for dups
+_IGNORE_SVOBS_KEY_PVS = {'value', 'measurementResult'}
+
+# Default number of SVObs sorted in memory into a run.
+_DEFAULT_RUN_SIZE = 100000
+
+# Aggregations that can be merged across shards.
+# Aggregation 'mean' needs the count of SVObs per shard that is not in the
+# shard outputs.
+_MERGE_AGGREGATIONS = {'sum', 'min', 'max', 'list', 'first', 'last'}
+
+
+def is_mcf_file_sorted(filename: str) -> bool:
+    """Returns True if nodes in the MCF file are sorted by dcid."""
+    prev_dcid = ''
+    for node in iterate_mcf_nodes(filename, normalize=False):
+        dcid = get_node_dcid(node)
+        if not dcid:
+            continue
+        if dcid < prev_dcid:
+            return False
+        prev_dcid = dcid
+    return True
+
+
+def _get_sorted_mcf_file(filename: str, tmp_dir: str) -> str:
+    """Returns an MCF file with nodes sorted by dcid.
+
+  If the file is not sorted, nodes are loaded and written out sorted into a
+  file in tmp_dir.
+  """
+    if is_mcf_file_sorted(filename):
+        return filename
+    logging.info(f'Sorting MCF nodes in {filename} for merge.')
+    sorted_file = os.path.join(tmp_dir, os.path.basename(filename))
+    write_mcf_nodes(load_mcf_nodes(filename), sorted_file, sort=True)
+    return sorted_file
+
+
+def _iterate_mcf_nodes_with_dcid(filename: str):
+    """Yields tuples of (dcid, node) for nodes with a dcid in the file."""
+    for node in iterate_mcf_nodes(filename):
+        dcid = get_node_dcid(node)
+        if dcid:
+            yield (dcid, node)
+
+
+def merge_mcf_files(
+    mcf_files: list,
+    output_mcf: str,
+    header: str = None,
+    counters: Counters = None,
+) -> int:
+    """Merge nodes from multiple MCF files into a single MCF file.
+
+  Nodes with the same dcid across files are merged into one node.
+  Each input is expected to be sorted by dcid, as generated by
+  write_mcf_nodes(sort=True). Unsorted inputs are sorted before merging.
+  Only the nodes for a single dcid are held in memory at a time.
+
+  Args:
+    mcf_files: list of MCF files to be merged.
+    output_mcf: output MCF file with the merged nodes.
+    header: string written as a comment at the begining of the file.
+    counters: Counters to be updated.
+
+  Returns:
+    number of nodes written into the output_mcf.
+  """
+    if counters is None:
+        counters = Counters()
+    num_nodes = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sorted_files = [
+            _get_sorted_mcf_file(file, tmp_dir) for file in mcf_files
+        ]
+        node_iterators = [
+            _iterate_mcf_nodes_with_dcid(file) for file in sorted_files
+        ]
+        with file_util.FileIO(output_mcf, 'w') as output_f:
+            if header is not None:
+                output_f.write(header)
+                output_f.write('\n')
+            merged_nodes = heapq.merge(*node_iterators, key=lambda x: x[0])
+            for dcid, dcid_nodes in itertools.groupby(merged_nodes,
+                                                      key=lambda x: x[0]):
+                nodes = {}
+                for _, node in dcid_nodes:
+                    counters.add_counter('merge-mcf-input-nodes', 1)
+                    add_mcf_node(node, nodes, counters=counters)
+                for node in nodes.values():
+                    pvs = node_dict_to_text(normalize_mcf_node(node))
+                    if pvs:
+                        output_f.write(pvs)
+                        output_f.write('\n\n')
+                        num_nodes += 1
+    counters.add_counter('merge-mcf-output-nodes', num_nodes)
+    logging.info(f'Merged {num_nodes} MCF nodes from {len(mcf_files)} files'
+                 f' into {output_mcf}')
+    return num_nodes
+
+
+def load_tmcf_constant_pvs(tmcf_file: str) -> dict:
+    """Returns the property:values in a tMCF that are not mapped to columns."""
+    pvs = {}
+    if not tmcf_file or not file_util.file_get_matching(tmcf_file):
+        return pvs
+    with file_util.FileIO(tmcf_file, 'r') as tmcf:
+        for line in tmcf:
+            line = line.strip()
+            if not line or line[0] == '#':
+                continue
+            prop, value = get_pv_from_line(line)
+            if prop and prop != 'Node' and not value.startswith('C:'):
+                pvs[prop] = value
+    return pvs
+
+
+def _get_csv_columns(csv_file: str) -> list:
+    """Returns the list of columns in the header of a CSV file."""
+    with file_util.FileIO(csv_file, 'r', newline='') as csv_f:
+        reader = csv.reader(csv_f, **_SVOBS_CSV_OPTIONS)
+        return next(reader, [])
+
+
+def get_merged_svobs_columns(csv_files: list,
+                             tmcf_files: list,
+                             default_columns: list = None) -> (list, dict):
+    """Returns the columns and constant PVs for merged SVObs CSV files.
+
+  Properties that are columns in any of the CSV files or that have
+  different constant values across shards are returned as columns.
+  Properties with the same value across all shards are returned as constant
+  PVs.
+
+  Args:
+    csv_files: list of SVObs CSV files.
+    tmcf_files: list of tMCF files, one per csv_file.
+    default_columns: list of columns in the order they should be output.
+
+  Returns:
+    tuple of (list of columns, dict of constant property:values)
+  """
+    columns = {}
+    constant_pvs = None
+    for csv_file, tmcf_file in zip(csv_files, tmcf_files):
+        for col in _get_csv_columns(csv_file):
+            columns[col] = True
+        shard_pvs = load_tmcf_constant_pvs(tmcf_file)
+        if constant_pvs is None:
+            constant_pvs = dict(shard_pvs)
+            continue
+        for prop in list(constant_pvs.keys()):
+            if shard_pvs.get(prop) != constant_pvs[prop]:
+                # Constant values differ across shards.
+                constant_pvs.pop(prop)
+                columns[prop] = True
+        for prop in shard_pvs.keys():
+            if prop not in constant_pvs:
+                columns[prop] = True
+    if constant_pvs is None:
+        constant_pvs = {}
+    for prop in list(constant_pvs.keys()):
+        if prop in columns:
+            constant_pvs.pop(prop)
+    # Order columns with defaults first.
+    output_columns = []
+    if default_columns:
+        output_columns = [col for col in default_columns if col in columns]
+    for col in columns:
+        if col not in output_columns and col not in constant_pvs:
+            output_columns.append(col)
+    return output_columns, constant_pvs
+
+
+def _iterate_svobs(csv_file: str, tmcf_file: str, columns: list):
+    """Yields dict of SVObs property:values in the CSV file.
+
+  Constant PVs from the tMCF that are output as columns are added to each
+  SVObs.
+  """
+    tmcf_pvs = {
+        p: v
+        for p, v in load_tmcf_constant_pvs(tmcf_file).items()
+        if p in columns
+    }
+    with file_util.FileIO(csv_file, 'r', newline='') as csv_f:
+        reader = csv.DictReader(csv_f, **_SVOBS_CSV_OPTIONS)
+        for row in reader:
+            svobs = dict(tmcf_pvs)
+            svobs.update(row)
+            yield svobs
+
+
+def get_svobs_key(svobs: dict, ignore_aggregate_mmethod: bool = False) -> str:
+    """Returns the key for SVObs concatenating all PVs, except value.
+
+  Args:
+    svobs: dictionary of SVObs property:values.
+    ignore_aggregate_mmethod: if True, the measurementMethod set by
+      aggregation, such as 'dcAggregate/<mmethod>' is replaced with the
+      original measurementMethod so that SVObs aggregated within a shard
+      match SVObs from other shards.
+  """
+    pvs = svobs
+    if ignore_aggregate_mmethod and 'measurementMethod' in svobs:
+        pvs = dict(svobs)
+        pvs['measurementMethod'] = _get_unaggregated_mmethod(
+            svobs['measurementMethod'])
+    return ';'.join([
+        f'{p}={pvs[p]}' for p in sorted(pvs.keys())
+        if p not in _IGNORE_SVOBS_KEY_PVS and p != _SVOBS_KEY_COLUMN and
+        pv_utils.is_valid_property(p, True) and pv_utils.is_valid_value(pvs[p])
+    ])
+
+
+def _get_unaggregated_mmethod(mmethod: str) -> str:
+    """Returns the measurementMethod before aggregation."""
+    mmethod = strip_namespace(mmethod)
+    if mmethod == 'DataCommonsAggregate':
+        return ''
+    if mmethod.startswith('dcAggregate/'):
+        mmethod = mmethod[len('dcAggregate/'):]
+    if mmethod:
+        return f'dcs:{mmethod}'
+    return ''
+
+
+def _write_sorted_run(svobs_list: list, columns: list, filename: str):
+    """Write SVObs sorted by key into a CSV file."""
+    svobs_list.sort(key=lambda svobs: svobs[_SVOBS_KEY_COLUMN])
+    with open(filename, 'w', newline='') as run_f:
+        writer = csv.DictWriter(run_f,
+                                fieldnames=[_SVOBS_KEY_COLUMN] + columns,
+                                extrasaction='ignore',
+                                **_SVOBS_CSV_OPTIONS)
+        writer.writeheader()
+        writer.writerows(svobs_list)
+
+
+def _iterate_run(filename: str):
+    """Yields SVObs dicts from a sorted run."""
+    with open(filename, 'r', newline='') as run_f:
+        for row in csv.DictReader(run_f, **_SVOBS_CSV_OPTIONS):
+            yield row
+
+
+def _merge_runs(runs: list,
+                columns: list,
+                tmp_dir: str,
+                max_open_files: int = 64) -> list:
+    """Merge sorted runs until there are at most max_open_files runs."""
+    max_open_files = max(max_open_files, 2)
+    while len(runs) > max_open_files:
+        merged_runs = []
+        for index in range(0, len(runs), max_open_files):
+            batch = runs[index:index + max_open_files]
+            if len(batch) == 1:
+                merged_runs.append(batch[0])
+                continue
+            merged_file = os.path.join(tmp_dir, f'run-{len(runs)}-{index}.csv')
+            with open(merged_file, 'w', newline='') as run_f:
+                writer = csv.DictWriter(run_f,
+                                        fieldnames=[_SVOBS_KEY_COLUMN] +
+                                        columns,
+                                        extrasaction='ignore',
+                                        **_SVOBS_CSV_OPTIONS)
+                writer.writeheader()
+                writer.writerows(
+                    heapq.merge(*[_iterate_run(run) for run in batch],
+                                key=lambda x: x[_SVOBS_KEY_COLUMN]))
+            for run in batch:
+                os.remove(run)
+            merged_runs.append(merged_file)
+        runs = merged_runs
+    return runs
+
+
+def merge_svobs_csv_files(
+    csv_files: list,
+    tmcf_files: list,
+    output_csv: str,
+    output_tmcf: str = '',
+    config: dict = None,
+    counters: Counters = None,
+    aggregate_func: Callable = None,
+    format_func: Callable = None,
+    max_open_files: int = 64,
+    run_size: int = 0,
+) -> int:
+    """Merge SVObs CSV files from shards into a single CSV file and tMCF.
+
+  SVObs are merged in one of the following modes set by the config
+  'merge_svobs_csv':
+    concat: CSV files are concatenated in order.
+    sort: SVObs are sorted by key and duplicate SVObs are merged.
+      If 'aggregate_duplicate_svobs' is set in the config, duplicate SVObs
+      are aggregated with aggregate_func. Else duplicates with the same value
+      are dropped and duplicates with different values are counted as errors
+      with the first SVObs retained.
+      Aggregation 'mean' is not supported as the shards don't have the
+      number of SVObs in each mean.
+  SVObs are sorted in memory into runs of run_size on disk that are merged.
+
+  Args:
+    csv_files: list of SVObs CSV files to be merged.
+    tmcf_files: list of tMCF files, one for each CSV file.
+    output_csv: output CSV file with merged SVObs.
+    output_tmcf: output tMCF file for the merged CSV.
+    config: dictionary of config parameters.
+    counters: Counters to be updated.
+    aggregate_func: function to aggregate duplicate SVObs with the signature:
+      aggregate_func(aggregation_type, current_pvs, new_pvs, property) that
+      updates current_pvs. See StatVarsMap.aggregate_value().
+    format_func: function that returns formatted SVObs after aggregation.
+    max_open_files: maximum number of runs to be merged at a time.
+    run_size: number of SVObs sorted in memory into a run.
+      Defaults to the config 'merge_svobs_run_size'.
+
+  Returns:
+    number of SVObs written into output_csv.
+  """
+    if config is None:
+        config = {}
+    if counters is None:
+        counters = Counters()
+    if tmcf_files is None:
+        tmcf_files = [''] * len(csv_files)
+    columns, constant_pvs = get_merged_svobs_columns(
+        csv_files, tmcf_files, list(config.get('default_svobs_pvs', {}).keys()))
+    merge_mode = config.get('merge_svobs_csv', 'sort')
+    aggregation = config.get('aggregate_duplicate_svobs', None)
+    if aggregation and merge_mode != 'concat' and str(
+            aggregation).lower() not in _MERGE_AGGREGATIONS:
+        logging.error(f'Unsupported aggregation {aggregation} for merging'
+                      f' SVObs across shards. Duplicates are not aggregated.')
+        counters.add_counter(
+            f'error-merge-unsupported-aggregation-{aggregation}', 1)
+        aggregation = None
+    if not run_size:
+        run_size = config.get('merge_svobs_run_size', _DEFAULT_RUN_SIZE)
+    run_size = max(1, run_size)
+    if aggregation and merge_mode != 'concat':
+        # Aggregated SVObs have a different measurementMethod.
+        if 'measurementMethod' not in columns:
+            columns.append('measurementMethod')
+        constant_pvs.pop('measurementMethod', None)
+    logging.info(f'Merging {len(csv_files)} SVObs CSV files with mode:'
+                 f' {merge_mode} into {output_csv} with columns: {columns}')
+    num_svobs = 0
+    with tempfile.TemporaryDirectory() as tmp_dir, file_util.FileIO(
+            output_csv, 'w', newline='') as output_f:
+        writer = csv.DictWriter(output_f,
+                                fieldnames=columns,
+                                extrasaction='ignore',
+                                **_SVOBS_CSV_OPTIONS)
+        writer.writeheader()
+        if merge_mode == 'concat':
+            for csv_file, tmcf_file in zip(csv_files, tmcf_files):
+                for svobs in _iterate_svobs(csv_file, tmcf_file, columns):
+                    writer.writerow(svobs)
+                    num_svobs += 1
+        else:
+            # Sort SVObs into runs in the order of the shards.
+            # The sort is stable so that duplicates are merged in order.
+            runs = []
+            svobs_list = []
+            for csv_file, tmcf_file in zip(csv_files, tmcf_files):
+                for svobs in _iterate_svobs(csv_file, tmcf_file, columns):
+                    svobs[_SVOBS_KEY_COLUMN] = get_svobs_key(
+                        svobs, ignore_aggregate_mmethod=bool(aggregation))
+                    svobs_list.append(svobs)
+                    counters.add_counter('merge-svobs-input-rows', 1)
+                    if len(svobs_list) >= run_size:
+                        run_file = os.path.join(tmp_dir, f'run-{len(runs)}.csv')
+                        _write_sorted_run(svobs_list, columns, run_file)
+                        runs.append(run_file)
+                        svobs_list = []
+            if svobs_list or not runs:
+                run_file = os.path.join(tmp_dir, f'run-{len(runs)}.csv')
+                _write_sorted_run(svobs_list, columns, run_file)
+                runs.append(run_file)
+                svobs_list = []
+            counters.add_counter('merge-svobs-runs', len(runs))
+            runs = _merge_runs(runs, columns, tmp_dir, max_open_files)
+            merged_svobs = heapq.merge(*[_iterate_run(run) for run in runs],
+                                       key=lambda x: x[_SVOBS_KEY_COLUMN])
+            for key, dup_svobs in itertools.groupby(
+                    merged_svobs, key=lambda x: x[_SVOBS_KEY_COLUMN]):
+                svobs = next(dup_svobs)
+                is_aggregated = False
+                for dup in dup_svobs:
+                    counters.add_counter('merge-svobs-duplicates', 1)
+                    if aggregation and aggregate_func:
+                        if aggregate_func(aggregation, svobs, dup, 'value'):
+                            is_aggregated = True
+                    elif dup.get('value') != svobs.get('value'):
+                        logging.error(
+                            f'Duplicate SVObs with mismatched values in merge:'
+                            f' {svobs} != {dup}')
+                        counters.add_counter('error-merge-mismatched-svobs', 1,
+                                             svobs.get('variableMeasured'))
+                if is_aggregated and format_func:
+                    svobs = format_func(svobs)
+                writer.writerow(svobs)
+                num_svobs += 1
+    counters.add_counter('merge-svobs-output-rows', num_svobs)
+    logging.info(f'Merged {num_svobs} SVObs from {len(csv_files)} files into'
+                 f' {output_csv}')
+
+    if output_tmcf:
+        write_svobs_tmcf(output_tmcf, columns, constant_pvs,
+                         _get_dataset_name(output_csv))
+    return num_svobs
+
+
+def _get_dataset_name(filename: str) -> str:
+    """Returns the dataset name for the tMCF from the CSV filename."""
+    if file_util.file_is_local(filename):
+        dataset, ext = os.path.splitext(filename)
+        return os.path.basename(dataset)
+    return 'Data'
+
+
+def write_svobs_tmcf(filename: str, columns: list, constant_pvs: dict,
+                     dataset_name: str):
+    """Write a tMCF for SVObs with the columns and constant PVs."""
+    tmcf = [f'Node: E:{dataset_name}->E0']
+    for col in columns:
+        if pv_utils.is_valid_property(col, True):
+            tmcf.append(f'{col}: C:{dataset_name}->{col}')
+    for prop, value in constant_pvs.items():
+        tmcf.append(f'{prop}: {value}')
+    with file_util.FileIO(filename, 'w', newline='') as tmcf_f:
+        tmcf_f.write('\n'.join(tmcf) + '\n')
+    logging.info(f'Generated TMCF {filename}')
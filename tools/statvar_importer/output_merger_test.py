@@ -0,0 +1,235 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for output_merger.py."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+from absl import app
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(_SCRIPT_DIR)
+sys.path.append(os.path.dirname(_SCRIPT_DIR))
+sys.path.append(os.path.dirname(os.path.dirname(_SCRIPT_DIR)))
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(_SCRIPT_DIR)), 'util'))
+
+from counters import Counters
+from mcf_file_util import load_mcf_nodes
+import output_merger
+
+
+def _write_file(filename: str, content: str) -> str:
+    with open(filename, 'w') as file:
+        file.write(content)
+    return filename
+
+
+def _sum_values(aggregation: str, current_pvs: dict, new_pvs: dict,
+                prop: str) -> bool:
+    current_pvs[prop] = int(current_pvs[prop]) + int(new_pvs[prop])
+    return True
+
+
+class OutputMergerTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_dir = self._tmp_dir.name
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_merge_mcf_files(self):
+        mcf1 = _write_file(
+            os.path.join(self.tmp_dir, 'shard1.mcf'), '# header\n\n'
+            'Node: dcid:Count_Person\ntypeOf: dcs:StatisticalVariable\n'
+            'populationType: dcs:Person\nname: "Person count"\n\n'
+            'Node: dcid:Count_Person_Male\ntypeOf: dcs:StatisticalVariable\n'
+            'populationType: dcs:Person\ngender: dcs:Male\n\n')
+        # Unsorted shard with a node that overlaps shard1.
+        mcf2 = _write_file(
+            os.path.join(self.tmp_dir, 'shard2.mcf'),
+            'Node: dcid:Count_Person_Female\ntypeOf: dcs:StatisticalVariable\n'
+            'populationType: dcs:Person\ngender: dcs:Female\n\n'
+            'Node: dcid:Count_Person\ntypeOf: dcs:StatisticalVariable\n'
+            'populationType: dcs:Person\ndescription: "Number of persons"\n\n')
+        self.assertTrue(output_merger.is_mcf_file_sorted(mcf1))
+        self.assertFalse(output_merger.is_mcf_file_sorted(mcf2))
+        output_mcf = os.path.join(self.tmp_dir, 'output.mcf')
+        counters = Counters()
+        self.assertEqual(
+            3,
+            output_merger.merge_mcf_files([mcf1, mcf2],
+                                          output_mcf,
+                                          counters=counters))
+        self.assertEqual(4, counters.get_counter('merge-mcf-input-nodes'))
+        nodes = load_mcf_nodes(output_mcf)
+        self.assertEqual([
+            'dcid:Count_Person', 'dcid:Count_Person_Female',
+            'dcid:Count_Person_Male'
+        ], list(nodes.keys()))
+        self.assertEqual('"Person count"', nodes['dcid:Count_Person']['name'])
+        self.assertEqual('"Number of persons"',
+                         nodes['dcid:Count_Person']['description'])
+
+    def _write_svobs_shards(self) -> (list, list):
+        csv1 = _write_file(
+            os.path.join(self.tmp_dir, 'shard1.csv'),
+            'observationDate,observationAbout,value\n'
+            '2020,dcid:geoId/06,10\n'
+            '2021,dcid:geoId/06,11\n')
+        tmcf1 = _write_file(
+            os.path.join(self.tmp_dir, 'shard1.tmcf'), 'Node: E:shard1->E0\n'
+            'observationDate: C:shard1->observationDate\n'
+            'observationAbout: C:shard1->observationAbout\n'
+            'value: C:shard1->value\n'
+            'variableMeasured: dcid:Count_Person\n'
+            'typeOf: dcs:StatVarObservation\n')
+        csv2 = _write_file(
+            os.path.join(self.tmp_dir, 'shard2.csv'),
+            'observationAbout,variableMeasured,value\n'
+            'dcid:geoId/06,dcid:Count_Person,5\n'
+            'dcid:geoId/07,dcid:Count_Person_Male,\\"12\\"\n')
+        tmcf2 = _write_file(
+            os.path.join(self.tmp_dir, 'shard2.tmcf'), 'Node: E:shard2->E0\n'
+            'observationAbout: C:shard2->observationAbout\n'
+            'variableMeasured: C:shard2->variableMeasured\n'
+            'value: C:shard2->value\n'
+            'observationDate: 2021\n'
+            'typeOf: dcs:StatVarObservation\n')
+        return [csv1, csv2], [tmcf1, tmcf2]
+
+    def test_get_merged_svobs_columns(self):
+        csv_files, tmcf_files = self._write_svobs_shards()
+        columns, constant_pvs = output_merger.get_merged_svobs_columns(
+            csv_files, tmcf_files, ['observationAbout', 'observationDate'])
+        self.assertEqual([
+            'observationAbout', 'observationDate', 'value', 'variableMeasured'
+        ], columns)
+        self.assertEqual({'typeOf': 'dcs:StatVarObservation'}, constant_pvs)
+
+    def test_merge_svobs_sort(self):
+        csv_files, tmcf_files = self._write_svobs_shards()
+        output_csv = os.path.join(self.tmp_dir, 'output.csv')
+        output_tmcf = os.path.join(self.tmp_dir, 'output.tmcf')
+        counters = Counters()
+        self.assertEqual(
+            3,
+            output_merger.merge_svobs_csv_files(csv_files,
+                                                tmcf_files,
+                                                output_csv,
+                                                output_tmcf,
+                                                config={},
+                                                counters=counters,
+                                                max_open_files=2,
+                                                run_size=1))
+        self.assertEqual(4, counters.get_counter('merge-svobs-runs'))
+        self.assertEqual(1, counters.get_counter('merge-svobs-duplicates'))
+        self.assertEqual(1,
+                         counters.get_counter('error-merge-mismatched-svobs'))
+        with open(output_csv) as csv_file:
+            self.assertEqual(
+                'observationDate,observationAbout,value,variableMeasured\n'
+                '2020,dcid:geoId/06,10,dcid:Count_Person\n'
+                '2021,dcid:geoId/06,11,dcid:Count_Person\n'
+                '2021,dcid:geoId/07,\\"12\\",dcid:Count_Person_Male\n',
+                csv_file.read())
+        with open(output_tmcf) as tmcf_file:
+            self.assertEqual(
+                'Node: E:output->E0\n'
+                'observationDate: C:output->observationDate\n'
+                'observationAbout: C:output->observationAbout\n'
+                'value: C:output->value\n'
+                'variableMeasured: C:output->variableMeasured\n'
+                'typeOf: dcs:StatVarObservation\n', tmcf_file.read())
+
+    def test_merge_svobs_aggregate(self):
+        csv_files, tmcf_files = self._write_svobs_shards()
+        output_csv = os.path.join(self.tmp_dir, 'output.csv')
+        output_merger.merge_svobs_csv_files(
+            csv_files,
+            tmcf_files,
+            output_csv,
+            config={'aggregate_duplicate_svobs': 'sum'},
+            aggregate_func=_sum_values)
+        with open(output_csv) as csv_file:
+            self.assertIn('2021,dcid:geoId/06,16,dcid:Count_Person',
+                          csv_file.read())
+
+    def test_merge_svobs_aggregated_mmethod(self):
+        # SVObs aggregated within a shard are merged with other shards.
+        csv1 = _write_file(
+            os.path.join(self.tmp_dir, 'shard1.csv'),
+            'observationAbout,value,measurementMethod\n'
+            'dcid:geoId/06,10,dcs:dcAggregate/Census\n'
+            'dcid:geoId/07,5,dcs:DataCommonsAggregate\n')
+        csv2 = _write_file(
+            os.path.join(self.tmp_dir, 'shard2.csv'),
+            'observationAbout,value,measurementMethod\n'
+            'dcid:geoId/06,6,dcs:Census\n'
+            'dcid:geoId/07,4,\n')
+        output_csv = os.path.join(self.tmp_dir, 'output.csv')
+        counters = Counters()
+        self.assertEqual(
+            2,
+            output_merger.merge_svobs_csv_files(
+                [csv1, csv2], ['', ''],
+                output_csv,
+                config={'aggregate_duplicate_svobs': 'sum'},
+                counters=counters,
+                aggregate_func=_sum_values))
+        self.assertEqual(2, counters.get_counter('merge-svobs-duplicates'))
+        with open(output_csv) as csv_file:
+            self.assertEqual(
+                'observationAbout,value,measurementMethod\n'
+                'dcid:geoId/06,16,dcs:dcAggregate/Census\n'
+                'dcid:geoId/07,9,dcs:DataCommonsAggregate\n', csv_file.read())
+
+    def test_merge_svobs_mean_unsupported(self):
+        csv_files, tmcf_files = self._write_svobs_shards()
+        output_csv = os.path.join(self.tmp_dir, 'output.csv')
+        counters = Counters()
+        self.assertEqual(
+            3,
+            output_merger.merge_svobs_csv_files(
+                csv_files,
+                tmcf_files,
+                output_csv,
+                config={'aggregate_duplicate_svobs': 'mean'},
+                counters=counters,
+                aggregate_func=_sum_values))
+        self.assertEqual(
+            1, counters.get_counter('error-merge-unsupported-aggregation-mean'))
+        with open(output_csv) as csv_file:
+            self.assertIn('2021,dcid:geoId/06,11,dcid:Count_Person',
+                          csv_file.read())
+
+    def test_merge_svobs_concat(self):
+        csv_files, tmcf_files = self._write_svobs_shards()
+        output_csv = os.path.join(self.tmp_dir, 'output.csv')
+        self.assertEqual(
+            4,
+            output_merger.merge_svobs_csv_files(
+                csv_files,
+                tmcf_files,
+                output_csv,
+                config={'merge_svobs_csv': 'concat'}))
+
+
+if __name__ == '__main__':
+    app.run()
+    unittest.main()
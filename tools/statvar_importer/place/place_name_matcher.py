@@ -55,6 +55,7 @@ To resolve places in a csv file on command line:
 import ast
 import csv
 import glob
+import hashlib
 import itertools
 import os
 import sys
@@ -119,6 +120,9 @@ _DEFAULT_CONFIG = {
     'ignore_non_alphanum': True,
     'min_match_fraction': 0.1,
     'num_results': 10,
+    # Directory for the ngram index of place names.
+    # The index is loaded from it if present, else saved into it.
+    'ngram_index': '',
 }
 
 
@@ -182,6 +186,16 @@ class PlaceNameMatcher:
         """Add the place names to the ngram matcher."""
         count = 0
         self._ngram_matcher = NgramMatcher(self._config)
+        # Load the ngram index saved earlier, if any, for the same places.
+        ngram_index = self._config.get('ngram_index', '')
+        places_hash = ''
+        if ngram_index:
+            places_hash = self._get_places_hash()
+            index_file = os.path.join(ngram_index, 'ngram_index.json')
+            # Rebuild the index if the places have changed.
+            if os.path.exists(index_file) and self._ngram_matcher.load(
+                    ngram_index, source_id=places_hash):
+                return
         for place_dcid, pvs in self._places_dict.items():
             place_names = self._get_full_place_names(place_dcid)
             for place_name in place_names:
@@ -190,6 +204,17 @@ class PlaceNameMatcher:
         num_ngrams = self._ngram_matcher.get_ngrams_count()
         logging.info(
             f'Loaded {count} names into ngram matcher with {num_ngrams} ngrams')
+        if ngram_index:
+            self._ngram_matcher.save(ngram_index, source_id=places_hash)
+
+    def _get_places_hash(self) -> str:
+        """Returns a hash of the places loaded for the ngram index."""
+        places_hash = hashlib.sha256()
+        for dcid in sorted(self._places_dict.keys()):
+            pvs = sorted(
+                (str(p), str(v)) for p, v in self._places_dict[dcid].items())
+            places_hash.update(repr((dcid, pvs)).encode('utf-8'))
+        return places_hash.hexdigest()
 
     def get_place_value(self,
                         place_dcid: str,
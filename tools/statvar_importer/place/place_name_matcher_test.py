@@ -16,7 +16,9 @@
 import unittest
 
 import os
+import shutil
 import sys
+import tempfile
 
 from absl import app
 from absl import logging
@@ -88,3 +90,27 @@ class PlaceNameMatcherTest(unittest.TestCase):
             matches)
         # Verify places outside India are not returned.
         self.assertNotIn(('Delhi, Texas TX', 'wikidataId/Q48851198'), matches)
+
+    def test_ngram_index(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            places_csv = os.path.join(tmp_dir, 'places.csv')
+            shutil.copy(os.path.join(_TEST_DIR, 'sample-places.csv'),
+                        places_csv)
+            config = {'ngram_index': os.path.join(tmp_dir, 'ngram_index')}
+            p = PlaceNameMatcher(place_file=places_csv, config=config)
+            self.assertIn(('Delhi', 'wikidataId/Q1353'), p.lookup('Delhi'))
+            self.assertTrue(
+                os.path.exists(
+                    os.path.join(tmp_dir, 'ngram_index', 'ngram_index.json')))
+
+            # Index is reused for the same places.
+            p = PlaceNameMatcher(place_file=places_csv, config=config)
+            self.assertIn(('Delhi', 'wikidataId/Q1353'), p.lookup('Delhi'))
+
+            # Index is rebuilt when the places change.
+            with open(places_csv, 'a') as places_file:
+                places_file.write(
+                    'wikidataId/Q999999999,City,Zyxwville,,,,Earth\n')
+            p = PlaceNameMatcher(place_file=places_csv, config=config)
+            self.assertEqual(('Zyxwville', 'wikidataId/Q999999999'),
+                             p.lookup('Zyxwville')[0])
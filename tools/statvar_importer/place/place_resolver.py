@@ -39,6 +39,7 @@ Additional candidate places may be filled in columns dcid<N>.
 """
 
 import ast
+import concurrent.futures
 import csv
 import glob
 import os
@@ -46,7 +47,7 @@ import pprint as pp
 import re
 import sys
 import time
-from typing import Union
+from typing import Callable, Union
 
 from absl import app
 from absl import flags
@@ -130,7 +131,7 @@ import wiki_place_resolver
 
 from counters import Counters
 from config_map import ConfigMap
-from download_util import request_url
+from download_util import RateLimiter, request_url
 from dc_api_wrapper import dc_api_batched_wrapper, dc_api_resolve_placeid
 from dc_api_wrapper import dc_api_resolve_latlng
 from place_name_matcher import PlaceNameMatcher
@@ -176,6 +177,9 @@ class PlaceResolver:
             self._maps_api_key = self._config.get('maps_api_key', '')
         self._place_name_matcher = PlaceNameMatcher(
             config=self._config.get_configs())
+        # Rate limiter for DC API requests per host.
+        self._rate_limiter = RateLimiter(
+            self._config.get('dc_api_requests_per_sec', 10))
         self._load_cache()
         self._wiki_resolver = wiki_place_resolver.WikiPlaceResolver(
             config_dict, counters_dict, cache=self._cache)
@@ -358,18 +362,25 @@ class PlaceResolver:
             return {}
 
         # Get a list of dcids keyed by the place name using DC API.
+        # Add resolved places to the cache as responses are received.
+        cached_place_names = set()
+
+        def _cache_resolved_place(place_name: str, dcids: list):
+            self._set_cache_value(place_name, _get_dcids_dict(dcids))
+            cached_place_names.add(place_name)
+
         resolved_places = self.resolve_name_dc_api_batch(
-            list(place_names_to_key.keys()))
+            list(place_names_to_key.keys()),
+            result_callback=_cache_resolved_place)
 
         # Add dcid for resolved places to the result.
         results = {}
         for place_name, dcids in resolved_places.items():
             key = place_names_to_key.get(place_name)
             if key is not None:
-                result = {}
-                for dcid in dcids:
-                    _add_to_dict('dcid', dcid, result)
-                self._set_cache_value(place_name, result)
+                result = _get_dcids_dict(dcids)
+                if place_name not in cached_place_names:
+                    self._set_cache_value(place_name, result)
                 results[key] = places[key]
                 results[key].update(result)
         logging.log_every_n(
@@ -378,56 +389,126 @@ class PlaceResolver:
             self._log_every_n)
         return results
 
-    def resolve_name_dc_api_batch(self, place_names: list) -> dict:
-        """Returns resolved places names in batches."""
+    def resolve_name_dc_api_batch(self,
+                                  place_names: list,
+                                  result_callback: Callable = None) -> dict:
+        """Returns resolved places names in batches.
+
+    Batches of names are resolved concurrently with upto
+    dc_api_max_concurrency requests in flight, rate limited to
+    dc_api_requests_per_sec per host. The batch size starts with
+    dc_api_batch_size and is doubled after each successful request upto
+    dc_api_max_batch_size. It is halved after a failed request and the names in
+    the failed batch are retried in smaller batches.
+
+    Args:
+      place_names: list of place names to resolve.
+      result_callback: function called with (place_name, dcids) for each
+        resolved place as responses are received.
+
+    Returns:
+      dictionary of place name to a list of resolved dcids.
+    """
         url = self._config.get('resolve_api_url')
         key = self._config.get('dc_api_key')
         if not url or not key:
             return {}
 
         resolve_resp = {}
+        # Lookup each unique place name once.
+        place_names = list(dict.fromkeys(place_names))
         index = 0
-        dc_api_batch_size = self._config.get('dc_api_batch_size', 3)
         num_places = len(place_names)
-
-        while index < num_places:
-            # Make a batch request to resolve places.
-            params = {
-                # List of place names to lookup.
-                'nodes': place_names[index:index + dc_api_batch_size],
-                # Lookup dcid by the description
-                'property': '<-description->dcid',
-            }
-            headers = {
-                'X-API-Key': key,
-            }
-            self._counters.add_counter('dc-api-resolve-name-lookups',
-                                       len(params['nodes']))
-            self._counters.add_counter('dc-api-resolve-name-calls', 1)
-            batch_resp = request_url(url,
-                                     method='POST',
-                                     headers=headers,
-                                     params=params,
-                                     output='json')
-            logging.log_every_n(logging.DEBUG,
-                                f'Got resolve name response: {batch_resp}',
-                                self._log_every_n)
-            # Extract dcids from the resolve response.
-            if not batch_resp:
-                self._counters.add_counter('dc-api-resolve-name-call-errors', 1)
-            else:
-                for resp in batch_resp.get('entities', []):
-                    if 'resolvedIds' in resp:
-                        # Got a list of dcids for the place name.
-                        resolve_resp[resp['node']] = resp['resolvedIds']
+        batch_size = max(1, self._config.get('dc_api_batch_size', 3))
+        max_batch_size = max(batch_size,
+                             self._config.get('dc_api_max_batch_size', 50))
+        max_concurrency = max(1, self._config.get('dc_api_max_concurrency', 4))
+        # Batches of names from failed requests to be retried.
+        retry_batches = []
+        # Dictionary of future for a request to the batch of names.
+        pending_requests = {}
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_concurrency) as executor:
+            while index < num_places or retry_batches or pending_requests:
+                # Make batch requests upto the max concurrency.
+                while len(pending_requests) < max_concurrency and (
+                        retry_batches or index < num_places):
+                    if retry_batches:
+                        batch = retry_batches.pop()
+                    else:
+                        batch = place_names[index:index + batch_size]
+                        index += len(batch)
+                    self._counters.add_counter('dc-api-resolve-name-lookups',
+                                               len(batch))
+                    self._counters.add_counter('dc-api-resolve-name-calls', 1)
+                    future = executor.submit(self._request_resolve_names, url,
+                                             key, batch)
+                    pending_requests[future] = batch
+
+                # Process responses as they are received.
+                done_requests, _ = concurrent.futures.wait(
+                    pending_requests,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done_requests:
+                    batch = pending_requests.pop(future)
+                    batch_resp = future.result()
+                    if batch_resp is None:
+                        self._counters.add_counter(
+                            'dc-api-resolve-name-call-errors', 1)
+                        batch_size = max(1, batch_size // 2)
+                        if len(batch) > 1:
+                            # Retry names in smaller batches.
+                            mid = len(batch) // 2
+                            retry_batches.append(batch[mid:])
+                            retry_batches.append(batch[:mid])
+                            self._counters.add_counter(
+                                'dc-api-resolve-name-retries', len(batch))
+                        continue
+                    batch_size = min(max_batch_size, batch_size * 2)
+                    for place_name, dcids in batch_resp.items():
+                        resolve_resp[place_name] = dcids
                         self._counters.add_counter('dc-api-resolve-name-dcids',
                                                    1)
-            # Move to the next batch of places
-            index += dc_api_batch_size
+                        if result_callback:
+                            result_callback(place_name, dcids)
         logging.log_every_n(logging.DEBUG, f'Resolved names: {resolve_resp}',
                             self._log_every_n)
         return resolve_resp
 
+    def _request_resolve_names(self, url: str, key: str,
+                               place_names: list) -> dict:
+        """Returns a dict of place name to dcids from the DC API resolve.
+
+    Returns None if the request failed.
+    """
+        params = {
+            # List of place names to lookup.
+            'nodes': place_names,
+            # Lookup dcid by the description
+            'property': '<-description->dcid',
+        }
+        headers = {
+            'X-API-Key': key,
+        }
+        self._rate_limiter.wait(url)
+        batch_resp = request_url(url,
+                                 method='POST',
+                                 headers=headers,
+                                 params=params,
+                                 output='json')
+        logging.log_every_n(logging.DEBUG,
+                            f'Got resolve name response: {batch_resp}',
+                            self._log_every_n)
+        if not batch_resp:
+            return None
+        # Extract dcids from the resolve response.
+        resolved_names = {}
+        for resp in batch_resp.get('entities', []):
+            if 'resolvedIds' in resp:
+                # Got a list of dcids for the place name.
+                resolved_names[resp['node']] = resp['resolvedIds']
+        return resolved_names
+
     def resolve_latlng(self, places: dict) -> dict:
         """Returns a dictionary with a list of dcids for each lat/lng.
 
@@ -1193,6 +1274,14 @@ def _add_to_dict(key: str, value: str, pvs: dict, key_num: int = 0) -> dict:
     pvs[key] = value
 
 
+def _get_dcids_dict(dcids: list) -> dict:
+    """Returns a dict with the list of dcids for a place."""
+    result = {}
+    for dcid in dcids:
+        _add_to_dict('dcid', dcid, result)
+    return result
+
+
 def _update_dict(src: dict, dst: dict) -> dict:
     """Returns the dst dict after adding all key:value from the src dict."""
     for key, value in src.items():
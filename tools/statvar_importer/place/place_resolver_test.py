@@ -16,6 +16,9 @@ import os
 import sys
 import tempfile
 import csv
+import http.server
+import json
+import threading
 import unittest
 from unittest.mock import patch, call
 
@@ -53,6 +56,82 @@ class GetLookupNameTest(unittest.TestCase):
                          'Mountain View USA')
 
 
+class _ResolveRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Stub for the DC API resolve that returns dcid/<name> for names."""
+
+    # List of names in each request.
+    requests = []
+
+    def do_POST(self):
+        request = json.loads(
+            self.rfile.read(int(self.headers['Content-Length'])))
+        _ResolveRequestHandler.requests.append(request['nodes'])
+        entities = [{
+            'node': name,
+            'resolvedIds': [f'dcid/{name}']
+        } for name in request['nodes'] if name != 'Unknown']
+        response = json.dumps({'entities': entities}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        return
+
+
+class ResolveNameDcApiBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        _ResolveRequestHandler.requests = []
+        self._server = http.server.ThreadingHTTPServer(('localhost', 0),
+                                                       _ResolveRequestHandler)
+        self._server_thread = threading.Thread(
+            target=self._server.serve_forever)
+        self._server_thread.start()
+
+    def tearDown(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._server_thread.join()
+
+    def test_resolve_name_dc_api_batch(self):
+        resolver = PlaceResolver(
+            config_dict={
+                'dc_api_key':
+                    'test_key',
+                'resolve_api_url':
+                    f'http://localhost:{self._server.server_port}/resolve',
+                'dc_api_batch_size':
+                    1,
+                'dc_api_max_batch_size':
+                    4,
+                'dc_api_max_concurrency':
+                    2,
+                'dc_api_requests_per_sec':
+                    0,
+            })
+        place_names = [f'Place{i}' for i in range(10)]
+        place_names.extend(['Place1', 'Unknown', 'Place2'])
+        callback_results = {}
+        results = resolver.resolve_name_dc_api_batch(
+            place_names,
+            result_callback=lambda name, dcids: callback_results.update(
+                {name: dcids}))
+
+        expected_results = {f'Place{i}': [f'dcid/Place{i}'] for i in range(10)}
+        self.assertEqual(expected_results, results)
+        self.assertEqual(expected_results, callback_results)
+        # Each name is looked up once in batches that grow in size.
+        requested_names = [
+            name for names in _ResolveRequestHandler.requests for name in names
+        ]
+        self.assertEqual(sorted(set(place_names)), sorted(requested_names))
+        self.assertEqual(
+            4, max(len(names) for names in _ResolveRequestHandler.requests))
+
+
 class ResolveNameDcApiTest(unittest.TestCase):
 
     @patch('place_resolver.PlaceResolver.resolve_name_dc_api_batch')
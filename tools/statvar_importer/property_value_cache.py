@@ -15,10 +15,16 @@
 
 The values are stored as a dict with any selected property such as dcid as the
 key. The cache is persisted in a file.
+
+The file can be a CSV that is loaded into memory and rewritten on save, or
+an SQLite database (with the extension .sqlite or .db) where entries are
+appended as they are added and loaded on lookup.
 """
 
 import csv
+import json
 import os
+import sqlite3
 import sys
 import unicodedata
 
@@ -36,6 +42,9 @@ import file_util
 from mcf_file_util import add_pv_to_node
 from counters import Counters
 
+# File extensions for caches stored in SQLite.
+_SQLITE_FILE_EXTENSIONS = ('.sqlite', '.db')
+
 # Indexed properties in order for lookup.
 _DEFAULT_KEY_PROPS = [
     'key',
@@ -88,6 +97,9 @@ class PropertyValueCache:
             properties as columns.
             The entries in the file are loaded on init and
             saved periodically and on exit.
+            If the file has an extension .sqlite or .db, entries are stored
+            in an SQLite database. Entries from a CSV file with the same name
+            are imported into a new database.
           key_props: list of properties that can be used for lookup.
             The values of these properties are assumed to be unique and
             values are stored in an index per property for lookup by value.
@@ -127,13 +139,27 @@ class PropertyValueCache:
         self._props = []
         self._add_props(key_props=key_props, props=props)
 
-        # Load entries from file.
-        self.load_cache_file(filename)
+        # Store for entries in an SQLite database file.
+        self._store = None
+        if _is_sqlite_file(filename):
+            self._store = _SqliteStore(filename)
+            if self._store.num_entries() == 0:
+                # Import entries from a CSV cache for a new database
+                # in a single transaction.
+                self._store.autocommit = False
+                self.load_cache_file(os.path.splitext(filename)[0] + '.csv')
+                self._store.commit()
+                self._store.autocommit = True
+        else:
+            # Load entries from file.
+            self.load_cache_file(filename)
         # Flag to indicate cache has been updated and has changed from file.
         self._is_modified = False
 
     def __del__(self):
         self.save_cache_file()
+        if self._store is not None:
+            self._store.close()
 
     def load_cache_file(self, filename: str):
         """Load entries of property:value dicts from files.
@@ -143,6 +169,9 @@ class PropertyValueCache:
               with one row per entry.
         """
         for file in file_util.file_get_matching(filename):
+            if _is_sqlite_file(file):
+                logging.error(f'Cannot load SQLite cache {file} into cache')
+                continue
             with file_util.FileIO(filename) as csv_file:
                 csv_reader = csv.DictReader(csv_file)
                 # Add columns as properties in order of input.
@@ -226,8 +255,16 @@ class PropertyValueCache:
             entry = cached_entry
         else:
             # Add a new entry
-            cached_entry = dict(entry)
-            self._entries[len(self._entries)] = cached_entry
+            entry_id = len(self._entries)
+            if self._store is not None:
+                cached_entry = _StoreEntry(entry)
+                entry_id = self._store.add_entry(cached_entry)
+                cached_entry.store_id = entry_id
+                # Index the entry saved in the store.
+                entry = cached_entry
+            else:
+                cached_entry = dict(entry)
+            self._entries[entry_id] = cached_entry
             self._counters.add_counter('pv-cache-entries', 1)
 
         # Add entry to the lookup index for all key properties.
@@ -240,6 +277,10 @@ class PropertyValueCache:
                     values = [values]
                 for value in values:
                     self._add_prop_key_entry(prop, value, entry)
+        if self._store is not None:
+            # Save the new or updated entry and its keys.
+            self._store.update_entry(cached_entry.store_id, cached_entry,
+                                     self._get_entry_keys(cached_entry))
         self._is_modified = True
         logging.level_debug() and logging.log_every_n(
             2, f'Added cache entry {cached_entry}', self._log_every_n)
@@ -288,6 +329,11 @@ class PropertyValueCache:
         if not self.is_dirty():
             # No change in cache. Skip writing to file.
             return
+        if self._store is not None:
+            # Entries are already in the store.
+            self._store.commit()
+            self._is_modified = False
+            return
         # Get the cache filename.
         # Save cache to the last file loaded in case of multiple files.
         filename = file_util.file_get_matching(self._filename)
@@ -330,6 +376,8 @@ class PropertyValueCache:
 
     def num_entries(self) -> int:
         """Returns the number of entries in the cache."""
+        if self._store is not None:
+            return self._store.num_entries()
         return len(self._entries)
 
     def normalize_string(self, key: str) -> str:
@@ -412,12 +460,132 @@ class PropertyValueCache:
     def _get_prop_key_entry(self, prop: str, key: str) -> dict:
         """Returns the entry for the key in the lookup map for prop."""
         entry = self._prop_index.get(prop, {}).get(key, {})
+        if not entry and self._store is not None and key:
+            entry = self._load_store_entry(prop, key)
         if entry:
             self._counters.add_counter(f'pv-cache-hits-{prop}', 1)
         else:
             self._counters.add_counter(f'pv-cache-misses-{prop}', 1)
         return entry
 
+    def _get_entry_keys(self, entry: dict) -> list:
+        """Returns a list of (prop, key) for the entry in the lookup index."""
+        keys = []
+        for prop in self._key_props:
+            for value in _get_value_list(entry.get(prop, None)):
+                if value:
+                    keys.append(
+                        (prop, self.get_lookup_key(prop=prop, value=value)))
+        return keys
+
+    def _load_store_entry(self, prop: str, key: str) -> dict:
+        """Returns the entry for the prop:key loaded from the store.
+
+        The entry is also added to the lookup index in memory.
+        """
+        entry_id = self._store.get_entry_id(prop, key)
+        if entry_id is None:
+            return {}
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            entry = self._store.get_entry(entry_id)
+            if not entry:
+                return {}
+            entry = _StoreEntry(entry)
+            entry.store_id = entry_id
+            self._entries[entry_id] = entry
+            self._add_props(props=entry.keys())
+        for entry_prop, entry_key in self._get_entry_keys(entry):
+            self._prop_index.setdefault(entry_prop, {})[entry_key] = entry
+        self._prop_index.setdefault(prop, {})[key] = entry
+        self._counters.add_counter('pv-cache-store-loads', 1)
+        return entry
+
+
+class _StoreEntry(dict):
+    """Cache entry with the id of the entry in the SQLite store."""
+
+    __slots__ = ('store_id',)
+
+
+class _SqliteStore:
+    """Store for cache entries in an SQLite database.
+
+  Entries are stored as JSON in the 'entries' table with the lookup keys for
+  each entry in the 'prop_index' table. The database uses write ahead logging
+  so that multiple processes can read the cache while it is being updated.
+  Each update is committed unless autocommit is disabled so that the write
+  lock is not held across updates, blocking other processes.
+  """
+
+    def __init__(self, filename: str, timeout: int = 60):
+        self.autocommit = True
+        dirname = os.path.dirname(filename)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self._db = sqlite3.connect(filename,
+                                   timeout=timeout,
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS entries'
+                         ' (id INTEGER PRIMARY KEY, pvs TEXT)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS prop_index'
+                         ' (prop TEXT, key TEXT, entry_id INTEGER,'
+                         ' PRIMARY KEY (prop, key))')
+        self._db.commit()
+        logging.info(
+            f'Opened cache {filename} with {self.num_entries()} entries')
+
+    def add_entry(self, entry: dict) -> int:
+        """Returns the id for a new entry added to the store."""
+        cursor = self._db.execute('INSERT INTO entries (pvs) VALUES (?)',
+                                  (json.dumps(entry),))
+        return cursor.lastrowid
+
+    def update_entry(self, entry_id: int, entry: dict, keys: list):
+        """Saves the entry and list of (prop, key) to lookup the entry."""
+        self._db.execute('UPDATE entries SET pvs = ? WHERE id = ?',
+                         (json.dumps(entry), entry_id))
+        self._db.executemany(
+            'INSERT OR REPLACE INTO prop_index (prop, key, entry_id)'
+            ' VALUES (?, ?, ?)', [(prop, key, entry_id) for prop, key in keys])
+        if self.autocommit:
+            self._db.commit()
+
+    def get_entry_id(self, prop: str, key: str) -> int:
+        """Returns the id of the entry for the prop:key."""
+        row = self._db.execute(
+            'SELECT entry_id FROM prop_index WHERE prop = ? AND key = ?',
+            (prop, key)).fetchone()
+        if row:
+            return row[0]
+        return None
+
+    def get_entry(self, entry_id: int) -> dict:
+        """Returns the entry for the id."""
+        row = self._db.execute('SELECT pvs FROM entries WHERE id = ?',
+                               (entry_id,)).fetchone()
+        if row:
+            return json.loads(row[0])
+        return {}
+
+    def num_entries(self) -> int:
+        return self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+def _is_sqlite_file(filename: str) -> bool:
+    """Returns True if the file is an SQLite database for the cache."""
+    return isinstance(filename,
+                      str) and filename.endswith(_SQLITE_FILE_EXTENSIONS)
+
 
 def flatten_dict(pvs: dict, props: list) -> list:
     """Returns a list of dicts, flattening out props with multiple values."""
@@ -17,6 +17,7 @@ import unittest
 import os
 import csv
 import tempfile
+import sqlite3
 
 from absl import app
 from absl import logging
@@ -344,6 +345,86 @@ class SharedCacheTest(unittest.TestCase):
             self.assertEqual(entry2['dcid'], reloaded_entry2['dcid'])
 
 
+class SqliteCacheTest(unittest.TestCase):
+
+    def test_add_and_reload_entries(self):
+        """Tests that entries are saved in the database and loaded on lookup."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_file = os.path.join(temp_dir, 'cache.sqlite')
+            cache1 = PropertyValueCache(cache_file)
+            cache1.add({'dcid': 'geoId/06', 'name': 'California'})
+            cache1.add({
+                'dcid': 'geoId/06',
+                'placeId': 'ChIJPV4oX_65j4ARVW8IJ6IJUYs'
+            })
+            cache1.save_cache_file()
+            self.assertEqual(1, cache1.num_entries())
+
+            cache2 = PropertyValueCache(cache_file)
+            entry = cache2.get_entry('ChIJPV4oX_65j4ARVW8IJ6IJUYs')
+            self.assertEqual('geoId/06', entry['dcid'])
+            self.assertEqual('California', entry['name'])
+            self.assertEqual(entry, cache2.get_entry('california'))
+            self.assertEqual({}, cache2.get_entry('Nevada'))
+
+            # Entries added by one instance are visible to the other.
+            cache2.add({'dcid': 'geoId/32', 'name': 'Nevada'})
+            cache2.save_cache_file()
+            self.assertEqual('geoId/32', cache1.get_entry('Nevada')['dcid'])
+            self.assertEqual(2, cache1.num_entries())
+
+    def test_add_does_not_lock_database(self):
+        """Tests that an add doesn't keep the database locked for writes."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_file = os.path.join(temp_dir, 'cache.sqlite')
+            cache = PropertyValueCache(cache_file)
+            cache.add({'dcid': 'geoId/06', 'name': 'California'})
+            cache.add({'dcid': 'geoId/06', 'typeOf': 'State'})
+            # Another process can write without waiting for a save.
+            db = sqlite3.connect(cache_file, timeout=0.1)
+            db.execute('INSERT INTO entries (pvs) VALUES (?)', ('{}',))
+            db.commit()
+            db.close()
+            self.assertEqual(2, cache.num_entries())
+
+            cache2 = PropertyValueCache(cache_file)
+            entry = cache2.get_entry('california')
+            self.assertEqual(
+                {
+                    'dcid': 'geoId/06',
+                    'name': 'California',
+                    'typeOf': 'State'
+                }, entry)
+            # Updates to an entry loaded from the store use its id.
+            cache2.add({
+                'name': 'California',
+                'placeId': 'ChIJPV4oX_65j4ARVW8IJ6IJUYs'
+            })
+            self.assertEqual(2, cache2.num_entries())
+            cache3 = PropertyValueCache(cache_file)
+            self.assertEqual(
+                'geoId/06',
+                cache3.get_entry('ChIJPV4oX_65j4ARVW8IJ6IJUYs')['dcid'])
+
+    def test_import_csv_cache(self):
+        """Tests that a CSV cache is imported into a new database."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, 'cache.csv'), 'w',
+                      newline='') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(['dcid', 'name', 'typeOf'])
+                writer.writerow(['geoId/01', 'Alabama', 'State'])
+                writer.writerow(['geoId/02', 'Alaska', 'State'])
+
+            pv_cache = PropertyValueCache(os.path.join(temp_dir, 'cache.db'))
+            self.assertEqual(2, pv_cache.num_entries())
+            self.assertFalse(pv_cache.is_dirty())
+            del pv_cache
+
+            pv_cache = PropertyValueCache(os.path.join(temp_dir, 'cache.db'))
+            self.assertEqual('Alaska', pv_cache.get_entry('geoId/02')['name'])
+
+
 class NormalizeStringTest(unittest.TestCase):
 
     def setUp(self):
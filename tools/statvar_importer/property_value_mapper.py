@@ -38,6 +38,7 @@ import property_value_utils as pv_utils
 
 from config_map import ConfigMap, read_py_dict_from_file
 from counters import Counters, CounterOptions
+from substring_index import SubstringIndex
 
 
 class PropertyValueMapper:
@@ -106,6 +107,17 @@ class PropertyValueMapper:
         self._pv_map = OrderedDict({'GLOBAL': {}})
         self._num_pv_map_keys = 0
         self._max_words_in_keys = 0
+        # Map from (namespace, ignore_case) to SubstringIndex of keys
+        # used to lookup keys that are substrings of a value.
+        self._substring_index = {}
+        # LRU cache of (namespace, value, max_fragment_size) to list of PVs
+        # returned by get_all_pvs_for_value().
+        self._lookup_cache = OrderedDict()
+        self._lookup_cache_size = self._config.get('pv_lookup_cache_size',
+                                                   10000)
+        # LRU cache of (#Eval statement, data value) to (property, result)
+        # for statements evaluated per column with 'eval_column_batch'.
+        self._eval_column_cache = OrderedDict()
         for filename in pv_map_files:
             namespace = 'GLOBAL'
             if not file_util.file_get_matching(filename):
@@ -238,12 +250,35 @@ class PropertyValueMapper:
                 2, f'Setting PVMap[{key}] = {pvs_dict}', self._log_every_n)
 
         self._num_pv_map_keys += num_keys_added
+        self._update_substring_index(namespace, pv_map_input.keys())
+        # New keys may change the PVs for values looked up earlier.
+        self._lookup_cache.clear()
         logging.info(
             f'Loaded {num_keys_added} property-value mappings for "{namespace}"'
         )
         logging.level_debug() and logging.debug(
             f'Loaded pv map {namespace}:{pv_map_input}')
 
+    def _get_substring_index(self, namespace: str) -> SubstringIndex:
+        """Returns the index of keys in the namespace for substring lookups."""
+        ignore_case = not self._config.get('match_substring_word_boundary',
+                                           True)
+        index = self._substring_index.get((namespace, ignore_case))
+        if index is None:
+            index = SubstringIndex(self._pv_map.get(namespace, {}).keys(),
+                                   ignore_case=ignore_case)
+            self._substring_index[(namespace, ignore_case)] = index
+        return index
+
+    def _update_substring_index(self, namespace: str, keys: list):
+        """Adds new keys to the substring indexes for the namespace."""
+        for (index_namespace,
+             ignore_case), index in self._substring_index.items():
+            if index_namespace == namespace:
+                index.add_keys(keys)
+        # Build the index for the current config at load time.
+        self._get_substring_index(namespace).build()
+
     def get_pv_map(self) -> dict:
         """Returns the dictionary mapping input-strings to property:values."""
         return self._pv_map
@@ -336,11 +371,14 @@ class PropertyValueMapper:
             return False
 
         eval_str = pvs[eval_key]
-        eval_prop, eval_data = eval_functions.evaluate_statement(
-            eval_str,
-            pvs,
-            self._config.get('eval_globals', eval_functions.EVAL_GLOBALS),
-        )
+        eval_globals = self._config.get('eval_globals',
+                                        eval_functions.EVAL_GLOBALS)
+        if self._is_column_eval(eval_str, pvs, data_key):
+            eval_prop, eval_data = self._evaluate_column_statement(
+                eval_str, pvs[data_key], data_key, eval_globals)
+        else:
+            eval_prop, eval_data = eval_functions.evaluate_statement(
+                eval_str, pvs, eval_globals)
         logging.level_debug() and logging.log_every_n(
             2,
             f'Processed eval {eval_str} with {pvs} to get {eval_prop}:{eval_data}',
@@ -354,6 +392,50 @@ class PropertyValueMapper:
             return True
         return False
 
+    def _is_column_eval(self, eval_str: str, pvs: dict, data_key: str) -> bool:
+        """Returns True if the #Eval statement can be evaluated per column.
+
+    A statement that uses no properties other than the data_key has the same
+    result for all cells in a column with the same value.
+    """
+        if not self._config.get('eval_column_batch', False):
+            return False
+        if data_key not in pvs:
+            return False
+        for name in eval_functions.get_statement_variables(eval_str):
+            if name != data_key and name in pvs:
+                return False
+        return True
+
+    def _evaluate_column_statement(self, eval_str: str, value: str,
+                                   data_key: str, eval_globals: dict) -> tuple:
+        """Returns the (property, result) for a #Eval statement on a value.
+
+    The statement is evaluated with evaluate_statement_for_column() once for
+    each unique value in a column and the results for recent values are
+    cached.
+    """
+        cache_key = (eval_str, value)
+        try:
+            result = self._eval_column_cache.get(cache_key)
+        except TypeError:
+            # Value can't be cached.
+            return eval_functions.evaluate_statement(eval_str,
+                                                     {data_key: value},
+                                                     eval_globals)
+        if result is not None:
+            self._eval_column_cache.move_to_end(cache_key)
+            self._counters.add_counter('eval-column-cache-hits', 1)
+            return result
+        self._counters.add_counter('eval-column-cache-misses', 1)
+        eval_prop, eval_data = eval_functions.evaluate_statement_for_column(
+            eval_str, [value], data_key, functions=eval_globals)
+        result = (eval_prop, eval_data[0])
+        self._eval_column_cache[cache_key] = result
+        if len(self._eval_column_cache) > self._lookup_cache_size:
+            self._eval_column_cache.popitem(last=False)
+        return result
+
     def get_pvs_for_key(self, key: str, namespace: str = 'GLOBAL') -> dict:
         """Return a dict of property-values that are mapped to the given key
     within the dictionary for the namespace.
@@ -494,11 +576,15 @@ class PropertyValueMapper:
         pvs_list = []
         keys_list = []
         for n in namespaces:
-            # Lookup keys from shortest to longest.
+            # Lookup keys from longest to shortest.
             # Caller will merge PVs in the reverse order.
             pv_map = self._pv_map[n]
-            sorted_keys = sorted(pv_map.keys(), key=len, reverse=True)
-            for key in sorted_keys:
+            index = self._get_substring_index(n)
+            matched_keys = index.find_keys(value)
+            key_num = 0
+            while key_num < len(matched_keys):
+                key = matched_keys[key_num]
+                key_num += 1
                 if self._is_key_in_value(key, value):
                     pvs_list.append(pv_map[key])
                     keys_list.append(key)
@@ -506,6 +592,14 @@ class PropertyValueMapper:
                         3, f'Got PVs for {key} in {value}: {pvs_list}',
                         self._log_every_n)
                     value = value.replace(key, ' ')
+                    # Replacing the key can remove or create matches for
+                    # the remaining shorter keys. Lookup the rest again.
+                    key_rank = index.get_key_rank(key)
+                    matched_keys = [
+                        k for k in index.find_keys(value)
+                        if index.get_key_rank(k) > key_rank
+                    ]
+                    key_num = 0
         logging.level_debug() and logging.log_every_n(
             2,
             f'Returning pvs for substrings of {value} from {keys_list}:{pvs_list}',
@@ -596,6 +690,35 @@ class PropertyValueMapper:
                     return pvs_list
         return None
 
+    def get_all_pvs_for_value_cached(self,
+                                     value: str,
+                                     namespace: str = 'GLOBAL',
+                                     max_fragment_size: int = None) -> list:
+        """Returns a list of property:value dictionaries for an input string.
+
+    Same as get_all_pvs_for_value() with the results for recent lookups
+    cached. The cache is cleared when any new PVs are loaded.
+    """
+        if self._lookup_cache_size <= 0:
+            return self.get_all_pvs_for_value(value, namespace,
+                                              max_fragment_size)
+        cache_key = (namespace, value, max_fragment_size)
+        if cache_key in self._lookup_cache:
+            self._lookup_cache.move_to_end(cache_key)
+            self._counters.add_counter('pvmap-lookup-cache-hits', 1)
+            pvs_list = self._lookup_cache[cache_key]
+        else:
+            self._counters.add_counter('pvmap-lookup-cache-misses', 1)
+            pvs_list = self.get_all_pvs_for_value(value, namespace,
+                                                  max_fragment_size)
+            self._lookup_cache[cache_key] = pvs_list
+            if len(self._lookup_cache) > self._lookup_cache_size:
+                self._lookup_cache.popitem(last=False)
+        if pvs_list:
+            # Return a copy of the list as callers may append to it.
+            return list(pvs_list)
+        return pvs_list
+
 
 # Local utility functions
 def _get_variable_expr(stmt: str, default_var: str = 'Data') -> (str, str):
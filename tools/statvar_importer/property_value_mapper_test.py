@@ -91,6 +91,69 @@ class PropertyValueMapperTest(unittest.TestCase):
         ]
         self.assertEqual(pvs, expected_pvs)
 
+    def test_get_pvs_for_key_substring(self):
+        pv_mapper = PropertyValueMapper()
+        pv_mapper.load_pvs_dict({
+            'Male': {
+                'gender': 'dcs:Male'
+            },
+            'Total': {
+                'populationType': 'dcs:Person'
+            },
+            'Total Males': {
+                'measuredProperty': 'dcs:count'
+            },
+        })
+        # Shorter keys within a matched longer key are not returned.
+        self.assertEqual([{
+            'measuredProperty': 'dcs:count'
+        }], pv_mapper.get_pvs_for_key_substring('Total Males'))
+        self.assertEqual([{
+            'populationType': 'dcs:Person'
+        }, {
+            'gender': 'dcs:Male'
+        }], pv_mapper.get_pvs_for_key_substring('Total of Males'))
+
+        # Keys loaded later are added to the substring index.
+        pv_mapper.load_pvs_dict({'of': {'statType': 'dcs:measuredValue'}})
+        self.assertEqual([{
+            'populationType': 'dcs:Person'
+        }, {
+            'gender': 'dcs:Male'
+        }, {
+            'statType': 'dcs:measuredValue'
+        }], pv_mapper.get_pvs_for_key_substring('Total of Males'))
+
+    def test_get_all_pvs_for_value_cached(self):
+        pv_mapper = PropertyValueMapper(pv_map_files=[
+            os.path.join(_SCRIPT_DIR, 'test_data/sample_pv_map.py')
+        ],
+                                        config_dict={'pv_lookup_cache_size': 2})
+        expected_pvs = pv_mapper.get_all_pvs_for_value('Males')
+        pvs = pv_mapper.get_all_pvs_for_value_cached('Males')
+        self.assertEqual(expected_pvs, pvs)
+        # Modifying the returned list doesn't change the cached result.
+        pvs.append({'age': 'dcid:Years18Onwards'})
+        self.assertEqual(expected_pvs,
+                         pv_mapper.get_all_pvs_for_value_cached('Males'))
+        self.assertIsNone(pv_mapper.get_all_pvs_for_value_cached('Unknown'))
+        counters = pv_mapper._counters
+        self.assertEqual(1, counters.get_counter('pvmap-lookup-cache-hits'))
+        self.assertEqual(2, counters.get_counter('pvmap-lookup-cache-misses'))
+
+        # Cached lookups are evicted beyond the cache size.
+        pv_mapper.get_all_pvs_for_value_cached('Females')
+        pv_mapper.get_all_pvs_for_value_cached('Males')
+        self.assertEqual(4, counters.get_counter('pvmap-lookup-cache-misses'))
+
+        # Cache is cleared when new PVs are loaded.
+        pv_mapper.load_pvs_dict({'Unknown': {'gender': 'dcs:Unknown'}})
+        self.assertEqual([{
+            'gender': 'dcs:Unknown'
+        }, {
+            'Key': 'Unknown'
+        }], pv_mapper.get_all_pvs_for_value_cached('Unknown'))
+
     def test_process_pvs(self):
         pv_mapper = PropertyValueMapper(pv_map_files=[
             os.path.join(_SCRIPT_DIR, 'test_data/sample_pv_map.py'),
@@ -111,3 +174,25 @@ class PropertyValueMapperTest(unittest.TestCase):
                 'StartAge': '10',
                 'age': 'dcid:{@StartAge}To{@EndAge}Years'
             })
+
+    def test_process_eval_column_batch(self):
+        pv_mapper = PropertyValueMapper(config_dict={'eval_column_batch': True})
+        values = ['Jan 2022', 'Feb 2022', 'Jan 2022', 'Not A Date']
+        expected = ['2022-01', '2022-02', '2022-01', '']
+        for value, date in zip(values, expected):
+            pvs = {
+                '#Eval': 'observationDate=format_date(Data, "%Y-%m")',
+                'Data': value
+            }
+            pv_mapper.process_pvs_for_data(value, pvs)
+            self.assertEqual(date, pvs.get('observationDate', ''))
+        counters = pv_mapper._counters
+        # The statement is evaluated once for each unique value.
+        self.assertEqual(1, counters.get_counter('eval-column-cache-hits'))
+        self.assertEqual(3, counters.get_counter('eval-column-cache-misses'))
+
+        # Statements using other properties are evaluated per cell.
+        pvs = {'#Eval': 'value=Data + Offset', 'Data': 1, 'Offset': 2}
+        self.assertTrue(pv_mapper.process_pvs_for_data('1', pvs))
+        self.assertEqual(3, pvs['value'])
+        self.assertEqual(3, counters.get_counter('eval-column-cache-misses'))
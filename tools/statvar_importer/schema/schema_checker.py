@@ -18,15 +18,25 @@ It checks schema for:
   - URLs to be active
 The errors are reported in counters as well as an output file.
 
+URLs are checked concurrently with a limit on connections per host.
+The status of URLs can be saved in an SQLite file with --url_status_cache
+that is reused across runs until the entries are older than
+--url_status_cache_ttl_hours.
+
 To check a list of MCF files, run the command:
   python schema_checker.py --schema_input_mcf=<input-mcf-file> \
       --schema_error_output=<output-file-with-errors-per-node>
 """
 
+import concurrent.futures
 import os
 import re
 import requests
+import sqlite3
 import sys
+import threading
+import time
+import urllib.parse
 
 from absl import app
 from absl import flags
@@ -52,6 +62,14 @@ flags.DEFINE_string('url_allowlist',
 flags.DEFINE_string('schema_check_output', '', 'File with list of spell errors')
 flags.DEFINE_string('url_regex', _URL_PATTERN, 'File with list of spell errors')
 flags.DEFINE_string('schema_check_config', '', 'File with config parameters.')
+flags.DEFINE_string('url_status_cache', '',
+                    'SQLite file to cache the status of URLs across runs.')
+flags.DEFINE_float('url_status_cache_ttl_hours', 24 * 7,
+                   'Hours after which cached URL status is checked again.')
+flags.DEFINE_integer('url_check_max_concurrency', 16,
+                     'Number of URLs checked in parallel.')
+flags.DEFINE_integer('url_check_max_per_host', 2,
+                     'Number of URLs checked in parallel for a host.')
 
 _FLAGS = flags.FLAGS
 
@@ -67,15 +85,30 @@ from schema_spell_checker import get_spell_checker, spell_check_nodes, get_defau
 
 import config_flags
 
+# Number of URL status checked before saving to the cache.
+_URL_CACHE_BATCH_SIZE = 100
+
+# Session class without any HTTP cache installed by requests_cache, such as
+# the one in dc_api_wrapper, so that URLs are always checked on the server.
+_SESSION_CLASS = next(
+    cls for cls in requests.sessions.Session.__mro__
+    if cls.__module__ == 'requests.sessions' and cls.__name__ == 'Session')
+
 
 # Check the URL
 # Copied from https://github.com/datacommonsorg/schema/blob/main/test/url_checker.py
-def get_url_status(url: str, timeout: int = 30) -> (str, str):
+def get_url_status(url: str,
+                   timeout: int = 30,
+                   use_head: bool = False,
+                   session: requests.Session = None) -> (str, str):
     """Gets the status for url.
 
   Args:
     url: URL to download.
     timeout: timeout in seconds.
+    use_head: if True, a HEAD request is tried first and the URL is
+      downloaded with a GET only if the HEAD request fails.
+    session: requests.Session to reuse connections across requests.
 
   Returns:
     a tuple of (status, message)
@@ -86,28 +119,186 @@ def get_url_status(url: str, timeout: int = 30) -> (str, str):
         ('403 Forbidden', 'Access denied'),
         ('301 Moved Permanently','Redirected to https://abc.com')
   """
+    if session is None:
+        with _SESSION_CLASS() as new_session:
+            return get_url_status(url, timeout, use_head, new_session)
+    if use_head:
+        # Some servers don't support HEAD. Errors are confirmed with a GET.
+        try:
+            resp = session.head(url, timeout=timeout, allow_redirects=True)
+            if resp.status_code < 400:
+                return _get_response_status(resp)
+        except Exception:
+            pass
     try:
-        resp = requests.get(url, timeout=timeout)
-
-        # Check for redirects
-        if resp.history:
-            initial_resp = resp.history[0]
-            return (
-                str(initial_resp.status_code) + " " + initial_resp.reason
-                if initial_resp.reason else str(initial_resp.status_code),
-                'Redirected to ' + resp.url,
-            )
-
-        # Return the response code with reason
-        status = str(resp.status_code)
-        if resp.reason:
-            status += ' ' + resp.reason
-        return (status, '')
+        # Get the headers without downloading the content.
+        with session.get(url, timeout=timeout, stream=True) as resp:
+            return _get_response_status(resp)
 
     except Exception as e:
         return "ERROR", str(e)
 
 
+def _get_response_status(resp: requests.Response) -> (str, str):
+    """Returns a tuple of (status, message) for the response."""
+    # Check for redirects
+    if resp.history:
+        initial_resp = resp.history[0]
+        return (
+            str(initial_resp.status_code) + " " + initial_resp.reason
+            if initial_resp.reason else str(initial_resp.status_code),
+            'Redirected to ' + resp.url,
+        )
+
+    # Return the response code with reason
+    status = str(resp.status_code)
+    if resp.reason:
+        status += ' ' + resp.reason
+    return (status, '')
+
+
+class UrlStatusCache:
+    """Cache of URL status saved in an SQLite file.
+
+  The cache can be used in place of a dict of url to a dict with the 'status'
+  and 'message'. Entries older than the ttl are ignored on lookup and are
+  replaced when the URL is checked again.
+
+  Attributes:
+      filename: SQLite file for the cache.
+      ttl_hours: Hours after which an entry expires. 0 for no expiry.
+  """
+
+    def __init__(self, filename: str, ttl_hours: float = 0, timeout: int = 60):
+        self.filename = filename
+        self.ttl_hours = ttl_hours
+        dirname = os.path.dirname(filename)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self._db = sqlite3.connect(filename,
+                                   timeout=timeout,
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS url_status'
+                         ' (url TEXT PRIMARY KEY, status TEXT, message TEXT,'
+                         ' timestamp REAL)')
+        self._db.commit()
+        logging.info(f'Opened URL status cache {filename} with'
+                     f' {len(self)} entries')
+
+    def __len__(self) -> int:
+        return self._db.execute('SELECT COUNT(*) FROM url_status').fetchone()[0]
+
+    def get(self, url: str, default: dict = None) -> dict:
+        """Returns a dict with the status and message for the URL."""
+        row = self._db.execute(
+            'SELECT status, message, timestamp FROM url_status WHERE url = ?',
+            (url,)).fetchone()
+        if not row:
+            return default
+        status, message, timestamp = row
+        if self.ttl_hours and time.time() - timestamp > self.ttl_hours * 3600:
+            return default
+        return {'status': status, 'message': message}
+
+    def __setitem__(self, url: str, url_status: dict):
+        self.update({url: url_status})
+
+    def update(self, url_statuses: dict):
+        """Saves a dict of url to a dict with the status and message."""
+        now = time.time()
+        self._db.executemany(
+            'INSERT OR REPLACE INTO url_status'
+            ' (url, status, message, timestamp) VALUES (?, ?, ?, ?)',
+            [(url, url_status.get('status', ''), url_status.get('message',
+                                                                ''), now)
+             for url, url_status in url_statuses.items()])
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+def get_url_status_cache(config: ConfigMap = None):
+    """Returns the cache for URL status.
+
+  Args:
+    config: ConfigMap with the parameters:
+      url_status_cache: SQLite file for the cache.
+      url_status_cache_ttl_hours: Hours after which cached entries expire.
+
+  Returns:
+    UrlStatusCache if a cache file is set in the config, else a dict.
+  """
+    if config:
+        cache_file = config.get('url_status_cache', '')
+        if cache_file:
+            return UrlStatusCache(
+                cache_file, config.get('url_status_cache_ttl_hours', 24 * 7))
+    return {}
+
+
+def get_url_status_list(urls: list[str],
+                        config: ConfigMap = None,
+                        result_callback=None) -> dict:
+    """Returns the status of URLs checked concurrently.
+
+  Args:
+    urls: list of URLs to be checked.
+    config: ConfigMap with the parameters:
+      url_check_max_concurrency: Number of URLs checked in parallel.
+      url_check_max_per_host: Number of URLs checked in parallel per host.
+      url_check_timeout: Timeout in seconds per request.
+      url_check_head: if True, a HEAD request is tried before a GET.
+    result_callback: function called with (url, status, message) for each
+      URL as it is checked.
+
+  Returns:
+    dictionary of url to a tuple of (status, message).
+  """
+    if not config:
+        config = ConfigMap()
+    max_concurrency = max(1, config.get('url_check_max_concurrency', 16))
+    max_per_host = max(1, config.get('url_check_max_per_host', 2))
+    timeout = config.get('url_check_timeout', 30)
+    use_head = config.get('url_check_head', True)
+
+    # Limit the connections per host with a semaphore for each host.
+    host_semaphores = {}
+    lock = threading.Lock()
+    # Session per thread to reuse connections.
+    thread_data = threading.local()
+
+    def _check_url(url: str) -> (str, str):
+        host = urllib.parse.urlsplit(url).netloc
+        with lock:
+            semaphore = host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(max_per_host)
+                host_semaphores[host] = semaphore
+        session = getattr(thread_data, 'session', None)
+        if session is None:
+            session = _SESSION_CLASS()
+            thread_data.session = session
+        with semaphore:
+            return get_url_status(url, timeout, use_head, session)
+
+    url_status = {}
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency) as executor:
+        pending_requests = {
+            executor.submit(_check_url, url): url for url in dict.fromkeys(urls)
+        }
+        for future in concurrent.futures.as_completed(pending_requests):
+            url = pending_requests[future]
+            status, msg = future.result()
+            url_status[url] = (status, msg)
+            if result_callback:
+                result_callback(url, status, msg)
+    return url_status
+
+
 def get_url_regex(config: ConfigMap = None) -> re.Pattern:
     """Returns the compiled regex pattern for URLs."""
     if config:
@@ -217,7 +408,7 @@ def check_mcf_urls(nodes: dict[str, dict],
                    urls_allowed: set[str] = None,
                    config: ConfigMap = None,
                    counters: Counters = None,
-                   url_status_cache: dict = {}) -> list[dict]:
+                   url_status_cache: dict = None) -> list[dict]:
     """Returns the URLs that don't load for each MCF node.
 
     Args:
@@ -225,13 +416,17 @@ def check_mcf_urls(nodes: dict[str, dict],
       config: configMap with configuration parameters.
       counters: counters to be updated.
       url_status_cache: Caches status of URLs.
+        A dict or a UrlStatusCache. If None, the cache is loaded from the
+        config parameter url_status_cache.
     """
     if not config:
         config = ConfigMap()
     if counters is None:
         counters = Counters(prefix='url_checker')
+    close_cache = False
     if url_status_cache is None:
-        url_status_cache = dict()
+        url_status_cache = get_url_status_cache(config)
+        close_cache = isinstance(url_status_cache, UrlStatusCache)
     url_errors = []
     url_regex = get_url_regex(config)
     if urls_allowed is None:
@@ -242,24 +437,43 @@ def check_mcf_urls(nodes: dict[str, dict],
     counters.add_counter('total', len(nodes))
     logging.level_debug() and logging.debug(f'Checking URLs in {len(nodes)}')
     # Extract any URL in each property:value across all nodes.
-    # Check if the URL can be downloaded.
+    node_url_props = {}
+    lookup_urls = {}
     for dcid, node in nodes.items():
-        counters.add_counter('processed', 1)
         url_props = get_node_urls(node, url_regex)
+        node_url_props[dcid] = url_props
+        for url in url_props:
+            if url not in lookup_urls and not is_url_allowed(
+                    url, urls_allowed) and not url_status_cache.get(url):
+                lookup_urls[url] = True
+
+    # Check if the URLs not in the cache can be downloaded.
+    if lookup_urls:
+        logging.info(f'Checking {len(lookup_urls)} URLs')
+        counters.add_counter('url-lookups', len(lookup_urls))
+        url_statuses = {}
+
+        def _save_url_status(url: str, url_status: str, msg: str):
+            counters.add_counter(f'url-status-{url_status}', 1)
+            url_statuses[url] = {'status': url_status, 'message': msg}
+            if len(url_statuses) >= _URL_CACHE_BATCH_SIZE:
+                url_status_cache.update(url_statuses)
+                url_statuses.clear()
+
+        get_url_status_list(list(lookup_urls.keys()), config, _save_url_status)
+        url_status_cache.update(url_statuses)
+
+    for dcid, url_props in node_url_props.items():
+        counters.add_counter('processed', 1)
         for url, props in url_props.items():
             if is_url_allowed(url, urls_allowed):
                 counters.add_counter('url-allowed', 1)
                 continue
-            cached_url = url_status_cache.get(url)
-            if cached_url:
-                url_status = cached_url.get('status', '')
-                msg = cached_url.get('message', '')
+            cached_url = url_status_cache.get(url, {})
+            url_status = cached_url.get('status', '')
+            msg = cached_url.get('message', '')
+            if lookup_urls.pop(url, None) is None:
                 counters.add_counter(f'url-cache-hits-{url_status}', 1)
-            else:
-                counters.add_counter(f'url-lookups', 1)
-                url_status, msg = get_url_status(url)
-                url_status_cache[url] = {'status': url_status, 'message': msg}
-                counters.add_counter(f'url-status-{url_status}', 1)
             if url_status.startswith('200'):
                 logging.level_debug() and logging.debug(
                     f'URL: {url} in {dcid} {url_status}')
@@ -278,6 +492,8 @@ def check_mcf_urls(nodes: dict[str, dict],
                 })
                 url_errors.append(err_node)
                 counters.add_counter('error-url-status', 1)
+    if close_cache:
+        url_status_cache.close()
     return url_errors
 
 
@@ -335,8 +551,10 @@ def sanity_check_nodes(
         counters.add_counter('urls-allowlist', len(urls_allowed))
 
     # Sanity each node in all MCF files.
+    close_cache = False
     if url_cache is None:
-        url_cache = {}
+        url_cache = get_url_status_cache(config)
+        close_cache = isinstance(url_cache, UrlStatusCache)
     if context is None:
         context = {}
 
@@ -356,6 +574,8 @@ def sanity_check_nodes(
                                     url_cache)
         context['check'] = 'URL'
         _add_list_to_dict(url_errors, context, errors)
+    if close_cache:
+        url_cache.close()
 
     logging.info(
         f'Sanity checked: nodes: {len(nodes)}, spell errors: {len(spell_errors)}, URL errors: {len(url_errors)}'
@@ -390,7 +610,7 @@ def sanity_check_mcf(input_mcf: str,
 
     # Sanity each node in all MCF files.
     errors = {}
-    url_cache = {}
+    url_cache = get_url_status_cache(config)
     input_files = file_util.file_get_matching(input_mcf)
     for mcf_file in input_files:
         nodes = _get_nodes_from_file(mcf_file)
@@ -407,6 +627,8 @@ def sanity_check_mcf(input_mcf: str,
         )
         for err in file_errors.values():
             errors[len(errors)] = err
+    if isinstance(url_cache, UrlStatusCache):
+        url_cache.close()
 
     # Save errors into output file.
     output_file = config.get('schema_check_output', '')
@@ -434,6 +656,10 @@ def get_default_schema_check_config() -> dict:
         'url_allowlist': _FLAGS.url_allowlist,
         'schema_check_output': _FLAGS.schema_check_output,
         'url_regex': _FLAGS.url_regex,
+        'url_status_cache': _FLAGS.url_status_cache,
+        'url_status_cache_ttl_hours': _FLAGS.url_status_cache_ttl_hours,
+        'url_check_max_concurrency': _FLAGS.url_check_max_concurrency,
+        'url_check_max_per_host': _FLAGS.url_check_max_per_host,
     })
     return config
 
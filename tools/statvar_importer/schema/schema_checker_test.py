@@ -0,0 +1,269 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for URL checks in schema_checker.py."""
+
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import requests_cache
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(_SCRIPT_DIR)
+sys.path.append(os.path.dirname(_SCRIPT_DIR))
+sys.path.append(os.path.dirname(os.path.dirname(_SCRIPT_DIR)))
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(_SCRIPT_DIR))),
+                 'util'))
+
+from config_map import ConfigMap
+from counters import Counters
+from schema_checker import check_mcf_urls, get_url_status, get_url_status_list, UrlStatusCache
+
+
+class _TestHandler(http.server.BaseHTTPRequestHandler):
+    """Handler for test URLs that tracks requests and active connections."""
+
+    requests = []
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def do_HEAD(self):
+        if self.path.startswith('/nohead'):
+            self._respond(405)
+        else:
+            self._handle()
+
+    def do_GET(self):
+        self._handle()
+
+    def _handle(self):
+        cls = _TestHandler
+        with cls.lock:
+            cls.requests.append((self.command, self.path))
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        if self.path.startswith('/slow'):
+            time.sleep(0.05)
+        with cls.lock:
+            cls.active -= 1
+        if self.path.startswith('/missing'):
+            self._respond(404)
+        elif self.path.startswith('/redirect'):
+            self.send_response(301)
+            self.send_header('Location', '/ok')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self._respond(200)
+
+    def _respond(self, code: int):
+        body = b'test'
+        self.send_response(code)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SchemaCheckerUrlTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(('localhost', 0),
+                                                     _TestHandler)
+        cls.url = f'http://localhost:{cls.server.server_port}'
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever,
+                                             daemon=True)
+        cls.server_thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _TestHandler.requests = []
+        _TestHandler.max_active = 0
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_dir = self._tmp_dir.name
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _get_nodes(self) -> dict:
+        return {
+            'Node1': {
+                'url': f'"{self.url}/ok"',
+                'description': f'"See {self.url}/missing for details"',
+            },
+            'Node2': {
+                'url': f'{self.url}/redirect',
+                'source': f'{self.url}/nohead',
+            },
+            'Node3': {
+                'url': f'{self.url}/missing',
+                'allowedUrl': f'{self.url}/allowed/page',
+            },
+        }
+
+    def _get_expected_errors(self) -> list:
+        return [
+            {
+                'dcid': 'Node1',
+                'property': f'{self.url}/missing',
+                'url': f'{self.url}/missing',
+                'url_status': '404 Not Found',
+                'url_error_message': '',
+            },
+            {
+                'dcid': 'Node2',
+                'property': f'{self.url}/redirect',
+                'url': f'{self.url}/redirect',
+                'url_status': '301 Moved Permanently',
+                'url_error_message': f'Redirected to {self.url}/ok',
+            },
+            {
+                'dcid': 'Node3',
+                'property': f'{self.url}/missing',
+                'url': f'{self.url}/missing',
+                'url_status': '404 Not Found',
+                'url_error_message': '',
+            },
+        ]
+
+    def test_get_url_status(self):
+        for use_head in [False, True]:
+            self.assertEqual(('200 OK', ''),
+                             get_url_status(f'{self.url}/ok',
+                                            use_head=use_head))
+            self.assertEqual(('404 Not Found', ''),
+                             get_url_status(f'{self.url}/missing',
+                                            use_head=use_head))
+            self.assertEqual(('200 OK', ''),
+                             get_url_status(f'{self.url}/nohead',
+                                            use_head=use_head))
+        # HEAD is used when supported with a fallback to GET.
+        self.assertIn(('HEAD', '/ok'), _TestHandler.requests)
+        self.assertIn(('GET', '/nohead'), _TestHandler.requests)
+        status, _ = get_url_status('http://localhost:1/unknown', timeout=1)
+        self.assertEqual('ERROR', status)
+
+    def test_url_status_with_requests_cache(self):
+        # URLs are checked on the server even with a global requests_cache.
+        is_cache_installed = requests_cache.is_installed()
+        if not is_cache_installed:
+            requests_cache.install_cache(backend='memory')
+        try:
+            for _ in range(2):
+                self.assertEqual(('200 OK', ''),
+                                 get_url_status(f'{self.url}/cached'))
+            url_status = get_url_status_list([f'{self.url}/cached'])
+        finally:
+            if not is_cache_installed:
+                requests_cache.uninstall_cache()
+        self.assertEqual({f'{self.url}/cached': ('200 OK', '')}, url_status)
+        self.assertEqual([('GET', '/cached'), ('GET', '/cached'),
+                          ('HEAD', '/cached')], _TestHandler.requests)
+
+    def test_check_mcf_urls(self):
+        counters = Counters()
+        url_cache = {}
+        url_errors = check_mcf_urls(self._get_nodes(),
+                                    urls_allowed={f'{self.url}/allowed'},
+                                    counters=counters,
+                                    url_status_cache=url_cache)
+        self.assertEqual(self._get_expected_errors(), url_errors)
+        self.assertEqual(4, counters.get_counter('url-lookups'))
+        self.assertEqual(1, counters.get_counter('url-allowed'))
+        self.assertEqual({
+            'status': '200 OK',
+            'message': ''
+        }, url_cache[f'{self.url}/nohead'])
+
+        # URLs are not fetched again with the cache.
+        _TestHandler.requests = []
+        url_errors = check_mcf_urls(self._get_nodes(),
+                                    urls_allowed={f'{self.url}/allowed'},
+                                    url_status_cache=url_cache)
+        self.assertEqual(self._get_expected_errors(), url_errors)
+        self.assertEqual([], _TestHandler.requests)
+
+    def test_url_status_cache(self):
+        cache_file = os.path.join(self.tmp_dir, 'url_cache.sqlite')
+        config = ConfigMap(config_dict={
+            'url_status_cache': cache_file,
+            'url_status_cache_ttl_hours': 1,
+        })
+        url_errors = check_mcf_urls(self._get_nodes(),
+                                    urls_allowed=set(),
+                                    config=config)
+        self.assertEqual(3, len(url_errors))
+        num_requests = len(_TestHandler.requests)
+        self.assertGreater(num_requests, 0)
+
+        # The cache is shared with the next run.
+        url_errors = check_mcf_urls(self._get_nodes(),
+                                    urls_allowed=set(),
+                                    config=config)
+        self.assertEqual(3, len(url_errors))
+        self.assertEqual(num_requests, len(_TestHandler.requests))
+
+        # URLs are checked again once the cache entries expire.
+        url_cache = UrlStatusCache(cache_file, ttl_hours=1)
+        self.assertEqual(5, len(url_cache))
+        self.assertEqual({
+            'status': '404 Not Found',
+            'message': ''
+        }, url_cache.get(f'{self.url}/missing'))
+        url_cache._db.execute('UPDATE url_status SET timestamp = 0')
+        url_cache._db.commit()
+        self.assertIsNone(url_cache.get(f'{self.url}/missing'))
+        url_errors = check_mcf_urls(self._get_nodes(),
+                                    urls_allowed=set(),
+                                    config=config,
+                                    url_status_cache=url_cache)
+        self.assertEqual(3, len(url_errors))
+        self.assertGreater(len(_TestHandler.requests), num_requests)
+        url_cache.close()
+
+    def test_max_per_host(self):
+        nodes = {
+            f'Node{index}': {
+                'url': f'{self.url}/slow/{index}'
+            } for index in range(20)
+        }
+        config = ConfigMap(config_dict={
+            'url_check_max_concurrency': 10,
+            'url_check_max_per_host': 2,
+        })
+        url_errors = check_mcf_urls(nodes,
+                                    urls_allowed=set(),
+                                    config=config,
+                                    url_status_cache={})
+        self.assertEqual([], url_errors)
+        self.assertEqual(20, len(_TestHandler.requests))
+        self.assertLessEqual(_TestHandler.max_active, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,6 +14,7 @@
 """Utility for semantic text search using embeddings."""
 
 import csv
+import hashlib
 import os
 import pickle
 import sys
@@ -22,6 +23,7 @@ import time
 from absl import app
 from absl import flags
 from absl import logging
+import numpy as np
 
 _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(_SCRIPT_DIR)
@@ -42,6 +44,12 @@ flags.DEFINE_string('semantic_matcher_output', '',
                     'Output file with results per query.')
 flags.DEFINE_string('semantic_matcher_model', 'all-MiniLM-L6-v2',
                     'Output file with results per query.')
+flags.DEFINE_string(
+    'semantic_matcher_embeddings_dir', '',
+    'Directory for corpus embeddings saved by hash of the corpus.')
+flags.DEFINE_integer(
+    'semantic_matcher_ann_lists', 0,
+    'Number of clusters for approximate search. 0 for exact search.')
 flags.DEFINE_bool('semantic_matcher_debug', False, 'Enable debug logs.')
 
 import file_util
@@ -79,6 +87,8 @@ class SemanticMatcher:
         self._key_values = dict()
         self._corpus = list()
         self._corpus_embeddings = None
+        # EmbeddingsIndex for corpus embeddings.
+        self._corpus_index = None
 
         # Embeddings matcher
         self._embedder = None
@@ -100,7 +110,8 @@ class SemanticMatcher:
             cache = pickle.load(file)
         self._key_values = cache.get('key_values')
         self._corpus = cache.get('corpus')
-        self._corpus_embeddings = cache.get('embeddings')
+        self._corpus_embeddings = _get_normalized_embeddings(
+            cache.get('embeddings'))
         logging.info(
             f'Loaded {len(self._corpus)} sentences from cache {cache_file}')
         self.init_transformer()
@@ -152,16 +163,10 @@ class SemanticMatcher:
         if self.is_initialized():
             return
 
-        # Import modules needed when running SemanticMatcher
-        # This is not imported in import-executor automation
-        # that calls stvtar processor, but doesn't need semantic matching.
-        from sentence_transformers import SentenceTransformer, util
-
-        model = self._config.get('embeddings_model', 'all-MiniLM-L6-v2')
-        logging.info(f'Creating SentenceTransformer with {model}')
-        self._embedder = SentenceTransformer(model)
-        self._semantic_search_util = util.semantic_search
+        self._embedder = self._load_embedder()
 
+        if self._corpus_embeddings is None:
+            self._corpus_embeddings = self.load_corpus_embeddings()
         if self._corpus_embeddings is None:
             logging.info(
                 f'Generating embeddings for corpus {len(self._corpus)}')
@@ -170,8 +175,75 @@ class SemanticMatcher:
                                        len(self._corpus))
             logging.info(
                 f'Created corpus embeddings for {len(self._corpus)} keys')
+            self.save_corpus_embeddings()
             self.save_corpus_to_cache(
                 self._config.get('semantic_matcher_cache'))
+        self._corpus_index = EmbeddingsIndex(
+            self._corpus_embeddings,
+            num_lists=self._config.get('semantic_matcher_ann_lists', 0),
+            num_probes=self._config.get('semantic_matcher_ann_probes', 8))
+
+    def _load_embedder(self):
+        """Returns the SentenceTransformer model to encode text."""
+        # Import modules needed when running SemanticMatcher
+        # This is not imported in import-executor automation
+        # that calls stvtar processor, but doesn't need semantic matching.
+        from sentence_transformers import SentenceTransformer
+
+        model = self._config.get('embeddings_model', 'all-MiniLM-L6-v2')
+        logging.info(f'Creating SentenceTransformer with {model}')
+        return SentenceTransformer(model)
+
+    def get_corpus_hash(self) -> str:
+        """Returns a hash of the model and corpus sentences."""
+        corpus_hash = hashlib.sha256(
+            self._config.get('embeddings_model', '').encode())
+        for sentence in self._corpus:
+            corpus_hash.update(b'\n')
+            corpus_hash.update(sentence.encode())
+        return corpus_hash.hexdigest()[:16]
+
+    def _get_corpus_embeddings_file(self) -> str:
+        embeddings_dir = self._config.get('semantic_matcher_embeddings_dir', '')
+        if not embeddings_dir:
+            return ''
+        return os.path.join(embeddings_dir,
+                            f'embeddings-{self.get_corpus_hash()}.npy')
+
+    def load_corpus_embeddings(self) -> np.ndarray:
+        """Returns corpus embeddings saved earlier for the same corpus.
+
+    The embeddings are loaded from a float16 numpy file named by the hash of
+    the corpus in semantic_matcher_embeddings_dir, memory mapped.
+    """
+        embeddings_file = self._get_corpus_embeddings_file()
+        if not embeddings_file or not os.path.exists(embeddings_file):
+            return None
+        embeddings = np.load(embeddings_file, mmap_mode='r')
+        if len(embeddings) != len(self._corpus):
+            logging.error(f'Ignoring embeddings in {embeddings_file} with'
+                          f' {len(embeddings)} rows for'
+                          f' {len(self._corpus)} corpus sentences')
+            return None
+        logging.info(
+            f'Loaded {len(embeddings)} corpus embeddings from {embeddings_file}'
+        )
+        self._counters.add_counter('semantic_matcher_corpus_embeddings_loaded',
+                                   len(embeddings))
+        return embeddings
+
+    def save_corpus_embeddings(self):
+        """Saves the corpus embeddings as float16 file named by corpus hash."""
+        embeddings_file = self._get_corpus_embeddings_file()
+        if not embeddings_file or self._corpus_embeddings is None:
+            return
+        os.makedirs(os.path.dirname(embeddings_file), exist_ok=True)
+        # Write to a temporary file so a partial file is never loaded.
+        tmp_file = embeddings_file + '.tmp.npy'
+        np.save(tmp_file, self._corpus_embeddings.astype(np.float16))
+        os.replace(tmp_file, embeddings_file)
+        logging.info(f'Saved {len(self._corpus_embeddings)} corpus embeddings'
+                     f' into {embeddings_file}')
 
     def lookup(self, key: str, num_results: int = 10) -> list:
         """Returns a list of tuples [(key, value)...] matching the key.
@@ -181,73 +253,96 @@ class SemanticMatcher:
         num_results: max results to return
       Returns
         list of tuples of (key, value) ordered by score.
+      """
+        return self.lookup_many([key], num_results)[0]
+
+    def lookup_many(self, keys: list, num_results: int = 10) -> list:
+        """Returns a list of matches for each key.
+
+      The embeddings for all keys are generated in batches and searched in
+      the corpus together.
+
+      Args:
+        keys: list of strings to lookup
+        num_results: max results to return per key
+      Returns
+        list with a list of tuples of (key, value) ordered by score for
+        each key in the input.
       """
         self.init_transformer()
-        if not key:
-            return []
+        query_keys = list(dict.fromkeys(key for key in keys if key))
+        if not query_keys:
+            return [[] for key in keys]
 
         # Get the query embeddings.
-        query_embedding = self.get_query_embedding(key)
-        if query_embedding is None:
-            logging.error(f'Unable to get embeddings for query: {key}')
-            return []
+        query_embeddings = self.get_query_embeddings(query_keys)
 
         # Lookup query embeddings in corpus
         start_time = time.perf_counter()
-        matches = self._semantic_search_util(query_embedding,
-                                             self._corpus_embeddings,
-                                             top_k=num_results)
+        matches = self._corpus_index.search(query_embeddings, num_results)
         end_time = time.perf_counter()
         logging.level_debug() and logging.debug(
-            f'Got semantic search result for {key}: {matches}')
-        if matches is None:
-            self._counters.add_counter(f'semantic_search_lookup_failures', 1)
-            return []
+            f'Got semantic search result for {query_keys}: {matches}')
 
         # Get values for corpus matches
-        results = []
-        for match in matches[0]:
-            corpus_id = match.get('corpus_id', '')
-            key = self._corpus[corpus_id]
-            value = self._key_values.get(key, None)
-            if key and value is not None:
-                results.append((key, value))
+        query_results = {}
+        for query, query_matches in zip(query_keys, matches):
+            results = []
+            for corpus_id, score in query_matches:
+                key = self._corpus[corpus_id]
+                value = self._key_values.get(key, None)
+                if key and value is not None:
+                    results.append((key, value))
+            query_results[query] = results
+            self._counters.add_counter(
+                f'semantic_search_lookup_results_{len(results)}', 1)
 
         # Update counters
-        self._counters.add_counter(f'semantic_search_lookups', 1)
-        self._counters.add_counter(
-            f'semantic_search_lookup_results_{len(results)}', 1)
-        query_time = end_time - start_time
+        self._counters.add_counter(f'semantic_search_lookups', len(query_keys))
+        self._counters.add_counter('semantic_search_lookup_time',
+                                   end_time - start_time)
         tot_query_time = self._counters.get_counter(
             'semantic_search_lookup_time')
-        tot_query_time += query_time
         tot_lookups = self._counters.get_counter('semantic_search_lookups')
         avg_time = tot_query_time / tot_lookups
         self._counters.set_counter(f'semantic_search_avg_lookup_time', avg_time)
-        return results
+        return [query_results.get(key, []) for key in keys]
 
-    def get_query_embedding(self, key: str) -> str:
+    def get_query_embedding(self, key: str) -> np.ndarray:
         """Returns the embedding for the query, building it if not set in cache."""
-        query_embedding = self._query_embeddings.get(key)
-        if query_embedding is not None:
-            self._counters.add_counter('semantic_matcher_query_cache_hits', 1)
-            return query_embedding
-
-        # Create embeddings for the query.
-        query_embedding = self.get_embeddings(key)
-        self._query_embeddings[key] = query_embedding
-        self._counters.add_counter('semantic_matcher_query_embeddings', 1)
-        return query_embedding
-
-    def get_embeddings(self, text) -> str:
-        """Returns the embeddings for the text."""
+        return self.get_query_embeddings([key])[0]
+
+    def get_query_embeddings(self, keys: list) -> np.ndarray:
+        """Returns an array of embeddings for the queries.
+
+      Embeddings not in the cache are generated together in batches.
+      """
+        new_keys = [key for key in keys if key not in self._query_embeddings]
+        self._counters.add_counter('semantic_matcher_query_cache_hits',
+                                   len(keys) - len(new_keys))
+        if new_keys:
+            # Create embeddings for the queries.
+            embeddings = self.get_embeddings(new_keys)
+            for key, embedding in zip(new_keys, embeddings):
+                self._query_embeddings[key] = embedding
+            self._counters.add_counter('semantic_matcher_query_embeddings',
+                                       len(new_keys))
+        return np.stack([self._query_embeddings[key] for key in keys])
+
+    def get_embeddings(self, text) -> np.ndarray:
+        """Returns the normalized embeddings for the text as float32 arrays."""
         start_time = time.perf_counter()
-        embeddings = self._embedder.encode(text, convert_to_tensor=True)
+        embeddings = self._embedder.encode(text,
+                                           batch_size=self._config.get(
+                                               'semantic_matcher_batch_size',
+                                               64),
+                                           convert_to_numpy=True,
+                                           normalize_embeddings=True)
         end_time = time.perf_counter()
         self._counters.add_counter(f'semantic_matcher_encode_time',
                                    end_time - start_time)
         self._counters.add_counter(f'semantic_matcher_encode_calls', 1)
-        return embeddings
+        return np.asarray(embeddings, dtype=np.float32)
 
     # Returns True if sentence transformer is initialized.
     # More key values cannot be added once initialized.
@@ -255,14 +350,157 @@ class SemanticMatcher:
         return self._embedder is not None
 
 
+class EmbeddingsIndex:
+    """Index of normalized embeddings to search by cosine similarity.
+
+  Searches all embeddings by default. For large corpora, an inverted file
+  index (IVF) can be built by clustering the embeddings into num_lists
+  clusters with k-means. A search then only scores the embeddings in the
+  num_probes clusters closest to the query.
+  """
+
+    def __init__(self,
+                 embeddings: np.ndarray,
+                 num_lists: int = 0,
+                 num_probes: int = 8,
+                 chunk_size: int = 65536):
+        self._embeddings = embeddings
+        self._num_probes = num_probes
+        self._chunk_size = chunk_size
+        # IVF index with cluster centroids and the embedding ids per cluster.
+        # Ids for cluster 'c' are at _list_ids[_list_offsets[c]:
+        # _list_offsets[c+1]].
+        self._centroids = None
+        self._list_offsets = None
+        self._list_ids = None
+        if num_lists > 1 and len(embeddings) > num_lists:
+            self._build_ivf(num_lists)
+
+    def search(self, queries: np.ndarray, top_k: int = 10) -> list:
+        """Returns a list of (id, score) tuples for the top_k for each query."""
+        queries = np.asarray(queries, dtype=np.float32)
+        if self._centroids is None:
+            return self._search_all(queries, top_k)
+        return self._search_ivf(queries, top_k)
+
+    def _search_all(self, queries: np.ndarray, top_k: int) -> list:
+        """Returns the top_k matches for queries across all embeddings."""
+        top_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        top_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self._embeddings), self._chunk_size):
+            chunk = np.asarray(self._embeddings[start:start + self._chunk_size],
+                               dtype=np.float32)
+            scores = np.concatenate([top_scores, queries @ chunk.T], axis=1)
+            ids = np.concatenate([
+                top_ids,
+                np.broadcast_to(np.arange(start, start + len(chunk)),
+                                (len(queries), len(chunk)))
+            ],
+                                 axis=1)
+            top_scores, top_ids = _get_top_k(scores, ids, top_k)
+        return [
+            list(zip(ids.tolist(), scores.tolist()))
+            for ids, scores in zip(top_ids, top_scores)
+        ]
+
+    def _search_ivf(self, queries: np.ndarray, top_k: int) -> list:
+        """Returns the top_k matches for queries in the closest clusters."""
+        num_probes = min(self._num_probes, len(self._centroids))
+        centroid_scores = queries @ self._centroids.T
+        probes = np.argpartition(-centroid_scores, num_probes - 1,
+                                 axis=1)[:, :num_probes]
+        results = []
+        for query, query_probes in zip(queries, probes):
+            ids = np.concatenate([
+                self._list_ids[self._list_offsets[c]:self._list_offsets[c + 1]]
+                for c in query_probes
+            ])
+            scores = np.asarray(self._embeddings[ids], dtype=np.float32) @ query
+            top_scores, top_ids = _get_top_k(scores[np.newaxis, :],
+                                             ids[np.newaxis, :], top_k)
+            results.append(
+                list(zip(top_ids[0].tolist(), top_scores[0].tolist())))
+        return results
+
+    def _build_ivf(self, num_lists: int, num_iterations: int = 10):
+        """Clusters the embeddings with spherical k-means."""
+        start_time = time.perf_counter()
+        num_embeddings = len(self._embeddings)
+        rng = np.random.default_rng(0)
+        # Train centroids on a sample of the embeddings.
+        sample_size = min(num_embeddings, num_lists * 256)
+        sample = np.asarray(self._embeddings[np.sort(
+            rng.choice(num_embeddings, sample_size, replace=False))],
+                            dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, num_lists, replace=False)]
+        for _ in range(num_iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Retain the previous centroid for empty clusters.
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12),
+                                 centroids)
+        # Assign all embeddings to the closest centroid.
+        assignments = np.concatenate([
+            np.argmax(
+                np.asarray(self._embeddings[start:start + self._chunk_size],
+                           dtype=np.float32) @ centroids.T,
+                axis=1) for start in range(0, num_embeddings, self._chunk_size)
+        ])
+        self._centroids = centroids
+        self._list_ids = np.argsort(assignments, kind='stable')
+        self._list_offsets = np.zeros(num_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=num_lists),
+                  out=self._list_offsets[1:])
+        logging.info(f'Built IVF index with {num_lists} lists for'
+                     f' {num_embeddings} embeddings in'
+                     f' {time.perf_counter() - start_time:.2f} secs')
+
+
+def _get_top_k(scores: np.ndarray, ids: np.ndarray, top_k: int) -> tuple:
+    """Returns the top_k (scores, ids) per row ordered by decreasing score."""
+    if scores.shape[1] > top_k:
+        top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        scores = np.take_along_axis(scores, top, axis=1)
+        ids = np.take_along_axis(ids, top, axis=1)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return (np.take_along_axis(scores, order,
+                               axis=1), np.take_along_axis(ids, order, axis=1))
+
+
+def _get_normalized_embeddings(embeddings) -> np.ndarray:
+    """Returns embeddings as a numpy array with unit length rows."""
+    if embeddings is None:
+        return None
+    if hasattr(embeddings, 'cpu'):
+        # Convert torch tensors from older caches.
+        embeddings = embeddings.cpu().numpy()
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
 def get_semantic_matcher_default_config() -> dict:
     """Get default config for semantic_matcher."""
     # Use default values of flags for tests
     if not _FLAGS.is_parsed():
         _FLAGS.mark_as_parsed()
     return {
-        'embeddings_model': _FLAGS.semantic_matcher_model,
-        'semantic_matcher_cache': _FLAGS.semantic_matcher_cache,
+        'embeddings_model':
+            _FLAGS.semantic_matcher_model,
+        'semantic_matcher_cache':
+            _FLAGS.semantic_matcher_cache,
+        'semantic_matcher_embeddings_dir':
+            _FLAGS.semantic_matcher_embeddings_dir,
+        # Number of queries to encode in a batch.
+        'semantic_matcher_batch_size':
+            64,
+        # Settings for approximate search with an IVF index.
+        'semantic_matcher_ann_lists':
+            _FLAGS.semantic_matcher_ann_lists,
+        'semantic_matcher_ann_probes':
+            8,
     }
 
 
@@ -298,8 +536,8 @@ def semantic_matcher_lookup(corpus_file: str,
     logging.info(f'Looking up {len(queries)} queries from {input_file}')
     results = {}
     counters.add_counter('total', len(queries))
-    for query in queries.keys():
-        matches = semantic_matcher.lookup(query)
+    query_matches = semantic_matcher.lookup_many(list(queries.keys()))
+    for query, matches in zip(queries.keys(), query_matches):
         result = {}
         for kv in matches:
             k, v = kv
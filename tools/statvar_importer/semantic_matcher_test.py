@@ -13,11 +13,49 @@
 # limitations under the License.
 """Test for semantic_matcher.py"""
 
+import os
+import sys
+import tempfile
 import unittest
 
 from absl import app
 from absl import logging
-from semantic_matcher import SemanticMatcher
+import numpy as np
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(_SCRIPT_DIR)
+sys.path.append(os.path.dirname(_SCRIPT_DIR))
+sys.path.append(os.path.dirname(os.path.dirname(_SCRIPT_DIR)))
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(_SCRIPT_DIR)), 'util'))
+
+from config_map import ConfigMap
+from semantic_matcher import EmbeddingsIndex, SemanticMatcher
+
+
+class _CharCountEmbedder:
+    """Embedder with normalized counts of letters in the text."""
+
+    def __init__(self):
+        self.num_encoded = 0
+
+    def encode(self, text, **kwargs):
+        texts = [text] if isinstance(text, str) else text
+        self.num_encoded += len(texts)
+        embeddings = np.zeros((len(texts), 26), dtype=np.float32)
+        for row, t in enumerate(texts):
+            for c in t.lower():
+                if 'a' <= c <= 'z':
+                    embeddings[row, ord(c) - ord('a')] += 1
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.maximum(norms, 1e-12)
+        return embeddings[0] if isinstance(text, str) else embeddings
+
+
+class _TestSemanticMatcher(SemanticMatcher):
+
+    def _load_embedder(self):
+        return _CharCountEmbedder()
 
 
 class SemanticMatcherTest(unittest.TestCase):
@@ -38,3 +76,65 @@ class SemanticMatcherTest(unittest.TestCase):
         results = matcher.lookup('boy')
         # Should return list of keys, values matching the lookup string
         self.assertEqual(('child', 'age: [- 17 Years]'), results[0])
+
+    def test_lookup_many_with_saved_embeddings(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = ConfigMap({
+                'semantic_matcher_cache': '',
+                'semantic_matcher_embeddings_dir': tmp_dir
+            })
+            matcher = _TestSemanticMatcher(config)
+            for key in ['apple', 'banana', 'cherry']:
+                matcher.add_key_value(key, key.upper())
+            self.assertEqual([[('banana', 'BANANA')], [], [('apple', 'APPLE')],
+                              [('banana', 'BANANA')]],
+                             matcher.lookup_many(
+                                 ['banan', '', 'appel', 'banan'], 1))
+            # Corpus and unique queries are encoded.
+            self.assertEqual(5, matcher._embedder.num_encoded)
+            self.assertEqual(1, len(os.listdir(tmp_dir)))
+
+            # Embeddings for the same corpus are loaded from the file.
+            matcher = _TestSemanticMatcher(config)
+            for key in ['apple', 'banana', 'cherry']:
+                matcher.add_key_value(key, key.upper())
+            self.assertEqual([('cherry', 'CHERRY'), ('apple', 'APPLE')],
+                             matcher.lookup('cheery', 2))
+            self.assertEqual(1, matcher._embedder.num_encoded)
+
+
+class EmbeddingsIndexTest(unittest.TestCase):
+
+    def _get_embeddings(self, rng, num_rows):
+        embeddings = rng.normal(size=(num_rows, 16)).astype(np.float32)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    def test_search(self):
+        rng = np.random.default_rng(1)
+        embeddings = self._get_embeddings(rng, 100)
+        queries = self._get_embeddings(rng, 5)
+        index = EmbeddingsIndex(embeddings, chunk_size=30)
+        results = index.search(queries, top_k=3)
+        expected_ids = np.argsort(-(queries @ embeddings.T), axis=1)[:, :3]
+        self.assertEqual(expected_ids.tolist(),
+                         [[i for i, _ in r] for r in results])
+
+    def test_search_ivf(self):
+        rng = np.random.default_rng(1)
+        embeddings = self._get_embeddings(rng, 200).astype(np.float16)
+        queries = self._get_embeddings(rng, 5)
+        exact = EmbeddingsIndex(embeddings).search(queries, top_k=5)
+        # Probing all lists returns exact results.
+        results = EmbeddingsIndex(embeddings, num_lists=8,
+                                  num_probes=8).search(queries, top_k=5)
+        self.assertEqual([[i for i, _ in r] for r in exact],
+                         [[i for i, _ in r] for r in results])
+        # Queries that are in the corpus match themselves.
+        results = EmbeddingsIndex(embeddings, num_lists=8,
+                                  num_probes=2).search(embeddings[:5], top_k=1)
+        self.assertEqual([0, 1, 2, 3, 4], [r[0][0] for r in results])
+
+
+if __name__ == '__main__':
+    app.run()
+    unittest.main()
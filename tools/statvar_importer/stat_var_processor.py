@@ -69,7 +69,8 @@ import eval_functions
 from log_util import configure_cloud_logging, running_on_cloud
 from utils import (capitalize_first_char, is_place_dcid,
                    get_observation_date_format, get_observation_period_for_date,
-                   pvs_has_any_prop, str_from_number, prepare_input_data)
+                   parse_observation_date, pvs_has_any_prop, str_from_number,
+                   prepare_input_data)
 import file_util
 import config_flags
 import data_annotator
@@ -82,12 +83,15 @@ from mcf_file_util import get_numeric_value, get_value_list, add_pv_to_node
 from mcf_file_util import load_mcf_nodes, write_mcf_nodes, add_namespace, strip_namespace
 from mcf_filter import drop_existing_mcf_nodes
 from mcf_diff import fingerprint_node, fingerprint_mcf_nodes, diff_mcf_node_pvs
+from output_merger import merge_mcf_files, merge_svobs_csv_files
 from place_resolver import PlaceResolver
 from property_value_mapper import PropertyValueMapper
 from schema_resolver import SchemaResolver
 from json_to_csv import file_json_to_csv
 from schema_generator import generate_schema_nodes, generate_statvar_name
 from schema_checker import sanity_check_nodes
+from svobs_store import SVObsStore
+from svobs_stream import HyperLogLog, SVObsKeySet, SVObsSpool
 
 # imports from ../../util
 from config_map import ConfigMap, read_py_dict_from_file
@@ -166,7 +170,21 @@ class StatVarsMap:
             self._config.get('existing_statvar_mcf', None))
 
         # Dictionary of statvar obs_key->{PVs}
-        self._statvar_obs_map = {}
+        self._statvar_obs_map = self._new_statvar_obs_map()
+        # In streaming mode, SVObs are written to a spool on disk as they are
+        # added instead of the _statvar_obs_map.
+        self._svobs_spool = None
+        self._svobs_keys = None
+        if self._is_stream_svobs_enabled():
+            tmp_dir = self._config.get('svobs_store_tmp_dir', '')
+            self._svobs_spool = SVObsSpool(tmp_dir=tmp_dir)
+            self._svobs_keys = SVObsKeySet(expected_keys=self._config.get(
+                'stream_svobs_expected_count', 10000000),
+                                           tmp_dir=tmp_dir)
+        # Hashed keys for streamed SVObs with duplicates.
+        self._dup_svobs_keys = set()
+        # Statvars with streamed SVObs.
+        self._statvars_with_svobs = set()
         # Unique values seen per SVObs property.
         self._statvar_obs_props = dict()
         # Cache for DC API lookups.
@@ -182,6 +200,45 @@ class StatVarsMap:
             f'Loaded {len(self._statvar_dcid_remap)} remapped statvar dcids: {str(self._statvar_dcid_remap)[:200]}'
         )
 
+    def _new_statvar_obs_map(self):
+        """Returns an empty map for SVObs as per config."""
+        if not self._config.get('compact_svobs_store', False):
+            return {}
+        return SVObsStore(
+            memory_mb=self._config.get('svobs_store_memory_mb', 0),
+            raw_properties=[self._config.get('input_reference_column')],
+            tmp_dir=self._config.get('svobs_store_tmp_dir', ''),
+            counters=self._counters)
+
+    def _is_stream_svobs_enabled(self) -> bool:
+        """Returns True if SVObs can be streamed to disk as they are added.
+
+    Streaming is not supported with configs that need all SVObs in memory.
+    """
+        if not self._config.get('stream_svobs', False):
+            return False
+        for config in [
+                'aggregate_duplicate_svobs',
+                'filter_data_min_value',
+                'filter_data_max_value',
+                'filter_data_max_change_ratio',
+                'filter_data_max_yearly_change_ratio',
+                'resolve_places_batch',
+        ]:
+            if self._config.get(config, None):
+                logging.warning(f'Disabling stream_svobs for config {config}:'
+                                f' {self._config.get(config)}')
+                self._counters.add_counter('warning-stream-svobs-disabled', 1,
+                                           config)
+                return False
+        return True
+
+    def get_num_svobs(self) -> int:
+        """Returns the number of SVObs added."""
+        if self._svobs_spool is not None:
+            return len(self._svobs_spool)
+        return len(self._statvar_obs_map)
+
     def add_default_pvs(self, default_pvs: dict, pvs: dict) -> dict:
         """Add default values for any missing PVs.
 
@@ -265,6 +322,8 @@ class StatVarsMap:
                     if duplicate_prop not in map_pvs:
                         map_pvs[duplicate_prop] = []
                     map_pvs[duplicate_prop].append(pvs)
+                    # Save the updated PVs for maps that return a copy.
+                    pv_map[key] = map_pvs
                 return False
         pv_map[key] = pvs
         return True
@@ -775,6 +834,12 @@ class StatVarsMap:
             existing_svobs[dup_svobs_key] = []
         # Add the duplicate SVObs to the original SVObs.
         existing_svobs[dup_svobs_key].append(svobs)
+        self._statvar_obs_map[svobs_key] = existing_svobs
+        self.set_statvar_with_dup_svobs(svobs_key, svobs)
+
+    def set_statvar_with_dup_svobs(self, svobs_key: str, svobs: dict):
+        """Add the key for a duplicate SVObs to its statvar."""
+        dup_svobs_key = self._config.get('duplicate_svobs_key')
         statvar_dcid = strip_namespace(svobs.get('variableMeasured', None))
         if not statvar_dcid:
             logging.log_every_n(
@@ -828,7 +893,10 @@ class StatVarsMap:
             # PVs with same value are not considered same, need to be aggregated.
             allow_equal_pvs = False
         svobs_key = self.get_svobs_key(pvs)
-        if not self.add_dict_to_map(
+        if self._svobs_spool is not None:
+            if not self.stream_statvar_obs(svobs_key, pvs, svobs_aggregation):
+                return False
+        elif not self.add_dict_to_map(
                 svobs_key,
                 pvs,
                 self._statvar_obs_map,
@@ -844,6 +912,7 @@ class StatVarsMap:
                 return False
             if svobs_aggregation and self.aggregate_value(
                     svobs_aggregation, existing_svobs, pvs, 'value'):
+                self._statvar_obs_map[svobs_key] = existing_svobs
                 self._counters.add_counter(
                     f'aggregated-svobs-{svobs_aggregation}',
                     1,
@@ -874,6 +943,100 @@ class StatVarsMap:
                 value_list.append(value)
         return True
 
+    def stream_statvar_obs(self, svobs_key: str, pvs: dict,
+                           svobs_aggregation: str) -> bool:
+        """Returns True if the SVObs is added to the spool or is a duplicate
+
+    with the same PVs as the SVObs added earlier.
+    SVObs with the same key but different PVs are errors as in
+    add_statvar_obs(). They are not aggregated in the streaming mode.
+    """
+        key = hash(svobs_key)
+        fingerprint = hash(
+            tuple(
+                sorted((prop, str(value))
+                       for prop, value in self.get_valid_pvs(pvs).items())))
+        existing_fingerprint = self._svobs_keys.add(key, fingerprint)
+        if existing_fingerprint is None:
+            self._svobs_spool.append(key, pvs)
+            self._statvars_with_svobs.add(
+                strip_namespace(pvs.get('variableMeasured', '')))
+            return True
+        if not svobs_aggregation and existing_fingerprint == fingerprint:
+            return True
+        if svobs_aggregation:
+            logging.log_every_n(
+                logging.ERROR,
+                f'Unable to aggregate {svobs_aggregation} in stream mode for'
+                f' {pvs}', self._log_every_n)
+            self._counters.add_counter(f'error-stream-svobs-aggregation', 1,
+                                       pvs.get('variableMeasured', ''))
+        logging.log_every_n(logging.ERROR,
+                            f'Duplicate SVObs with mismatched values: {pvs}',
+                            self._log_every_n)
+        self._counters.add_counter(f'error-mismatched-svobs', 1,
+                                   pvs.get('variableMeasured', ''))
+        # The SVObs added earlier is dropped from the output.
+        self._dup_svobs_keys.add(key)
+        self.set_statvar_with_dup_svobs(svobs_key, pvs)
+        return False
+
+    def get_output_svobs(self):
+        """Yields the SVObs PVs to be written into the output."""
+        if self._svobs_spool is None:
+            for pvs in self._statvar_obs_map.values():
+                yield pvs
+            return
+        for key, pvs in self._svobs_spool:
+            if key in self._dup_svobs_keys or not self.is_valid_svobs(pvs):
+                self._counters.add_counter(f'dropped-invalid-svobs', 1,
+                                           self.get_svobs_key(pvs))
+                continue
+            yield pvs
+
+    def update_svobs_places(self, place_dcids: dict, place_names: dict):
+        """Updates the observationAbout for SVObs with places resolved in batch.
+
+    SVObs with a resolved place are added again with the place dcid so that
+    any duplicates are merged or aggregated as in add_statvar_obs().
+    SVObs with an unresolved place are set back to the place name if they
+    have an output column, else they are dropped.
+
+    Args:
+      place_dcids: dictionary of deferred place key to the resolved dcid.
+      place_names: dictionary of all deferred place keys to the place name.
+    """
+        svobs_map = self._statvar_obs_map
+        self._statvar_obs_map = self._new_statvar_obs_map()
+        output_columns = self._config.get('output_columns')
+        for svobs_key, pvs in svobs_map.items():
+            place = pvs.get('observationAbout', '')
+            if (place not in place_names and
+                    svobs_key not in self._statvar_obs_map):
+                self._statvar_obs_map[svobs_key] = pvs
+                continue
+            # SVObs was counted when it was first added.
+            self._counters.add_counter('svobs-added', -1,
+                                       pvs.get('variableMeasured', ''))
+            if place in place_dcids:
+                pvs['observationAbout'] = place_dcids[place]
+            elif place in place_names:
+                if not pvs_has_any_prop(pvs, output_columns):
+                    logging.log_every_n(
+                        logging.ERROR,
+                        f'Dropping SVObs {pvs} with unresolved place {place}',
+                        self._log_every_n)
+                    self._counters.add_counter(
+                        f'dropped-svobs-unresolved-place', 1,
+                        pvs.get('variableMeasured', ''))
+                    continue
+                pvs['observationAbout'] = place_names[place]
+            if not self.add_statvar_obs(pvs, has_output_column=True):
+                self._counters.add_counter(f'dropped-svobs-invalid', 1,
+                                           pvs.get('variableMeasured', ''))
+        if isinstance(svobs_map, SVObsStore):
+            svobs_map.close()
+
     def is_valid_pvs(self, pvs: dict) -> bool:
         """Returns True if there are no error PVs."""
         dup_svobs_key = self._config.get('duplicate_svobs_key')
@@ -965,7 +1128,8 @@ class StatVarsMap:
     def drop_statvars_without_svobs(self):
         """Drop any Statvars without any observations."""
         # Get statvars with observations
-        statvars_with_obs = set()
+        statvars_with_obs = set(self._statvars_with_svobs)
+        statvars_with_obs.discard('')
         for svobs_key, pvs in self._statvar_obs_map.items():
             statvar_dcid = strip_namespace(pvs.get('variableMeasured', None))
             if statvar_dcid:
@@ -1006,15 +1170,15 @@ class StatVarsMap:
                                            statvar)
         self._statvars_map = valid_statvars
 
-        # Collect valid SVObs with valid statvars.
-        valid_svobs = {}
+        # Drop invalid SVObs.
+        invalid_svobs = []
         for svobs_key, pvs in self._statvar_obs_map.items():
-            if self.is_valid_svobs(pvs):
-                valid_svobs[svobs_key] = pvs
-            else:
+            if not self.is_valid_svobs(pvs):
+                invalid_svobs.append(svobs_key)
                 self._counters.add_counter(f'dropped-invalid-svobs', 1,
                                            svobs_key)
-        self._statvar_obs_map = valid_svobs
+        for svobs_key in invalid_svobs:
+            self._statvar_obs_map.pop(svobs_key)
 
         # Drop any statvars without any observations.
         if self._config.get('drop_statvars_without_svobs', True):
@@ -1157,7 +1321,7 @@ class StatVarsMap:
 
     def get_constant_svobs_pvs(self) -> dict:
         """Return PVs that have a fixed value across SVObs."""
-        if len(self._statvar_obs_map) < 2:
+        if self.get_num_svobs() < 2:
             return {'typeOf': 'dcs:StatVarObservation'}
         pvs = {}
         for prop, value_list in self._statvar_obs_props.items():
@@ -1242,7 +1406,7 @@ class StatVarsMap:
 
         logging.log_every_n(
             logging.INFO,
-            f'Writing {len(self._statvar_obs_map)} SVObs  into {output_csv} with'
+            f'Writing {self.get_num_svobs()} SVObs  into {output_csv} with'
             f' {columns}', self._log_every_n)
         svobs_unique_values = {}
         with file_util.FileIO(output_csv, mode, newline='') as f_out_csv:
@@ -1256,23 +1420,29 @@ class StatVarsMap:
             )
             if mode == 'w':
                 csv_writer.writeheader()
-            for key, svobs in self._statvar_obs_map.items():
+            num_rows = 0
+            for svobs in self.get_output_svobs():
                 format_svobs = self.format_svobs(svobs)
                 csv_writer.writerow(format_svobs)
+                num_rows += 1
                 for p, v in svobs.items():
                     if p in columns or pv_utils.is_valid_property(
                             p, self._config.get('schemaless', False)):
                         if p not in svobs_unique_values:
-                            svobs_unique_values[p] = set()
+                            svobs_unique_values[p] = HyperLogLog()
                         svobs_unique_values[p].add(v)
 
-        self._counters.add_counter('output-svobs-csv-rows',
-                                   len(self._statvar_obs_map), output_csv)
+        self._counters.add_counter('output-svobs-csv-rows', num_rows,
+                                   output_csv)
         for p, s in svobs_unique_values.items():
-            self._counters.add_counter(f'output-svobs-unique-{p}', len(s))
+            self._counters.add_counter(f'output-svobs-unique-{p}', s.count())
 
         if output_tmcf_file:
             self.write_statvar_obs_tmcf(output_tmcf_file, columns=columns)
+        if self._svobs_spool is not None:
+            # Remove the streamed SVObs and keys on disk once written.
+            self._svobs_spool.close()
+            self._svobs_keys.close()
 
     def write_statvar_obs_tmcf(
         self,
@@ -1412,6 +1582,11 @@ class StatVarDataProcessor:
             config_dict=self._config.get_configs(),
             counters_dict=self._counters.get_counters(),
         )
+        # Places to be resolved in batch keyed by the observationAbout in SVObs.
+        self._deferred_places = {}
+        # Cache of resolved date and period keyed by
+        # (date, input date format, output date format).
+        self._resolved_dates = {}
         # Regex for references within values, such as, '@Variable' or '{Variable}'
         self._reference_pattern = re.compile(
             r'@([a-zA-Z0-9_]{3,}+)\b|{([a-zA-Z0-9_]+)}')
@@ -1901,10 +2076,12 @@ class StatVarDataProcessor:
             self._counters.set_counter(f'processing-input-rows-rate', line_rate,
                                        filename)
 
+        # Resolve any places deferred for batch mode.
+        self.resolve_deferred_places()
+
         # Filter outlisers
         self._statvars_map.filter_svobs()
 
-        # TODO: resolve svobs place in batch mode.
         time_end = time.perf_counter()
         rows_processed = self._counters.get_counter('input-rows-processed')
         time_taken = time_end - time_start
@@ -1991,13 +2168,18 @@ class StatVarDataProcessor:
         # Create a list of keys to be looked up in pvmap in order
         # starting with the cell value followed by cell index.
         # If any key resturns a pvmap, use that.
-        keys = [value]
-        keys.append(f'Cell:{row_index}:{col_index+1}')
-        keys.append(f'Column:{col_index+1}')
-        keys.append(f'Row:{row_index}')
-        for key in keys:
-            pv_list = self._pv_mapper.get_all_pvs_for_value(
-                key, self.get_last_column_header_key(col_index))
+        # Lookups for keys that don't depend on the row are cached.
+        keys = [(value, True)]
+        keys.append((f'Cell:{row_index}:{col_index+1}', False))
+        keys.append((f'Column:{col_index+1}', True))
+        keys.append((f'Row:{row_index}', False))
+        namespace = self.get_last_column_header_key(col_index)
+        for key, use_cache in keys:
+            if use_cache:
+                pv_list = self._pv_mapper.get_all_pvs_for_value_cached(
+                    key, namespace)
+            else:
+                pv_list = self._pv_mapper.get_all_pvs_for_value(key, namespace)
             if pv_list:
                 logging.level_debug() and logging.log_every_n(
                     logging.DEBUG,
@@ -2633,6 +2815,60 @@ class StatVarDataProcessor:
                 return None
         return statvar_dcid
 
+    def defer_svobs_place(self, pvs: dict, place: str) -> bool:
+        """Sets the SVObs place to be resolved later by resolve_deferred_places().
+
+    The observationAbout is set to a key for the place name along with any
+    country or administrative area hints in the SVObs.
+    """
+        country = pvs.get('#country', self._config.get('maps_api_country',
+                                                       None))
+        administrative_area = pvs.get(
+            '#administrative_area',
+            self._config.get('maps_api_administrative_area', None))
+        place_key = place
+        if '#country' in pvs or '#administrative_area' in pvs:
+            place_key = f'{place}#{country}#{administrative_area}'
+        if place_key not in self._deferred_places:
+            self._deferred_places[place_key] = {
+                'place_name': place,
+                'country': country,
+                'administrative_area': administrative_area,
+            }
+            self._counters.add_counter('deferred-places', 1)
+        pvs['observationAbout'] = place_key
+        return True
+
+    def resolve_deferred_places(self):
+        """Resolves all places deferred in batch mode and updates the SVObs.
+
+    SVObs with places that can't be resolved are dropped unless they have
+    output columns.
+    """
+        if not self._deferred_places:
+            return
+        logging.info(f'Resolving {len(self._deferred_places)} places in batch')
+        resolved_places = self._place_resolver.resolve_name(
+            self._deferred_places)
+        place_dcids = {}
+        for place_key, place in self._deferred_places.items():
+            resolved_dcid = resolved_places.get(place_key, {}).get('dcid', None)
+            if resolved_dcid:
+                place_dcids[place_key] = add_namespace(resolved_dcid)
+                self._counters.add_counter(f'resolved-places', 1)
+            else:
+                logging.log_every_n(
+                    logging.WARNING,
+                    f'Unable to resolve place {place["place_name"]}',
+                    self._log_every_n)
+                self._counters.add_counter(f'error-unresolved-place', 1,
+                                           place['place_name'])
+        self._statvars_map.update_svobs_places(place_dcids, {
+            key: place['place_name']
+            for key, place in self._deferred_places.items()
+        })
+        self._deferred_places = {}
+
     def resolve_svobs_place(self, pvs: dict) -> bool:
         """Resolve any references in the StatVarObs PVs, such as places."""
         place = pvs.get('observationAbout', None)
@@ -2642,6 +2878,9 @@ class StatVarDataProcessor:
             self._counters.add_counter(f'warning-svobs-missing-place', 1,
                                        pvs.get('variableMeasured', ''))
             return False
+        if place in self._deferred_places:
+            # Place will be resolved in batch.
+            return True
         if is_place_dcid(place):
             # Place is a resolved dcid or a place property.
             return True
@@ -2657,6 +2896,9 @@ class StatVarDataProcessor:
             place_dcid = place_pvs.get('observationAbout', '')
         if not is_place_dcid(place_dcid):
             # Place is not resolved yet. Try resolving through Maps API.
+            if self._config.get('resolve_places', False) and self._config.get(
+                    'resolve_places_batch', False):
+                return self.defer_svobs_place(pvs, place_dcid)
             if self._config.get('resolve_places', False):
                 resolved_place = self._place_resolver.resolve_name({
                     place_dcid: {
@@ -2700,29 +2942,68 @@ class StatVarDataProcessor:
         if not date:
             # No date to resolve
             return True
+        output_date_format = self._config.get('observation_date_format', '')
+        input_date_format = pvs.get(
+            self._config.get('date_format_key', '#DateFormat'),
+            self._config.get('date_format'),
+        )
+        # Lookup the date in the cache of dates resolved earlier.
+        cache_key = (date, input_date_format, output_date_format)
+        resolved = self._resolved_dates.get(cache_key)
+        if resolved is None:
+            self._counters.add_counter('observation-date-cache-misses', 1)
+            resolved = self.format_date(date, input_date_format,
+                                        output_date_format)
+            if len(self._resolved_dates) < self._config.get(
+                    'observation_date_cache_size', 100000):
+                self._resolved_dates[cache_key] = resolved
+        else:
+            self._counters.add_counter('observation-date-cache-hits', 1)
+        resolved_date, period = resolved
+        if not resolved_date:
+            return False
+
+        # Got a valid date
+        pvs['observationDate'] = resolved_date
+
+        # Set the observation period based on date, if empty
+        if pvs.get('observationPeriod') == '' and period:
+            pvs['observationPeriod'] = period
+            logging.level_debug() and logging.log_every_n(
+                logging.DEBUG,
+                f'Setting observationPeriod for {resolved_date} to {period}',
+                self._log_every_n)
+
+        return True
+
+    def format_date(self, date: str, input_date_format: str,
+                    output_date_format: str) -> tuple:
+        """Returns a tuple (date, observationPeriod) for the formatted date.
+
+    The date is empty if it can't be formatted into output_date_format.
+    """
         # Convert any non alpha numeric characters to space
         date_normalized = re.sub(r'[^A-Za-z0-9]+', '-', date).strip('-')
-        output_date_format = self._config.get('observation_date_format', '')
-        obs_period = pvs.get('observationPeriod')
         if not output_date_format:
             output_date_format = get_observation_date_format(date_normalized)
         # Check if date is already formatted as expected
-        try:
-            resolved_date = datetime.datetime.strptime(
-                date_normalized,
-                output_date_format).strftime(output_date_format)
-        except ValueError as e:
-            # Date is not in expected format. Try formatting it.
-            logging.log_every_n(
-                2, f'Formatting date {date} into {output_date_format}',
-                self._log_every_n)
-            resolved_date = ''
+        resolved_date = parse_observation_date(date_normalized,
+                                               output_date_format)
+        if resolved_date:
+            self._counters.add_counter('observation-date-fast-parsed', 1)
+        else:
+            try:
+                resolved_date = datetime.datetime.strptime(
+                    date_normalized,
+                    output_date_format).strftime(output_date_format)
+            except ValueError as e:
+                # Date is not in expected format. Try formatting it.
+                logging.log_every_n(
+                    2, f'Formatting date {date} into {output_date_format}',
+                    self._log_every_n)
+                resolved_date = ''
         if not resolved_date:
             # If input has a date format, parse date string by input format
-            input_date_format = pvs.get(
-                self._config.get('date_format_key', '#DateFormat'),
-                self._config.get('date_format'),
-            )
             if input_date_format:
                 try:
                     resolved_date = datetime.datetime.strptime(
@@ -2743,23 +3024,8 @@ class StatVarDataProcessor:
             resolved_date = eval_functions.format_date(date_normalized,
                                                        output_date_format)
         if not resolved_date:
-            return False
-
-        # Got a valid date
-        pvs['observationDate'] = resolved_date
-
-        # Set the observation period based on date, if empty
-        if obs_period == '':
-            period = get_observation_period_for_date(resolved_date,
-                                                     pvs['observationPeriod'])
-            if period:
-                pvs['observationPeriod'] = period
-                logging.level_debug() and logging.log_every_n(
-                    logging.DEBUG,
-                    f'Setting observationPeriod for {resolved_date} to {period}',
-                    self._log_every_n)
-
-        return True
+            return ('', '')
+        return (resolved_date, get_observation_period_for_date(resolved_date))
 
     def write_outputs(self, output_path: str):
         """Generate output mcf, csv and tmcf."""
@@ -2808,6 +3074,54 @@ class StatVarDataProcessor:
         return outputs
 
 
+def _merge_shard_counters(counters: dict, shard_counters: dict):
+    """Merge counters from a parallel shard into the counters dict.
+
+    Counters for processing time, rates and memory are set to the max across
+    shards. All other numeric counters are added up.
+    """
+    if counters is None or not shard_counters:
+        return
+    for name, value in shard_counters.items():
+        if not isinstance(value, (int, float)):
+            continue
+        if name.endswith('start_time'):
+            continue
+        if ('elapsed_time' in name or 'rate' in name or 'remaining' in name or
+                '-mem' in name):
+            counters[name] = max(counters.get(name, value), value)
+        else:
+            counters[name] = counters.get(name, 0) + value
+
+
+def _process_shard(shard_args: dict) -> dict:
+    """Process a single input shard in a worker process.
+
+    Returns a dict with the status and counters for the shard that is
+    returned to the parent process.
+    """
+    process_args = shard_args['process_args']
+    counters = {}
+    process_args['counters'] = counters
+    result = {
+        'shard_index': shard_args['shard_index'],
+        'input_data': process_args['input_data'],
+        'output_path': process_args['output_path'],
+        'status': False,
+        'error': '',
+    }
+    start_time = time.perf_counter()
+    try:
+        result['status'] = process(**process_args)
+    except Exception as e:
+        logging.exception(
+            f'Failed to process shard {process_args["input_data"]}')
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['counters'] = counters
+    result['time_seconds'] = time.perf_counter() - start_time
+    return result
+
+
 def parallel_process(
     data_processor_class: StatVarDataProcessor,
     input_data: list,
@@ -2817,61 +3131,121 @@ def parallel_process(
     counters: dict = None,
     parallelism: int = 0,
 ) -> bool:
-    """Process files in parallel, calling process() for each input file."""
+    """Process files in parallel, calling process() for each input file.
+
+    All input files are scheduled on a pool of worker processes and results are
+    collected as each shard completes. Counters from each shard are merged into
+    the counters dict.
+
+    Returns:
+      True if all shards were processed without errors.
+    """
     if not parallelism:
         parallelism = os.cpu_count()
+    if counters is None:
+        counters = {}
     logging.info(
         f'Processing {input_data} with {parallelism} parallel processes.')
-    # Invoke process() for each input file in parallel.
     input_files = file_util.file_get_matching(input_data)
     num_inputs = len(input_files)
-    with multiprocessing.get_context('spawn').Pool(parallelism) as pool:
-        for input_index in range(num_inputs):
-            input_file = input_files[input_index]
-            if not output_path:
-                fd, output_path = tempfile.mkstemp()
-            output_file_path = f'{output_path}-{input_index:05d}-of-{num_inputs:05d}'
-            logging.info(f'Processing {input_file} into {output_file_path}...')
-            process_args = {
+    if not output_path:
+        fd, output_path = tempfile.mkstemp()
+    # Disable parallelism and input sharding within each shard.
+    shard_config = dict(config)
+    shard_config['parallelism'] = 0
+    shard_args = []
+    for input_index in range(num_inputs):
+        output_file_path = f'{output_path}-{input_index:05d}-of-{num_inputs:05d}'
+        shard_args.append({
+            'shard_index': input_index,
+            'process_args': {
                 'data_processor_class': data_processor_class,
-                'input_data': [input_file],
+                'input_data': [input_files[input_index]],
                 'output_path': output_file_path,
-                'config': config,
+                'config': shard_config,
                 'pv_map_files': pv_map_files,
-                'counters': counters,
                 'parallelism': 0,
-            }
-            task = pool.apply_async(process, kwds=process_args)
-            task.get()
+            },
+        })
+
+    # Invoke process() for each input file in parallel.
+    failed_shards = []
+    num_completed = 0
+    time_start = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(
+            min(parallelism, max(num_inputs, 1))) as pool:
+        for result in pool.imap_unordered(_process_shard, shard_args):
+            num_completed += 1
+            _merge_shard_counters(counters, result.get('counters'))
+            shard_status = 'completed'
+            if result['error']:
+                failed_shards.append(result)
+                shard_status = 'failed'
+                counters['error-parallel-shards-failed'] = len(failed_shards)
+            elif not result['status']:
+                shard_status = 'completed with errors'
+            logging.info(
+                f'Shard {num_completed}/{num_inputs} {shard_status}:'
+                f' {result["input_data"]} into {result["output_path"]} in'
+                f' {result["time_seconds"]:.2f} secs {result["error"]}')
         pool.close()
         pool.join()
+    counters['parallel-shards-processed'] = num_completed
+    counters['parallel-processing-time-seconds'] = (time.perf_counter() -
+                                                    time_start)
+    if failed_shards:
+        logging.error(f'Failed to process {len(failed_shards)} of'
+                      f' {num_inputs} shards:'
+                      f' {[r["input_data"] for r in failed_shards]}')
 
     # Merge statvar mcf files into a single mcf output.
-    mcf_files = f'{output_path}-*-of-*.mcf'
-    statvar_nodes = load_mcf_nodes(mcf_files)
+    merge_counters = Counters(counters_dict=counters, prefix='5:merge_output_')
+    mcf_files = sorted(
+        file_util.file_get_matching(
+            f'{output_path}-*-of-{num_inputs:05d}*.mcf'))
     output_mcf_file = f'{output_path}.mcf'
     commandline = ' '.join(sys.argv)
     header = (f'# Auto generated using command: "{commandline}" on'
               f' {datetime.datetime.now()}\n')
-    write_mcf_nodes(
-        node_dicts=[statvar_nodes],
-        filename=output_mcf_file,
-        mode='w',
-        sort=True,
-        header=header,
-    )
-    logging.info(
-        f'Merged {len(statvar_nodes)} stat var MCF nodes from {mcf_files} into'
-        f' {output_mcf_file}.')
-
-    # Create a common TMCF from output, removing the shard suffix.
-    with file_util.FileIO(f'{output_path}-00000-of-{num_inputs:05d}.tmcf',
-                          mode='r') as tmcf:
-        tmcf_node = tmcf.read()
-        tmcf_node = re.sub(r'-[0-9]*-of-[0-9]*', '', tmcf_node)
-        with file_util.FileIO(f'{output_path}.tmcf', mode='w') as output_tmcf:
-            output_tmcf.write(tmcf_node)
-    logging.info(f'Generated TMCF {output_path}.tmcf')
+    merge_mcf_files(mcf_files,
+                    output_mcf_file,
+                    header=header,
+                    counters=merge_counters)
+
+    # Merge the SVObs csv files and generate a common TMCF.
+    csv_files = []
+    tmcf_files = []
+    for input_index in range(num_inputs):
+        shard_path = f'{output_path}-{input_index:05d}-of-{num_inputs:05d}'
+        if file_util.file_get_matching(f'{shard_path}.csv'):
+            csv_files.append(f'{shard_path}.csv')
+            tmcf_files.append(f'{shard_path}.tmcf')
+    if not csv_files:
+        logging.error(f'No SVObs CSV generated for {output_path}')
+        return False
+    # Use StatVarsMap to aggregate and format duplicate SVObs across shards.
+    statvars_map_config = dict(config)
+    statvars_map_config['existing_statvar_mcf'] = ''
+    statvars_map_config['statvar_dcid_remap_csv'] = ''
+    statvars_map = StatVarsMap(config_dict=statvars_map_config,
+                               counters_dict=counters)
+    merge_svobs_csv_files(csv_files,
+                          tmcf_files,
+                          f'{output_path}.csv',
+                          f'{output_path}.tmcf',
+                          config=config,
+                          counters=merge_counters,
+                          aggregate_func=statvars_map.aggregate_value,
+                          format_func=statvars_map.format_svobs)
+    # Check if there were any errors, including errors in the merge.
+    merge_error_prefix = merge_counters.get_prefix() + 'err'
+    error_counters = [
+        f'{c}={v}' for c, v in counters.items()
+        if c.startswith('err') or c.startswith(merge_error_prefix)
+    ]
+    if error_counters:
+        logging.info(f'Error Counters: {error_counters}')
+        return False
     return True
 
 
@@ -2906,6 +3280,16 @@ def process(
             logging.info(f'Creating output directory: {output_dir}')
             os.makedirs(output_dir, exist_ok=True)
     parallelism = config_dict.get('parallelism', parallelism)
+    aggregation = config_dict.get('aggregate_duplicate_svobs')
+    if parallelism > 1 and len(input_files) > 1 and str(
+            aggregation).lower() == 'mean':
+        # The mean can't be merged across shards without the counts per shard.
+        logging.warning(f'Processing {input_files} sequentially for'
+                        f' aggregation {aggregation}.')
+        if counters is None:
+            counters = {}
+        counters['warning-parallel-process-disabled-for-mean'] = 1
+        parallelism = 1
     if parallelism <= 1 or len(input_files) <= 1:
         logging.info(f'Processing data {input_files} into {output_path}...')
         if pv_map_files:
@@ -14,9 +14,11 @@
 """Unit tests for stat_var_processor.py."""
 
 import os
+import shutil
 import sys
 import tempfile
 import unittest
+from unittest import mock
 
 from absl import app
 from absl import logging
@@ -29,9 +31,13 @@ sys.path.append(os.path.dirname(os.path.dirname(_SCRIPT_DIR)))
 sys.path.append(
     os.path.join(os.path.dirname(os.path.dirname(_SCRIPT_DIR)), 'util'))
 
+from config_flags import get_default_config
 from counters import Counters
+import file_util
 from mcf_diff import diff_mcf_files
-from stat_var_processor import StatVarDataProcessor, process
+from mcf_file_util import load_mcf_nodes, normalize_mcf_node
+from stat_var_processor import StatVarDataProcessor, StatVarsMap, process
+from place_resolver import PlaceResolver
 
 
 class TestStatVarProcessor(unittest.TestCase):
@@ -141,6 +147,242 @@ class TestStatVarProcessor(unittest.TestCase):
             # for file in output_files.keys():
             #    os.remove(file)
 
+    def test_parallel_process_row_shards(self):
+        file_prefix = os.path.join(_SCRIPT_DIR, 'test_data',
+                                   'us_census_EC1200A1-2022-09-15')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Copy the input into tmp_dir as shards are created alongside it.
+            test_input = os.path.join(tmp_dir, 'input.csv')
+            shutil.copy(f'{file_prefix}_input.csv', test_input)
+            test_output = os.path.join(tmp_dir, 'output')
+            config = file_util.file_load_py_dict(f'{file_prefix}_config.py')
+            config['parallelism'] = 2
+            config['shard_input_by_rows'] = 10
+            counters = {}
+            self.assertTrue(
+                process(
+                    data_processor_class=self.data_processor_class,
+                    input_data=[test_input],
+                    output_path=test_output,
+                    config=config,
+                    pv_map_files=[f'{file_prefix}_pv_map.py'],
+                    counters=counters,
+                ))
+            # Input with 29 data rows is split into 3 shards.
+            self.assertEqual(
+                3,
+                len(file_util.file_get_matching(f'{tmp_dir}/input-rows-*.csv')))
+            self.assertEqual(3, counters.get('parallel-shards-processed'))
+            self.assertEqual(
+                3, counters.get('1:process_input_input-files-processed'))
+            # Shard outputs are merged into a single output.
+            self.compare_files(
+                {test_output + '.csv': f'{file_prefix}_output.csv'})
+            self.assertTrue(os.path.exists(test_output + '.tmcf'))
+            merged_nodes = load_mcf_nodes(test_output + '.mcf')
+            expected_nodes = load_mcf_nodes(
+                f'{file_prefix}_output_stat_vars.mcf')
+            for dcid, node in expected_nodes.items():
+                self.assertEqual(normalize_mcf_node(node),
+                                 normalize_mcf_node(merged_nodes.get(dcid)))
+
+    def test_parallel_process_mean(self):
+        # Aggregation by mean is not merged across shards.
+        file_prefix = os.path.join(_SCRIPT_DIR, 'test_data',
+                                   'us_census_EC1200A1-2022-09-15')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_input = os.path.join(tmp_dir, 'input.csv')
+            shutil.copy(f'{file_prefix}_input.csv', test_input)
+            test_output = os.path.join(tmp_dir, 'output')
+            config = file_util.file_load_py_dict(f'{file_prefix}_config.py')
+            config['parallelism'] = 2
+            config['shard_input_by_rows'] = 10
+            config['aggregate_duplicate_svobs'] = 'mean'
+            counters = {}
+            process(
+                data_processor_class=self.data_processor_class,
+                input_data=[test_input],
+                output_path=test_output,
+                config=config,
+                pv_map_files=[f'{file_prefix}_pv_map.py'],
+                counters=counters,
+            )
+            self.assertEqual(
+                1, counters.get('warning-parallel-process-disabled-for-mean'))
+            self.assertIsNone(counters.get('parallel-shards-processed'))
+            self.assertTrue(os.path.exists(test_output + '.csv'))
+
+    def test_resolve_places_batch(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_input = os.path.join(tmp_dir, 'input.csv')
+            with open(test_input, 'w') as file:
+                file.write('County,Year,Total Persons\n'
+                           'Kings County CA,2020,100\n'
+                           'Kings County CA,2021,110\n'
+                           'Orange County CA,2020,200\n'
+                           'Nowhere,2020,300\n')
+            pv_map = os.path.join(tmp_dir, 'pv_map.py')
+            with open(pv_map, 'w') as file:
+                file.write(
+                    str({
+                        'Kings County CA': {
+                            'observationAbout': 'Kings County CA'
+                        },
+                        'Orange County CA': {
+                            'observationAbout': 'Orange County CA'
+                        },
+                        'Nowhere': {
+                            'observationAbout': 'Nowhere'
+                        },
+                        'Year': {
+                            'observationDate': '@Number'
+                        },
+                        'Total Persons': {
+                            'value': '@Number',
+                            'populationType': 'dcs:Person',
+                            'measuredProperty': 'dcs:count',
+                        },
+                    }))
+            test_output = os.path.join(tmp_dir, 'output')
+            counters = {}
+            with mock.patch.object(PlaceResolver, 'resolve_name') as resolve:
+                resolve.return_value = {
+                    'Kings County CA': {
+                        'dcid': 'geoId/06031'
+                    },
+                    'Orange County CA': {
+                        'dcid': 'geoId/06059'
+                    },
+                }
+                self.assertTrue(
+                    process(
+                        data_processor_class=self.data_processor_class,
+                        input_data=[test_input],
+                        output_path=test_output,
+                        config={
+                            'resolve_places': True,
+                            'resolve_places_batch': True,
+                        },
+                        pv_map_files=[pv_map],
+                        counters=counters,
+                    ))
+            # All places are resolved in a single call.
+            resolve.assert_called_once()
+            self.assertEqual(['Kings County CA', 'Orange County CA', 'Nowhere'],
+                             list(resolve.call_args.args[0].keys()))
+            df = pd.read_csv(test_output + '.csv')
+            self.assertEqual([['dcid:geoId/06031', 2020, 100],
+                              ['dcid:geoId/06031', 2021, 110],
+                              ['dcid:geoId/06059', 2020, 200]], df[[
+                                  'observationAbout', 'observationDate', 'value'
+                              ]].values.tolist())
+            self.assertEqual(1, counters.get('dropped-svobs-unresolved-place'))
+
+    def test_resolve_svobs_date(self):
+        counters = {}
+        processor = self.data_processor_class(config_dict={},
+                                              counters_dict=counters)
+        for _ in range(3):
+            pvs = {'observationDate': '2023/5/1', 'observationPeriod': ''}
+            self.assertTrue(processor.resolve_svobs_date(pvs))
+            self.assertEqual(
+                {
+                    'observationDate': '2023-05-01',
+                    'observationPeriod': 'P1D'
+                }, pvs)
+        # Dates in other formats are parsed with the input date format.
+        pvs = {'observationDate': 'May 2023', '#DateFormat': '%b-%Y'}
+        self.assertTrue(processor.resolve_svobs_date(pvs))
+        self.assertEqual('2023-05', pvs['observationDate'])
+        self.assertFalse(
+            processor.resolve_svobs_date({'observationDate': 'unknown'}))
+        self.assertEqual(2, counters.get('observation-date-cache-hits'))
+        self.assertEqual(3, counters.get('observation-date-cache-misses'))
+        self.assertEqual(1, counters.get('observation-date-fast-parsed'))
+
+    def test_stream_svobs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_input = os.path.join(tmp_dir, 'input.csv')
+            with open(test_input, 'w') as file:
+                file.write('Place,Year,Total Persons,Total Households\n'
+                           'USA,2020,100,10\n'
+                           'USA,2021,110,11\n'
+                           'USA,2021,110,11\n'
+                           'USA,2021,120,11\n')
+            pv_map = os.path.join(tmp_dir, 'pv_map.py')
+            with open(pv_map, 'w') as file:
+                file.write(
+                    str({
+                        'USA': {
+                            'observationAbout': 'dcid:country/USA'
+                        },
+                        'Year': {
+                            'observationDate': '@Number'
+                        },
+                        'Total Persons': {
+                            'value': '@Number',
+                            'populationType': 'dcs:Person',
+                            'measuredProperty': 'dcs:count',
+                        },
+                        'Total Households': {
+                            'value': '@Number',
+                            'populationType': 'dcs:Household',
+                            'measuredProperty': 'dcs:count',
+                        },
+                    }))
+            outputs = {}
+            for stream_svobs in [False, True]:
+                test_output = os.path.join(tmp_dir, f'output_{stream_svobs}')
+                counters = {}
+                # Returns False for the errors with duplicate SVObs.
+                process(
+                    data_processor_class=self.data_processor_class,
+                    input_data=[test_input],
+                    output_path=test_output,
+                    config={
+                        'stream_svobs': stream_svobs,
+                        'stream_svobs_expected_count': 1000,
+                    },
+                    pv_map_files=[pv_map],
+                    counters=counters,
+                )
+                outputs[stream_svobs] = test_output
+                self.assertEqual(1, counters.get('error-mismatched-svobs'))
+            # Streamed SVObs are the same as the ones kept in memory.
+            # Count_Person with mismatched SVObs for 2021 is dropped.
+            self.compare_csv_files(
+                {outputs[True] + '.csv': outputs[False] + '.csv'})
+            self.assertEqual([['dcid:Count_Person', 2020, 100],
+                              ['dcid:Count_Household', 2020, 10],
+                              ['dcid:Count_Household', 2021, 11]],
+                             pd.read_csv(outputs[True] + '.csv')[[
+                                 'variableMeasured', 'observationDate', 'value'
+                             ]].values.tolist())
+
+    def test_stream_svobs_close(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            svobs_tmp_dir = os.path.join(tmp_dir, 'svobs')
+            os.makedirs(svobs_tmp_dir)
+            config = get_default_config()
+            config.update({
+                'stream_svobs': True,
+                'stream_svobs_expected_count': 1000,
+                'svobs_store_tmp_dir': svobs_tmp_dir,
+            })
+            statvars_map = StatVarsMap(config_dict=config)
+            self.assertTrue(
+                statvars_map.add_statvar_obs({
+                    'observationAbout': 'dcid:country/USA',
+                    'observationDate': '2020',
+                    'variableMeasured': 'dcid:Count_Person',
+                    'value': 100,
+                }))
+            self.assertTrue(os.listdir(svobs_tmp_dir))
+            statvars_map.write_statvar_obs_csv(
+                os.path.join(tmp_dir, 'output.csv'))
+            # Streamed SVObs on disk are removed once written.
+            self.assertEqual([], os.listdir(svobs_tmp_dir))
+
     # Test processing of sample files.
     def test_process(self):
         logging.info(f'Testing inputs: {self.test_files}')
@@ -0,0 +1,149 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Class to find all keys that are substrings of a text in a single pass.
+
+The keys are compiled into an Aho-Corasick automaton so that a lookup takes
+time proportional to the length of the text and the number of matches
+instead of the number of keys.
+
+Example:
+  index = SubstringIndex(['Male', 'Total', 'Total Males'])
+  index.find_keys('Total Males 18 Years')
+  # returns keys in the text, longest first:
+  # ['Total Males', 'Total', 'Male']
+
+  # Keys can be added later. The automaton is rebuilt on the next lookup.
+  index.add_keys(['Years'])
+"""
+
+from collections import deque
+
+
+class SubstringIndex:
+    """Aho-Corasick automaton over a set of string keys."""
+
+    def __init__(self, keys: list = None, ignore_case: bool = False):
+        self._ignore_case = ignore_case
+        # List of keys in the order added. The position is the key id.
+        self._keys = []
+        # Dictionary of key to key id.
+        self._key_ids = {}
+        # Trie of states. Each state has a dict of char to next state,
+        # a failure link, a list of key ids that end at the state and
+        # a link to the next state along the failure chain with keys.
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+        self._output_link = [0]
+        self._is_built = True
+        if keys:
+            self.add_keys(keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add_key(self, key: str) -> int:
+        """Adds a key to the index and returns the id for the key."""
+        key_id = self._key_ids.get(key)
+        if key_id is not None:
+            return key_id
+        key_id = len(self._keys)
+        self._keys.append(key)
+        self._key_ids[key] = key_id
+        state = 0
+        for char in self._normalize(key):
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._output_link.append(0)
+            state = next_state
+        self._outputs[state].append(key_id)
+        self._is_built = False
+        return key_id
+
+    def add_keys(self, keys: list):
+        """Adds a list of keys to the index."""
+        for key in keys:
+            self.add_key(key)
+
+    def build(self):
+        """Computes the failure links for the automaton.
+
+    New keys can change the failure links for existing states, so the links
+    are recomputed for all states after keys are added.
+    """
+        if self._is_built:
+            return
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            self._output_link[state] = 0
+            queue.append(state)
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fail_state = self._fail[state]
+                while fail_state and char not in self._goto[fail_state]:
+                    fail_state = self._fail[fail_state]
+                fail_state = self._goto[fail_state].get(char, 0)
+                self._fail[next_state] = fail_state
+                if self._outputs[fail_state]:
+                    self._output_link[next_state] = fail_state
+                else:
+                    self._output_link[next_state] = self._output_link[
+                        fail_state]
+                queue.append(next_state)
+        self._is_built = True
+
+    def find_key_ids(self, text: str) -> set:
+        """Returns the set of ids for keys that are substrings of text."""
+        self.build()
+        key_ids = set(self._outputs[0])
+        state = 0
+        for char in self._normalize(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            output_state = state
+            while output_state:
+                key_ids.update(self._outputs[output_state])
+                output_state = self._output_link[output_state]
+        return key_ids
+
+    def find_keys(self, text: str) -> list:
+        """Returns the keys that are substrings of text.
+
+    Keys are ordered by length, longest first, with keys of the same length
+    in the order they were added.
+    """
+        return [
+            self._keys[key_id]
+            for key_id in sorted(self.find_key_ids(text), key=self._rank)
+        ]
+
+    def get_key_rank(self, key: str) -> tuple:
+        """Returns the sort order for a key used in find_keys()."""
+        return self._rank(self._key_ids[key])
+
+    def _rank(self, key_id: int) -> tuple:
+        return (-len(self._keys[key_id]), key_id)
+
+    def _normalize(self, text: str) -> str:
+        if self._ignore_case:
+            return text.lower()
+        return text
@@ -0,0 +1,65 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for substring_index.py."""
+
+import os
+import random
+import sys
+import unittest
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(_SCRIPT_DIR)
+
+from substring_index import SubstringIndex
+
+
+class SubstringIndexTest(unittest.TestCase):
+
+    def test_find_keys(self):
+        index = SubstringIndex(['Male', 'Total', 'Total Males', 'Female'])
+        self.assertEqual(['Total Males', 'Female', 'Total', 'Male'],
+                         index.find_keys('Total Males and Females'))
+        self.assertEqual([], index.find_keys('total'))
+        self.assertEqual([], index.find_keys(''))
+
+    def test_ignore_case(self):
+        index = SubstringIndex(['Male', 'TOTAL'], ignore_case=True)
+        self.assertEqual(['TOTAL', 'Male'], index.find_keys('total males'))
+
+    def test_add_keys(self):
+        index = SubstringIndex(['abc'])
+        self.assertEqual(['abc'], index.find_keys('xabcd'))
+        # New keys that are suffixes of existing keys update failure links.
+        index.add_keys(['bcd', 'c', 'abc'])
+        self.assertEqual(3, len(index))
+        self.assertEqual(['abc', 'bcd', 'c'], index.find_keys('xabcd'))
+        self.assertLess(index.get_key_rank('abc'), index.get_key_rank('bcd'))
+
+    def test_matches_substring_search(self):
+        rand = random.Random(1)
+        keys = [
+            ''.join(rand.choice('abc ')
+                    for _ in range(rand.randint(1, 5)))
+            for _ in range(100)
+        ]
+        index = SubstringIndex(keys)
+        for _ in range(100):
+            text = ''.join(
+                rand.choice('abcd ') for _ in range(rand.randint(0, 20)))
+            self.assertEqual(set(k for k in keys if k in text),
+                             set(index.find_keys(text)))
+
+
+if __name__ == '__main__':
+    unittest.main()
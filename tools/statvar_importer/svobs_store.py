@@ -0,0 +1,324 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compact store for StatVar observations.
+
+SVObsStore is a dictionary of SVObs key to a dict of property:values that
+uses less memory than a dict per observation:
+  - Keys are stored as the 64-bit hash of the SVObs key string.
+    SVObs with different keys but the same hash are treated as duplicates.
+  - Each property is a column with one entry per SVObs.
+    Values are interned and the column is an array of value ids, except for
+    properties with mostly unique values, such as 'value', that are kept as
+    a list of values.
+  - Once the SVObs in memory exceed a budget, they are moved into a
+    sqlite database on disk and looked up from there.
+
+The dict of PVs returned for an SVObs is a copy. Any changes to it have to be
+saved back with store[key] = pvs.
+
+Usage:
+  svobs_map = SVObsStore(memory_mb=1024)
+  svobs_map[svobs_key] = {'observationAbout': 'dcid:geoId/06', 'value': 10}
+  for key, pvs in svobs_map.items():
+    ...
+"""
+
+import array
+import collections.abc
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+
+from absl import logging
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(_SCRIPT_DIR)
+sys.path.append(os.path.dirname(_SCRIPT_DIR))
+sys.path.append(os.path.dirname(os.path.dirname(_SCRIPT_DIR)))
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(_SCRIPT_DIR)), 'util'))
+
+from counters import Counters
+
+# Properties with mostly unique values that are not interned.
+_DEFAULT_RAW_PROPERTIES = ['value', '#input']
+
+# Approximate bytes used per SVObs in memory excluding the columns.
+_ROW_BYTES = 120
+# Approximate bytes used per column entry.
+_COLUMN_BYTES = 8
+
+# Marker for a missing value in a raw column.
+_MISSING = object()
+
+# Number of SVObs read from disk at a time.
+_SPILL_BATCH_SIZE = 10000
+
+
+class SVObsStore(collections.abc.MutableMapping):
+    """Dictionary of SVObs key to PVs with interned values and disk spill.
+
+  Keys can be the SVObs key string or the integer key returned when iterating
+  over the store. Insertion order is preserved.
+
+  Attributes:
+      memory_mb: Approximate memory in MB for SVObs beyond which SVObs are
+        moved to disk. 0 to keep all SVObs in memory.
+  """
+
+    def __init__(self,
+                 memory_mb: int = 0,
+                 raw_properties: list = None,
+                 tmp_dir: str = '',
+                 counters: Counters = None):
+        self.memory_mb = memory_mb
+        self._raw_props = set(_DEFAULT_RAW_PROPERTIES)
+        if raw_properties:
+            self._raw_props.update(raw_properties)
+        self._tmp_dir = tmp_dir
+        self._counters = counters
+        if self._counters is None:
+            self._counters = Counters()
+        # Interned values with the id as the index into _values.
+        # Id 0 is for missing values.
+        self._values = [None]
+        self._value_ids = {}
+        # Columns for each property in memory. Each column is an array of
+        # value ids or a list of values for raw properties.
+        self._columns = {}
+        # Dictionary of key to row index in the columns.
+        self._index = {}
+        self._num_rows = 0
+        # Database for SVObs moved to disk.
+        self._db = None
+        self._db_dir = None
+        self._num_spilled = 0
+
+    def __len__(self) -> int:
+        return len(self._index) + self._num_spilled
+
+    def __contains__(self, key) -> bool:
+        key = self._get_key(key)
+        if key in self._index:
+            return True
+        return self._num_spilled > 0 and self._db_has_key(key)
+
+    def __getitem__(self, key) -> dict:
+        key = self._get_key(key)
+        row = self._index.get(key)
+        if row is not None:
+            return self._get_row(row)
+        if self._num_spilled:
+            record = self._db_get_record(key)
+            if record is not None:
+                return self._decode_record(record)
+        raise KeyError(key)
+
+    def __setitem__(self, key, pvs: dict):
+        key = self._get_key(key)
+        row = self._index.get(key)
+        if row is not None:
+            self._set_row(row, pvs)
+            return
+        if self._num_spilled and self._db_has_key(key):
+            self._db.execute('UPDATE svobs SET record = ? WHERE key = ?',
+                             (self._encode_record(pvs), key))
+            return
+        self._index[key] = self._add_row(pvs)
+        if self.memory_mb and self._get_memory_bytes(
+        ) > self.memory_mb * 1024 * 1024:
+            self.spill()
+
+    def __delitem__(self, key):
+        key = self._get_key(key)
+        if self._index.pop(key, None) is not None:
+            return
+        if self._num_spilled:
+            cursor = self._db.execute('DELETE FROM svobs WHERE key = ?', (key,))
+            if cursor.rowcount:
+                self._num_spilled -= 1
+                return
+        raise KeyError(key)
+
+    def __iter__(self):
+        for key, _ in self._iter_items(decode=False):
+            yield key
+
+    def items(self):
+        """Yields tuples of (key, pvs) for all SVObs in insertion order."""
+        return self._iter_items(decode=True)
+
+    def spill(self):
+        """Moves all SVObs in memory to the database on disk."""
+        if not self._index:
+            return
+        if self._db is None:
+            self._db_dir = tempfile.TemporaryDirectory(
+                dir=self._tmp_dir or None)
+            self._db = sqlite3.connect(
+                os.path.join(self._db_dir.name, 'svobs.db'))
+            self._db.execute('PRAGMA journal_mode = OFF')
+            self._db.execute('PRAGMA synchronous = OFF')
+            self._db.execute('CREATE TABLE svobs (seq INTEGER PRIMARY KEY,'
+                             ' key INTEGER UNIQUE, record BLOB)')
+        logging.info(f'Moving {len(self._index)} SVObs to disk in'
+                     f' {self._db_dir.name}')
+        self._db.executemany('INSERT INTO svobs (key, record) VALUES (?, ?)',
+                             ((key, self._encode_record(self._get_row(row)))
+                              for key, row in self._index.items()))
+        self._db.commit()
+        self._counters.add_counter('svobs-store-spilled', len(self._index))
+        self._num_spilled += len(self._index)
+        self._index = {}
+        self._columns = {}
+        self._num_rows = 0
+
+    def close(self):
+        """Removes any SVObs on disk."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            self._db_dir.cleanup()
+            self._db_dir = None
+            self._num_spilled = 0
+
+    def _get_key(self, key) -> int:
+        if isinstance(key, int):
+            return key
+        return hash(key)
+
+    def _get_memory_bytes(self) -> int:
+        # Rows for deleted SVObs are freed only when moved to disk.
+        return self._num_rows * (_ROW_BYTES +
+                                 _COLUMN_BYTES * len(self._columns))
+
+    def _get_value_id(self, value) -> int:
+        # Values are interned with the type so that 1, 1.0 and True that are
+        # equal are returned as the value that was added.
+        value_key = (type(value), value)
+        value_id = self._value_ids.get(value_key)
+        if value_id is None:
+            value_id = len(self._values)
+            self._values.append(value)
+            self._value_ids[value_key] = value_id
+        return value_id
+
+    def _add_column(self, prop: str, value) -> list:
+        """Returns a new column for the property with missing values."""
+        if prop in self._raw_props or not _is_hashable(value):
+            column = [_MISSING] * self._num_rows
+        else:
+            column = array.array('I', bytes(4 * self._num_rows))
+        self._columns[prop] = column
+        return column
+
+    def _set_value(self, prop: str, row: int, value):
+        column = self._columns.get(prop)
+        if column is None:
+            column = self._add_column(prop, value)
+        if isinstance(column, list):
+            column[row] = value
+        elif _is_hashable(value):
+            column[row] = self._get_value_id(value)
+        else:
+            # Convert the column to a list for values that can't be interned.
+            column = [
+                self._values[value_id] if value_id else _MISSING
+                for value_id in column
+            ]
+            column[row] = value
+            self._columns[prop] = column
+
+    def _add_row(self, pvs: dict) -> int:
+        row = self._num_rows
+        self._num_rows += 1
+        for column in self._columns.values():
+            column.append(_MISSING if isinstance(column, list) else 0)
+        for prop, value in pvs.items():
+            self._set_value(prop, row, value)
+        return row
+
+    def _set_row(self, row: int, pvs: dict):
+        for prop, column in self._columns.items():
+            if prop not in pvs:
+                column[row] = _MISSING if isinstance(column, list) else 0
+        for prop, value in pvs.items():
+            self._set_value(prop, row, value)
+
+    def _get_row(self, row: int) -> dict:
+        pvs = {}
+        for prop, column in self._columns.items():
+            value = column[row]
+            if isinstance(column, list):
+                if value is not _MISSING:
+                    pvs[prop] = value
+            elif value:
+                pvs[prop] = self._values[value]
+        return pvs
+
+    def _encode_record(self, pvs: dict) -> bytes:
+        # Interned values are saved as ids and the rest as is.
+        record = []
+        for prop, value in pvs.items():
+            if prop not in self._raw_props and _is_hashable(value):
+                record.append((prop, self._get_value_id(value), True))
+            else:
+                record.append((prop, value, False))
+        return pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _decode_record(self, record: bytes) -> dict:
+        pvs = {}
+        for prop, value, is_interned in pickle.loads(record):
+            pvs[prop] = self._values[value] if is_interned else value
+        return pvs
+
+    def _db_has_key(self, key: int) -> bool:
+        return self._db.execute('SELECT 1 FROM svobs WHERE key = ?',
+                                (key,)).fetchone() is not None
+
+    def _db_get_record(self, key: int) -> bytes:
+        result = self._db.execute('SELECT record FROM svobs WHERE key = ?',
+                                  (key,)).fetchone()
+        if result is None:
+            return None
+        return result[0]
+
+    def _iter_items(self, decode: bool):
+        # SVObs on disk were added before the ones in memory.
+        if self._num_spilled:
+            last_seq = 0
+            while True:
+                rows = self._db.execute(
+                    'SELECT seq, key, record FROM svobs WHERE seq > ?'
+                    ' ORDER BY seq LIMIT ?',
+                    (last_seq, _SPILL_BATCH_SIZE)).fetchall()
+                if not rows:
+                    break
+                for seq, key, record in rows:
+                    yield key, self._decode_record(record) if decode else None
+                last_seq = rows[-1][0]
+        # Copy the index to allow changes while iterating.
+        for key, row in list(self._index.items()):
+            if self._index.get(key) == row:
+                yield key, self._get_row(row) if decode else None
+
+
+def _is_hashable(value) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
@@ -0,0 +1,136 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for svobs_store.py."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(_SCRIPT_DIR)
+sys.path.append(os.path.dirname(_SCRIPT_DIR))
+sys.path.append(os.path.dirname(os.path.dirname(_SCRIPT_DIR)))
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(_SCRIPT_DIR)), 'util'))
+
+from counters import Counters
+from svobs_store import SVObsStore
+
+
+def _get_svobs(index: int) -> dict:
+    return {
+        'observationAbout': f'dcid:geoId/{index % 10:02d}',
+        'observationDate': str(2000 + index // 10),
+        'variableMeasured': 'dcid:Count_Person',
+        'value': index,
+    }
+
+
+class SVObsStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_dir = self._tmp_dir.name
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _check_store(self, store: SVObsStore, expected: dict):
+        self.assertEqual(len(expected), len(store))
+        self.assertEqual([store._get_key(key) for key in expected],
+                         list(store.keys()))
+        self.assertEqual(list(expected.values()),
+                         [pvs for _, pvs in store.items()])
+        for key, pvs in expected.items():
+            self.assertIn(key, store)
+            self.assertEqual(pvs, store[key])
+        self.assertNotIn('missing', store)
+        self.assertIsNone(store.get('missing'))
+
+    def test_store(self):
+        store = SVObsStore()
+        expected = {}
+        for index in range(100):
+            expected[f'key{index}'] = _get_svobs(index)
+            store[f'key{index}'] = _get_svobs(index)
+        self._check_store(store, expected)
+        # Values are interned except for raw properties.
+        self.assertEqual(10 + 10 + 1 + 1, len(store._values))
+
+        # Update an SVObs with new and deleted properties.
+        pvs = store['key5']
+        pvs.pop('observationDate')
+        pvs['#MergedSVObs'] = [_get_svobs(200)]
+        pvs['measurementMethod'] = 'dcs:DataCommonsAggregate'
+        store['key5'] = pvs
+        expected['key5'] = pvs
+        del store['key7']
+        expected.pop('key7')
+        self.assertEqual(_get_svobs(8), store.pop('key8'))
+        expected.pop('key8')
+        with self.assertRaises(KeyError):
+            del store['key8']
+        self._check_store(store, expected)
+
+    def test_value_types(self):
+        store = SVObsStore()
+        values = {'a': 1, 'b': 1.0, 'c': True, 'd': (1, [2]), 'e': (1, [2])}
+        for key, value in values.items():
+            store[key] = {'observationDate': value}
+        for key, value in values.items():
+            date = store[key]['observationDate']
+            # Equal values of different types are not merged.
+            self.assertIs(type(value), type(date))
+            self.assertEqual(value, date)
+
+    def test_spill(self):
+        counters = Counters()
+        store = SVObsStore(memory_mb=0.01,
+                           tmp_dir=self.tmp_dir,
+                           counters=counters)
+        expected = {}
+        for index in range(200):
+            expected[f'key{index}'] = _get_svobs(index)
+            store[f'key{index}'] = _get_svobs(index)
+        self.assertGreater(counters.get_counter('svobs-store-spilled'), 0)
+        self.assertTrue(os.listdir(self.tmp_dir))
+        self._check_store(store, expected)
+
+        # Update and delete SVObs on disk and in memory.
+        for key in ['key1', 'key199']:
+            pvs = store[key]
+            pvs['value'] = 0
+            pvs['#ErrorDuplicateSVObs'] = [_get_svobs(300)]
+            store[key] = pvs
+            expected[key] = pvs
+        for key in ['key2', 'key198']:
+            del store[key]
+            expected.pop(key)
+        self._check_store(store, expected)
+
+        # Changes while iterating over the SVObs.
+        for key, pvs in store.items():
+            if pvs['value'] % 2:
+                del store[key]
+        self._check_store(store, {
+            key: pvs for key, pvs in expected.items() if not pvs['value'] % 2
+        })
+
+        store.close()
+        self.assertFalse(os.listdir(self.tmp_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Classes to emit StatVar observations without keeping them in memory.
+
+In the streaming mode of the StatVarProcessor, SVObs are written to disk as
+they are generated with memory that doesn't grow with the number of SVObs:
+  - SVObsSpool: file on disk with SVObs appended as they are added.
+  - SVObsKeySet: set of SVObs keys to detect duplicates. A bloom filter in
+    memory avoids lookups on disk for new keys.
+  - HyperLogLog: approximate count of unique values for a column.
+
+Usage:
+  key_set = SVObsKeySet()
+  spool = SVObsSpool()
+  for key, pvs in svobs:
+    if key_set.add(hash(key), fingerprint(pvs)) is None:
+      spool.append(key, pvs)
+  for key, pvs in spool:
+    ...
+"""
+
+import math
+import os
+import pickle
+import sqlite3
+import tempfile
+
+_MASK64 = (1 << 64) - 1
+
+# Number of keys added to SVObsKeySet before they are saved to disk.
+_KEY_SET_BATCH_SIZE = 10000
+
+
+def _hash64(value) -> int:
+    """Returns a 64-bit hash with the bits mixed for the value."""
+    if isinstance(value, (list, dict, set)):
+        value = str(value)
+    # Mix the bits as hash() for small numbers is the number itself.
+    h = hash(value) & _MASK64
+    h ^= h >> 33
+    h = (h * 0xff51afd7ed558ccd) & _MASK64
+    h ^= h >> 33
+    h = (h * 0xc4ceb9fe1a85ec53) & _MASK64
+    h ^= h >> 33
+    return h
+
+
+class HyperLogLog:
+    """Approximate count of unique values.
+
+  Values are counted exactly until there are max_exact_values after which a
+  HyperLogLog sketch with 2^precision registers is used. The standard error
+  of the count for the sketch is about 1.04/sqrt(2^precision).
+
+  Attributes:
+      precision: Number of bits of the hash used for the register index.
+      max_exact_values: Number of unique values counted exactly.
+  """
+
+    def __init__(self, precision: int = 12, max_exact_values: int = 1000):
+        self.precision = precision
+        self.max_exact_values = max_exact_values
+        self._values = set()
+        self._registers = None
+
+    def add(self, value):
+        if self._registers is None:
+            if isinstance(value, (list, dict, set)):
+                value = str(value)
+            self._values.add(value)
+            if len(self._values) > self.max_exact_values:
+                self._registers = bytearray(1 << self.precision)
+                for exact_value in self._values:
+                    self._add_hash(_hash64(exact_value))
+                self._values = None
+            return
+        self._add_hash(_hash64(value))
+
+    def count(self) -> int:
+        """Returns the number of unique values added."""
+        if self._registers is None:
+            return len(self._values)
+        num_registers = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / num_registers)
+        estimate = alpha * num_registers * num_registers / sum(
+            2.0**-r for r in self._registers)
+        num_zeros = self._registers.count(0)
+        if estimate <= 2.5 * num_registers and num_zeros:
+            # Use linear counting for small counts.
+            estimate = num_registers * math.log(num_registers / num_zeros)
+        return int(round(estimate))
+
+    def _add_hash(self, h: int):
+        index = h >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        rank = remaining_bits - (h &
+                                 ((1 << remaining_bits) - 1)).bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+
+class SVObsKeySet:
+    """Set of SVObs keys with a fingerprint of the SVObs PVs.
+
+  Keys and fingerprints are 64-bit signed integers, such as from hash().
+
+  Keys are saved in a sqlite database on disk. A bloom filter in memory
+  tracks the keys added so that the database is looked up only for keys that
+  may have been added before.
+
+  Attributes:
+      expected_keys: Number of keys for a false positive rate of about 1% in
+        the bloom filter. More keys can be added with more lookups on disk.
+  """
+
+    def __init__(self, expected_keys: int = 10000000, tmp_dir: str = ''):
+        self.expected_keys = expected_keys
+        # Bloom filter with 10 bits per key and 7 hashes.
+        self._num_bits = max(expected_keys * 10, 1024)
+        self._num_hashes = 7
+        self._bits = bytearray((self._num_bits + 7) // 8)
+        # Keys added recently that are not saved to the database.
+        self._pending = {}
+        self._num_keys = 0
+        self._db_dir = tempfile.TemporaryDirectory(dir=tmp_dir or None)
+        self._db = sqlite3.connect(os.path.join(self._db_dir.name, 'keys.db'))
+        self._db.execute('PRAGMA journal_mode = OFF')
+        self._db.execute('PRAGMA synchronous = OFF')
+        self._db.execute('CREATE TABLE svobs_keys (key INTEGER PRIMARY KEY,'
+                         ' fingerprint INTEGER)')
+
+    def __len__(self) -> int:
+        return self._num_keys
+
+    def add(self, key: int, fingerprint: int) -> int:
+        """Adds the key if it is new.
+
+    Args:
+      key: integer key for the SVObs.
+      fingerprint: integer for the SVObs PVs.
+
+    Returns:
+      The fingerprint added earlier for the key or None if the key is new.
+    """
+        bit_positions = self._get_bit_positions(key)
+        if all(self._bits[pos >> 3] & (1 << (pos & 7))
+               for pos in bit_positions):
+            existing = self._get_fingerprint(key)
+            if existing is not None:
+                return existing
+        for pos in bit_positions:
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self._pending[key] = fingerprint
+        self._num_keys += 1
+        if len(self._pending) >= _KEY_SET_BATCH_SIZE:
+            self._save_pending()
+        return None
+
+    def close(self):
+        """Removes the keys on disk."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            self._db_dir.cleanup()
+
+    def _get_bit_positions(self, key: int) -> list:
+        h = _hash64(key)
+        h1 = h & 0xffffffff
+        h2 = h >> 32
+        return [(h1 + i * h2) % self._num_bits for i in range(self._num_hashes)]
+
+    def _get_fingerprint(self, key: int) -> int:
+        fingerprint = self._pending.get(key)
+        if fingerprint is not None:
+            return fingerprint
+        result = self._db.execute(
+            'SELECT fingerprint FROM svobs_keys WHERE key = ?',
+            (key,)).fetchone()
+        if result is None:
+            return None
+        return result[0]
+
+    def _save_pending(self):
+        self._db.executemany(
+            'INSERT INTO svobs_keys (key, fingerprint) VALUES (?, ?)',
+            self._pending.items())
+        self._db.commit()
+        self._pending = {}
+
+
+class SVObsSpool:
+    """File on disk with SVObs appended as a tuple of (key, pvs).
+
+  The SVObs are returned in the order added when iterating over the spool.
+  """
+
+    def __init__(self, tmp_dir: str = ''):
+        self._file = tempfile.TemporaryFile(dir=tmp_dir or None)
+        self._num_svobs = 0
+
+    def __len__(self) -> int:
+        return self._num_svobs
+
+    def append(self, key, pvs: dict):
+        pickle.dump((key, pvs), self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._num_svobs += 1
+
+    def __iter__(self):
+        self._file.flush()
+        offset = self._file.tell()
+        self._file.seek(0)
+        try:
+            for _ in range(self._num_svobs):
+                yield pickle.load(self._file)
+        finally:
+            self._file.seek(offset)
+
+    def close(self):
+        self._file.close()
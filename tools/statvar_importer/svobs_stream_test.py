@@ -0,0 +1,81 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for svobs_stream.py."""
+
+import os
+import sys
+import unittest
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(_SCRIPT_DIR)
+
+from svobs_stream import HyperLogLog, SVObsKeySet, SVObsSpool
+
+
+class HyperLogLogTest(unittest.TestCase):
+
+    def test_exact_count(self):
+        hll = HyperLogLog(max_exact_values=100)
+        for value in ['a', 'b', 'a', 1, 1.0, ['x'], ['x']]:
+            hll.add(value)
+        # 1 and 1.0 are the same value.
+        self.assertEqual(4, hll.count())
+
+    def test_approximate_count(self):
+        for num_values in [500, 20000, 200000]:
+            hll = HyperLogLog(precision=12, max_exact_values=100)
+            for value in range(num_values):
+                hll.add(str(value))
+                hll.add(value)
+            # Standard error for 4096 registers is about 1.6%.
+            self.assertAlmostEqual(2 * num_values,
+                                   hll.count(),
+                                   delta=0.05 * 2 * num_values)
+
+
+class SVObsKeySetTest(unittest.TestCase):
+
+    def test_add(self):
+        key_set = SVObsKeySet(expected_keys=1000)
+        # Add more keys than expected to look up keys saved on disk.
+        for key in range(-10000, 10000, 2):
+            self.assertIsNone(key_set.add(hash(f'key{key}'), key))
+        self.assertEqual(10000, len(key_set))
+        for key in range(-10000, 10000, 2):
+            self.assertEqual(key, key_set.add(hash(f'key{key}'), 0))
+        for key in range(-9999, 10000, 2):
+            self.assertIsNone(key_set.add(hash(f'key{key}'), key))
+        self.assertEqual(20000, len(key_set))
+        key_set.close()
+
+
+class SVObsSpoolTest(unittest.TestCase):
+
+    def test_spool(self):
+        spool = SVObsSpool()
+        expected = []
+        for index in range(100):
+            pvs = {'observationDate': str(2000 + index), 'value': index}
+            spool.append(index, pvs)
+            expected.append((index, pvs))
+        self.assertEqual(100, len(spool))
+        self.assertEqual(expected, list(spool))
+        # SVObs can be added after reading the spool.
+        spool.append(100, {'value': 100})
+        self.assertEqual(expected + [(100, {'value': 100})], list(spool))
+        spool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,6 +16,9 @@
 This module provides helper functions used across the StatVar import process.
 """
 
+import calendar
+import csv
+import itertools
 import os
 import logging
 import re
@@ -268,6 +271,65 @@ def get_observation_date_format(date_str: str) -> str:
     return date_format
 
 
+# Dates as YYYY, YYYY-MM or YYYY-MM-DD with optional zero padding.
+_OBSERVATION_DATE_PATTERN = re.compile(
+    r'^(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?$')
+
+# Number of date parts for the formats parsed by parse_observation_date().
+_OBSERVATION_DATE_FORMAT_PARTS = {
+    '%Y': 1,
+    '%Y-%m': 2,
+    '%Y-%m-%d': 3,
+}
+
+
+def parse_observation_date(date_str: str, date_format: str) -> Optional[str]:
+    """Returns the date string formatted as date_format without strptime.
+
+    This is a fast path for the common date formats YYYY, YYYY-MM and
+    YYYY-MM-DD that returns the same result as a round trip through
+    datetime.strptime() and strftime() with the date_format.
+
+    Args:
+        date_str: The date string with parts separated by '-'.
+        date_format: The strftime format for the date.
+
+    Returns:
+        The date zero padded as per date_format, or None if the date_format
+        is not supported or the date doesn't match it.
+
+    Examples:
+        >>> parse_observation_date("2023-5", "%Y-%m")
+        '2023-05'
+        >>> parse_observation_date("2023-02-30", "%Y-%m-%d") # Invalid day
+        >>> parse_observation_date("2023-05", "%Y") # Mismatched format
+    """
+    num_parts = _OBSERVATION_DATE_FORMAT_PARTS.get(date_format)
+    if not num_parts:
+        return None
+    match = _OBSERVATION_DATE_PATTERN.match(date_str)
+    if not match:
+        return None
+    parts = [int(part) for part in match.groups() if part is not None]
+    if len(parts) != num_parts:
+        return None
+    year = parts[0]
+    if year < 1000:
+        # Years before 1000 are not zero padded by strftime on all platforms.
+        return None
+    if num_parts == 1:
+        return f'{year}'
+    month = parts[1]
+    if month < 1 or month > 12:
+        return None
+    if num_parts == 2:
+        return f'{year}-{month:02d}'
+    day = parts[2]
+    if day < 1 or day > calendar.monthrange(year, month)[1]:
+        return None
+    return f'{year}-{month:02d}-{day:02d}'
+
+
 def get_filename_for_url(url: str, path: str) -> str:
     """Generates a safe local filename from a URL, ensuring uniqueness in the given path.
 
@@ -434,6 +496,90 @@ def shard_csv_data(
     return output_files
 
 
+def shard_csv_rows(
+    files: List[str],
+    rows_per_shard: int,
+    header_rows: int = 1,
+    keep_existing_files: bool = True,
+) -> List[str]:
+    """Shards CSV files into smaller CSV files with a range of rows each.
+
+    Unlike `shard_csv_data`, the input is streamed row by row so that files
+    larger than memory can be split. The first `header_rows` rows of each
+    input file are copied into every shard so that each shard can be
+    processed independently with the same column headers.
+
+    Args:
+        files: A list of paths to the input CSV files.
+        rows_per_shard: Number of data rows, excluding headers, per shard.
+        header_rows: Number of rows at the start of each file to be copied
+          into every shard.
+        keep_existing_files: If True, and shards for an input already exist,
+          they are reused instead of being regenerated.
+
+    Returns:
+        A list of file paths for the generated shard files.
+
+    Examples:
+        >>> shard_csv_rows(['my_data.csv'], rows_per_shard=1000000)
+        ['my_data-rows-00000-of-00002.csv', 'my_data-rows-00001-of-00002.csv']
+        >>> shard_csv_rows([], rows_per_shard=100)
+        []
+    """
+    output_files = []
+    if not files or rows_per_shard <= 0:
+        return list(files) if files else []
+    for file in files:
+        if file_util.file_is_local(file):
+            (file_prefix, file_ext) = os.path.splitext(file)
+        else:
+            fd, file_prefix = tempfile.mkstemp()
+        output_path = f'{file_prefix}-rows'
+        existing_shards = sorted(
+            file_util.file_get_matching(f'{output_path}-*-of-*.csv'))
+        if existing_shards and keep_existing_files:
+            logging.info(f'Using existing shards for {file}: {existing_shards}')
+            output_files.extend(existing_shards)
+            continue
+        logging.info(f'Sharding {file} into {rows_per_shard} rows per shard'
+                     f' into {output_path}-*.csv.')
+        shard_files = []
+        with file_util.FileIO(file, newline='') as csvfile:
+            reader = csv.reader(csvfile)
+            headers = list(itertools.islice(reader, header_rows))
+            writer = None
+            shard_fd = None
+            num_rows = 0
+            for row in reader:
+                if num_rows % rows_per_shard == 0:
+                    # Start a new shard with the headers.
+                    if shard_fd:
+                        shard_fd.close()
+                    shard_file = f'{output_path}-{len(shard_files):05d}.tmp'
+                    shard_fd = open(shard_file, 'w', newline='')
+                    shard_files.append(shard_file)
+                    writer = csv.writer(shard_fd)
+                    writer.writerows(headers)
+                writer.writerow(row)
+                num_rows += 1
+            if shard_fd:
+                shard_fd.close()
+        if not shard_files:
+            # No data rows to shard, use the original file.
+            output_files.append(file)
+            continue
+        # Rename shards with the total number of shards.
+        num_shards = len(shard_files)
+        for shard_index in range(num_shards):
+            output_file = (f'{output_path}-{shard_index:05d}-of-'
+                           f'{num_shards:05d}.csv')
+            os.replace(shard_files[shard_index], output_file)
+            output_files.append(output_file)
+        logging.info(f'Sharded {num_rows} rows from {file} into {num_shards}'
+                     f' shards.')
+    return output_files
+
+
 def convert_xls_to_csv(filenames: List[str],
                        sheets: Optional[List[str]] = None) -> List[str]:
     """Converts specified sheets from Excel files (.xls, .xlsx) into CSV files.
@@ -495,6 +641,9 @@ def prepare_input_data(config: Dict) -> List[str]:
     2.  Converts any Excel files (`.xls`, `.xlsx`) to CSV format.
     3.  If `parallelism` is enabled and a `shard_input_by_column` is specified,
         it shards the CSV files into smaller chunks.
+    4.  Else if `parallelism` is enabled and `shard_input_by_rows` is set,
+        it splits the CSV files into shards with a range of rows each.
+        A negative value splits each file into `parallelism` shards.
 
     Args:
         config: A dictionary containing configuration parameters, such as:
@@ -502,6 +651,7 @@ def prepare_input_data(config: Dict) -> List[str]:
                 - `data_url` (str): URL to download data from if `input_data` is not found.
                 - `input_xls` (list): A list of sheets to convert from Excel files.
                 - `shard_input_by_column` (str): The column to shard by.
+                - `shard_input_by_rows` (int): Number of rows per shard.
                 - `parallelism` (int): The number of parallel processes to use.
 
     Returns:
@@ -552,11 +702,27 @@ def prepare_input_data(config: Dict) -> List[str]:
         input_files = download_csv_from_url(data_url, input_data)
     input_files = convert_xls_to_csv(input_files, config.get('input_xls', []))
     shard_column = config.get('shard_input_by_column', '')
-    if config.get('parallelism', 0) > 0 and shard_column:
+    parallelism = config.get('parallelism', 0)
+    if parallelism > 0 and shard_column:
         return shard_csv_data(
             input_files,
             shard_column,
             config.get('shard_prefix_length', sys.maxsize),
             True,
         )
+    shard_rows = config.get('shard_input_by_rows', 0)
+    if parallelism > 1 and shard_rows:
+        if shard_rows < 0:
+            # Split inputs into one shard per parallel process.
+            shard_rows = max(
+                1,
+                file_util.file_estimate_num_rows(input_files) // parallelism +
+                1)
+        header_rows = max(config.get('header_rows', 1), 1)
+        return shard_csv_rows(
+            input_files,
+            shard_rows,
+            config.get('skip_rows', 0) + header_rows,
+            True,
+        )
     return input_files
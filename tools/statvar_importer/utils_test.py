@@ -14,14 +14,15 @@
 
 import unittest
 import os
+import tempfile
 from unittest.mock import patch
 import pandas as pd
 
 from utils import (capitalize_first_char, str_from_number, pvs_has_any_prop,
                    is_place_dcid, get_observation_period_for_date,
-                   get_observation_date_format, get_filename_for_url,
-                   download_csv_from_url, shard_csv_data, convert_xls_to_csv,
-                   prepare_input_data)
+                   get_observation_date_format, parse_observation_date,
+                   get_filename_for_url, download_csv_from_url, shard_csv_data,
+                   shard_csv_rows, convert_xls_to_csv, prepare_input_data)
 
 
 class TestCapitalizeFirstChar(unittest.TestCase):
@@ -196,6 +197,25 @@ class TestGetObservationDateFormat(unittest.TestCase):
                          "%Y-%m-%d")
 
 
+class TestParseObservationDate(unittest.TestCase):
+
+    def test_formats(self):
+        self.assertEqual(parse_observation_date("2023", "%Y"), "2023")
+        self.assertEqual(parse_observation_date("2023-5", "%Y-%m"), "2023-05")
+        self.assertEqual(parse_observation_date("2023-05-1", "%Y-%m-%d"),
+                         "2023-05-01")
+
+    def test_invalid_date(self):
+        self.assertIsNone(parse_observation_date("2023-13", "%Y-%m"))
+        self.assertIsNone(parse_observation_date("2023-02-29", "%Y-%m-%d"))
+        self.assertIsNone(parse_observation_date("May-2023", "%Y-%m"))
+
+    def test_mismatched_format(self):
+        self.assertIsNone(parse_observation_date("2023-05", "%Y"))
+        self.assertIsNone(parse_observation_date("2023-05", "%Y-%m-%d"))
+        self.assertIsNone(parse_observation_date("2023-05", "%m-%Y"))
+
+
 class TestGetFilenameForUrl(unittest.TestCase):
 
     @patch('utils.file_util.file_get_matching')
@@ -333,6 +353,32 @@ class TestShardCsvData(unittest.TestCase):
         self.assertEqual(files, [])
 
 
+class TestShardCsvRows(unittest.TestCase):
+
+    def test_shard_csv_rows(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = os.path.join(tmp_dir, 'test.csv')
+            with open(input_file, 'w') as f:
+                f.write('col1,col2\n')
+                for i in range(5):
+                    f.write(f'a{i},"b,{i}"\n')
+            files = shard_csv_rows([input_file], rows_per_shard=2)
+            self.assertEqual(files, [
+                os.path.join(tmp_dir, f'test-rows-0000{i}-of-00003.csv')
+                for i in range(3)
+            ])
+            dfs = [pd.read_csv(file) for file in files]
+            self.assertEqual([len(df) for df in dfs], [2, 2, 1])
+            self.assertEqual(list(dfs[2].columns), ['col1', 'col2'])
+            self.assertEqual(dfs[2]['col2'][0], 'b,4')
+            # Existing shards are reused.
+            self.assertEqual(files,
+                             shard_csv_rows([input_file], rows_per_shard=1))
+
+    def test_empty_files(self):
+        self.assertEqual(shard_csv_rows([], 10), [])
+
+
 class TestConvertXlsToCsv(unittest.TestCase):
 
     @patch('utils.pd.ExcelFile')
@@ -54,7 +54,32 @@ This contains the following utilities to download data from URLS:
         method='POST',
         output_file='india_state_population.csv')
 
-3. set_test_response():
+3. request_urls()
+  Download a list of URLs concurrently and return the responses in order.
+
+  Example: To get the JSON response for a list of URLs with upto 8 requests
+  in parallel:
+    responses = download_util.request_urls(
+        [url1, {'url': url2, 'params': {'dcids': 'Earth'}}],
+        max_concurrency=8,
+        output='json')
+
+4. ResponseCache
+  Cache for responses saved on disk with an expiry time per request.
+
+  Example: To cache responses for an hour:
+    response = download_util.request_url(url, use_cache=True, cache_ttl=3600)
+
+5. RateLimiter
+  Limit the rate of requests to a host across threads.
+
+  Example: To make upto 10 requests per second to a host:
+    rate_limiter = download_util.RateLimiter(requests_per_sec=10)
+    for url in urls:
+      rate_limiter.wait(url)
+      download_util.request_url(url)
+
+6. set_test_response():
   For tests that use the above functions, use this to seed the response for a URL.
   When the caller requests for the URL later, the pre-filled response is returned.
 
@@ -71,13 +96,20 @@ This contains the following utilities to download data from URLS:
           # server_resp will be set to {'dcid': '123'} set earlier.
   '''
 
+from concurrent.futures import ThreadPoolExecutor
 import gzip
+import hashlib
 import json
 import os
+import random
 import requests
-import requests_cache
+import requests.adapters
+import sqlite3
+import tempfile
+import threading
 import time
 import urllib
+import urllib.parse
 
 from absl import logging
 from google.cloud import storage
@@ -86,6 +118,27 @@ from typing import Union
 # Response pre-filled for tests.
 _PREFILLED_RESPONSE = {}
 
+# Sessions with a pool of connections per host.
+_SESSIONS = {}
+# Session class without any response cache. requests_cache.install_cache()
+# replaces requests.Session with a CachedSession that returns cached
+# responses even when use_cache is not set.
+_SESSION_CLASS = next(
+    cls for cls in requests.sessions.Session.__mro__
+    if cls.__module__ == 'requests.sessions' and cls.__name__ == 'Session')
+_SESSIONS_LOCK = threading.Lock()
+# Maximum number of connections per host.
+_SESSION_POOL_SIZE = 32
+
+# Maximum interval in seconds between retries.
+_MAX_RETRY_SECS = 60
+
+# Default expiry in seconds for cached responses.
+_DEFAULT_CACHE_TTL = 300
+# Cache for responses used when use_cache is set.
+_RESPONSE_CACHE = None
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
 
 def request_url(url: str,
                 params: dict = {},
@@ -95,7 +148,9 @@ def request_url(url: str,
                 timeout: int = 30,
                 retries: int = 3,
                 retry_secs: int = 5,
-                use_cache: bool = False) -> Union[str, dict, bytes]:
+                use_cache: bool = False,
+                cache_ttl: int = None,
+                cache: 'ResponseCache' = None) -> Union[str, dict, bytes]:
     '''Wrapper around requests to make a HTTP request and return the response.
     Returns the response from the http request in the specified format(text/json/bytes).
 
@@ -107,8 +162,15 @@ def request_url(url: str,
       output: the output format, 'text', 'json' or 'bytes'
       timeout: timeout in seconds.
       retries: Number of retries in case of HTTP errors.
-      retry_sec: Interval in seconds between retries for which caller is blocked.
+      retry_sec: Initial interval in seconds between retries for which caller
+        is blocked. The interval is doubled with some random jitter for each
+        retry upto a minute.
       use_cache: If True, uses request cache for faster response.
+      cache_ttl: Seconds for which the response is cached.
+        Defaults to 5 mins when use_cache is set.
+        If set, the response is cached even if use_cache is not set.
+      cache: ResponseCache or any object with get(key) and set(key, value, ttl)
+        to be used instead of the default cache.
 
     Returns:
       The response from the URL download in the output format whcih is one of:
@@ -134,58 +196,217 @@ def request_url(url: str,
         f'Downloading URL: {url} with params: {params}, method: {method}')
     if not retries or retries <= 0:
         retries = 1
-    # Setup request cache
-    if not requests_cache.is_installed():
-        requests_cache.install_cache(expires_after=300)
-    cache_context = None
-    if use_cache:
-        cache_context = requests_cache.enabled()
-        logging.debug(f'Using requests_cache for URL {url}')
-    else:
-        cache_context = requests_cache.disabled()
-        logging.debug(f'Using requests_cache for URL {url}')
-    with cache_context:
-        for attempt in range(retries):
-            try:
-                logging.debug(
-                    f'Downloading URL {url}, headers:{headers} params:{params}, {method} #{attempt}, retries={retries}'
-                )
-                if 'get' in method.lower():
-                    response = requests.get(url,
-                                            headers=headers,
-                                            params=params,
-                                            timeout=timeout)
-                else:
-                    response = requests.post(url,
-                                             headers=headers,
-                                             json=params,
-                                             timeout=timeout)
-                logging.debug(
-                    f'Got API response {response} for {url}, {params}')
-                if response.ok:
-                    if 'json' in output.lower():
-                        return response.json()
-                    elif 'text' in output:
-                        return response.text
-                    else:
-                        return response.content
-            except KeyError:
-                # Exception in case of API error.
-                return None
-            except (requests.exceptions.ConnectTimeout,
-                    requests.exceptions.ConnectionError, urllib.error.URLError,
-                    urllib.error.HTTPError) as e:
-                logging.debug(f'Got exception {e} for {url}, {params}')
-
-            # retry in case of errors
-            if attempt >= retries:
-                raise urllib.error.URLError
+    # Lookup the response cache
+    cache_key = None
+    if use_cache or cache_ttl or cache is not None:
+        if cache is None:
+            cache = get_response_cache()
+        if not cache_ttl:
+            cache_ttl = _DEFAULT_CACHE_TTL
+        cache_key = _get_cache_key(url, params, method)
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            logging.debug(f'Using cached response for URL {url}')
+            return _get_response_output(cached_response, output)
+
+    session = get_session(url)
+    for attempt in range(retries):
+        try:
+            logging.debug(
+                f'Downloading URL {url}, headers:{headers} params:{params}, {method} #{attempt}, retries={retries}'
+            )
+            if 'get' in method.lower():
+                response = session.get(url,
+                                       headers=headers,
+                                       params=params,
+                                       timeout=timeout)
             else:
-                logging.debug(f'Retrying URL {url} after {retry_secs} secs ...')
-                time.sleep(retry_secs)
+                response = session.post(url,
+                                        headers=headers,
+                                        json=params,
+                                        timeout=timeout)
+            logging.debug(f'Got API response {response} for {url}, {params}')
+            if response.ok:
+                cached_response = {
+                    'content': response.content,
+                    'encoding': response.encoding,
+                }
+                if cache_key:
+                    cache.set(cache_key, cached_response, cache_ttl)
+                return _get_response_output(cached_response, output)
+        except KeyError:
+            # Exception in case of API error.
+            return None
+        except (requests.exceptions.ConnectTimeout,
+                requests.exceptions.ConnectionError, urllib.error.URLError,
+                urllib.error.HTTPError) as e:
+            logging.debug(f'Got exception {e} for {url}, {params}')
+
+        # retry in case of errors
+        if attempt + 1 < retries:
+            wait_secs = get_retry_wait_secs(attempt, retry_secs)
+            logging.debug(f'Retrying URL {url} after {wait_secs} secs ...')
+            time.sleep(wait_secs)
     return None
 
 
+def request_urls(url_requests: list,
+                 max_concurrency: int = 8,
+                 rate_limiter: 'RateLimiter' = None,
+                 **kwargs) -> list:
+    '''Downloads a list of URLs concurrently.
+
+    Args:
+      url_requests: list of requests where each request is either a URL string
+        or a dictionary of arguments for request_url(), such as:
+        {'url': <url>, 'params': {...}, 'method': 'POST'}
+      max_concurrency: maximum number of requests in parallel.
+      rate_limiter: RateLimiter to limit the requests per host.
+      **kwargs: default arguments for request_url() for all requests,
+        such as output, timeout or use_cache.
+
+    Returns:
+      list of responses in the same order as the url_requests.
+      The response is None for a request that failed.
+    '''
+
+    def _request(url_request) -> Union[str, dict, bytes]:
+        args = dict(kwargs)
+        if isinstance(url_request, dict):
+            args.update(url_request)
+        else:
+            args['url'] = url_request
+        if rate_limiter:
+            rate_limiter.wait(args['url'])
+        try:
+            return request_url(**args)
+        except Exception as e:
+            logging.error(f'Failed to download {args["url"]}: {e}')
+            return None
+
+    if not max_concurrency or max_concurrency <= 1 or len(url_requests) <= 1:
+        return [_request(url_request) for url_request in url_requests]
+    with ThreadPoolExecutor(
+            max_workers=min(max_concurrency, len(url_requests))) as executor:
+        return list(executor.map(_request, url_requests))
+
+
+def get_session(url: str) -> requests.Session:
+    '''Returns a session with a pool of connections for the host of the url.'''
+    host = urllib.parse.urlparse(url).netloc
+    session = _SESSIONS.get(host)
+    if session is not None:
+        return session
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(host)
+        if session is None:
+            session = _SESSION_CLASS()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=_SESSION_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _SESSIONS[host] = session
+    return session
+
+
+def get_retry_wait_secs(attempt: int,
+                        retry_secs: float,
+                        max_retry_secs: float = _MAX_RETRY_SECS) -> float:
+    '''Returns the seconds to wait before a retry with exponential backoff.
+
+    The interval doubles for each attempt with a random jitter so that
+    concurrent clients don't retry at the same time.
+    '''
+    if not retry_secs or retry_secs <= 0:
+        return 0
+    wait_secs = min(max_retry_secs, retry_secs * (2**attempt))
+    return wait_secs * random.uniform(0.5, 1.0)
+
+
+class ResponseCache:
+    '''Cache for URL responses in an SQLite file with an expiry per entry.
+
+    Any object with the methods get(key) and set(key, value, ttl) can be used
+    in place of this cache in request_url().
+    '''
+
+    def __init__(self, filename: str = ''):
+        if not filename:
+            filename = os.path.join(tempfile.gettempdir(),
+                                    'download_util_cache.sqlite')
+        self._filename = filename
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filename,
+                                   timeout=60,
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS responses'
+                         ' (key TEXT PRIMARY KEY, expiry REAL, value BLOB)')
+        self._db.commit()
+
+    def get(self, key: str) -> dict:
+        '''Returns the cached value for the key if it has not expired.'''
+        with self._lock:
+            row = self._db.execute(
+                'SELECT expiry, value FROM responses WHERE key = ?',
+                (key,)).fetchone()
+        if not row or row[0] < time.time():
+            return None
+        encoding, content = row[1].split(b'\n', 1)
+        return {'content': content, 'encoding': encoding.decode() or None}
+
+    def set(self, key: str, value: dict, ttl: int = _DEFAULT_CACHE_TTL):
+        '''Saves the value for the key for ttl seconds.'''
+        encoding = (value.get('encoding') or '').encode()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses (key, expiry, value)'
+                ' VALUES (?, ?, ?)',
+                (key, time.time() + ttl, encoding + b'\n' + value['content']))
+            self._db.commit()
+
+    def clear(self):
+        '''Removes all entries from the cache.'''
+        with self._lock:
+            self._db.execute('DELETE FROM responses')
+            self._db.commit()
+
+
+def get_response_cache() -> ResponseCache:
+    '''Returns the default cache for responses.'''
+    global _RESPONSE_CACHE
+    with _RESPONSE_CACHE_LOCK:
+        if _RESPONSE_CACHE is None:
+            _RESPONSE_CACHE = ResponseCache()
+    return _RESPONSE_CACHE
+
+
+def set_response_cache(cache: ResponseCache):
+    '''Sets the default cache for responses.'''
+    global _RESPONSE_CACHE
+    _RESPONSE_CACHE = cache
+
+
+def _get_cache_key(url: str, params: dict, method: str) -> str:
+    '''Returns the key for the response cache.'''
+    request = json.dumps([method.upper(), url, params],
+                         sort_keys=True,
+                         default=str)
+    return hashlib.sha256(request.encode()).hexdigest()
+
+
+def _get_response_output(response: dict,
+                         output: str) -> Union[str, dict, bytes]:
+    '''Returns the response content in the output format.'''
+    content = response['content']
+    if 'json' in output.lower():
+        return json.loads(content)
+    elif 'text' in output:
+        return content.decode(response.get('encoding') or 'utf-8',
+                              errors='replace')
+    return content
+
+
 def download_gcs_file(url: str, params: dict = {}) -> bytes:
     '''Downloads a GCS file from the given URL.
     Assumes the client is authenticated and has access to the project.
@@ -289,6 +510,39 @@ def download_file_from_url(url: str,
     return output_file
 
 
+class RateLimiter:
+    '''Limits the rate of requests per host across threads.'''
+
+    def __init__(self, requests_per_sec: float = 10):
+        self._interval = 0
+        if requests_per_sec and requests_per_sec > 0:
+            self._interval = 1 / requests_per_sec
+        self._lock = threading.Lock()
+        # Dictionary of host to the time for the next request.
+        self._next_request_time = {}
+
+    def wait(self, url: str) -> float:
+        '''Blocks until a request to the host of the url can be made.
+
+        Args:
+          url: URL to be requested.
+
+        Returns:
+          the number of seconds waited.
+        '''
+        if not self._interval:
+            return 0
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            request_time = max(now, self._next_request_time.get(host, 0))
+            self._next_request_time[host] = request_time + self._interval
+        wait_secs = request_time - now
+        if wait_secs > 0:
+            time.sleep(wait_secs)
+        return wait_secs
+
+
 def set_test_url_download_response(url: str, params: dict, response: str):
     '''Sets a pre-filled response for tests.
     Args:
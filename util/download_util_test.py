@@ -13,17 +13,50 @@
 # limitations under the License.
 '''Tests for download_util.py'''
 
+import http.server
+import json
 import os
 import sys
 import tempfile
+import threading
+import time
 import unittest
 
+import requests_cache
+
 _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(_SCRIPT_DIR)
 
 import download_util
 
 
+class _TestRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Stub server that returns the request path as JSON.
+
+  Requests for paths with 'fail' return an error for the first request.
+  """
+
+    # List of paths requested.
+    requests = []
+
+    def do_GET(self):
+        _TestRequestHandler.requests.append(self.path)
+        if 'fail' in self.path and _TestRequestHandler.requests.count(
+                self.path) == 1:
+            self.send_response(503)
+            self.end_headers()
+            return
+        response = json.dumps({'path': self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
 class TestCounters(unittest.TestCase):
 
     def setUp(self):
@@ -54,6 +87,17 @@ class TestCounters(unittest.TestCase):
                                                   output='json')
         self.assertEqual({'name': 'abc'}, test_response)
 
+    def test_rate_limiter(self):
+        rate_limiter = download_util.RateLimiter(requests_per_sec=20)
+        start_time = time.monotonic()
+        for _ in range(3):
+            rate_limiter.wait('http://host1.test/path?a=1')
+            # Requests to other hosts are not limited.
+            rate_limiter.wait('http://host2.test/path')
+        # 3 requests to a host take at least 2 intervals of 0.05 secs.
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.09)
+        self.assertLess(time.monotonic() - start_time, 1)
+
     def test_download_file(self):
         with tempfile.TemporaryDirectory() as tmp_dir:
             filename = os.path.join(tmp_dir, 'test.json')
@@ -62,4 +106,81 @@ class TestCounters(unittest.TestCase):
             self.assertTrue(os.path.exists(filename))
             with open(filename) as fp:
                 contents = fp.read()
-                self.assertEqual('{"param": "value"}', contents)
\ No newline at end of file
+                self.assertEqual('{"param": "value"}', contents)
+
+
+class RequestUrlsTest(unittest.TestCase):
+
+    def setUp(self):
+        _TestRequestHandler.requests = []
+        self._server = http.server.ThreadingHTTPServer(('localhost', 0),
+                                                       _TestRequestHandler)
+        self._server_thread = threading.Thread(
+            target=self._server.serve_forever)
+        self._server_thread.start()
+        self._url = f'http://localhost:{self._server.server_port}'
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._cache = download_util.ResponseCache(
+            os.path.join(self._tmp_dir.name, 'cache.sqlite'))
+
+    def tearDown(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._server_thread.join()
+        self._tmp_dir.cleanup()
+
+    def test_request_urls(self):
+        url_requests = [f'{self._url}/path{i}' for i in range(10)]
+        url_requests.append({'url': f'{self._url}/params', 'params': {'id': 1}})
+        responses = download_util.request_urls(url_requests,
+                                               max_concurrency=4,
+                                               output='json')
+        self.assertEqual([{
+            'path': f'/path{i}'
+        } for i in range(10)] + [{
+            'path': '/params?id=1'
+        }], responses)
+
+    def test_retry(self):
+        response = download_util.request_url(f'{self._url}/fail',
+                                             output='text',
+                                             retry_secs=0.01)
+        self.assertEqual('{"path": "/fail"}', response)
+        self.assertEqual(['/fail', '/fail'], _TestRequestHandler.requests)
+        for attempt in range(10):
+            self.assertLessEqual(
+                download_util.get_retry_wait_secs(attempt, 1, 10), 10)
+        self.assertGreaterEqual(download_util.get_retry_wait_secs(3, 1), 4)
+
+    def test_request_with_global_requests_cache(self):
+        # Responses are not cached by a global requests_cache install.
+        requests_cache.install_cache(backend='memory')
+        try:
+            url = f'{self._url}/uncached'
+            for _ in range(2):
+                self.assertEqual({'path': '/uncached'},
+                                 download_util.request_url(url, output='json'))
+        finally:
+            requests_cache.uninstall_cache()
+        self.assertEqual(['/uncached', '/uncached'],
+                         _TestRequestHandler.requests)
+
+    def test_response_cache(self):
+        url = f'{self._url}/cached'
+        for _ in range(3):
+            self.assertEqual({'path': '/cached'},
+                             download_util.request_url(url,
+                                                       output='json',
+                                                       cache=self._cache,
+                                                       cache_ttl=60))
+        self.assertEqual(
+            b'{"path": "/cached"}',
+            download_util.request_url(url, output='bytes', cache=self._cache))
+        self.assertEqual(['/cached'], _TestRequestHandler.requests)
+
+        # Expired responses are downloaded again.
+        url = f'{self._url}/expired'
+        for _ in range(2):
+            download_util.request_url(url, cache=self._cache, cache_ttl=-1)
+        self.assertEqual(['/cached', '/expired', '/expired'],
+                         _TestRequestHandler.requests)